@@ -0,0 +1,66 @@
+-- Usage Counters Migration
+-- Pre-aggregated per-key usage so quota checks are a primary-key lookup
+-- instead of a COUNT(*) over api_usage
+
+BEGIN;
+
+-- One row per key, bucket and period:
+--   finance_daily: FinSight calls per day (Cite-Agent keys)
+--   monthly:       all calls per month, period_start is the 1st (FinSight keys)
+-- No foreign key: in-memory demo keys are counted too
+CREATE TABLE IF NOT EXISTS api_usage_counters (
+    api_key_id VARCHAR(255) NOT NULL,
+    bucket VARCHAR(32) NOT NULL,
+    period_start DATE NOT NULL,
+    count BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    PRIMARY KEY (api_key_id, bucket, period_start)
+);
+
+-- Backfill from existing usage (same day/month boundaries as the views)
+INSERT INTO api_usage_counters (api_key_id, bucket, period_start, count)
+SELECT api_key_id, 'finance_daily', DATE(timestamp), COUNT(*)
+FROM api_usage
+WHERE endpoint LIKE '/v1/finance%'
+GROUP BY api_key_id, DATE(timestamp)
+ON CONFLICT (api_key_id, bucket, period_start) DO UPDATE SET count = EXCLUDED.count;
+
+INSERT INTO api_usage_counters (api_key_id, bucket, period_start, count)
+SELECT api_key_id, 'monthly', DATE(DATE_TRUNC('month', timestamp)), COUNT(*)
+FROM api_usage
+GROUP BY api_key_id, DATE(DATE_TRUNC('month', timestamp))
+ON CONFLICT (api_key_id, bucket, period_start) DO UPDATE SET count = EXCLUDED.count;
+
+-- Per-key time range scans (fallback path and billing reports)
+CREATE INDEX IF NOT EXISTS idx_api_usage_key_timestamp ON api_usage(api_key_id, timestamp);
+
+-- Partial index for FinSight calls; text_pattern_ops lets LIKE 'prefix%'
+-- use the endpoint index regardless of collation
+CREATE INDEX IF NOT EXISTS idx_api_usage_finance_key_timestamp
+    ON api_usage(api_key_id, timestamp)
+    WHERE endpoint LIKE '/v1/finance%';
+CREATE INDEX IF NOT EXISTS idx_api_usage_endpoint_pattern ON api_usage(endpoint text_pattern_ops);
+
+-- Expression indexes for the daily/monthly views. DATE(timestamptz) depends
+-- on the session time zone and can't be indexed, so these pin UTC
+CREATE INDEX IF NOT EXISTS idx_api_usage_key_utc_day
+    ON api_usage(api_key_id, ((timestamp AT TIME ZONE 'UTC')::date));
+CREATE INDEX IF NOT EXISTS idx_api_usage_key_utc_month
+    ON api_usage(api_key_id, DATE_TRUNC('month', timestamp AT TIME ZONE 'UTC'));
+
+-- The views now read the counters
+CREATE OR REPLACE VIEW daily_finsight_usage AS
+SELECT api_key_id, period_start AS usage_date, count AS call_count
+FROM api_usage_counters
+WHERE bucket = 'finance_daily';
+
+CREATE OR REPLACE VIEW monthly_usage AS
+SELECT
+    api_key_id,
+    EXTRACT(YEAR FROM period_start) AS year,
+    EXTRACT(MONTH FROM period_start) AS month,
+    count AS call_count
+FROM api_usage_counters
+WHERE bucket = 'monthly';
+
+COMMIT;
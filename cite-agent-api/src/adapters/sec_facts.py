@@ -3,9 +3,7 @@ SEC Facts Adapter - Simplified
 Fetches XBRL financial facts from SEC EDGAR with proper citations
 """
 
-import asyncio
 import structlog
-import aiohttp
 import yaml
 import os
 from typing import Dict, Any, Optional, List
@@ -13,6 +11,8 @@ from fastapi import HTTPException
 from datetime import datetime
 
 from src.config.settings import get_settings
+from src.connectors.http_client import get_upstream_client
+from src.facts.snapshot import snapshot_lookup
 from src.utils.resiliency import cache
 
 logger = structlog.get_logger(__name__)
@@ -22,8 +22,8 @@ class SECFactsAdapter:
     
     def __init__(self):
         self.base_url = "https://data.sec.gov"
-        self.session = None
-        self._session_loop = None
+        # Pooled, rate-limited client shared with the SEC connectors
+        self.client = get_upstream_client("sec")
         
         # Dynamic ticker lookup - supports ALL SEC-filing companies (10,123+)
         # No hardcoded mapping needed - uses src.jobs.symbol_map.cik_for_ticker()
@@ -113,28 +113,6 @@ class SECFactsAdapter:
         self.mock_data = {}
         self.ifrs_demo_data = {}
         
-    async def _get_session(self):
-        """Get aiohttp session"""
-        current_loop = asyncio.get_running_loop()
-
-        # Recreate the session when used from a new event loop or if the existing
-        # session was closed (pytest-asyncio creates a fresh loop per test).
-        if (
-            self.session is None
-            or self.session.closed
-            or self._session_loop is not current_loop
-        ):
-            if self.session is not None and not self.session.closed:
-                await self.session.close()
-
-            self.session = aiohttp.ClientSession(
-                headers={"User-Agent": "FinSight Financial Data (contact@nocturnal.dev)"},
-                timeout=aiohttp.ClientTimeout(total=30)
-            )
-            self._session_loop = current_loop
-
-        return self.session
-    
     async def get_facts_from_same_filing(
         self,
         ticker: str,
@@ -185,7 +163,6 @@ class SECFactsAdapter:
             logger.error("Failed to get facts from same filing", ticker=ticker, concepts=concepts, error=str(e))
             return {}
 
-    @cache(ttl=900, source_version="sec_facts")  # 15 minutes cache
     async def get_fact(
         self,
         ticker: str,
@@ -195,6 +172,25 @@ class SECFactsAdapter:
         freq: str = "Q",
         as_reported: bool = False,
         accession: str = None
+    ) -> Optional[Dict[str, Any]]:
+        """Get a financial fact from SEC EDGAR, once per request inside a fact snapshot"""
+        return await snapshot_lookup(
+            ("sec", ticker.upper(), concept, period, freq, as_reported, accession),
+            lambda: self._fetch_fact(
+                ticker, concept, period=period, freq=freq, as_reported=as_reported, accession=accession
+            )
+        )
+
+    @cache(ttl=900, source_version="sec_facts")  # 15 minutes cache
+    async def _fetch_fact(
+        self,
+        ticker: str,
+        concept: str,
+        *,
+        period: str = None,
+        freq: str = "Q",
+        as_reported: bool = False,
+        accession: str = None
     ) -> Optional[Dict[str, Any]]:
         """Get a financial fact from SEC EDGAR (production mode only)"""
         try:
@@ -212,97 +208,95 @@ class SECFactsAdapter:
                 logger.warning("No XBRL concepts found", concept=concept)
                 return None
 
-            session = await self._get_session()
-
             # Fetch company facts
             url = f"{self.base_url}/api/xbrl/companyfacts/CIK{cik}.json"
             logger.info("Fetching company facts", ticker=ticker, cik=cik)
 
-            async with session.get(url) as response:
-                if response.status != 200:
-                    logger.error("Failed to fetch company facts", status=response.status)
-                    return None
+            response = await self.client.get(url)
+            if response.status != 200:
+                logger.error("Failed to fetch company facts", status=response.status)
+                return None
 
-                data = await response.json()
-                facts = data.get("facts", {})
+            data = response.json()
+            facts = data.get("facts", {})
 
-                # Try both US-GAAP and IFRS taxonomies
-                taxonomies = ["us-gaap", "ifrs-full"]
+            # Try both US-GAAP and IFRS taxonomies
+            taxonomies = ["us-gaap", "ifrs-full"]
 
-                # If looking for latest data (not specific accession), find the NEWEST available concept
-                # This handles schema drift where companies switch to newer XBRL tags
-                if not accession and period in {"latest", "most_recent", "recent", None}:
-                    candidates = []
+            # If looking for latest data (not specific accession), find the NEWEST available concept
+            # This handles schema drift where companies switch to newer XBRL tags
+            if not accession and period in {"latest", "most_recent", "recent", None}:
+                candidates = []
 
-                    for taxonomy in taxonomies:
-                        if taxonomy not in facts:
-                            continue
-                        taxonomy_data = facts[taxonomy]
-
-                        for xbrl_concept in xbrl_concepts:
-                            if xbrl_concept in taxonomy_data:
-                                concept_data = taxonomy_data[xbrl_concept]
-                                fact = self._find_fact_for_period(concept_data, None, freq, None)
-
-                                if fact and fact.get("fp") != "FY" if freq == "Q" else True:
-                                    candidates.append({
-                                        "fact": fact,
-                                        "xbrl_concept": xbrl_concept,
-                                        "taxonomy": taxonomy,
-                                        "end_date": fact.get("end", "")
-                                    })
-
-                    # Pick the candidate with the most recent end date
-                    if candidates:
-                        best = max(candidates, key=lambda x: x["end_date"])
-                        logger.info("Selected newest concept",
-                                  ticker=ticker, concept=concept,
-                                  xbrl_concept=best["xbrl_concept"],
-                                  end_date=best["end_date"],
-                                  total_candidates=len(candidates))
-
-                        return await self._build_fact_response(
-                            best["fact"], ticker, concept, best["xbrl_concept"], best["taxonomy"]
-                        )
-
-                # Original logic for specific periods or when accession is specified
                 for taxonomy in taxonomies:
                     if taxonomy not in facts:
                         continue
-
                     taxonomy_data = facts[taxonomy]
 
-                    # Find matching facts in this taxonomy
                     for xbrl_concept in xbrl_concepts:
                         if xbrl_concept in taxonomy_data:
                             concept_data = taxonomy_data[xbrl_concept]
-                            normalized_period = period if period not in {"latest", "most_recent", "recent"} else None
-                            fact = self._find_fact_for_period(concept_data, normalized_period, freq, accession)
-
-                            if fact:
-                                # Check if we're returning annual data when quarterly was requested
-                                fact_fp = fact.get("fp", "")
-                                if freq == "Q" and fact_fp == "FY":
-                                    logger.warning("No quarterly data available, found annual data instead",
-                                                 ticker=ticker, concept=concept, period=period, fact_fp=fact_fp)
-                                    continue  # Skip annual data when quarterly was requested
-
-                                # Validate the financial data (temporarily disabled - validation has bug)
-                                value = fact.get("val", 0)
-                                # if not self._validate_financial_data(ticker, concept, value, period or "", freq):
-                                #     logger.warning("Financial data validation failed",
-                                #                  ticker=ticker, concept=concept, value=value, period=period)
-                                #     continue  # Try next concept
-
-                                logger.info("Fact retrieved",
-                                          ticker=ticker, concept=concept,
-                                          taxonomy=taxonomy, xbrl_concept=xbrl_concept,
-                                          value=value, period=period, accession=fact.get("accn"))
-
-                                return await self._build_fact_response(fact, ticker, concept, xbrl_concept, taxonomy)
-
-                logger.warning("No facts found", ticker=ticker, concept=concept, taxonomies=taxonomies)
-                return None
+                            fact = self._find_fact_for_period(concept_data, None, freq, None)
+
+                            if fact and fact.get("fp") != "FY" if freq == "Q" else True:
+                                candidates.append({
+                                    "fact": fact,
+                                    "xbrl_concept": xbrl_concept,
+                                    "taxonomy": taxonomy,
+                                    "end_date": fact.get("end", "")
+                                })
+
+                # Pick the candidate with the most recent end date
+                if candidates:
+                    best = max(candidates, key=lambda x: x["end_date"])
+                    logger.info("Selected newest concept",
+                              ticker=ticker, concept=concept,
+                              xbrl_concept=best["xbrl_concept"],
+                              end_date=best["end_date"],
+                              total_candidates=len(candidates))
+
+                    return await self._build_fact_response(
+                        best["fact"], ticker, concept, best["xbrl_concept"], best["taxonomy"]
+                    )
+
+            # Original logic for specific periods or when accession is specified
+            for taxonomy in taxonomies:
+                if taxonomy not in facts:
+                    continue
+
+                taxonomy_data = facts[taxonomy]
+
+                # Find matching facts in this taxonomy
+                for xbrl_concept in xbrl_concepts:
+                    if xbrl_concept in taxonomy_data:
+                        concept_data = taxonomy_data[xbrl_concept]
+                        normalized_period = period if period not in {"latest", "most_recent", "recent"} else None
+                        fact = self._find_fact_for_period(concept_data, normalized_period, freq, accession)
+
+                        if fact:
+                            # Check if we're returning annual data when quarterly was requested
+                            fact_fp = fact.get("fp", "")
+                            if freq == "Q" and fact_fp == "FY":
+                                logger.warning("No quarterly data available, found annual data instead",
+                                             ticker=ticker, concept=concept, period=period, fact_fp=fact_fp)
+                                continue  # Skip annual data when quarterly was requested
+
+                            # Validate the financial data (temporarily disabled - validation has bug)
+                            value = fact.get("val", 0)
+                            # if not self._validate_financial_data(ticker, concept, value, period or "", freq):
+                            #     logger.warning("Financial data validation failed",
+                            #                  ticker=ticker, concept=concept, value=value, period=period)
+                            #     continue  # Try next concept
+
+                            logger.info("Fact retrieved",
+                                      ticker=ticker, concept=concept,
+                                      taxonomy=taxonomy, xbrl_concept=xbrl_concept,
+                                      value=value, period=period, accession=fact.get("accn"))
+
+                            return await self._build_fact_response(fact, ticker, concept, xbrl_concept, taxonomy)
+
+            logger.warning("No facts found", ticker=ticker, concept=concept, taxonomies=taxonomies)
+            return None
 
         except ValueError as e:
             # Re-raise ValueError from strict mode
@@ -322,21 +316,20 @@ class SECFactsAdapter:
                 logger.warning("Unknown ticker when fetching company facts", ticker=ticker)
                 return None
 
-            session = await self._get_session()
             url = f"{self.base_url}/api/xbrl/companyfacts/CIK{cik}.json"
             logger.info("Fetching full company facts", ticker=ticker, cik=cik)
 
-            async with session.get(url) as response:
-                if response.status != 200:
-                    logger.error(
-                        "Failed to fetch company facts",
-                        ticker=ticker,
-                        cik=cik,
-                        status=response.status
-                    )
-                    return None
+            response = await self.client.get(url)
+            if response.status != 200:
+                logger.error(
+                    "Failed to fetch company facts",
+                    ticker=ticker,
+                    cik=cik,
+                    status=response.status
+                )
+                return None
 
-                data = await response.json()
+            data = response.json()
 
             normalized: Dict[str, Any] = {
                 "cik": cik,
@@ -874,13 +867,12 @@ class SECFactsAdapter:
                 logger.warning("Unknown ticker", ticker=ticker)
                 return []
             
-            session = await self._get_session()
             url = f"{self.base_url}/api/xbrl/companyfacts/CIK{cik}.json"
-            async with session.get(url) as response:
-                if response.status != 200:
-                    logger.error("Failed to fetch company facts for series", status=response.status)
-                    return []
-                data = await response.json()
+            response = await self.client.get(url)
+            if response.status != 200:
+                logger.error("Failed to fetch company facts for series", status=response.status)
+                return []
+            data = response.json()
         except Exception as e:
             logger.error("Failed to fetch series data", ticker=ticker, concept=concept, error=str(e))
             return []
@@ -947,9 +939,8 @@ class SECFactsAdapter:
         return series
     
     async def close(self):
-        """Close session"""
-        if self.session:
-            await self.session.close()
+        """No-op: the shared SEC client is closed on app shutdown"""
+        pass
 
 # Global instance
 sec_facts_adapter = SECFactsAdapter()
@@ -2,9 +2,12 @@
 Production-ready authentication and authorization system
 """
 
+import ast
+import asyncio
 import hashlib
 import secrets
 import time
+from dataclasses import dataclass
 from datetime import datetime, timedelta, timezone
 from typing import Optional, Dict, Any
 import structlog
@@ -31,12 +34,55 @@ pwd_context = CryptContext(schemes=["argon2"], deprecated="auto")
 # HTTP Bearer token scheme
 security = HTTPBearer()
 
+API_KEY_CACHE_TTL = 30  # seconds a validated key is trusted without asking Redis
+REVOCATION_CHANNEL = "api_keys:revoked"
+REVOCATION_RETRY_SECONDS = 5
+
+
+def _api_key_key(api_key: str) -> str:
+    return f"api_key:{api_key}"
+
+
+def _api_key_stats_key(api_key: str) -> str:
+    """Hash of usage_count/last_used, kept apart so validation never rewrites the key data"""
+    return f"api_key_stats:{api_key}"
+
+
+def _user_keys_key(user_id: str) -> str:
+    """Set of a user's API keys"""
+    return f"api_keys:user:{user_id}"
+
+
+def _decode(value) -> str:
+    return value.decode() if isinstance(value, bytes) else value
+
+
+def _parse_key_data(raw, stats) -> Dict[str, Any]:
+    """Key data stored by create_api_key with usage statistics merged in"""
+    data = ast.literal_eval(_decode(raw))
+    stats = {_decode(k): _decode(v) for k, v in (stats or {}).items()}
+    data["usage_count"] = data.get("usage_count", 0) + int(stats.get("usage_count", 0))
+    data["last_used"] = stats.get("last_used", data.get("last_used"))
+    return data
+
+
+@dataclass
+class _CachedKey:
+    data: Dict[str, Any]
+    expires_at: float
+    uses: int = 0  # Validations not yet written to Redis
+    last_used: Optional[str] = None
+
+
 class AuthManager:
     """Production-ready authentication manager"""
     
-    def __init__(self, redis_client: redis.Redis):
+    def __init__(self, redis_client: redis.Redis, cache_ttl: float = API_KEY_CACHE_TTL):
         self.redis = redis_client
         self.api_keys = {}  # In production, this would be in database
+        self.cache_ttl = cache_ttl
+        self._key_cache: Dict[str, _CachedKey] = {}
+        self._revocation_listener: Optional[asyncio.Task] = None
         
     def verify_password(self, plain_password: str, hashed_password: str) -> bool:
         """Verify a password against its hash"""
@@ -84,74 +130,197 @@ class AuthManager:
             "usage_count": 0
         }
         
-        await self.redis.setex(
-            f"api_key:{api_key}",
-            API_KEY_EXPIRE_DAYS * 24 * 3600,  # 90 days
-            str(key_data)
-        )
+        ttl = API_KEY_EXPIRE_DAYS * 24 * 3600  # 90 days
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.setex(_api_key_key(api_key), ttl, str(key_data))
+            # The index itself never expires (keys in use keep sliding theirs);
+            # members whose key expired are pruned by get_user_api_keys
+            pipe.sadd(_user_keys_key(user_id), api_key)
+            await pipe.execute()
         
         logger.info("API key created", user_id=user_id, name=name, permissions=permissions)
         return api_key
     
     async def validate_api_key(self, api_key: str) -> Optional[Dict[str, Any]]:
-        """Validate API key and return user data"""
+        """
+        Validate API key and return user data
+
+        Valid keys are cached in process for cache_ttl seconds; revocations
+        evict them immediately through REVOCATION_CHANNEL. Usage statistics
+        are counted locally and written once per refresh instead of on
+        every call.
+        """
         if not api_key or not api_key.startswith("na_"):
             return None
-        
-        # Check Redis cache first
-        key_data = await self.redis.get(f"api_key:{api_key}")
+
+        self._ensure_revocation_listener()
+        cached = self._key_cache.get(api_key)
+        if cached is None or time.monotonic() >= cached.expires_at:
+            cached = await self._refresh_api_key(api_key, cached)
+            if cached is None:
+                return None
+
+        cached.uses += 1
+        cached.last_used = datetime.now(timezone.utc).isoformat()
+        data = dict(cached.data)
+        data["last_used"] = cached.last_used
+        data["usage_count"] = data.get("usage_count", 0) + cached.uses
+        return data
+
+    async def _refresh_api_key(self, api_key: str, previous: Optional[_CachedKey]) -> Optional[_CachedKey]:
+        """Re-read a key from Redis, writing the usage counted since the last refresh"""
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.get(_api_key_key(api_key))
+            pipe.hgetall(_api_key_stats_key(api_key))
+            key_data, stats = await pipe.execute()
+
         if not key_data:
+            self._key_cache.pop(api_key, None)
             return None
-        
+
         try:
-            import ast
-            data = ast.literal_eval(key_data.decode())
-            
-            # Update usage statistics
-            data["last_used"] = datetime.now(timezone.utc).isoformat()
-            data["usage_count"] = data.get("usage_count", 0) + 1
-            
-            await self.redis.setex(
-                f"api_key:{api_key}",
-                API_KEY_EXPIRE_DAYS * 24 * 3600,
-                str(data)
-            )
-            
-            return data
-            
+            data = _parse_key_data(key_data, stats)
         except Exception as e:
             logger.error("Error validating API key", error=str(e))
             return None
+
+        ttl = API_KEY_EXPIRE_DAYS * 24 * 3600
+        async with self.redis.pipeline(transaction=False) as pipe:
+            if previous is not None and previous.uses:
+                pipe.hincrby(_api_key_stats_key(api_key), "usage_count", previous.uses)
+                pipe.hset(_api_key_stats_key(api_key), "last_used", previous.last_used)
+                data["usage_count"] += previous.uses
+                data["last_used"] = previous.last_used
+            # Keys in use keep sliding their expiry forward
+            pipe.expire(_api_key_key(api_key), ttl)
+            pipe.expire(_api_key_stats_key(api_key), ttl)
+            await pipe.execute()
+
+        cached = _CachedKey(data=data, expires_at=time.monotonic() + self.cache_ttl)
+        self._key_cache[api_key] = cached
+        return cached
+
+    def _ensure_revocation_listener(self) -> None:
+        loop = asyncio.get_running_loop()
+        task = self._revocation_listener
+        if task is None or task.done() or task.get_loop() is not loop:
+            self._revocation_listener = loop.create_task(self._listen_for_revocations())
+
+    async def _listen_for_revocations(self) -> None:
+        """Evict API keys revoked by any instance from the local cache"""
+        while True:
+            try:
+                pubsub = self.redis.pubsub()
+                try:
+                    await pubsub.subscribe(REVOCATION_CHANNEL)
+                    async for message in pubsub.listen():
+                        if message.get("type") == "message":
+                            self._key_cache.pop(_decode(message["data"]), None)
+                finally:
+                    await pubsub.aclose()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("API key revocation listener disconnected", error=str(e))
+            # Revocations may have been missed meanwhile: re-check every cached key
+            for cached in self._key_cache.values():
+                cached.expires_at = 0
+            await asyncio.sleep(REVOCATION_RETRY_SECONDS)
     
     async def revoke_api_key(self, api_key: str) -> bool:
         """Revoke an API key"""
-        result = await self.redis.delete(f"api_key:{api_key}")
-        logger.info("API key revoked", api_key=api_key[:10] + "...", success=bool(result))
-        return bool(result)
+        cached = self._key_cache.pop(api_key, None)
+        user_id = cached.data.get("user_id") if cached else None
+        if user_id is None:
+            key_data = await self.redis.get(_api_key_key(api_key))
+            try:
+                user_id = ast.literal_eval(_decode(key_data)).get("user_id") if key_data else None
+            except Exception:
+                user_id = None
+
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.delete(_api_key_key(api_key))
+            pipe.delete(_api_key_stats_key(api_key))
+            if user_id is not None:
+                pipe.srem(_user_keys_key(user_id), api_key)
+            pipe.publish(REVOCATION_CHANNEL, api_key)
+            results = await pipe.execute()
+
+        logger.info("API key revoked", api_key=api_key[:10] + "...", success=bool(results[0]))
+        return bool(results[0])
     
     async def get_user_api_keys(self, user_id: str) -> list:
         """Get all API keys for a user"""
+        index = _user_keys_key(user_id)
+        api_keys = [_decode(member) for member in await self.redis.smembers(index)]
+        if not api_keys:
+            return []
+
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for api_key in api_keys:
+                pipe.get(_api_key_key(api_key))
+                pipe.hgetall(_api_key_stats_key(api_key))
+            results = await pipe.execute()
+
         keys = []
-        async for key in self.redis.scan_iter(match=f"api_key:na_*"):
-            key_data = await self.redis.get(key)
-            if key_data:
+        expired = []
+        for api_key, key_data, stats in zip(api_keys, results[::2], results[1::2]):
+            if not key_data:
+                expired.append(api_key)
+                continue
+            try:
+                data = _parse_key_data(key_data, stats)
+            except Exception as e:
+                logger.error("Error parsing API key data", error=str(e))
+                continue
+            keys.append({
+                "api_key": api_key,
+                "name": data.get("name"),
+                "permissions": data.get("permissions", []),
+                "created_at": data.get("created_at"),
+                "last_used": data.get("last_used"),
+                "usage_count": data.get("usage_count", 0)
+            })
+
+        if expired:
+            await self.redis.srem(index, *expired)
+        keys.sort(key=lambda entry: entry["created_at"] or "")
+        return keys
+
+    async def rebuild_user_key_index(self) -> int:
+        """
+        Index keys created before the per-user sets existed
+
+        One-off maintenance: scans the keyspace once. Returns the number of
+        keys indexed.
+        """
+        indexed = 0
+        batch = []
+        async for key in self.redis.scan_iter(match="api_key:na_*"):
+            batch.append(_decode(key))
+            if len(batch) >= 500:
+                indexed += await self._index_keys(batch)
+                batch = []
+        if batch:
+            indexed += await self._index_keys(batch)
+        logger.info("API key index rebuilt", keys=indexed)
+        return indexed
+
+    async def _index_keys(self, redis_keys: list) -> int:
+        values = await self.redis.mget(redis_keys)
+        indexed = 0
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for redis_key, key_data in zip(redis_keys, values):
+                if not key_data:
+                    continue
                 try:
-                    import ast
-                    data = ast.literal_eval(key_data.decode())
-                    if data.get("user_id") == user_id:
-                        keys.append({
-                            "api_key": key.decode().replace("api_key:", ""),
-                            "name": data.get("name"),
-                            "permissions": data.get("permissions", []),
-                            "created_at": data.get("created_at"),
-                            "last_used": data.get("last_used"),
-                            "usage_count": data.get("usage_count", 0)
-                        })
-                except Exception as e:
-                    logger.error("Error parsing API key data", error=str(e))
+                    user_id = ast.literal_eval(_decode(key_data)).get("user_id")
+                except Exception:
                     continue
-        
-        return keys
+                pipe.sadd(_user_keys_key(user_id), redis_key[len("api_key:"):])
+                indexed += 1
+            await pipe.execute()
+        return indexed
 
 # Global auth manager instance
 auth_manager = None
@@ -65,6 +65,7 @@ class Settings(BaseSettings):
     # Search Configuration
     default_search_limit: int = Field(default=10, description="Default search result limit")
     max_search_limit: int = Field(default=100, description="Maximum search result limit")
+    search_deadline_seconds: float = Field(default=3.0, description="Latency budget for a multi-provider paper search")
     
     # Cache Configuration
     cache_ttl: int = Field(default=3600, description="Cache TTL in seconds")
@@ -2,14 +2,14 @@
 Federal Reserve Economic Data (FRED) API adapter
 """
 
-import asyncio
-import aiohttp
+import os
 import structlog
 import time
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any
 from datetime import datetime
 
 from .base import SourceAdapter, AdapterOutput, Provenance, SourceUnavailableError, ParseError
+from .http_client import get_upstream_client
 
 logger = structlog.get_logger(__name__)
 
@@ -18,44 +18,17 @@ class FREDAdapter(SourceAdapter):
     
     def __init__(self, config: Dict[str, Any]):
         super().__init__(config)
-        self.session: Optional[aiohttp.ClientSession] = None
-        self.api_key = None  # Will be set from environment
+        self.client = get_upstream_client("fred")
+        self.api_key = os.getenv("FRED_API_KEY")
         self.request_count = 0
-        self.last_request_time = 0
-        self.rate_limit_delay = 0.5  # 120 requests per minute = 0.5 seconds between requests
     
     async def __aenter__(self):
-        """Async context manager entry"""
-        # Get API key from environment
-        import os
-        self.api_key = os.getenv("FRED_API_KEY")
-        
-        self.session = aiohttp.ClientSession(
-            headers={
-                "Accept": "application/json",
-                "Accept-Encoding": "gzip, deflate",
-            },
-            timeout=aiohttp.ClientTimeout(total=30)
-        )
+        """Async context manager entry (connections are pooled by the shared client)"""
         return self
     
     async def __aexit__(self, exc_type, exc_val, exc_tb):
         """Async context manager exit"""
-        if self.session:
-            await self.session.close()
-    
-    async def _rate_limit(self):
-        """Respect FRED rate limiting guidelines"""
-        current_time = time.time()
-        time_since_last = current_time - self.last_request_time
-        
-        if time_since_last < self.rate_limit_delay:
-            sleep_time = self.rate_limit_delay - time_since_last
-            logger.debug("FRED rate limit sleep", sleep_time=sleep_time)
-            await asyncio.sleep(sleep_time)
-        
-        self.last_request_time = time.time()
-        self.request_count += 1
+        pass
     
     async def search(self, **kwargs) -> AdapterOutput:
         """
@@ -70,9 +43,6 @@ class FREDAdapter(SourceAdapter):
         Returns:
             AdapterOutput with economic series data
         """
-        if not self.session:
-            raise RuntimeError("FREDAdapter must be used as async context manager")
-        
         series_id = kwargs.get("series_id")
         if not series_id:
             raise ValueError("series_id is required for FRED search")
@@ -106,15 +76,13 @@ class FREDAdapter(SourceAdapter):
                 end_date=end_date
             )
             
-            # Apply rate limiting
-            await self._rate_limit()
+            # Rate limited and pooled by the shared FRED client
+            self.request_count += 1
+            response = await self.client.get(url, params=params)
+            if response.status != 200:
+                raise SourceUnavailableError(f"FRED API failed: {response.status}")
             
-            # Make request
-            async with self.session.get(url, params=params) as response:
-                if response.status != 200:
-                    raise SourceUnavailableError(f"FRED API failed: {response.status}")
-                
-                raw_data = await response.json()
+            raw_data = response.json()
             
             # Parse response
             parsed_data = await self.parse(raw_data, series_id)
@@ -235,12 +203,6 @@ class FREDAdapter(SourceAdapter):
         try:
             start_time = time.time()
             
-            if not self.session:
-                self.session = aiohttp.ClientSession(
-                    headers={"Accept": "application/json"},
-                    timeout=aiohttp.ClientTimeout(total=10)
-                )
-            
             # Test with a known series (CPI)
             url = f"{self.base_url}series/observations"
             params = {
@@ -252,24 +214,24 @@ class FREDAdapter(SourceAdapter):
             if self.api_key:
                 params["api_key"] = self.api_key
             
-            async with self.session.get(url, params=params) as response:
-                latency_ms = (time.time() - start_time) * 1000
-                
-                if response.status == 200:
-                    return {
-                        "source_id": self.source_id,
-                        "status": "healthy",
-                        "latency_ms": round(latency_ms, 2),
-                        "timestamp": time.time()
-                    }
-                else:
-                    return {
-                        "source_id": self.source_id,
-                        "status": "unhealthy",
-                        "error": f"HTTP {response.status}",
-                        "latency_ms": round(latency_ms, 2),
-                        "timestamp": time.time()
-                    }
+            response = await self.client.get(url, params=params, timeout=10, max_age=0)
+            latency_ms = (time.time() - start_time) * 1000
+            
+            if response.status == 200:
+                return {
+                    "source_id": self.source_id,
+                    "status": "healthy",
+                    "latency_ms": round(latency_ms, 2),
+                    "timestamp": time.time()
+                }
+            else:
+                return {
+                    "source_id": self.source_id,
+                    "status": "unhealthy",
+                    "error": f"HTTP {response.status}",
+                    "latency_ms": round(latency_ms, 2),
+                    "timestamp": time.time()
+                }
                     
         except Exception as e:
             return {
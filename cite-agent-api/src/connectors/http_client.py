@@ -0,0 +1,433 @@
+"""
+Shared upstream HTTP client for FinSight connectors
+
+Every connector talking to the same upstream (SEC EDGAR, FRED) goes through
+one UpstreamClient:
+
+- one pooled aiohttp session per event loop, gzip/deflate negotiated
+- a token bucket that is asyncio-safe and, by default, shared by every
+  worker process on the host through a file lock, so N workers together
+  stay under the upstream's fair-access limit. The file only spans one
+  host: set FINSIGHT_RATE_LIMIT_REDIS_URL to keep the bucket in Redis and
+  share it across hosts (the per-host file is the fallback while Redis is
+  unreachable)
+- identical concurrent GETs are coalesced into one request
+- responses carrying an ETag or Last-Modified are kept (bounded by bytes)
+  and revalidated with a conditional GET once older than ``fresh_for``
+
+Usage:
+    client = get_upstream_client("sec")
+    response = await client.get(url)
+    if response.status == 200:
+        data = response.json()
+"""
+
+import asyncio
+import json
+import os
+import tempfile
+import time
+import weakref
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, Mapping, Optional, Tuple
+from urllib.parse import urlencode
+
+import aiohttp
+import structlog
+from multidict import CIMultiDict
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # pragma: no cover - Redis is optional
+    aioredis = None
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows: limits are per process
+    fcntl = None
+
+logger = structlog.get_logger(__name__)
+
+SEC_USER_AGENT = os.getenv("SEC_USER_AGENT", "Nocturnal Archive Research Tool (contact@nocturnal.dev)")
+
+# Refill and take (or pause) atomically, on Redis' clock so hosts with skewed
+# clocks agree. Returns the seconds to wait before a token is available.
+_REDIS_BUCKET_SCRIPT = """
+local rate, capacity = tonumber(ARGV[1]), tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = capacity
+if state[1] then
+    tokens = math.min(capacity, tonumber(state[1]) + (now - tonumber(state[2])) * rate)
+end
+local delay = 0
+if ARGV[3] == 'pause' then
+    tokens = math.min(tokens, -tonumber(ARGV[4]) * rate)
+elseif tokens >= 1 then
+    tokens = tokens - 1
+else
+    delay = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('EXPIRE', KEYS[1], 3600)
+return tostring(delay)
+"""
+
+
+class TokenBucket:
+    """
+    Token bucket rate limiter
+
+    Waiters queue on an asyncio lock, so concurrent coroutines take tokens
+    one at a time instead of all passing a timestamp check together. With
+    ``shared_path`` the bucket state lives in a file updated under an
+    exclusive flock, which makes the limit hold across processes on one
+    host. With ``redis_url`` it lives in a Redis hash updated by a Lua
+    script, which makes it hold across hosts; while Redis is unreachable
+    the bucket falls back to the file (or in-process) state.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        capacity: Optional[float] = None,
+        shared_path: Optional[Path] = None,
+        redis_url: Optional[str] = None,
+        redis_key: str = "finsight:ratelimit"
+    ):
+        """
+        Args:
+            rate: Tokens added per second
+            capacity: Burst size (defaults to rate)
+            shared_path: File holding the state shared between processes
+            redis_url: Redis holding the state shared between hosts
+            redis_key: Redis key of the bucket state
+        """
+        self.rate = rate
+        self.capacity = capacity or rate
+        self.shared_path = Path(shared_path) if shared_path and fcntl else None
+        self.redis_url = redis_url if aioredis else None
+        self.redis_key = redis_key
+        self._tokens = self.capacity
+        self._updated = time.time()
+        self._state_file = None
+        self._locks: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Lock]" = weakref.WeakKeyDictionary()
+        self._redis: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Any]" = weakref.WeakKeyDictionary()
+        self._redis_retry_at = 0.0
+
+    async def acquire(self) -> float:
+        """Wait for a token; returns the seconds spent waiting"""
+        loop = asyncio.get_running_loop()
+        lock = self._locks.setdefault(loop, asyncio.Lock())
+        waited = 0.0
+        async with lock:
+            while True:
+                delay = await self._redis_update("take")
+                if delay is None:
+                    delay = self._update(self._take)
+                if delay <= 0:
+                    return waited
+                await asyncio.sleep(delay)
+                waited += delay
+
+    async def pause(self, seconds: float) -> None:
+        """Hold off every holder of the bucket (after the upstream said 429)"""
+        if await self._redis_update("pause", seconds) is None:
+            self._update(lambda tokens: (min(tokens, -seconds * self.rate), None))
+
+    async def _redis_update(self, action: str, seconds: float = 0.0) -> Optional[float]:
+        """Run the bucket script in Redis; None when Redis isn't configured or reachable"""
+        if self.redis_url is None or time.monotonic() < self._redis_retry_at:
+            return None
+        loop = asyncio.get_running_loop()
+        client = self._redis.get(loop)
+        if client is None:
+            client = aioredis.from_url(self.redis_url, socket_timeout=1.0, socket_connect_timeout=1.0)
+            self._redis[loop] = client
+        try:
+            result = await client.eval(
+                _REDIS_BUCKET_SCRIPT, 1, self.redis_key, self.rate, self.capacity, action, seconds
+            )
+        except Exception as exc:
+            # Retry Redis in a while instead of paying a timeout per request
+            self._redis_retry_at = time.monotonic() + 30
+            logger.warning("Redis rate limit unavailable, limiting per host", key=self.redis_key, error=str(exc))
+            return None
+        return float(result)
+
+    async def close(self) -> None:
+        for client in list(self._redis.values()):
+            await client.aclose()
+        self._redis.clear()
+
+    def _take(self, tokens: float) -> Tuple[float, float]:
+        if tokens >= 1:
+            return tokens - 1, 0.0
+        return tokens, (1 - tokens) / self.rate
+
+    def _update(self, change: Callable[[float], Tuple[float, Any]]) -> Any:
+        """Refill the bucket, apply change(tokens) -> (tokens, result), return result"""
+        if self.shared_path is None:
+            now = time.time()
+            tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._tokens, result = change(tokens)
+            self._updated = now
+            return result
+
+        state = self._open_state_file()
+        fcntl.flock(state, fcntl.LOCK_EX)
+        try:
+            now = time.time()
+            state.seek(0)
+            try:
+                stored_tokens, updated = (float(v) for v in state.read().split())
+                tokens = min(self.capacity, stored_tokens + (now - updated) * self.rate)
+            except ValueError:
+                tokens = self.capacity
+            tokens, result = change(tokens)
+            state.seek(0)
+            state.truncate()
+            state.write(f"{tokens} {now}")
+            state.flush()
+            return result
+        finally:
+            fcntl.flock(state, fcntl.LOCK_UN)
+
+    def _open_state_file(self):
+        if self._state_file is None:
+            self.shared_path.parent.mkdir(parents=True, exist_ok=True)
+            self._state_file = open(self.shared_path, "a+")
+        return self._state_file
+
+
+@dataclass
+class UpstreamResponse:
+    """A fully read upstream response (safe to share between coalesced callers)"""
+    status: int
+    body: bytes
+    headers: Mapping[str, str] = field(default_factory=CIMultiDict)
+    revalidated: bool = False  # Served from cache after a 304
+
+    def json(self) -> Any:
+        return json.loads(self.body)
+
+
+@dataclass
+class _CacheEntry:
+    response: UpstreamResponse
+    etag: Optional[str]
+    last_modified: Optional[str]
+    fetched_at: float
+
+
+class UpstreamClient:
+    """Pooled, rate-limited, coalescing GET client for one upstream"""
+
+    def __init__(
+        self,
+        name: str,
+        *,
+        headers: Optional[Dict[str, str]] = None,
+        rate: float = 5.0,
+        burst: Optional[float] = None,
+        shared_limit: bool = True,
+        timeout: float = 30.0,
+        max_connections: int = 10,
+        fresh_for: float = 60.0,
+        max_cache_bytes: int = 64 * 1024 * 1024
+    ):
+        """
+        Args:
+            name: Upstream name (names the shared rate limit file)
+            headers: Default request headers
+            rate: Requests per second across all processes sharing the limit
+            burst: Requests allowed back to back (defaults to rate)
+            shared_limit: Coordinate the limit across processes on this host, and
+                across hosts when FINSIGHT_RATE_LIMIT_REDIS_URL is set
+            timeout: Default total timeout per request in seconds
+            max_connections: Connection pool size
+            fresh_for: Seconds a cached response is served without revalidation
+            max_cache_bytes: Total size of cached response bodies
+        """
+        self.name = name
+        self.headers = {"Accept-Encoding": "gzip, deflate", **(headers or {})}
+        shared_path = None
+        if shared_limit:
+            limit_dir = os.getenv("FINSIGHT_RATE_LIMIT_DIR", tempfile.gettempdir())
+            shared_path = Path(limit_dir) / f"finsight-{name}.bucket"
+        redis_url = os.getenv("FINSIGHT_RATE_LIMIT_REDIS_URL") if shared_limit else None
+        self.bucket = TokenBucket(
+            rate, burst, shared_path=shared_path, redis_url=redis_url, redis_key=f"finsight:ratelimit:{name}"
+        )
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.fresh_for = fresh_for
+        self.max_cache_bytes = max_cache_bytes
+
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._session_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._in_flight: Dict[str, asyncio.Future] = {}
+        self._cache: "OrderedDict[str, _CacheEntry]" = OrderedDict()
+        self._cache_bytes = 0
+        self.stats = {"requests": 0, "cache_hits": 0, "revalidated": 0, "coalesced": 0}
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        loop = asyncio.get_running_loop()
+        # pytest-asyncio (and anything else running several loops) needs a
+        # session per loop
+        if self._session is None or self._session.closed or self._session_loop is not loop:
+            if self._session is not None and not self._session.closed and self._session_loop is loop:
+                await self._session.close()
+            self._session = aiohttp.ClientSession(
+                headers=self.headers,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                connector=aiohttp.TCPConnector(limit=self.max_connections, ttl_dns_cache=300)
+            )
+            self._session_loop = loop
+        return self._session
+
+    async def get(
+        self,
+        url: str,
+        params: Optional[Dict[str, Any]] = None,
+        *,
+        timeout: Optional[float] = None,
+        max_age: Optional[float] = None
+    ) -> UpstreamResponse:
+        """
+        GET url, reusing a fresh cached copy or an identical request in flight
+
+        Args:
+            url: Absolute URL
+            params: Query parameters
+            timeout: Total timeout override in seconds
+            max_age: Override fresh_for for this call (0 always revalidates)
+
+        Raises:
+            aiohttp.ClientError / asyncio.TimeoutError on transport failures
+        """
+        key = f"{url}?{urlencode(sorted(params.items()))}" if params else url
+        cached = self._cache.get(key)
+        fresh_for = self.fresh_for if max_age is None else max_age
+        if cached is not None and time.monotonic() - cached.fetched_at < fresh_for:
+            self._cache.move_to_end(key)
+            self.stats["cache_hits"] += 1
+            return cached.response
+
+        loop = asyncio.get_running_loop()
+        in_flight = self._in_flight.get(key)
+        if in_flight is not None and not in_flight.done() and in_flight.get_loop() is loop:
+            self.stats["coalesced"] += 1
+            return await asyncio.shield(in_flight)
+
+        request = loop.create_task(self._fetch(key, url, params, cached, timeout))
+        self._in_flight[key] = request
+        request.add_done_callback(lambda done: self._in_flight.pop(key, None) if self._in_flight.get(key) is done else None)
+        # Shielded so one caller giving up doesn't cancel it for the others
+        return await asyncio.shield(request)
+
+    async def _fetch(
+        self,
+        key: str,
+        url: str,
+        params: Optional[Dict[str, Any]],
+        cached: Optional[_CacheEntry],
+        timeout: Optional[float]
+    ) -> UpstreamResponse:
+        headers = {}
+        if cached is not None:
+            if cached.etag:
+                headers["If-None-Match"] = cached.etag
+            if cached.last_modified:
+                headers["If-Modified-Since"] = cached.last_modified
+
+        waited = await self.bucket.acquire()
+        if waited:
+            logger.debug("Upstream rate limit wait", upstream=self.name, waited=round(waited, 3))
+
+        session = await self._get_session()
+        # timeout=None would disable the session's default, so only pass an override
+        overrides = {"timeout": aiohttp.ClientTimeout(total=timeout)} if timeout else {}
+        self.stats["requests"] += 1
+        async with session.get(url, params=params, headers=headers, **overrides) as response:
+            if response.status == 304 and cached is not None:
+                cached.fetched_at = time.monotonic()
+                self._cache.move_to_end(key)
+                self.stats["revalidated"] += 1
+                return UpstreamResponse(
+                    status=200, body=cached.response.body, headers=cached.response.headers, revalidated=True
+                )
+            body = await response.read()
+            result = UpstreamResponse(status=response.status, body=body, headers=CIMultiDict(response.headers))
+
+        if result.status in (403, 429):
+            retry_after = result.headers.get("Retry-After", "")
+            pause = float(retry_after) if retry_after.isdigit() else 1.0
+            logger.warning("Upstream throttled us", upstream=self.name, status=result.status, pause=pause)
+            await self.bucket.pause(pause)
+        elif result.status == 200:
+            self._store(key, result)
+        return result
+
+    def _store(self, key: str, response: UpstreamResponse) -> None:
+        size = len(response.body)
+        if size > self.max_cache_bytes // 4:
+            return
+        previous = self._cache.pop(key, None)
+        if previous is not None:
+            self._cache_bytes -= len(previous.response.body)
+        self._cache[key] = _CacheEntry(
+            response=response,
+            etag=response.headers.get("ETag"),
+            last_modified=response.headers.get("Last-Modified"),
+            fetched_at=time.monotonic()
+        )
+        self._cache_bytes += size
+        while self._cache_bytes > self.max_cache_bytes:
+            _, evicted = self._cache.popitem(last=False)
+            self._cache_bytes -= len(evicted.response.body)
+
+    async def close(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        await self.bucket.close()
+
+
+# Per-upstream settings. SEC's fair-access limit is 10 requests/second per
+# host; 8/s with a burst of 2 never exceeds it in any one-second window.
+# Without FINSIGHT_RATE_LIMIT_REDIS_URL the bucket only spans one host, so
+# deployments behind one egress IP with several hosts must split the limit
+# (e.g. SEC_REQUESTS_PER_SECOND=8/hosts).
+_CLIENT_SETTINGS: Dict[str, Dict[str, Any]] = {
+    "sec": {
+        "headers": {"User-Agent": SEC_USER_AGENT, "Accept": "application/json"},
+        "rate": float(os.getenv("SEC_REQUESTS_PER_SECOND", "8")),
+        "burst": 2,
+    },
+    "fred": {
+        "headers": {"Accept": "application/json"},
+        "rate": 2.0,  # 120 requests per minute
+        "burst": 2,
+    },
+}
+
+_clients: Dict[str, UpstreamClient] = {}
+
+
+def get_upstream_client(name: str) -> UpstreamClient:
+    """Get the shared client for an upstream ("sec", "fred")"""
+    client = _clients.get(name)
+    if client is None:
+        client = UpstreamClient(name, **_CLIENT_SETTINGS.get(name, {}))
+        _clients[name] = client
+    return client
+
+
+async def close_upstream_clients() -> None:
+    """Close pooled upstream connections (app shutdown)"""
+    for client in _clients.values():
+        await client.close()
@@ -2,14 +2,13 @@
 SEC EDGAR Company Facts API adapter
 """
 
-import asyncio
-import aiohttp
 import structlog
 import time
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any
 from datetime import datetime
 
 from .base import SourceAdapter, AdapterOutput, Provenance, SourceUnavailableError, ParseError
+from .http_client import get_upstream_client
 
 logger = structlog.get_logger(__name__)
 
@@ -18,40 +17,16 @@ class SECCompanyFactsAdapter(SourceAdapter):
     
     def __init__(self, config: Dict[str, Any]):
         super().__init__(config)
-        self.session: Optional[aiohttp.ClientSession] = None
+        self.client = get_upstream_client("sec")
         self.request_count = 0
-        self.last_request_time = 0
-        self.rate_limit_delay = 6.0  # 10 requests per minute
     
     async def __aenter__(self):
-        """Async context manager entry"""
-        self.session = aiohttp.ClientSession(
-            headers={
-                "User-Agent": "Nocturnal Archive Research Tool (contact@nocturnal.dev)",
-                "Accept": "application/json",
-                "Accept-Encoding": "gzip, deflate",
-            },
-            timeout=aiohttp.ClientTimeout(total=30)
-        )
+        """Async context manager entry (connections are pooled by the shared client)"""
         return self
     
     async def __aexit__(self, exc_type, exc_val, exc_tb):
         """Async context manager exit"""
-        if self.session:
-            await self.session.close()
-    
-    async def _rate_limit(self):
-        """Respect SEC rate limiting guidelines"""
-        current_time = time.time()
-        time_since_last = current_time - self.last_request_time
-        
-        if time_since_last < self.rate_limit_delay:
-            sleep_time = self.rate_limit_delay - time_since_last
-            logger.debug("SEC rate limit sleep", sleep_time=sleep_time)
-            await asyncio.sleep(sleep_time)
-        
-        self.last_request_time = time.time()
-        self.request_count += 1
+        pass
     
     async def search(self, **kwargs) -> AdapterOutput:
         """
@@ -63,9 +38,6 @@ class SECCompanyFactsAdapter(SourceAdapter):
         Returns:
             AdapterOutput with company facts data
         """
-        if not self.session:
-            raise RuntimeError("SECCompanyFactsAdapter must be used as async context manager")
-        
         cik = kwargs.get("cik")
         if not cik:
             raise ValueError("CIK is required for SEC company facts search")
@@ -84,18 +56,16 @@ class SECCompanyFactsAdapter(SourceAdapter):
                 url=url
             )
             
-            # Apply rate limiting
-            await self._rate_limit()
+            # Rate limited and pooled by the shared SEC client
+            self.request_count += 1
+            response = await self.client.get(url)
+            if response.status == 403 or response.status == 429:
+                raise SourceUnavailableError(f"SEC rate limited: {response.status}")
             
-            # Make request
-            async with self.session.get(url) as response:
-                if response.status == 403 or response.status == 429:
-                    raise SourceUnavailableError(f"SEC rate limited: {response.status}")
-                
-                if response.status != 200:
-                    raise SourceUnavailableError(f"SEC company facts failed: {response.status}")
-                
-                raw_data = await response.json()
+            if response.status != 200:
+                raise SourceUnavailableError(f"SEC company facts failed: {response.status}")
+            
+            raw_data = response.json()
             
             # Parse response
             parsed_data = await self.parse(raw_data)
@@ -265,37 +235,28 @@ class SECCompanyFactsAdapter(SourceAdapter):
         try:
             start_time = time.time()
             
-            if not self.session:
-                self.session = aiohttp.ClientSession(
-                    headers={
-                        "User-Agent": "Nocturnal Archive Research Tool (contact@nocturnal.dev)",
-                        "Accept": "application/json",
-                    },
-                    timeout=aiohttp.ClientTimeout(total=10)
-                )
-            
             # Test with a known CIK (Apple)
             test_cik = "0000320193"
             url = f"{self.base_url}CIK{test_cik}.json"
             
-            async with self.session.get(url) as response:
-                latency_ms = (time.time() - start_time) * 1000
-                
-                if response.status == 200:
-                    return {
-                        "source_id": self.source_id,
-                        "status": "healthy",
-                        "latency_ms": round(latency_ms, 2),
-                        "timestamp": time.time()
-                    }
-                else:
-                    return {
-                        "source_id": self.source_id,
-                        "status": "unhealthy",
-                        "error": f"HTTP {response.status}",
-                        "latency_ms": round(latency_ms, 2),
-                        "timestamp": time.time()
-                    }
+            response = await self.client.get(url, timeout=10, max_age=0)
+            latency_ms = (time.time() - start_time) * 1000
+            
+            if response.status == 200:
+                return {
+                    "source_id": self.source_id,
+                    "status": "healthy",
+                    "latency_ms": round(latency_ms, 2),
+                    "timestamp": time.time()
+                }
+            else:
+                return {
+                    "source_id": self.source_id,
+                    "status": "unhealthy",
+                    "error": f"HTTP {response.status}",
+                    "latency_ms": round(latency_ms, 2),
+                    "timestamp": time.time()
+                }
                     
         except Exception as e:
             return {
@@ -0,0 +1,295 @@
+"""
+Pre-aggregated API usage counters for quota checks
+
+Quota checks read one counter per (api key, bucket, period) instead of
+counting api_usage rows. Counters live in memory and are reconciled with
+the ``api_usage_counters`` table (migration 004):
+
+- ``record`` bumps the in-memory counters and buffers the api_usage row;
+  nothing touches the database on the request path
+- a background task flushes the buffer every few seconds (or once it is
+  full) in a single transaction: one batched INSERT into api_usage and one
+  upsert that adds the deltas to the shared counters and returns the totals
+- a counter that has not been read from Postgres for ``reconcile_after``
+  seconds is re-read by primary key, picking up other workers' calls
+- after each successful flush, counters with nothing unflushed are dropped
+  once their period is over or they are due for a re-read anyway, so memory
+  stays bounded by the keys active in the current period
+
+Periods follow UTC days, matching the api_usage timestamps.
+"""
+
+import asyncio
+import os
+import time
+from dataclasses import dataclass
+from datetime import date, datetime, timezone
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+import structlog
+
+logger = structlog.get_logger(__name__)
+
+FINANCE_PREFIX = "/v1/finance"
+
+# Buckets
+FINANCE_DAILY = "finance_daily"  # Cite-Agent keys: FinSight calls per day
+MONTHLY = "monthly"              # FinSight keys: all calls per month
+
+FLUSH_INTERVAL = 5.0      # seconds between batched writes
+MAX_BUFFERED = 500        # flush early once this many rows are waiting
+MAX_RETAINED = 10000      # rows kept for retry while the database is down
+RECONCILE_AFTER = 30.0    # seconds before a counter is re-read from Postgres
+
+CounterKey = Tuple[str, str, date]  # (api_key_id, bucket, period_start)
+
+_COUNTER_SQL = """
+    SELECT count FROM api_usage_counters
+    WHERE api_key_id = $1 AND bucket = $2 AND period_start = $3
+"""
+
+# Used until migration 004 has run; range predicates so the
+# (api_key_id, timestamp) index applies
+_SCAN_SQL = {
+    FINANCE_DAILY: """
+        SELECT COUNT(*) FROM api_usage
+        WHERE api_key_id = $1
+          AND timestamp >= $2::date AND timestamp < $3::date
+          AND endpoint LIKE '/v1/finance%'
+    """,
+    MONTHLY: """
+        SELECT COUNT(*) FROM api_usage
+        WHERE api_key_id = $1
+          AND timestamp >= $2::date AND timestamp < $3::date
+    """,
+}
+
+# Rows for keys that only exist in memory (demo keys) are skipped rather
+# than failing the batch on the foreign key
+_INSERT_USAGE_SQL = """
+    INSERT INTO api_usage (api_key_id, endpoint, response_time_ms, status_code, timestamp)
+    SELECT u.api_key_id, u.endpoint, u.response_time_ms, u.status_code, u.timestamp
+    FROM unnest($1::varchar[], $2::varchar[], $3::integer[], $4::integer[], $5::timestamptz[])
+        AS u(api_key_id, endpoint, response_time_ms, status_code, timestamp)
+    JOIN api_keys k ON k.key_id = u.api_key_id
+"""
+
+_UPSERT_COUNTERS_SQL = """
+    INSERT INTO api_usage_counters (api_key_id, bucket, period_start, count)
+    SELECT * FROM unnest($1::varchar[], $2::varchar[], $3::date[], $4::bigint[])
+    ON CONFLICT (api_key_id, bucket, period_start)
+    DO UPDATE SET count = api_usage_counters.count + EXCLUDED.count, updated_at = NOW()
+    RETURNING api_key_id, bucket, period_start, count
+"""
+
+
+def utc_today() -> date:
+    return datetime.now(timezone.utc).date()
+
+
+def period_start(bucket: str, day: date) -> date:
+    return day.replace(day=1) if bucket == MONTHLY else day
+
+
+def _period_end(bucket: str, start: date) -> date:
+    if bucket == MONTHLY:
+        return date(start.year + start.month // 12, start.month % 12 + 1, 1)
+    return date.fromordinal(start.toordinal() + 1)
+
+
+async def _default_connect():
+    import asyncpg
+    return await asyncpg.connect(os.getenv("DATABASE_URL", "postgresql://localhost/nocturnal_archive"))
+
+
+@dataclass
+class _Counter:
+    base: int = 0                     # Last total seen in Postgres
+    pending: int = 0                  # Recorded here, not yet flushed
+    flushing: int = 0                 # In the batch being written
+    loaded_at: Optional[float] = None
+    generation: int = 0               # Bumped whenever base changes
+
+    @property
+    def value(self) -> int:
+        return self.base + self.pending + self.flushing
+
+
+class UsageCounters:
+    """In-memory usage counters with batched Postgres persistence"""
+
+    def __init__(
+        self,
+        connect: Optional[Callable[[], Awaitable]] = None,
+        flush_interval: float = FLUSH_INTERVAL,
+        max_buffered: int = MAX_BUFFERED,
+        reconcile_after: float = RECONCILE_AFTER
+    ):
+        self._connect = connect or _default_connect
+        self.flush_interval = flush_interval
+        self.max_buffered = max_buffered
+        self.reconcile_after = reconcile_after
+        self._counters: Dict[CounterKey, _Counter] = {}
+        self._rows: List[tuple] = []
+        self._flush_task: Optional[asyncio.Task] = None
+        self._flush_in_progress = False
+
+    async def count(self, conn, api_key_id, bucket: str, day: date) -> int:
+        """Calls recorded for api_key_id in the bucket's period containing day"""
+        key = (str(api_key_id), bucket, period_start(bucket, day))
+        counter = self._counters.setdefault(key, _Counter())
+        now = time.monotonic()
+        if counter.loaded_at is None or now - counter.loaded_at >= self.reconcile_after:
+            generation = counter.generation
+            stored = await self._load(conn, key)
+            counter.loaded_at = now
+            # A flush that finished meanwhile returned a newer total
+            if stored is not None and counter.generation == generation:
+                counter.base = stored
+                counter.generation += 1
+        return counter.value
+
+    async def _load(self, conn, key: CounterKey) -> Optional[int]:
+        api_key_id, bucket, start = key
+        try:
+            value = await conn.fetchval(_COUNTER_SQL, api_key_id, bucket, start)
+            return int(value or 0)
+        except Exception as e:
+            logger.warning("Usage counter lookup failed, counting rows", error=str(e))
+        try:
+            value = await conn.fetchval(_SCAN_SQL[bucket], api_key_id, start, _period_end(bucket, start))
+            return int(value or 0)
+        except Exception as e:
+            logger.error("Failed to fetch usage", bucket=bucket, error=str(e))
+            return None
+
+    def record(
+        self,
+        api_key_id,
+        endpoint: str,
+        response_time_ms: Optional[int] = None,
+        status_code: int = 200,
+        day: Optional[date] = None
+    ) -> None:
+        """Count a call now; its api_usage row is written with the next batch"""
+        day = day or utc_today()
+        api_key_id = str(api_key_id)
+        buckets = [MONTHLY]
+        if endpoint.startswith(FINANCE_PREFIX):
+            buckets.append(FINANCE_DAILY)
+        for bucket in buckets:
+            key = (api_key_id, bucket, period_start(bucket, day))
+            self._counters.setdefault(key, _Counter()).pending += 1
+        self._rows.append((api_key_id, endpoint, response_time_ms, status_code, datetime.now(timezone.utc)))
+        self._schedule()
+
+    def _schedule(self) -> None:
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return  # No event loop: flushed at the next record or at shutdown
+        task = self._flush_task
+        if task is not None and not task.done() and task.get_loop() is loop:
+            if len(self._rows) < self.max_buffered:
+                return
+            task.cancel()
+        delay = 0 if len(self._rows) >= self.max_buffered else self.flush_interval
+        self._flush_task = loop.create_task(self._flush_later(delay))
+
+    async def _flush_later(self, delay: float) -> None:
+        await asyncio.sleep(delay)
+        self._flush_task = None
+        await self.flush()
+
+    async def flush(self) -> None:
+        """Write buffered rows and counter deltas in one transaction"""
+        if self._flush_in_progress:
+            return
+        deltas = {key: c.pending for key, c in self._counters.items() if c.pending}
+        if not self._rows and not deltas:
+            return
+
+        self._flush_in_progress = True
+        rows, self._rows = self._rows, []
+        for key, delta in deltas.items():
+            counter = self._counters[key]
+            counter.pending -= delta
+            counter.flushing += delta
+
+        try:
+            conn = await self._connect()
+            try:
+                async with conn.transaction():
+                    if rows:
+                        await conn.execute(_INSERT_USAGE_SQL, *(list(column) for column in zip(*rows)))
+                    totals = await conn.fetch(
+                        _UPSERT_COUNTERS_SQL,
+                        [k[0] for k in deltas], [k[1] for k in deltas], [k[2] for k in deltas],
+                        list(deltas.values())
+                    )
+            finally:
+                await conn.close()
+        except Exception as e:
+            logger.warning("Failed to persist API usage, will retry", rows=len(rows), error=str(e))
+            self._rows[:0] = rows
+            if len(self._rows) > MAX_RETAINED:
+                logger.error("Dropping unpersisted API usage rows", dropped=len(self._rows) - MAX_RETAINED)
+                del self._rows[:len(self._rows) - MAX_RETAINED]
+            for key, delta in deltas.items():
+                counter = self._counters[key]
+                counter.flushing -= delta
+                counter.pending += delta
+            return
+        finally:
+            self._flush_in_progress = False
+
+        now = time.monotonic()
+        for key, delta in deltas.items():
+            self._counters[key].flushing -= delta
+        for row in totals:
+            counter = self._counters[(row["api_key_id"], row["bucket"], row["period_start"])]
+            counter.base = int(row["count"])
+            counter.loaded_at = now
+            counter.generation += 1
+        self._evict(now)
+
+        if self._rows:
+            self._schedule()
+
+    def _evict(self, now: float) -> None:
+        """Drop counters that hold nothing Postgres does not already have"""
+        today = utc_today()
+        for key, counter in list(self._counters.items()):
+            if counter.pending or counter.flushing:
+                continue
+            _, bucket, start = key
+            ended = _period_end(bucket, start) <= today
+            # count() would re-read these from Postgres on their next use anyway
+            stale = counter.loaded_at is not None and now - counter.loaded_at >= self.reconcile_after
+            if ended or stale:
+                del self._counters[key]
+
+    async def close(self) -> None:
+        """Flush everything still buffered (app shutdown)"""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        await self.flush()
+
+
+# Global instance
+_usage_counters: Optional[UsageCounters] = None
+
+
+def get_usage_counters() -> UsageCounters:
+    """Get singleton usage counters"""
+    global _usage_counters
+    if _usage_counters is None:
+        _usage_counters = UsageCounters()
+    return _usage_counters
+
+
+async def close_usage_counters() -> None:
+    """Flush the singleton's buffered usage (app shutdown)"""
+    if _usage_counters is not None:
+        await _usage_counters.close()
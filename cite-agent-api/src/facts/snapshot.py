@@ -0,0 +1,90 @@
+"""
+Request-scoped fact snapshot
+
+One API call can ask for the same company fact several times: the calc
+engine resolves inputs, get_facts_from_same_filing re-reads them pinned to
+one accession and the validator fetches the SEC value again. Inside a
+``fact_snapshot()`` block every lookup goes through a FactSnapshot held in a
+contextvar, so each (company, concept, period, freq) is resolved once and
+every caller in the request sees the same value. Nothing outlives the
+block, so there is no invalidation to get wrong.
+
+Usage:
+    with fact_snapshot() as snapshot:
+        await engine.calculate_metric("AAPL", "grossMargin")
+    logger.info("Fact lookups", **snapshot.stats())
+"""
+
+import asyncio
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterator, Optional
+
+_current_snapshot: ContextVar[Optional["FactSnapshot"]] = ContextVar("fact_snapshot", default=None)
+
+
+class FactSnapshot:
+    """Memoized fact lookups for one unit of work"""
+
+    def __init__(self):
+        self._results: Dict[Hashable, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+
+    async def lookup(self, key: Hashable, load: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Result of load() for key, running it at most once per snapshot
+
+        Concurrent lookups of a key still being loaded wait for that load.
+        A load that raises isn't remembered, so the next lookup retries.
+        """
+        result = self._results.get(key)
+        if result is not None:
+            self.hits += 1
+            return await asyncio.shield(result)
+
+        self.misses += 1
+        result = asyncio.get_running_loop().create_future()
+        self._results[key] = result
+        try:
+            value = await load()
+        except BaseException as exc:
+            del self._results[key]
+            result.set_exception(exc)
+            result.exception()  # Waiters get it; don't warn if there are none
+            raise
+        result.set_result(value)
+        return value
+
+    def stats(self) -> Dict[str, int]:
+        return {"fact_lookups": self.hits + self.misses, "fact_snapshot_hits": self.hits}
+
+    def __len__(self) -> int:
+        return len(self._results)
+
+
+def current_fact_snapshot() -> Optional[FactSnapshot]:
+    return _current_snapshot.get()
+
+
+@contextmanager
+def fact_snapshot() -> Iterator[FactSnapshot]:
+    """Memoize fact lookups until the block exits (reuses an enclosing snapshot)"""
+    snapshot = _current_snapshot.get()
+    if snapshot is not None:
+        yield snapshot
+        return
+    snapshot = FactSnapshot()
+    token = _current_snapshot.set(snapshot)
+    try:
+        yield snapshot
+    finally:
+        _current_snapshot.reset(token)
+
+
+async def snapshot_lookup(key: Hashable, load: Callable[[], Awaitable[Any]]) -> Any:
+    """load() through the current snapshot, or directly outside of one"""
+    snapshot = _current_snapshot.get()
+    if snapshot is None:
+        return await load()
+    return await snapshot.lookup(key, load)
@@ -0,0 +1,58 @@
+"""
+Assembled financial statement cache
+Statements are keyed by (ticker, statement type, period, freq, filing accession)
+"""
+
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Set, Tuple
+
+import structlog
+
+logger = structlog.get_logger(__name__)
+
+StatementKey = Tuple[str, str, str, str, Optional[str]]
+
+
+class StatementCache:
+    """
+    LRU cache of assembled statements
+
+    The accession in the key already makes entries for an older filing
+    unreachable; invalidate_company drops them as soon as a new filing is
+    ingested so they don't linger until evicted.
+    """
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[StatementKey, Tuple[str, Dict[str, Any]]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: StatementKey) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def set(self, key: StatementKey, cik: str, statement: Dict[str, Any]) -> None:
+        self._entries[key] = (cik, statement)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate_company(self, cik: str, accessions: Optional[Set[str]] = None) -> None:
+        """Drop every statement for a company (accession listener for FactsStore)"""
+        stale = [key for key, (entry_cik, _) in self._entries.items() if entry_cik == cik]
+        for key in stale:
+            del self._entries[key]
+        if stale:
+            logger.info("Statement cache invalidated", cik=cik, entries=len(stale))
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -5,13 +5,14 @@ Normalizes and indexes XBRL facts for efficient retrieval
 
 import asyncio
 import structlog
-from typing import Dict, List, Optional, Any, Tuple
+from typing import Callable, Dict, List, Optional, Any, Set, Tuple
 from datetime import datetime, date, timezone
 from dataclasses import dataclass
 from enum import Enum
 import json
 
 from src.config.settings import get_settings
+from src.facts.snapshot import snapshot_lookup
 try:
     from src.facts.test_data import TEST_COMPANY_DATA, TEST_COMPANY_BY_CIK
 except ModuleNotFoundError:  # pragma: no cover - optional during runtime packaging
@@ -42,6 +43,14 @@ class Fact:
     start_date: Optional[str] = None  # Start date for duration facts (YYYY-MM-DD)
     end_date: Optional[str] = None    # End date (YYYY-MM-DD)
 
+@dataclass
+class CompanySnapshot:
+    """A company's loaded facts as of its most recently ingested filing"""
+    ticker: str
+    cik: str
+    accession: Optional[str]  # Changes whenever a new filing is stored
+    metadata: Dict[str, Any]
+
 class FactsStore:
     """Store for financial facts with indexing and retrieval"""
     
@@ -51,6 +60,12 @@ class FactsStore:
         self.facts_by_concept: Dict[str, List[Fact]] = {}
         self.company_metadata: Dict[str, Dict[str, Any]] = {}
         self._ticker_to_cik: Dict[str, str] = {}
+        self._accessions: Dict[str, Set[str]] = {}
+        self._latest_accession: Dict[str, str] = {}
+        self._accession_listeners: List[Callable[[str, Set[str]], None]] = []
+        # (cik, concept, freq) -> segment -> facts, newest first
+        self._segment_index: Dict[Tuple[str, str, str], Dict[str, List[Fact]]] = {}
+        self._loads_in_flight: Dict[Tuple[str, bool], asyncio.Future] = {}
 
         if self.settings.environment == "test" and TEST_COMPANY_DATA:
             async def _load_fixtures():
@@ -113,6 +128,7 @@ class FactsStore:
             # Process facts
             facts_data = company_data.get("facts", {})
             facts_stored = 0
+            accessions: Set[str] = set()
             
             for concept, concept_facts in facts_data.items():
                 if not isinstance(concept_facts, list):
@@ -134,7 +150,12 @@ class FactsStore:
                         self.facts_by_concept[concept].append(fact)
                         
                         facts_stored += 1
+                        if fact.accession:
+                            accessions.add(fact.accession)
             
+            self._drop_segment_index(cik)
+            self._record_accessions(cik, accessions, self.facts_by_company[cik])
+
             logger.info(
                 "Company facts stored",
                 cik=cik,
@@ -146,6 +167,40 @@ class FactsStore:
             logger.error("Failed to store company facts", error=str(e))
             raise
     
+    def _record_accessions(self, cik: str, accessions: Set[str], company_facts: Dict[str, List[Fact]]) -> None:
+        """Note filings seen for the first time and tell the accession listeners"""
+        known = self._accessions.setdefault(cik, set())
+        new_accessions = accessions - known
+        if not new_accessions:
+            return
+        known.update(new_accessions)
+
+        # The newest of the new filings identifies this version of the company
+        newest = max(
+            (fact for facts in company_facts.values() for fact in facts if fact.accession in new_accessions),
+            key=lambda f: (f.end_date or "", f.period or "", f.accession)
+        )
+        self._latest_accession[cik] = newest.accession
+
+        logger.info("New filings ingested", cik=cik, accessions=sorted(new_accessions))
+        for listener in self._accession_listeners:
+            try:
+                listener(cik, new_accessions)
+            except Exception as e:
+                logger.warning("Accession listener failed", cik=cik, error=str(e))
+
+    def add_accession_listener(self, listener: Callable[[str, Set[str]], None]) -> None:
+        """Call listener(cik, new_accessions) whenever filings not seen before are stored"""
+        self._accession_listeners.append(listener)
+
+    def company_accession(self, cik: str) -> Optional[str]:
+        """Most recently ingested filing accession for a company"""
+        return self._latest_accession.get(cik)
+
+    def _drop_segment_index(self, cik: str) -> None:
+        for key in [key for key in self._segment_index if key[0] == cik]:
+            del self._segment_index[key]
+
     def _filter_facts_by_duration(self, facts: List[Fact], freq: str) -> List[Fact]:
         """Filter facts to match expected duration for frequency
 
@@ -290,6 +345,28 @@ class FactsStore:
                 logger.warning("Could not resolve ticker to CIK", ticker=ticker)
                 return None
             
+            # Each (cik, concept, period, freq) is resolved once per request
+            return await snapshot_lookup(
+                ("store", cik, concept, period, freq, ttm, segment),
+                lambda: self._select_fact(ticker, cik, concept, period, freq, ttm, segment)
+            )
+            
+        except Exception as e:
+            logger.error("Failed to get fact", ticker=ticker, concept=concept, error=str(e))
+            return None
+
+    async def _select_fact(
+        self,
+        ticker: str,
+        cik: str,
+        concept: str,
+        period: str,
+        freq: str,
+        ttm: bool,
+        segment: Optional[str]
+    ) -> Optional[Fact]:
+        """Pick the fact for a period from the company's facts, lazy-loading them if needed"""
+        try:
             # Get facts for company and concept (with lazy loading from SEC if not cached)
             company_facts = self.facts_by_company.get(cik, {})
             concept_facts = company_facts.get(concept, [])
@@ -446,6 +523,86 @@ class FactsStore:
             logger.error("Failed to get facts series", ticker=ticker, concept=concept, error=str(e))
             return []
     
+    async def get_company_snapshot(self, ticker: str) -> Optional[CompanySnapshot]:
+        """
+        Resolve a ticker and make sure its facts are loaded (at most one fetch)
+
+        Returns:
+            CompanySnapshot, or None if the company is unknown or has no facts
+        """
+        cik = await self._resolve_ticker_to_cik(ticker)
+        if not cik:
+            return None
+        if cik not in self.facts_by_company:
+            await self._lazy_load_company_facts(ticker, cik)
+        metadata = self.company_metadata.get(cik)
+        if not metadata:
+            return None
+        return CompanySnapshot(
+            ticker=ticker.upper(),
+            cik=cik,
+            accession=self._latest_accession.get(cik),
+            metadata=metadata
+        )
+
+    async def get_facts(
+        self,
+        ticker: str,
+        concepts: List[str],
+        period: str = "latest",
+        freq: str = "Q"
+    ) -> Dict[str, Optional[Fact]]:
+        """
+        Get several facts for a company in one concurrent batch
+
+        Lookups that need the SEC share a single fetch of the company's facts.
+
+        Returns:
+            Dict of concept to Fact (None where not found)
+        """
+        unique = list(dict.fromkeys(concepts))
+        facts = await asyncio.gather(
+            *(self.get_fact(ticker, concept, period=period, freq=freq) for concept in unique)
+        )
+        return dict(zip(unique, facts))
+
+    async def get_segment_series(
+        self,
+        ticker: str,
+        concept: str,
+        freq: str = "Q",
+        limit: int = 12
+    ) -> Dict[str, List[Fact]]:
+        """
+        Get a concept's facts grouped by business segment
+
+        The grouping is built once per company, concept and frequency and
+        rebuilt when the company's facts are stored again.
+
+        Returns:
+            Dict of segment name ("Consolidated" when undimensioned) to at
+            most `limit` facts, most recent first
+        """
+        cik = await self._resolve_ticker_to_cik(ticker)
+        if not cik:
+            return {}
+
+        key = (cik, concept, freq)
+        segments = self._segment_index.get(key)
+        if segments is None:
+            concept_facts = self.facts_by_company.get(cik, {}).get(concept, [])
+            if freq == "Q":
+                concept_facts = [f for f in concept_facts if "Q" in f.period]
+            elif freq == "A":
+                concept_facts = [f for f in concept_facts if "Q" not in f.period]
+
+            segments = {}
+            for fact in sorted(concept_facts, key=lambda x: x.period, reverse=True):
+                segments.setdefault(fact.dimensions.get("BusinessSegment", "Consolidated"), []).append(fact)
+            self._segment_index[key] = segments
+
+        return {segment: facts[:limit] for segment, facts in segments.items()}
+
     async def _resolve_ticker_to_cik(self, ticker: str) -> Optional[str]:
         """Resolve ticker symbol to CIK using IdentifierResolver (supports 10,123+ companies)"""
         try:
@@ -473,7 +630,19 @@ class FactsStore:
         """
         Lazy-load company facts from SEC Facts API when not in cache.
         This enables "just works" UX - any ticker can be queried without pre-loading!
+
+        Concurrent calls for the same company share one fetch.
         """
+        key = (cik, force_refresh)
+        load = self._loads_in_flight.get(key)
+        if load is None:
+            load = asyncio.ensure_future(self._load_company_facts(ticker, cik, force_refresh=force_refresh))
+            self._loads_in_flight[key] = load
+            load.add_done_callback(lambda _: self._loads_in_flight.pop(key, None))
+        # Shielded so one caller being cancelled doesn't cancel the load for the others
+        await asyncio.shield(load)
+
+    async def _load_company_facts(self, ticker: str, cik: str, *, force_refresh: bool = False) -> None:
         try:
             from src.adapters.sec_facts import get_sec_facts_adapter
 
@@ -691,5 +860,9 @@ class FactsStore:
         self.facts_by_company.clear()
         self.facts_by_concept.clear()
         self.company_metadata.clear()
+        self._segment_index.clear()
+        # Filings stored again after a clear are new to this store
+        self._accessions.clear()
+        self._latest_accession.clear()
         logger.info("Facts store cleared")
 
@@ -3,7 +3,6 @@ Nocturnal Archive API - Main FastAPI application
 """
 
 import logging
-import time
 from contextlib import asynccontextmanager
 from importlib import import_module
 from typing import AsyncGenerator, Optional
@@ -26,8 +25,7 @@ from src.config.settings import get_settings
 from src.middleware.rate_limit import RateLimitMiddleware
 from src.middleware.api_auth import APIKeyAuthMiddleware
 from src.middleware.security import SecurityMiddleware
-from src.middleware.tracing import TracingMiddleware
-from src.middleware.request_id import RequestIdMiddleware
+from src.middleware.context import RequestContextMiddleware
 from src.middleware.pilot_guards import PilotGuardsMiddleware
 from src.middleware.admin_auth import AdminAuthMiddleware
 from src.utils.resiliency import init_redis
@@ -106,6 +104,22 @@ async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
     # Shutdown
     logger.info("Shutting down Nocturnal Archive API")
 
+    # Release pooled LLM provider connections
+    from src.services.llm_providers import close_provider_manager
+    await close_provider_manager()
+
+    # Write API usage still waiting for the next batch
+    from src.core.usage_counters import close_usage_counters
+    await close_usage_counters()
+
+    # Release pooled SEC/FRED connections
+    from src.connectors.http_client import close_upstream_clients
+    await close_upstream_clients()
+
+    # Release the pooled paper search session
+    from src.services.paper_search import close_paper_search_session
+    await close_paper_search_session()
+
 
 # Create FastAPI app
 app = FastAPI(
@@ -132,9 +146,9 @@ app.add_middleware(
     allowed_hosts=["*"] if settings.environment in {"development", "test"} else ["api.nocturnal-archive.com"]
 )
 
-app.add_middleware(SecurityMiddleware)
-app.add_middleware(TracingMiddleware)
-app.add_middleware(RequestIdMiddleware)
+# Pure ASGI middlewares (no BaseHTTPMiddleware: no extra task or body re-streaming per layer).
+# The last one added runs first: RequestContextMiddleware sets up the shared per-request
+# context and writes the request-id, trace, timing and collected headers once.
 app.add_middleware(PilotGuardsMiddleware)
 app.add_middleware(APIKeyAuthMiddleware)
 app.add_middleware(
@@ -144,21 +158,13 @@ app.add_middleware(
     per_ip_limit=50           # Global per-IP fuse: 50 req/s
 )
 app.add_middleware(AdminAuthMiddleware)
+app.add_middleware(SecurityMiddleware)
+app.add_middleware(RequestContextMiddleware)
 
 # Add Prometheus metrics
 Instrumentator().instrument(app).expose(app, include_in_schema=False)
 
 
-@app.middleware("http")
-async def add_process_time_header(request: Request, call_next):
-    """Add processing time to response headers"""
-    start_time = time.time()
-    response = await call_next(request)
-    process_time = time.time() - start_time
-    response.headers["X-Process-Time"] = str(process_time)
-    return response
-
-
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request: Request, exc: HTTPException):
     """Handle HTTP exceptions (auth errors, validation, etc.)"""
@@ -4,42 +4,46 @@ Admin authentication middleware for protecting operational endpoints
 
 import os
 import structlog
-from fastapi import Request, HTTPException, status
-from starlette.middleware.base import BaseHTTPMiddleware
+from fastapi import status
+from fastapi.responses import JSONResponse
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from src.middleware.context import client_ip
 
 logger = structlog.get_logger(__name__)
 
-class AdminAuthMiddleware(BaseHTTPMiddleware):
+class AdminAuthMiddleware:
     """Middleware to protect admin/operational endpoints"""
     
-    def __init__(self, app, admin_key: str = None):
-        super().__init__(app)
+    def __init__(self, app: ASGIApp, admin_key: str = None):
+        self.app = app
         self.admin_key = admin_key or os.getenv("ADMIN_KEY", "admin-key-change-me")
-        self.protected_paths = [
+        self.protected_paths = (
             "/v1/diag/",
             "/metrics",
             "/docs",
             "/redoc", 
             "/openapi.json"
-        ]
+        )
     
-    async def dispatch(self, request: Request, call_next):
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
         # Check if this is a protected endpoint
-        if any(request.url.path.startswith(path) for path in self.protected_paths):
+        if scope["type"] == "http" and scope["path"].startswith(self.protected_paths):
             # Check for admin key in header
-            admin_key = request.headers.get("X-Admin-Key")
+            admin_key = Headers(scope=scope).get("X-Admin-Key")
             if not admin_key or admin_key != self.admin_key:
                 logger.warning(
                     "Unauthorized access attempt to protected endpoint",
-                    path=request.url.path,
-                    ip=request.client.host if request.client else "unknown"
+                    path=scope["path"],
+                    ip=client_ip(scope)
                 )
-                from fastapi.responses import JSONResponse
-                return JSONResponse(
+                response = JSONResponse(
                     status_code=status.HTTP_401_UNAUTHORIZED,
                     content={"detail": "Admin access required"},
                     headers={"WWW-Authenticate": "Bearer"}
                 )
+                await response(scope, receive, send)
+                return
         
-        response = await call_next(request)
-        return response
+        await self.app(scope, receive, send)
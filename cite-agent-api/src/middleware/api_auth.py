@@ -6,18 +6,21 @@ import time
 import hashlib
 import structlog
 from typing import Dict, Optional
-from fastapi import Request, HTTPException, status
-from starlette.middleware.base import BaseHTTPMiddleware
+from fastapi import status
+from fastapi.responses import JSONResponse
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Receive, Scope, Send
 
 from src.config.settings import get_settings
+from src.middleware.context import client_ip, get_request_context
 
 logger = structlog.get_logger(__name__)
 
-class APIKeyAuthMiddleware(BaseHTTPMiddleware):
+class APIKeyAuthMiddleware:
     """Middleware for API key authentication and rate limiting"""
     
-    def __init__(self, app):
-        super().__init__(app)
+    def __init__(self, app: ASGIApp):
+        self.app = app
         self.settings = get_settings()
         # Simple in-memory storage for demo (replace with DB in production)
         self.api_keys = {
@@ -69,12 +72,12 @@ class APIKeyAuthMiddleware(BaseHTTPMiddleware):
         self.rate_limits: Dict[str, Dict[str, float]] = {}
         
         # API endpoints that require authentication
-        self.protected_paths = [
+        self.protected_paths = (
             "/api/search",
             "/api/synthesize", 
             "/api/format",
             "/v1/finance"
-        ]
+        )
     
     def _get_rate_limit_key(self, api_key: str) -> str:
         """Get rate limit key for current hour"""
@@ -125,117 +128,122 @@ class APIKeyAuthMiddleware(BaseHTTPMiddleware):
         rate_data["count"] += 1
         return True, None
     
-    async def dispatch(self, request: Request, call_next):
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
         # Check if this endpoint requires authentication
-        if any(request.url.path.startswith(path) for path in self.protected_paths):
-            # Get API key from header - prioritize X-API-Key over Authorization Bearer
-            api_key = request.headers.get("X-API-Key")
-            if not api_key:
-                auth_header = request.headers.get("Authorization")
-                if auth_header and auth_header.startswith("Bearer "):
-                    api_key = auth_header[7:]  # Remove "Bearer " prefix
-            
-            if not api_key:
-                if self.settings.environment == "test" and request.url.path.startswith("/api/"):
-                    api_key = "demo-key-123"
-                else:
-                    from fastapi.responses import JSONResponse
-                    return JSONResponse(
-                        status_code=status.HTTP_401_UNAUTHORIZED,
-                        content={
-                            "error": "authentication_error",
-                            "message": "Missing API key. Provide X-API-Key header or Authorization: Bearer <key>",
-                            "request_id": getattr(request.state, "trace_id", "unknown")
-                        }
-                    )
+        if scope["type"] != "http" or not scope["path"].startswith(self.protected_paths):
+            await self.app(scope, receive, send)
+            return
 
-            # Validate API key
-            if api_key not in self.api_keys:
-                logger.warning(
-                    "Invalid API key attempt",
-                    api_key_hash=hashlib.sha256(api_key.encode()).hexdigest()[:8],
-                    ip=request.client.host if request.client else "unknown"
-                )
-                from fastapi.responses import JSONResponse
-                return JSONResponse(
+        path = scope["path"]
+        headers = Headers(scope=scope)
+        trace_id = scope["state"].get("trace_id", "unknown")
+
+        # Get API key from header - prioritize X-API-Key over Authorization Bearer
+        api_key = headers.get("X-API-Key")
+        if not api_key:
+            auth_header = headers.get("Authorization")
+            if auth_header and auth_header.startswith("Bearer "):
+                api_key = auth_header[7:]  # Remove "Bearer " prefix
+        
+        if not api_key:
+            if self.settings.environment == "test" and path.startswith("/api/"):
+                api_key = "demo-key-123"
+            else:
+                response = JSONResponse(
                     status_code=status.HTTP_401_UNAUTHORIZED,
                     content={
                         "error": "authentication_error",
-                        "message": "Invalid API key",
-                        "request_id": getattr(request.state, "trace_id", "unknown")
+                        "message": "Missing API key. Provide X-API-Key header or Authorization: Bearer <key>",
+                        "request_id": trace_id
                     }
                 )
+                await response(scope, receive, send)
+                return
 
-            key_info = self.api_keys[api_key]
-            if not key_info["active"]:
-                from fastapi.responses import JSONResponse
-                return JSONResponse(
-                    status_code=status.HTTP_403_FORBIDDEN,
-                    content={
-                        "error": "authentication_error",
-                        "message": "API key is inactive",
-                        "request_id": getattr(request.state, "trace_id", "unknown")
-                    }
-                )
+        # Validate API key
+        if api_key not in self.api_keys:
+            logger.warning(
+                "Invalid API key attempt",
+                api_key_hash=hashlib.sha256(api_key.encode()).hexdigest()[:8],
+                ip=client_ip(scope)
+            )
+            response = JSONResponse(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                content={
+                    "error": "authentication_error",
+                    "message": "Invalid API key",
+                    "request_id": trace_id
+                }
+            )
+            await response(scope, receive, send)
+            return
 
-            # Permission model: read access for GET, write access for mutating operations
-            required_permission: Optional[str] = None
-            if request.url.path.startswith("/v1/finance"):
-                required_permission = "finance:write" if request.method.upper() not in {"GET", "HEAD", "OPTIONS"} else "finance:read"
-            elif request.url.path.startswith("/api"):
-                required_permission = "research"
+        key_info = self.api_keys[api_key]
+        if not key_info["active"]:
+            response = JSONResponse(
+                status_code=status.HTTP_403_FORBIDDEN,
+                content={
+                    "error": "authentication_error",
+                    "message": "API key is inactive",
+                    "request_id": trace_id
+                }
+            )
+            await response(scope, receive, send)
+            return
 
-            if required_permission and required_permission not in key_info.get("permissions", set()):
-                from fastapi.responses import JSONResponse
-                return JSONResponse(
-                    status_code=status.HTTP_403_FORBIDDEN,
-                    content={
-                        "error": "permission_denied",
-                        "message": f"Insufficient permissions. Required: {required_permission}",
-                        "request_id": getattr(request.state, "trace_id", "unknown")
-                    }
-                )
-            
-            # Check rate limit
-            allowed, retry_after = self._check_rate_limit(api_key, key_info)
-            if not allowed:
-                from fastapi.responses import JSONResponse
-                response = JSONResponse(
-                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-                    content={
-                        "error": "rate_limit_exceeded",
-                        "message": "Too many requests. Please try again later.",
-                        "trace_id": getattr(request.state, "trace_id", None)
-                    }
-                )
-                response.headers["Retry-After"] = str(max(1, retry_after or 1))
-                response.headers["X-RateLimit-Limit"] = str(key_info["rate_limit"])
-                response.headers["X-RateLimit-Remaining"] = "0"
-                response.headers["X-RateLimit-Reset"] = str(int(time.time()) + max(1, retry_after or 60))
-                response.headers["X-Usage-Today"] = str(key_info.get("rate_limit", 0))
-                return response
-            
-            # Add key info to request state
-            request.state.api_key = api_key
-            request.state.key_info = key_info
-            
-            # Calculate usage stats
-            rate_key = self._get_rate_limit_key(api_key)
-            rate_data = self.rate_limits.get(rate_key, {"count": 0, "reset_time": time.time() + 3600})
-            remaining = max(0, key_info["rate_limit"] - rate_data["count"])
-            
-            # Process request
-            response = await call_next(request)
-            
-            # Add usage headers (RFC 6585 compliant)
-            response.headers["X-Request-ID"] = getattr(request.state, "trace_id", "unknown")
+        # Permission model: read access for GET, write access for mutating operations
+        required_permission: Optional[str] = None
+        if path.startswith("/v1/finance"):
+            required_permission = "finance:write" if scope["method"].upper() not in {"GET", "HEAD", "OPTIONS"} else "finance:read"
+        elif path.startswith("/api"):
+            required_permission = "research"
+
+        if required_permission and required_permission not in key_info.get("permissions", set()):
+            response = JSONResponse(
+                status_code=status.HTTP_403_FORBIDDEN,
+                content={
+                    "error": "permission_denied",
+                    "message": f"Insufficient permissions. Required: {required_permission}",
+                    "request_id": trace_id
+                }
+            )
+            await response(scope, receive, send)
+            return
+        
+        # Check rate limit
+        allowed, retry_after = self._check_rate_limit(api_key, key_info)
+        if not allowed:
+            response = JSONResponse(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                content={
+                    "error": "rate_limit_exceeded",
+                    "message": "Too many requests. Please try again later.",
+                    "trace_id": trace_id
+                }
+            )
+            response.headers["Retry-After"] = str(max(1, retry_after or 1))
             response.headers["X-RateLimit-Limit"] = str(key_info["rate_limit"])
-            response.headers["X-RateLimit-Remaining"] = str(remaining)
-            response.headers["X-RateLimit-Reset"] = str(int(rate_data["reset_time"]))
-            response.headers["X-Usage-Today"] = str(rate_data["count"])
-            
-            return response
+            response.headers["X-RateLimit-Remaining"] = "0"
+            response.headers["X-RateLimit-Reset"] = str(int(time.time()) + max(1, retry_after or 60))
+            response.headers["X-Usage-Today"] = str(key_info.get("rate_limit", 0))
+            await response(scope, receive, send)
+            return
+        
+        # Add key info to request state
+        scope["state"]["api_key"] = api_key
+        scope["state"]["key_info"] = key_info
+        
+        # Calculate usage stats
+        rate_key = self._get_rate_limit_key(api_key)
+        rate_data = self.rate_limits.get(rate_key, {"count": 0, "reset_time": time.time() + 3600})
+        remaining = max(0, key_info["rate_limit"] - rate_data["count"])
+        
+        # Add usage headers (RFC 6585 compliant); the request id header is set by the context middleware
+        get_request_context(scope).response_headers.update({
+            "X-RateLimit-Limit": str(key_info["rate_limit"]),
+            "X-RateLimit-Remaining": str(remaining),
+            "X-RateLimit-Reset": str(int(rate_data["reset_time"])),
+            "X-Usage-Today": str(rate_data["count"]),
+        })
         
-        # No authentication required for this endpoint
-        response = await call_next(request)
-        return response
+        await self.app(scope, receive, send)
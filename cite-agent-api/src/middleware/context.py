@@ -0,0 +1,106 @@
+"""
+Per-request context for the pure-ASGI middleware stack
+
+RequestContextMiddleware is the outermost of our middlewares. It assigns the
+request/trace id, starts the clock, opens the request's fact snapshot
+(src.facts.snapshot) and wraps ``send`` exactly once; the
+middlewares inside it never wrap ``send`` themselves; they record response
+headers on the shared RequestContext (or register a hook that runs when the
+response starts) and this middleware writes them all in one pass.
+"""
+
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, MutableMapping, Optional
+
+import structlog
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.facts.snapshot import fact_snapshot
+
+logger = structlog.get_logger(__name__)
+
+
+@dataclass
+class RequestContext:
+    """State shared by every middleware handling one request"""
+    request_id: str
+    trace_id: str
+    state: MutableMapping[str, Any]  # Same dict as request.state
+    started: float = field(default_factory=time.perf_counter)
+    status_code: Optional[int] = None
+    response_headers: Dict[str, str] = field(default_factory=dict)
+    # Called with the context just before the response headers are sent
+    header_hooks: List[Callable[["RequestContext"], None]] = field(default_factory=list)
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+
+def get_request_context(scope: Scope) -> RequestContext:
+    """Context set up by RequestContextMiddleware for this request"""
+    return scope["state"]["context"]
+
+
+def client_ip(scope: Scope) -> str:
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+
+class RequestContextMiddleware:
+    """Request id, trace id, timing headers and request logging"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        trace_id = str(uuid.uuid4())
+        # Honour a client-supplied request id; otherwise it is the trace id
+        request_id = Headers(scope=scope).get("x-request-id") or trace_id
+        state = scope.setdefault("state", {})
+        context = RequestContext(request_id=request_id, trace_id=trace_id, state=state)
+        state.update(context=context, trace_id=trace_id, request_id=request_id)
+
+        logger.info(
+            "Request started",
+            method=scope["method"],
+            path=scope["path"],
+            query_string=scope.get("query_string", b"").decode("latin-1"),
+            trace_id=trace_id
+        )
+
+        async def send_with_headers(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                context.status_code = message["status"]
+                for hook in context.header_hooks:
+                    hook(context)
+                elapsed = context.elapsed
+                headers = MutableHeaders(scope=message)
+                headers["X-Request-Id"] = request_id
+                headers["X-Trace-ID"] = trace_id
+                headers["X-Process-Time"] = str(elapsed)
+                headers["X-Response-Time-Ms"] = str(int(elapsed * 1000))
+                for name, value in context.response_headers.items():
+                    headers[name] = value
+            await send(message)
+
+        # Fact lookups are memoized for the rest of this request
+        with fact_snapshot() as snapshot:
+            state["fact_snapshot"] = snapshot
+            await self.app(scope, receive, send_with_headers)
+
+        logger.info(
+            "Request completed",
+            method=scope["method"],
+            path=scope["path"],
+            status_code=context.status_code,
+            trace_id=trace_id,
+            **(snapshot.stats() if len(snapshot) else {})
+        )
@@ -2,45 +2,45 @@
 Middleware for pilot guards - adds rate limit and quota headers to responses
 """
 
-import time
-from fastapi import Request, Response
-from starlette.middleware.base import BaseHTTPMiddleware
-from src.core.ratelimit import get_rate_limit_stats
-from src.core.soft_quota import get_quota_stats
+from starlette.types import ASGIApp, Receive, Scope, Send
 
-class PilotGuardsMiddleware(BaseHTTPMiddleware):
+from src.middleware.context import RequestContext, get_request_context
+
+
+class PilotGuardsMiddleware:
     """Middleware to add rate limit and quota headers to responses"""
     
-    async def dispatch(self, request: Request, call_next):
-        # Process the request
-        start_time = time.time()
-        response = await call_next(request)
-        duration_ms = int((time.time() - start_time) * 1000)
-        
-        # Get API key for stats
-        api_key = request.headers.get("X-API-Key") or request.headers.get("Authorization")
-        if api_key and api_key.startswith("Bearer "):
-            api_key = api_key[7:]  # Remove "Bearer " prefix
-        
-        key = api_key or f"anon:{request.client.host if request.client else 'unknown'}"
-        
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http":
+            # Handlers record rate limit and quota usage on request.state while running
+            get_request_context(scope).header_hooks.append(self._add_guard_headers)
+        await self.app(scope, receive, send)
+
+    @staticmethod
+    def _add_guard_headers(context: RequestContext) -> None:
+        state = context.state
+        guard_headers = {}
+
         # Add rate limit headers if available
-        if hasattr(request.state, 'rate_limit_remaining'):
-            response.headers["X-RateLimit-Limit"] = "120"
-            response.headers["X-RateLimit-Remaining"] = str(request.state.rate_limit_remaining)
-            response.headers["X-RateLimit-Reset"] = str(request.state.rate_limit_reset)
+        if "rate_limit_remaining" in state:
+            guard_headers["X-RateLimit-Limit"] = "120"
+            guard_headers["X-RateLimit-Remaining"] = str(state["rate_limit_remaining"])
+            guard_headers["X-RateLimit-Reset"] = str(state.get("rate_limit_reset"))
         
         # Add quota headers if available
-        if hasattr(request.state, 'quota_remaining'):
-            response.headers["X-Quota-Limit"] = "500"
-            response.headers["X-Quota-Used"] = str(request.state.quota_used)
-            response.headers["X-Quota-Remaining"] = str(request.state.quota_remaining)
-        
-        # Add request timing
-        response.headers["X-Response-Time-Ms"] = str(duration_ms)
+        if "quota_remaining" in state:
+            guard_headers["X-Quota-Limit"] = "500"
+            guard_headers["X-Quota-Used"] = str(state.get("quota_used"))
+            guard_headers["X-Quota-Remaining"] = str(state["quota_remaining"])
         
         # Add pilot mode indicator
-        response.headers["X-Pilot-Mode"] = "true"
-        response.headers["X-Guards"] = "rate-limit,soft-quota"
-        
-        return response
+        guard_headers["X-Pilot-Mode"] = "true"
+        guard_headers["X-Guards"] = "rate-limit,soft-quota"
+
+        # This is the innermost middleware: headers set by the outer ones
+        # (APIKeyAuth's X-RateLimit-*) take precedence, as they always have
+        for name, value in guard_headers.items():
+            context.response_headers.setdefault(name, value)
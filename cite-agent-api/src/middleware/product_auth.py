@@ -9,6 +9,8 @@ from fastapi import HTTPException
 import structlog
 from datetime import date
 
+from src.core.usage_counters import FINANCE_DAILY, MONTHLY, get_usage_counters, utc_today
+
 logger = structlog.get_logger(__name__)
 
 class ProductType(Enum):
@@ -153,42 +155,11 @@ async def get_key_info(conn, api_key: str) -> Optional[dict]:
 
 async def get_daily_finsight_usage(conn, api_key_id: int, today: date) -> int:
     """Get FinSight usage count for today (for Cite-Agent users)"""
-    try:
-        row = await conn.fetchrow(
-            """
-            SELECT COUNT(*) as count
-            FROM api_usage
-            WHERE api_key_id = $1
-              AND DATE(timestamp) = $2
-              AND endpoint LIKE '/v1/finance%'
-            """,
-            api_key_id,
-            today
-        )
-        return row["count"] if row else 0
-    except Exception as e:
-        logger.error("Failed to fetch daily usage", error=str(e))
-        return 0
+    return await get_usage_counters().count(conn, api_key_id, FINANCE_DAILY, today)
 
 async def get_monthly_usage(conn, api_key_id: int, year: int, month: int) -> int:
     """Get API usage count for current month (for FinSight users)"""
-    try:
-        row = await conn.fetchrow(
-            """
-            SELECT COUNT(*) as count
-            FROM api_usage
-            WHERE api_key_id = $1
-              AND EXTRACT(YEAR FROM timestamp) = $2
-              AND EXTRACT(MONTH FROM timestamp) = $3
-            """,
-            api_key_id,
-            year,
-            month
-        )
-        return row["count"] if row else 0
-    except Exception as e:
-        logger.error("Failed to fetch monthly usage", error=str(e))
-        return 0
+    return await get_usage_counters().count(conn, api_key_id, MONTHLY, date(year, month, 1))
 
 async def log_api_usage(
     conn,
@@ -197,21 +168,13 @@ async def log_api_usage(
     response_time_ms: int = None,
     status_code: int = 200
 ):
-    """Log API usage for rate limiting and billing"""
-    try:
-        await conn.execute(
-            """
-            INSERT INTO api_usage (api_key_id, endpoint, response_time_ms, status_code)
-            VALUES ($1, $2, $3, $4)
-            """,
-            api_key_id,
-            endpoint,
-            response_time_ms,
-            status_code
-        )
-    except Exception as e:
-        logger.warning("Failed to log API usage", error=str(e))
-        # Don't fail the request if logging fails
+    """
+    Log API usage for rate limiting and billing
+
+    Counted immediately; the api_usage row is written in the next batch, so
+    this never waits on the database (conn is kept for compatibility)
+    """
+    get_usage_counters().record(api_key_id, endpoint, response_time_ms, status_code)
 
 async def check_product_access(
     conn,
@@ -277,7 +240,7 @@ async def check_product_access(
                 )
 
             # Check daily quota
-            today = date.today()
+            today = utc_today()
             daily_usage = await get_daily_finsight_usage(conn, key_info["id"], today)
             daily_limit = tier_config["daily_finsight"]
 
@@ -306,13 +269,14 @@ async def check_product_access(
                 usage=daily_usage,
                 limit=daily_limit
             )
+            await log_api_usage(conn, key_info["id"], endpoint)
             return key_info
 
         # FinSight users: direct API with monthly limits
         elif product == ProductType.FINSIGHT:
 
             # Check monthly quota
-            now = date.today()
+            now = utc_today()
             monthly_usage = await get_monthly_usage(conn, key_info["id"], now.year, now.month)
             monthly_limit = tier_config["monthly_calls"]
 
@@ -345,6 +309,7 @@ async def check_product_access(
                 limit=monthly_limit if monthly_limit > 0 else "unlimited",
                 tier=tier.value
             )
+            await log_api_usage(conn, key_info["id"], endpoint)
             return key_info
 
     # ========================
@@ -4,20 +4,22 @@ Rate limiting middleware
 
 import time
 import structlog
-from fastapi import Request, HTTPException
-from starlette.middleware.base import BaseHTTPMiddleware
+from fastapi.responses import JSONResponse
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Receive, Scope, Send
 from typing import Dict, Tuple
 
 from src.config.settings import get_settings
+from src.middleware.context import client_ip as scope_client_ip
 
 logger = structlog.get_logger(__name__)
 
 
-class RateLimitMiddleware(BaseHTTPMiddleware):
+class RateLimitMiddleware:
     """Rate limiting middleware"""
     
-    def __init__(self, app, requests_per_hour: int = 100, burst_limit: int = 10, per_ip_limit: int = 50):
-        super().__init__(app)
+    def __init__(self, app: ASGIApp, requests_per_hour: int = 100, burst_limit: int = 10, per_ip_limit: int = 50):
+        self.app = app
         self.settings = get_settings()
         self.requests_per_hour = requests_per_hour
         self.burst_limit = burst_limit
@@ -33,44 +35,46 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
             self.endpoint_limits["/api/search"] = {"per_minute": 30, "per_hour": 120}
             self.endpoint_limits["/v1/finance"] = {"per_minute": 60, "per_hour": 240}
     
-    async def dispatch(self, request: Request, call_next):
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
         # Get client identifier (IP address or API key)
-        client_id = self._get_client_id(request)
-        client_ip = request.client.host if request.client else "unknown"
+        client_ip = scope_client_ip(scope)
+        client_id = self._get_client_id(Headers(scope=scope), client_ip)
         
         # Check rate limits
-        if not self._check_rate_limit(client_id, client_ip, request.url.path):
+        if not self._check_rate_limit(client_id, client_ip, scope["path"]):
             logger.warning(
                 "Rate limit exceeded",
                 client_id=client_id,
                 client_ip=client_ip,
-                path=request.url.path
+                path=scope["path"]
             )
-            from fastapi.responses import JSONResponse
-            return JSONResponse(
+            response = JSONResponse(
                 status_code=429,
                 content={
                     "error": "rate_limit_exceeded",
                     "message": "Too many requests. Please try again later.",
-                    "trace_id": getattr(request.state, "trace_id", None)
+                    "trace_id": scope.get("state", {}).get("trace_id")
                 },
                 headers={"Retry-After": "5"}
             )
+            await response(scope, receive, send)
+            return
         
-        # Process request
-        response = await call_next(request)
-        return response
+        await self.app(scope, receive, send)
     
-    def _get_client_id(self, request: Request) -> str:
+    def _get_client_id(self, headers: Headers, client_ip: str) -> str:
         """Get client identifier for rate limiting"""
         
         # Try to get API key from header
-        api_key = request.headers.get("X-API-Key")
+        api_key = headers.get("X-API-Key")
         if api_key:
             return f"api_key:{api_key}"
         
         # Fallback to IP address
-        client_ip = request.client.host if request.client else "unknown"
         return f"ip:{client_ip}"
     
     def _resolve_limits(self, path: str) -> Tuple[int, int]:
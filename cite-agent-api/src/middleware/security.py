@@ -2,55 +2,66 @@
 Security middleware for input validation and protection
 """
 
-import json
 import structlog
-from fastapi import Request, Response
 from fastapi.responses import JSONResponse
-from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from src.middleware.context import client_ip, get_request_context
 
 logger = structlog.get_logger(__name__)
 
-class SecurityMiddleware(BaseHTTPMiddleware):
+SECURITY_HEADERS = {
+    "X-Content-Type-Options": "nosniff",
+    "X-Frame-Options": "DENY",
+    "X-XSS-Protection": "1; mode=block",
+    "Referrer-Policy": "strict-origin-when-cross-origin",
+}
+
+SUSPICIOUS_HEADERS = ("x-forwarded-for", "x-real-ip", "x-originating-ip")
+
+
+class SecurityMiddleware:
     """Middleware for security checks and input validation"""
     
-    def __init__(self, app):
-        super().__init__(app)
+    def __init__(self, app: ASGIApp):
+        self.app = app
         self.max_body_size = 2 * 1024 * 1024  # 2MB limit
         self.max_content_length = 10 * 1024 * 1024  # 10MB for file uploads
     
-    async def dispatch(self, request: Request, call_next):
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+
         # Check content length
-        content_length = request.headers.get("content-length")
-        if content_length and int(content_length) > self.max_content_length:
+        content_length = headers.get("content-length")
+        if content_length and content_length.isdigit() and int(content_length) > self.max_content_length:
             logger.warning(
                 "Request body too large",
                 content_length=content_length,
                 max_allowed=self.max_content_length,
-                ip=request.client.host if request.client else "unknown"
+                ip=client_ip(scope)
             )
-            return JSONResponse(
+            response = JSONResponse(
                 status_code=413,
                 content={"detail": "Request body too large"}
             )
+            await response(scope, receive, send)
+            return
         
         # Check for suspicious headers
-        suspicious_headers = ["x-forwarded-for", "x-real-ip", "x-originating-ip"]
-        for header in suspicious_headers:
-            if header in request.headers:
+        for header in SUSPICIOUS_HEADERS:
+            if header in headers:
                 logger.info(
                     "Suspicious header detected",
                     header=header,
-                    value=request.headers[header],
-                    ip=request.client.host if request.client else "unknown"
+                    value=headers[header],
+                    ip=client_ip(scope)
                 )
         
-        # Process request
-        response = await call_next(request)
-        
-        # Add security headers
-        response.headers["X-Content-Type-Options"] = "nosniff"
-        response.headers["X-Frame-Options"] = "DENY"
-        response.headers["X-XSS-Protection"] = "1; mode=block"
-        response.headers["Referrer-Policy"] = "strict-origin-when-cross-origin"
-        
-        return response
+        # Security headers go on every response, including short-circuited ones
+        get_request_context(scope).response_headers.update(SECURITY_HEADERS)
+        await self.app(scope, receive, send)
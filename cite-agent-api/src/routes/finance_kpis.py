@@ -3,14 +3,17 @@ Finance KPIs API Routes
 Endpoints for retrieving financial KPIs and statements
 """
 
+import asyncio
+
 from fastapi import APIRouter, HTTPException, Query, Request
 from pydantic import BaseModel, Field
 from typing import List, Optional, Dict, Any
 import structlog
 
-from src.facts.store import FactsStore
+from src.facts.statement_cache import StatementCache
+from src.facts.store import CompanySnapshot, FactsStore
 from src.calc.registry import KPIRegistry
-from src.utils.error_handling import create_problem_response, get_error_type
+from src.utils.error_handling import problem_json_response
 from src.adapters.sec_facts import get_sec_facts_adapter
 
 logger = structlog.get_logger(__name__)
@@ -19,6 +22,23 @@ router = APIRouter(prefix="/kpis", tags=["Finance KPIs"])
 # Global instances (would be injected in production)
 kpi_registry = KPIRegistry()
 facts_store = FactsStore()
+statement_cache = StatementCache()
+facts_store.add_accession_listener(statement_cache.invalidate_company)
+
+# Statement line items by type
+STATEMENT_ITEMS = {
+    "income": [
+        "revenue", "costOfRevenue", "grossProfit", "operatingIncome",
+        "netIncome", "epsBasic", "epsDiluted"
+    ],
+    "balance": [
+        "currentAssets", "totalAssets", "currentLiabilities",
+        "shareholdersEquity", "workingCapital", "currentRatio"
+    ],
+    "cashflow": [
+        "cfo", "cfi", "cff", "fcf"
+    ]
+}
 
 class KPISearchRequest(BaseModel):
     ticker: str = Field(..., description="Company ticker symbol")
@@ -155,7 +175,7 @@ async def get_kpi(
                 fallback_response = await _adapter_series_fallback(adapter_key)
                 if fallback_response:
                     return fallback_response
-            return create_problem_response(
+            return problem_json_response(
                 f"Unknown KPI: {kpi}"
             ,
                 404,
@@ -165,7 +185,7 @@ async def get_kpi(
         # Get facts series for the KPI (registry-backed)
         input_defs = kpi_registry.get_metric_inputs(effective_kpi)
         if not input_defs:
-            return create_problem_response(
+            return problem_json_response(
                 f"KPI '{kpi}' has no defined inputs"
             ,
                 422,
@@ -181,7 +201,7 @@ async def get_kpi(
         # Try to get facts for the preferred concept first
         target_concept = prefer_concept or concepts[0] if concepts else None
         if not target_concept:
-            return create_problem_response(
+            return problem_json_response(
                 f"Input '{primary_input}' has no concepts defined"
             ,
                 422,
@@ -211,7 +231,7 @@ async def get_kpi(
                 fallback_response = await _adapter_series_fallback(adapter_key)
                 if fallback_response:
                     return fallback_response
-            return create_problem_response(
+            return problem_json_response(
                 f"No {freq} data found for {ticker} {kpi} ({target_concept})",
                 404,
                 "not-found"
@@ -271,13 +291,91 @@ async def get_kpi(
             error=str(e),
             trace_id=getattr(request.state, "trace_id", "unknown")
         )
-        return create_problem_response(
-                f"Internal error: {str(e,
-                500,
-                "internal-error"
-            )}"
+        return problem_json_response(
+            f"Internal error: {str(e)}",
+            500,
+            "internal-error"
         )
 
+def _line_item_concept(item: str) -> Optional[str]:
+    """Concept backing a statement line item (primary input's preferred concept)"""
+    if not kpi_registry.get_metric(item):
+        return None
+    input_defs = kpi_registry.get_metric_inputs(item)
+    if not input_defs:
+        return None
+    primary_input = list(input_defs.keys())[0]
+    input_def = input_defs[primary_input]
+    concepts = input_def.get("concepts", [])
+    prefer_concept = input_def.get("prefer")
+    return prefer_concept or concepts[0] if concepts else None
+
+
+async def _assemble_statement(
+    snapshot: CompanySnapshot,
+    statement_type: str,
+    period: str,
+    freq: str
+) -> Dict[str, Any]:
+    """Build one statement from the company snapshot, or serve it from the cache"""
+    cache_key = (snapshot.ticker, statement_type, period, freq, snapshot.accession)
+    cached = statement_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    line_items = STATEMENT_ITEMS[statement_type]
+    concepts = {item: _line_item_concept(item) for item in line_items}
+    facts = await facts_store.get_facts(
+        snapshot.ticker,
+        [concept for concept in concepts.values() if concept],
+        period=period,
+        freq=freq
+    )
+
+    statement_data = []
+    for item in line_items:
+        target_concept = concepts[item]
+        fact = facts.get(target_concept) if target_concept else None
+        if fact:
+            statement_data.append({
+                "line_item": item,
+                "concept": target_concept,
+                "value": fact.value,
+                "unit": fact.unit,
+                "period": fact.period,
+                "citation": {
+                    "source_url": fact.url,
+                    "accession": fact.accession,
+                    "fragment_id": fact.fragment_id,
+                    "dimensions": fact.dimensions
+                },
+                "quality_flags": fact.quality_flags
+            })
+
+    statement = {
+        "ticker": snapshot.ticker,
+        "company_name": snapshot.metadata.get("company_name", ""),
+        "statement_type": statement_type,
+        "period": period,
+        "freq": freq,
+        "line_items": statement_data,
+        "metadata": {
+            "total_items": len(statement_data),
+            "company_info": snapshot.metadata,
+            "statement_definition": {
+                "type": statement_type,
+                "items": line_items
+            }
+        }
+    }
+
+    # A refresh during assembly may have ingested a newer filing; don't
+    # file a mixed statement under either accession
+    if facts_store.company_accession(snapshot.cik) == snapshot.accession:
+        statement_cache.set(cache_key, snapshot.cik, statement)
+    return statement
+
+
 @router.get("/{ticker}/statements/{statement_type}")
 async def get_financial_statement(
     ticker: str,
@@ -290,6 +388,8 @@ async def get_financial_statement(
     Get financial statement data for a company
     
     Returns structured financial statement with all line items and citations.
+    Use statement_type "all" for the income, balance and cash flow
+    statements in one response.
     """
     try:
         logger.info(
@@ -301,104 +401,48 @@ async def get_financial_statement(
             trace_id=getattr(request.state, "trace_id", "unknown")
         )
         
-        # Define statement line items by type
-        statement_items = {
-            "income": [
-                "revenue", "costOfRevenue", "grossProfit", "operatingIncome",
-                "netIncome", "epsBasic", "epsDiluted"
-            ],
-            "balance": [
-                "currentAssets", "totalAssets", "currentLiabilities",
-                "shareholdersEquity", "workingCapital", "currentRatio"
-            ],
-            "cashflow": [
-                "cfo", "cfi", "cff", "fcf"
-            ]
-        }
-        
-        if statement_type not in statement_items:
-            return create_problem_response(
-                f"Statement type must be one of: {', '.join(statement_items.keys())}",
+        if statement_type != "all" and statement_type not in STATEMENT_ITEMS:
+            return problem_json_response(
+                f"Statement type must be one of: {', '.join([*STATEMENT_ITEMS, 'all'])}",
                 422,
                 "validation-error"
             )
         
-        # Get company metadata
-        company_metadata = facts_store.get_company_metadata(ticker)
-        if not company_metadata:
-            return create_problem_response(
-                f"No data found for company: {ticker}"
-            ,
+        # Load the company once for every line item
+        snapshot = await facts_store.get_company_snapshot(ticker)
+        if not snapshot:
+            return problem_json_response(
+                f"No data found for company: {ticker}",
                 404,
                 "not-found"
             )
         
-        # Get statement line items
-        statement_data = []
-        for item in statement_items[statement_type]:
-            # Get KPI definition
-            kpi_def = kpi_registry.get_metric(item)
-            if not kpi_def:
-                continue
-            
-            # Get facts for this item
-            input_defs = kpi_registry.get_metric_inputs(item)
-            if not input_defs:
-                continue
-            
-            # Get primary input concept
-            primary_input = list(input_defs.keys())[0]
-            input_def = input_defs[primary_input]
-            concepts = input_def.get("concepts", [])
-            prefer_concept = input_def.get("prefer")
-            target_concept = prefer_concept or concepts[0] if concepts else None
-            
-            if target_concept:
-                fact = await facts_store.get_fact(
-                    ticker=ticker,
-                    concept=target_concept,
-                    period=period,
-                    freq=freq
-                )
-                
-                if fact:
-                    statement_data.append({
-                        "line_item": item,
-                        "concept": target_concept,
-                        "value": fact.value,
-                        "unit": fact.unit,
-                        "period": fact.period,
-                        "citation": {
-                            "source_url": fact.url,
-                            "accession": fact.accession,
-                            "fragment_id": fact.fragment_id,
-                            "dimensions": fact.dimensions
-                        },
-                        "quality_flags": fact.quality_flags
-                    })
+        statement_types = list(STATEMENT_ITEMS) if statement_type == "all" else [statement_type]
+        statements = await asyncio.gather(
+            *(_assemble_statement(snapshot, name, period, freq) for name in statement_types)
+        )
         
-        response_data = {
-            "ticker": ticker,
-            "company_name": company_metadata.get("company_name", ""),
-            "statement_type": statement_type,
-            "period": period,
-            "freq": freq,
-            "line_items": statement_data,
-            "metadata": {
-                "total_items": len(statement_data),
-                "company_info": company_metadata,
-                "statement_definition": {
-                    "type": statement_type,
-                    "items": statement_items[statement_type]
+        if statement_type == "all":
+            response_data = {
+                "ticker": snapshot.ticker,
+                "company_name": snapshot.metadata.get("company_name", ""),
+                "statement_type": "all",
+                "period": period,
+                "freq": freq,
+                "statements": dict(zip(statement_types, statements)),
+                "metadata": {
+                    "total_items": sum(len(s["line_items"]) for s in statements),
+                    "company_info": snapshot.metadata
                 }
             }
-        }
+        else:
+            response_data = statements[0]
         
         logger.info(
             "Finance statement request completed",
             ticker=ticker,
             statement_type=statement_type,
-            items_returned=len(statement_data),
+            items_returned=response_data["metadata"]["total_items"],
             trace_id=getattr(request.state, "trace_id", "unknown")
         )
         
@@ -412,11 +456,10 @@ async def get_financial_statement(
             error=str(e),
             trace_id=getattr(request.state, "trace_id", "unknown")
         )
-        return create_problem_response(
-                f"Internal error: {str(e,
-                500,
-                "internal-error"
-            )}"
+        return problem_json_response(
+            f"Internal error: {str(e)}",
+            500,
+            "internal-error"
         )
 
 @router.get("/{ticker}/segments/{kpi}")
@@ -445,7 +488,7 @@ async def get_segment_kpi(
         # Get KPI definition
         kpi_def = kpi_registry.get_metric(kpi)
         if not kpi_def:
-            return create_problem_response(
+            return problem_json_response(
                 f"Unknown KPI: {kpi}"
             ,
                 404,
@@ -455,7 +498,7 @@ async def get_segment_kpi(
         # Get input concepts
         input_defs = kpi_registry.get_metric_inputs(kpi)
         if not input_defs:
-            return create_problem_response(
+            return problem_json_response(
                 f"KPI '{kpi}' has no defined inputs"
             ,
                 422,
@@ -470,34 +513,24 @@ async def get_segment_kpi(
         target_concept = prefer_concept or concepts[0] if concepts else None
         
         if not target_concept:
-            return create_problem_response(
+            return problem_json_response(
                 f"Input '{primary_input}' has no concepts defined"
             ,
                 422,
                 "validation-error"
             )
         
-        # Get facts with segment dimensions
-        facts = await facts_store.get_facts_series(
+        # Facts grouped by segment, newest first (grouping is cached by the store)
+        segments = await facts_store.get_segment_series(
             ticker=ticker,
             concept=target_concept,
             freq=freq,
             limit=limit
         )
         
-        # Group by segment
-        segments = {}
-        for fact in facts:
-            segment = fact.dimensions.get("BusinessSegment", "Consolidated")
-            if segment not in segments:
-                segments[segment] = []
-            segments[segment].append(fact)
-        
         # Build segment data
         segment_data = {}
         for segment, segment_facts in segments.items():
-            segment_facts.sort(key=lambda x: x.period, reverse=True)
-            
             segment_data[segment] = [
                 {
                     "period": fact.period,
@@ -511,7 +544,7 @@ async def get_segment_kpi(
                     },
                     "quality_flags": fact.quality_flags
                 }
-                for fact in segment_facts[:limit]
+                for fact in segment_facts
             ]
         
         response_data = {
@@ -546,11 +579,10 @@ async def get_segment_kpi(
             error=str(e),
             trace_id=getattr(request.state, "trace_id", "unknown")
         )
-        return create_problem_response(
-                f"Internal error: {str(e,
-                500,
-                "internal-error"
-            )}"
+        return problem_json_response(
+            f"Internal error: {str(e)}",
+            500,
+            "internal-error"
         )
 
 
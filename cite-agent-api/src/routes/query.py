@@ -7,6 +7,7 @@ from datetime import datetime, timezone, date
 from typing import Optional, List, Dict, Any
 import structlog
 from fastapi import APIRouter, HTTPException, Depends, status, Header
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 import asyncpg
 import os
@@ -14,6 +15,7 @@ from groq import Groq
 import asyncio
 from src.services.llm_providers import get_provider_manager
 from src.services.citation_verifier import get_verifier
+from src.utils.streaming import NDJSON_MEDIA_TYPE, ndjson_event
 
 logger = structlog.get_logger(__name__)
 router = APIRouter(prefix="/query", tags=["query"])
@@ -139,7 +141,7 @@ async def record_query(
     cost: float,
     model: str
 ) -> str:
-    """Record query in database for analytics, returns query_id"""
+    """Record query in database for analytics and bill its tokens, returns query_id"""
     import secrets
     query_id = secrets.token_urlsafe(16)
     
@@ -151,6 +153,16 @@ async def record_query(
         query_id, user_id, query_text[:1000], response_text[:5000], tokens_used, cost, model, datetime.now(timezone.utc)
     )
     
+    # Update user token usage
+    await conn.execute(
+        """
+        UPDATE users
+        SET tokens_used_today = tokens_used_today + $1
+        WHERE user_id = $2
+        """,
+        tokens_used, user_id
+    )
+    
     return query_id
 
 
@@ -203,16 +215,6 @@ async def record_accuracy_metrics(query_id: str, response_id: str, citation_resu
             await conn.close()
     except Exception as e:
         logger.error("Failed to record accuracy metrics", error=str(e))
-    
-    # Update user token usage
-    await conn.execute(
-        """
-        UPDATE users
-        SET tokens_used_today = tokens_used_today + $1
-        WHERE user_id = $2
-        """,
-        tokens_used, user_id
-    )
 
 def estimate_tokens(text: str) -> int:
     """Rough token estimation (1 token ≈ 4 chars)"""
@@ -272,78 +274,36 @@ def detect_small_talk(query: str) -> Optional[str]:
     # Not small talk - proceed to LLM
     return None
 
-# Main query endpoint
-@router.post("/", response_model=QueryResponse)
-async def process_query(
-    request: QueryRequest,
-    current_user: dict = Depends(get_current_user_from_token)
-):
-    """
-    Process a user query securely
-    - Validates auth token
-    - Checks token limits
-    - Calls Groq API (keys never exposed to client)
-    - Tracks usage and costs
-    """
-    user_id = current_user['user_id']
+async def enforce_token_limit(conn: asyncpg.Connection, user_id: str, request: QueryRequest) -> None:
+    """Raise 429 if the request's estimated tokens would exceed the daily limit"""
+    # Estimate tokens needed (rough estimate)
+    estimated_tokens = estimate_tokens(request.query) + (request.max_tokens or 2000)
     
-    conn = await get_db()
-    try:
-        # Estimate tokens needed (rough estimate)
-        estimated_tokens = estimate_tokens(request.query) + (request.max_tokens or 2000)
-        
-        # Check token limit BEFORE making API call
-        can_proceed = await check_and_update_token_limit(conn, user_id, estimated_tokens)
-        
-        if not can_proceed:
-            # Get current usage for error message
-            user = await conn.fetchrow(
-                "SELECT tokens_used_today FROM users WHERE user_id = $1",
-                user_id
-            )
-            tokens_remaining = DAILY_TOKEN_LIMIT - user['tokens_used_today']
-
-            raise HTTPException(
-                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-                detail={
-                    "error": "Daily token limit exceeded",
-                    "tokens_used_today": user['tokens_used_today'],
-                    "daily_limit": DAILY_TOKEN_LIMIT,
-                    "tokens_remaining": max(0, tokens_remaining)
-                }
-            )
-
-        # =====================================================================
-        # SMALL TALK DETECTION - Handle simple queries without LLM call
-        # =====================================================================
-        small_talk_response = detect_small_talk(request.query)
-        if small_talk_response:
-            logger.info("Small talk detected, returning quick response", query=request.query[:50])
+    # Check token limit BEFORE making API call
+    can_proceed = await check_and_update_token_limit(conn, user_id, estimated_tokens)
+    
+    if not can_proceed:
+        # Get current usage for error message
+        user = await conn.fetchrow(
+            "SELECT tokens_used_today FROM users WHERE user_id = $1",
+            user_id
+        )
+        tokens_remaining = DAILY_TOKEN_LIMIT - user['tokens_used_today']
 
-            # Get current token usage for response
-            user = await conn.fetchrow(
-                "SELECT tokens_used_today FROM users WHERE user_id = $1",
-                user_id
-            )
-            tokens_remaining = DAILY_TOKEN_LIMIT - user['tokens_used_today']
-
-            return QueryResponse(
-                response=small_talk_response,
-                tokens_used=0,  # No tokens used for small talk
-                tokens_remaining=tokens_remaining,
-                cost=0.0,
-                model="quick_reply",
-                provider="builtin",
-                timestamp=datetime.now(timezone.utc).isoformat()
-            )
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail={
+                "error": "Daily token limit exceeded",
+                "tokens_used_today": user['tokens_used_today'],
+                "daily_limit": DAILY_TOKEN_LIMIT,
+                "tokens_remaining": max(0, tokens_remaining)
+            }
+        )
 
-        # Call LLM with automatic provider failover
-        # Tries: Groq (4 keys) → Cerebras → Cloudflare → OpenRouter → others
-        provider_manager = get_provider_manager()
-        
-        try:
-            # Build specialized Cite-Agent system prompt  
-            system_prompt = """You are Cite Agent, a professional research assistant with Archive, FinSight (SEC+Yahoo), Web Search, and Shell Access.
+async def build_query_messages(request: QueryRequest, provider_manager) -> List[Dict[str, str]]:
+    """System prompt, API context, (summarized) history and the query, ready for the LLM"""
+    # Build specialized Cite-Agent system prompt  
+    system_prompt = """You are Cite Agent, a professional research assistant with Archive, FinSight (SEC+Yahoo), Web Search, and Shell Access.
 
 🚨 OUTPUT FORMAT - CRITICAL:
 - Output ONLY the final answer to the user
@@ -462,61 +422,120 @@ Otherwise: ANSWER using your tools. Be resourceful, not helpless.
 - If a user asks to find a file or directory and you are not sure where it is, use the `find` command with wildcards to search for it.
 - If a `cd` command fails, automatically run `ls -F` on the current or parent directory to understand the directory structure and find the correct path."""
 
-            # Build messages with specialized system prompt
-            messages = [{"role": "system", "content": system_prompt}]
+    # Build messages with specialized system prompt
+    messages = [{"role": "system", "content": system_prompt}]
+    
+    # Import json at module level (used in multiple places)
+    import json
+    
+    # Add API context if provided
+    if request.api_context:
+        api_context_str = json.dumps(request.api_context, indent=2)
+        
+        # DEBUG: Log what we received
+        if request.api_context.get("shell_info", {}).get("search_results"):
+            logger.info("Shell search results received", 
+                      results=request.api_context["shell_info"]["search_results"][:200])
+        
+        messages.append({"role": "system", "content": f"API Data Available:\n{api_context_str}"})
+    
+    # CONVERSATION SUMMARIZATION: Pure token-based (like Claude/Cursor)
+    # Model: Cerebras llama-3.3-70b has 128K context window
+    # Budget: System(2K) + API(3K) + Conversation(30K) + Response(4K) = 39K / 128K (30% usage, safe margin)
+    if request.conversation_history:
+        # Use actual tokenizer for accurate counting
+        try:
+            import tiktoken
+            # Use cl100k_base encoding (GPT-4, llama-3 compatible)
+            encoder = tiktoken.get_encoding("cl100k_base")
             
-            # Import json at module level (used in multiple places)
-            import json
+            # Count tokens accurately
+            history_str = json.dumps(request.conversation_history)
+            estimated_tokens = len(encoder.encode(history_str))
+        except Exception:
+            # Fallback to heuristic if tiktoken fails
+            history_str = json.dumps(request.conversation_history)
+            estimated_tokens = len(history_str) // 4
+        
+        # Optimal thresholds (balanced between Claude 20K and over-generous 60K)
+        TARGET_TOKENS = 30000  # Start summarizing (handles ~60 message conversations)
+        RECENT_TOKENS = 15000  # Keep recent context (last ~30 messages worth)
+        
+        if estimated_tokens <= TARGET_TOKENS:
+            # Fits in budget - keep everything
+            messages.extend(request.conversation_history)
+            logger.info("Conversation fits", tokens=estimated_tokens, msgs=len(request.conversation_history))
+        else:
+            # Exceeds budget - summarize old, keep recent
+            # Step 1: Count backwards to find recent messages that fit in RECENT_TOKENS
+            recent_history = []
+            recent_tokens = 0
             
-            # Add API context if provided
-            if request.api_context:
-                api_context_str = json.dumps(request.api_context, indent=2)
-                
-                # DEBUG: Log what we received
-                if request.api_context.get("shell_info", {}).get("search_results"):
-                    logger.info("Shell search results received", 
-                              results=request.api_context["shell_info"]["search_results"][:200])
-                
-                messages.append({"role": "system", "content": f"API Data Available:\n{api_context_str}"})
+            # Use same encoder for per-message counting
+            try:
+                encoder = tiktoken.get_encoding("cl100k_base")
+                use_tiktoken = True
+            except:
+                use_tiktoken = False
             
-            # CONVERSATION SUMMARIZATION: Pure token-based (like Claude/Cursor)
-            # Model: Cerebras llama-3.3-70b has 128K context window
-            # Budget: System(2K) + API(3K) + Conversation(30K) + Response(4K) = 39K / 128K (30% usage, safe margin)
-            if request.conversation_history:
-                # Use actual tokenizer for accurate counting
-                try:
-                    import tiktoken
-                    # Use cl100k_base encoding (GPT-4, llama-3 compatible)
-                    encoder = tiktoken.get_encoding("cl100k_base")
+            for msg in reversed(request.conversation_history):
+                if use_tiktoken:
+                    msg_tokens = len(encoder.encode(json.dumps(msg)))
+                else:
+                    msg_tokens = len(json.dumps(msg)) // 4
                     
-                    # Count tokens accurately
-                    history_str = json.dumps(request.conversation_history)
-                    estimated_tokens = len(encoder.encode(history_str))
-                except Exception:
-                    # Fallback to heuristic if tiktoken fails
-                    history_str = json.dumps(request.conversation_history)
-                    estimated_tokens = len(history_str) // 4
-                
-                # Optimal thresholds (balanced between Claude 20K and over-generous 60K)
-                TARGET_TOKENS = 30000  # Start summarizing (handles ~60 message conversations)
-                RECENT_TOKENS = 15000  # Keep recent context (last ~30 messages worth)
-                
-                if estimated_tokens <= TARGET_TOKENS:
-                    # Fits in budget - keep everything
-                    messages.extend(request.conversation_history)
-                    logger.info("Conversation fits", tokens=estimated_tokens, msgs=len(request.conversation_history))
+                if recent_tokens + msg_tokens <= RECENT_TOKENS:
+                    recent_history.insert(0, msg)
+                    recent_tokens += msg_tokens
                 else:
-                    # Exceeds budget - summarize old, keep recent
-                    # Step 1: Count backwards to find recent messages that fit in RECENT_TOKENS
-                    recent_history = []
-                    recent_tokens = 0
+                    break
+            
+            # Step 2: Everything else gets summarized
+            early_history = request.conversation_history[:len(request.conversation_history) - len(recent_history)]
+            
+            if not early_history:
+                # Edge case: even one message is > RECENT_TOKENS
+                # Just truncate the message
+                messages.extend(request.conversation_history)
+                logger.warning("Single message too large", tokens=estimated_tokens)
+            else:
+                # Summarize early history
+                try:
+                    summary_messages = [
+                        {"role": "system", "content": "Summarize the key points and context from this conversation. Focus on: topic discussed, data/papers found, conclusions reached, user's goals. Keep under 300 words."},
+                        {"role": "user", "content": f"Conversation to summarize:\n{json.dumps(early_history, indent=2)}"}
+                    ]
+                    
+                    # Use fast model for summarization (cheap)
+                    summary_result = await provider_manager.query_with_fallback(
+                        query="summarize",
+                        conversation_history=[],
+                        messages=summary_messages,
+                        model="llama-3.1-8b-instant",
+                        temperature=0.2,
+                        max_tokens=500
+                    )
+                    
+                    conversation_summary = summary_result['content']
+                    summary_tokens = len(conversation_summary) // 4
+                    
+                    messages.append({"role": "system", "content": f"📜 Previous conversation summary:\n{conversation_summary}"})
+                    messages.extend(recent_history)
                     
-                    # Use same encoder for per-message counting
-                    try:
-                        encoder = tiktoken.get_encoding("cl100k_base")
-                        use_tiktoken = True
-                    except:
-                        use_tiktoken = False
+                    final_tokens = summary_tokens + recent_tokens
+                    logger.info("Summarized conversation", 
+                              original_tokens=estimated_tokens,
+                              final_tokens=final_tokens,
+                              saved_tokens=estimated_tokens - final_tokens,
+                              early_msgs=len(early_history), 
+                              recent_msgs=len(recent_history))
+                    
+                except Exception as e:
+                    # If summarization fails, truncate to fit RECENT_TOKENS budget
+                    logger.warning("Summarization failed, truncating", error=str(e))
+                    
+                    truncated_history = []
+                    truncated_tokens = 0
                     
                     for msg in reversed(request.conversation_history):
                         if use_tiktoken:
@@ -524,75 +543,138 @@ Otherwise: ANSWER using your tools. Be resourceful, not helpless.
                         else:
                             msg_tokens = len(json.dumps(msg)) // 4
                             
-                        if recent_tokens + msg_tokens <= RECENT_TOKENS:
-                            recent_history.insert(0, msg)
-                            recent_tokens += msg_tokens
+                        if truncated_tokens + msg_tokens <= RECENT_TOKENS:
+                            truncated_history.insert(0, msg)
+                            truncated_tokens += msg_tokens
                         else:
                             break
                     
-                    # Step 2: Everything else gets summarized
-                    early_history = request.conversation_history[:len(request.conversation_history) - len(recent_history)]
-                    
-                    if not early_history:
-                        # Edge case: even one message is > RECENT_TOKENS
-                        # Just truncate the message
-                        messages.extend(request.conversation_history)
-                        logger.warning("Single message too large", tokens=estimated_tokens)
-                    else:
-                        # Summarize early history
-                        try:
-                            summary_messages = [
-                                {"role": "system", "content": "Summarize the key points and context from this conversation. Focus on: topic discussed, data/papers found, conclusions reached, user's goals. Keep under 300 words."},
-                                {"role": "user", "content": f"Conversation to summarize:\n{json.dumps(early_history, indent=2)}"}
-                            ]
-                            
-                            # Use fast model for summarization (cheap)
-                            summary_result = await provider_manager.query_with_fallback(
-                                query="summarize",
-                                conversation_history=[],
-                                messages=summary_messages,
-                                model="llama-3.1-8b-instant",
-                                temperature=0.2,
-                                max_tokens=500
-                            )
-                            
-                            conversation_summary = summary_result['content']
-                            summary_tokens = len(conversation_summary) // 4
-                            
-                            messages.append({"role": "system", "content": f"📜 Previous conversation summary:\n{conversation_summary}"})
-                            messages.extend(recent_history)
-                            
-                            final_tokens = summary_tokens + recent_tokens
-                            logger.info("Summarized conversation", 
-                                      original_tokens=estimated_tokens,
-                                      final_tokens=final_tokens,
-                                      saved_tokens=estimated_tokens - final_tokens,
-                                      early_msgs=len(early_history), 
-                                      recent_msgs=len(recent_history))
-                            
-                        except Exception as e:
-                            # If summarization fails, truncate to fit RECENT_TOKENS budget
-                            logger.warning("Summarization failed, truncating", error=str(e))
-                            
-                            truncated_history = []
-                            truncated_tokens = 0
-                            
-                            for msg in reversed(request.conversation_history):
-                                if use_tiktoken:
-                                    msg_tokens = len(encoder.encode(json.dumps(msg)))
-                                else:
-                                    msg_tokens = len(json.dumps(msg)) // 4
-                                    
-                                if truncated_tokens + msg_tokens <= RECENT_TOKENS:
-                                    truncated_history.insert(0, msg)
-                                    truncated_tokens += msg_tokens
-                                else:
-                                    break
-                            
-                            messages.extend(truncated_history)
-                            logger.info("Truncated to recent", tokens=truncated_tokens, msgs=len(truncated_history))
-            
-            messages.append({"role": "user", "content": request.query})
+                    messages.extend(truncated_history)
+                    logger.info("Truncated to recent", tokens=truncated_tokens, msgs=len(truncated_history))
+    
+    messages.append({"role": "user", "content": request.query})
+    
+    return messages
+
+async def quick_reply(conn: asyncpg.Connection, user_id: str, response_text: str) -> QueryResponse:
+    """Response for small talk answered without an LLM call"""
+    # Get current token usage for response
+    user = await conn.fetchrow(
+        "SELECT tokens_used_today FROM users WHERE user_id = $1",
+        user_id
+    )
+    tokens_remaining = DAILY_TOKEN_LIMIT - user['tokens_used_today']
+
+    return QueryResponse(
+        response=response_text,
+        tokens_used=0,  # No tokens used for small talk
+        tokens_remaining=tokens_remaining,
+        cost=0.0,
+        model="quick_reply",
+        provider="builtin",
+        timestamp=datetime.now(timezone.utc).isoformat()
+    )
+
+async def finalize_query(
+    conn: asyncpg.Connection,
+    user_id: str,
+    request: QueryRequest,
+    response_text: str,
+    tokens_used: int,
+    model_used: str,
+    provider_used: str
+) -> QueryResponse:
+    """Verify citations, record usage and build the response for a completed answer"""
+    # Calculate cost
+    cost = calculate_cost(tokens_used)
+    
+    # Record query for analytics (including provider used) before anything
+    # that can fail, so the tokens are billed either way
+    query_id = await record_query(
+        conn, user_id, request.query, response_text,
+        tokens_used, cost, f"{provider_used}/{model_used}"
+    )
+    
+    # Verify citations (async, don't block response)
+    verifier = get_verifier()
+    citation_results = await verifier.verify_response(response_text)
+    
+    # Log citation quality
+    logger.info(
+        "Citation quality",
+        has_citations=citation_results['has_citations'],
+        total_citations=citation_results['total_citations'],
+        verified_urls=citation_results['url_verification']['verified'],
+        broken_urls=citation_results['url_verification']['broken'],
+        quality_score=citation_results['quality_score']
+    )
+    
+    # Record accuracy metrics (async, fire-and-forget)
+    import uuid
+    response_id = str(uuid.uuid4())
+    asyncio.create_task(
+        record_accuracy_metrics(query_id, response_id, citation_results)
+    )
+    
+    # Get updated token count
+    user = await conn.fetchrow(
+        "SELECT tokens_used_today FROM users WHERE user_id = $1",
+        user_id
+    )
+    tokens_remaining = DAILY_TOKEN_LIMIT - user['tokens_used_today']
+    
+    logger.info(
+        "Query processed",
+        user_id=user_id,
+        tokens_used=tokens_used,
+        tokens_remaining=tokens_remaining,
+        cost=cost
+    )
+    
+    return QueryResponse(
+        response=response_text,
+        tokens_used=tokens_used,
+        tokens_remaining=max(0, tokens_remaining),
+        cost=cost,
+        model=model_used,
+        provider=provider_used,  # Show which provider was used
+        timestamp=datetime.now(timezone.utc).isoformat(),
+        citation_quality=citation_results  # Include citation verification
+    )
+
+# Main query endpoint
+@router.post("/", response_model=QueryResponse)
+async def process_query(
+    request: QueryRequest,
+    current_user: dict = Depends(get_current_user_from_token)
+):
+    """
+    Process a user query securely
+    - Validates auth token
+    - Checks token limits
+    - Calls Groq API (keys never exposed to client)
+    - Tracks usage and costs
+    """
+    user_id = current_user['user_id']
+    
+    conn = await get_db()
+    try:
+        await enforce_token_limit(conn, user_id, request)
+
+        # =====================================================================
+        # SMALL TALK DETECTION - Handle simple queries without LLM call
+        # =====================================================================
+        small_talk_response = detect_small_talk(request.query)
+        if small_talk_response:
+            logger.info("Small talk detected, returning quick response", query=request.query[:50])
+            return await quick_reply(conn, user_id, small_talk_response)
+
+        # Call LLM with automatic provider failover
+        # Tries: Groq (4 keys) → Cerebras → Cloudflare → OpenRouter → others
+        provider_manager = get_provider_manager()
+        
+        try:
+            messages = await build_query_messages(request, provider_manager)
             
             # Use multi-provider manager with automatic failover
             # Priority: Cerebras (14.4K RPD) → Groq → Cloudflare → others
@@ -625,65 +707,128 @@ Otherwise: ANSWER using your tools. Be resourceful, not helpless.
                 detail="AI service temporarily unavailable. Please try again."
             )
         
-        # Calculate cost
-        cost = calculate_cost(tokens_used)
-        
-        # Verify citations (async, don't block response)
-        verifier = get_verifier()
-        citation_results = await verifier.verify_response(response_text)
-        
-        # Log citation quality
-        logger.info(
-            "Citation quality",
-            has_citations=citation_results['has_citations'],
-            total_citations=citation_results['total_citations'],
-            verified_urls=citation_results['url_verification']['verified'],
-            broken_urls=citation_results['url_verification']['broken'],
-            quality_score=citation_results['quality_score']
-        )
-        
-        # Record query for analytics (including provider used)
-        query_id = await record_query(
-            conn, user_id, request.query, response_text,
-            tokens_used, cost, f"{provider_used}/{model_used}"
-        )
-        
-        # Record accuracy metrics (async, fire-and-forget)
-        import uuid
-        response_id = str(uuid.uuid4())
-        asyncio.create_task(
-            record_accuracy_metrics(query_id, response_id, citation_results)
-        )
-        
-        # Get updated token count
-        user = await conn.fetchrow(
-            "SELECT tokens_used_today FROM users WHERE user_id = $1",
-            user_id
-        )
-        tokens_remaining = DAILY_TOKEN_LIMIT - user['tokens_used_today']
-        
-        logger.info(
-            "Query processed",
-            user_id=user_id,
-            tokens_used=tokens_used,
-            tokens_remaining=tokens_remaining,
-            cost=cost
-        )
-        
-        return QueryResponse(
-            response=response_text,
-            tokens_used=tokens_used,
-            tokens_remaining=max(0, tokens_remaining),
-            cost=cost,
-            model=model_used,
-            provider=provider_used,  # Show which provider was used
-            timestamp=datetime.now(timezone.utc).isoformat(),
-            citation_quality=citation_results  # Include citation verification
+        return await finalize_query(
+            conn, user_id, request, response_text, tokens_used, model_used, provider_used
         )
         
     finally:
         await conn.close()
 
+@router.post("/stream")
+async def process_query_stream(
+    request: QueryRequest,
+    current_user: dict = Depends(get_current_user_from_token)
+):
+    """
+    Process a user query, streaming the answer as it is generated
+    - Same auth, limits and accounting as POST /query/
+    - Body is NDJSON: {"type": "start", provider, model}, {"type": "token", content}...,
+      then {"type": "done", ...QueryResponse fields except response}
+      or {"type": "error", detail} if the provider fails mid-answer
+    - Tokens already sent are billed even if the provider fails or the client disconnects
+    - Providers fail over until one produces its first token; if none does, responds 503
+    """
+    user_id = current_user['user_id']
+    
+    conn = await get_db()
+    try:
+        await enforce_token_limit(conn, user_id, request)
+
+        small_talk_response = detect_small_talk(request.query)
+        if small_talk_response:
+            logger.info("Small talk detected, returning quick response", query=request.query[:50])
+            result = await quick_reply(conn, user_id, small_talk_response)
+            await conn.close()
+            events = [
+                {"type": "start", "provider": result.provider, "model": result.model},
+                {"type": "token", "content": result.response},
+                {"type": "done", **result.model_dump(exclude={"response"})},
+            ]
+            return StreamingResponse(
+                iter([ndjson_event(event) for event in events]),
+                media_type=NDJSON_MEDIA_TYPE
+            )
+
+        provider_manager = get_provider_manager()
+        
+        try:
+            messages = await build_query_messages(request, provider_manager)
+            stream = provider_manager.stream_with_fallback(
+                messages=messages,
+                model=request.model,
+                temperature=request.temperature,
+                max_tokens=request.max_tokens
+            )
+            # Failover happens while waiting for the first token
+            first_event = await stream.__anext__()
+        except Exception as e:
+            logger.error("All LLM providers failed", error=str(e), user_id=user_id)
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="AI service temporarily unavailable. Please try again."
+            )
+    except BaseException:
+        await conn.close()
+        raise
+    
+    async def bill_unfinished_stream(sent: List[str]) -> None:
+        """Record usage for the tokens a stream sent before it stopped short"""
+        try:
+            content = ''.join(sent)
+            # Same 4-chars-per-token estimate the provider manager uses without usage
+            prompt_chars = sum(len(m.get('content') or '') for m in messages)
+            tokens_used = (prompt_chars + len(content)) // 4
+            await record_query(
+                conn, user_id, request.query, content, tokens_used,
+                calculate_cost(tokens_used), f"{first_event['provider']}/{first_event['model']}"
+            )
+            logger.info("Billed unfinished stream", user_id=user_id, tokens_used=tokens_used)
+        except Exception as e:
+            logger.error("Failed to bill unfinished stream", error=str(e), user_id=user_id)
+        finally:
+            await conn.close()
+    
+    async def events():
+        sent: List[str] = []
+        billed = False
+        try:
+            yield ndjson_event(first_event)
+            async for event in stream:
+                if event['type'] == 'token':
+                    sent.append(event['content'])
+                if event['type'] != 'done':
+                    yield ndjson_event(event)
+                    continue
+                # finalize_query records usage before verifying citations
+                billed = True
+                result = await finalize_query(
+                    conn, user_id, request, event['content'],
+                    event['tokens'], event['model'], event['provider']
+                )
+                yield ndjson_event({"type": "done", **result.model_dump(exclude={"response"})})
+        except Exception as e:
+            logger.error("Streaming query failed", error=str(e), user_id=user_id)
+            yield ndjson_event({
+                "type": "error",
+                "detail": "AI service interrupted the response. Please try again."
+            })
+        finally:
+            # Also runs when the client disconnects (GeneratorExit/CancelledError)
+            try:
+                await stream.aclose()
+            finally:
+                if billed:
+                    await conn.close()
+                else:
+                    # Shielded so a cancelled response still records what was sent
+                    await asyncio.shield(bill_unfinished_stream(sent))
+    
+    return StreamingResponse(
+        events(),
+        media_type=NDJSON_MEDIA_TYPE,
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @router.get("/limits")
 async def get_user_limits(current_user: dict = Depends(get_current_user_from_token)):
     """Get current user's token usage and limits"""
@@ -6,7 +6,7 @@ import structlog
 import uuid
 import asyncio
 from fastapi import APIRouter, Depends, HTTPException, Query
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from typing import Any, Dict, List, Optional
 
 from src.config.settings import Settings, get_settings
@@ -17,6 +17,7 @@ from src.services.performance_integration import performance_integration
 from src.utils.async_utils import resolve_awaitable
 from src.engine.research_engine import sophisticated_engine
 from src.utils.api_fallback import api_fallback
+from src.utils.streaming import NDJSON_MEDIA_TYPE, ndjson_event
 
 logger = structlog.get_logger(__name__)
 router = APIRouter()
@@ -283,10 +284,6 @@ async def search_papers(
                     sources=request.sources,
                     filters=request.filters
                 )
-                try:
-                    await searcher.close()
-                except Exception:
-                    pass
 
             if not papers:
                 searcher = PaperSearcher()
@@ -296,10 +293,6 @@ async def search_papers(
                     sources=request.sources,
                     filters=request.filters
                 )
-                try:
-                    await searcher.close()
-                except Exception:
-                    pass
         else:
             logger.info("Using basic search engine", trace_id=trace_id)
             # Use basic search
@@ -309,10 +302,6 @@ async def search_papers(
                 limit=request.limit,
                 sources=request.sources
             )
-            try:
-                await searcher.close()
-            except Exception:
-                pass
         
         # Extract papers from the response
         if isinstance(papers, dict) and "papers" in papers:
@@ -424,6 +413,45 @@ async def search_papers(
         )
 
 
+@router.post("/search/stream")
+async def stream_search_papers(request: SearchRequest):
+    """
+    Search academic papers, streaming each provider's results as they arrive
+    - Body is NDJSON: {"type": "papers", source, papers} per provider that answers
+      within the search deadline, then {"type": "done", count, sources_used, sources_pending}
+    - Papers are normalized like POST /search; duplicates across providers are sent once
+    """
+    trace_id = str(uuid.uuid4())
+    logger.info(
+        "Streaming search request received",
+        query=request.query,
+        limit=request.limit,
+        sources=request.sources,
+        trace_id=trace_id
+    )
+    searcher = PaperSearcher()
+
+    async def events():
+        try:
+            async for event in searcher.stream_papers(
+                query=request.query,
+                limit=request.limit,
+                sources=request.sources,
+                filters=request.filters
+            ):
+                if event["type"] == "papers":
+                    event["papers"] = [
+                        payload for payload in (_prepare_paper_payload(paper, trace_id) for paper in event["papers"])
+                        if payload
+                    ]
+                yield ndjson_event({**event, "trace_id": trace_id})
+        except Exception as e:
+            logger.error("Streaming search failed", error=str(e), query=request.query, trace_id=trace_id)
+            yield ndjson_event({"type": "error", "detail": "Failed to search papers", "trace_id": trace_id})
+
+    return StreamingResponse(events(), media_type=NDJSON_MEDIA_TYPE)
+
+
 @router.get("/search/insights/{query_id}")
 async def get_search_insights(
     query_id: str,
@@ -1,18 +1,86 @@
 """
 Multi-provider LLM service with automatic failover
 Supports: Groq (4 keys), Cerebras, Cloudflare, OpenRouter, Together, Fireworks
+
+Each provider keeps a long-lived HTTP/2 connection pool (HTTP/1.1 keep-alive
+when the h2 package is missing), closed from the app lifespan. Providers and
+keys are tried in order of recent health (latency and error rate); with
+hedging enabled, a slow call is raced against a second provider once it
+passes the first provider's p95 latency.
 """
 
 import os
+import json
+import time
 import asyncio
-from typing import List, Dict, Optional, Any
-from dataclasses import dataclass
+from collections import deque
+from typing import AsyncIterator, Deque, Iterator, List, Dict, Optional, Any, Tuple
+from dataclasses import dataclass, field
 import structlog
 from groq import Groq
 import httpx
 
 logger = structlog.get_logger(__name__)
 
+# Cerebras first - highest rate limit
+PROVIDER_PRIORITY = ['cerebras', 'groq', 'cloudflare', 'openrouter', 'together', 'fireworks']
+OPENAI_COMPATIBLE_PROVIDERS = ['groq', 'cerebras', 'openrouter', 'together', 'fireworks']
+
+# MODEL MAPPING: Translate model names between providers
+# Cerebras uses 'llama-3.3-70b', Groq uses 'llama-3.3-70b-versatile'
+MODEL_MAP = {
+    'groq': {
+        'llama-3.3-70b': 'llama-3.3-70b-versatile',
+        'llama3.1-8b': 'llama-3.1-8b-instant'
+    },
+    'cerebras': {
+        'llama-3.3-70b-versatile': 'llama-3.3-70b',
+        'llama-3.1-8b-instant': 'llama3.1-8b',
+        'openai/gpt-oss-120b': 'gpt-oss-120b'  # Strip openai/ prefix for Cerebras
+    }
+}
+
+# Connection pooling (per provider, shared across requests)
+POOL_LIMITS = httpx.Limits(max_connections=50, max_keepalive_connections=20, keepalive_expiry=120.0)
+REQUEST_TIMEOUT = httpx.Timeout(60.0, connect=10.0)
+
+# Health tracking
+HEALTH_WINDOW = 100  # Recent latency samples kept per provider (for p95)
+HEALTH_DECAY = 0.2  # Weight of the newest outcome in the moving averages
+DEFAULT_LATENCY_SECONDS = 2.0  # Assumed latency for providers with no samples yet
+
+# Hedging: race a second provider once a call exceeds the first one's p95
+HEDGE_MIN_SAMPLES = 20
+
+@dataclass
+class ProviderHealth:
+    """Recent latency and error rate of a provider (or of one key)"""
+    latency_ewma: Optional[float] = None
+    error_rate: float = 0.0
+    latencies: Deque[float] = field(default_factory=lambda: deque(maxlen=HEALTH_WINDOW))
+
+    def record(self, latency: Optional[float], ok: bool) -> None:
+        """Record one call; latency is None when only the outcome is known"""
+        self.error_rate += HEALTH_DECAY * ((0.0 if ok else 1.0) - self.error_rate)
+        if ok and latency is not None:
+            self.latencies.append(latency)
+            if self.latency_ewma is None:
+                self.latency_ewma = latency
+            else:
+                self.latency_ewma += HEALTH_DECAY * (latency - self.latency_ewma)
+
+    def p95(self) -> Optional[float]:
+        """95th percentile of recent successful latencies (None until enough samples)"""
+        if len(self.latencies) < HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))]
+
+    def expected_cost(self) -> float:
+        """Expected seconds to a successful answer (latency inflated by failure odds)"""
+        latency = self.latency_ewma if self.latency_ewma is not None else DEFAULT_LATENCY_SECONDS
+        return latency / max(1.0 - self.error_rate, 0.05)
+
 @dataclass
 class ProviderConfig:
     name: str
@@ -25,9 +93,15 @@ class ProviderConfig:
 class LLMProviderManager:
     """Manages multiple LLM providers with automatic failover"""
     
-    def __init__(self):
+    def __init__(self, hedge_requests: Optional[bool] = None):
         self.providers = self._load_providers()
         self.usage_tracking = {}  # Track usage per key
+        self.health: Dict[str, ProviderHealth] = {}
+        self.key_health: Dict[Tuple[str, str], ProviderHealth] = {}
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        if hedge_requests is None:
+            hedge_requests = os.getenv('LLM_HEDGE_REQUESTS', '').lower() in ('1', 'true', 'yes')
+        self.hedge_requests = hedge_requests
         
     def _load_providers(self) -> Dict[str, ProviderConfig]:
         """Load all configured providers from environment"""
@@ -134,6 +208,58 @@ class LLMProviderManager:
         provider.current_key_index = (provider.current_key_index + 1) % len(provider.keys)
         
         return key
+
+    def _resolve_model(self, provider_name: str, model: Optional[str]) -> str:
+        """Requested model (or the provider default) translated to the provider's naming"""
+        requested_model = model or self.providers[provider_name].models[0]
+        return MODEL_MAP.get(provider_name, {}).get(requested_model, requested_model)
+
+    def _provider_health(self, provider_name: str) -> ProviderHealth:
+        return self.health.setdefault(provider_name, ProviderHealth())
+
+    def _record_outcome(self, provider_name: str, api_key: str, latency: Optional[float], ok: bool) -> None:
+        self._provider_health(provider_name).record(latency, ok)
+        self.key_health.setdefault((provider_name, api_key), ProviderHealth()).record(latency, ok)
+
+    def _key_attempts(self) -> Iterator[Tuple[str, str]]:
+        """
+        (provider, key) pairs in failover order, every key of each configured provider
+        Providers are ordered by expected time to a good answer (ties keep
+        PROVIDER_PRIORITY order); keys rotate round-robin, failing keys last.
+        """
+        configured = [name for name in PROVIDER_PRIORITY if name in self.providers]
+        configured.sort(key=lambda name: self._provider_health(name).expected_cost())
+        for provider_name in configured:
+            provider = self.providers[provider_name]
+            if not provider.keys:
+                continue
+            # Start at the round-robin position and advance it once per request
+            start = provider.current_key_index
+            keys = provider.keys[start:] + provider.keys[:start]
+            provider.current_key_index = (start + 1) % len(provider.keys)
+            keys.sort(key=lambda k: self.key_health[(provider_name, k)].error_rate
+                      if (provider_name, k) in self.key_health else 0.0)
+            for key in keys:
+                if key:
+                    yield provider_name, key
+
+    def _client(self, provider_name: str) -> httpx.AsyncClient:
+        """Long-lived pooled client for a provider"""
+        client = self._clients.get(provider_name)
+        if client is None or client.is_closed:
+            try:
+                client = httpx.AsyncClient(http2=True, limits=POOL_LIMITS, timeout=REQUEST_TIMEOUT)
+            except ImportError:
+                # h2 not installed: HTTP/1.1 keep-alive still skips per-call TCP/TLS setup
+                client = httpx.AsyncClient(limits=POOL_LIMITS, timeout=REQUEST_TIMEOUT)
+            self._clients[provider_name] = client
+        return client
+
+    async def aclose(self) -> None:
+        """Close every pooled provider connection"""
+        clients, self._clients = list(self._clients.values()), {}
+        for client in clients:
+            await client.aclose()
     
     async def call_provider(
         self, 
@@ -150,30 +276,10 @@ class LLMProviderManager:
         if not provider:
             raise ValueError(f"Unknown provider: {provider_name}")
         
-        # MODEL MAPPING: Translate model names between providers
-        # Cerebras uses 'llama-3.3-70b', Groq uses 'llama-3.3-70b-versatile'
-        model_map = {
-            'groq': {
-                'llama-3.3-70b': 'llama-3.3-70b-versatile',
-                'llama3.1-8b': 'llama-3.1-8b-instant'
-            },
-            'cerebras': {
-                'llama-3.3-70b-versatile': 'llama-3.3-70b',
-                'llama-3.1-8b-instant': 'llama3.1-8b',
-                'openai/gpt-oss-120b': 'gpt-oss-120b'  # Strip openai/ prefix for Cerebras
-            }
-        }
-
-        requested_model = model or provider.models[0]
-
-        # Map model if needed
-        if provider_name in model_map and requested_model in model_map[provider_name]:
-            model_to_use = model_map[provider_name][requested_model]
-        else:
-            model_to_use = requested_model
+        model_to_use = self._resolve_model(provider_name, model)
         
         try:
-            if provider_name in ['groq', 'cerebras', 'openrouter', 'together', 'fireworks']:
+            if provider_name in OPENAI_COMPATIBLE_PROVIDERS:
                 # OpenAI-compatible providers
                 return await self._call_openai_compatible(
                     endpoint=provider.endpoint,
@@ -212,35 +318,33 @@ class LLMProviderManager:
     ) -> Dict[str, Any]:
         """Call OpenAI-compatible API"""
         
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                endpoint,
-                headers={
-                    "Authorization": f"Bearer {api_key}",
-                    "Content-Type": "application/json"
-                },
-                json={
-                    "model": model,
-                    "messages": messages,
-                    "temperature": temperature,
-                    "max_tokens": max_tokens
-                },
-                timeout=60.0
-            )
-            
-            if response.status_code == 429:
-                raise Exception("Rate limit exceeded")
-            elif response.status_code != 200:
-                raise Exception(f"HTTP {response.status_code}: {response.text}")
-            
-            data = response.json()
-            
-            return {
-                'content': data['choices'][0]['message']['content'],
-                'tokens': data.get('usage', {}).get('total_tokens', 0),
-                'model': model,
-                'provider': provider_name
+        response = await self._client(provider_name).post(
+            endpoint,
+            headers={
+                "Authorization": f"Bearer {api_key}",
+                "Content-Type": "application/json"
+            },
+            json={
+                "model": model,
+                "messages": messages,
+                "temperature": temperature,
+                "max_tokens": max_tokens
             }
+        )
+        
+        if response.status_code == 429:
+            raise Exception("Rate limit exceeded")
+        elif response.status_code != 200:
+            raise Exception(f"HTTP {response.status_code}: {response.text}")
+        
+        data = response.json()
+        
+        return {
+            'content': data['choices'][0]['message']['content'],
+            'tokens': data.get('usage', {}).get('total_tokens', 0),
+            'model': model,
+            'provider': provider_name
+        }
     
     async def _call_cloudflare(
         self,
@@ -254,31 +358,29 @@ class LLMProviderManager:
         account_id = os.getenv('CLOUDFLARE_ACCOUNT_ID')
         endpoint = f'https://api.cloudflare.com/client/v4/accounts/{account_id}/ai/run/{model}'
         
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                endpoint,
-                headers={
-                    "Authorization": f"Bearer {api_key}",
-                    "Content-Type": "application/json"
-                },
-                json={
-                    "messages": messages,
-                    "max_tokens": max_tokens
-                },
-                timeout=60.0
-            )
-            
-            if response.status_code != 200:
-                raise Exception(f"HTTP {response.status_code}: {response.text}")
-            
-            data = response.json()
-            
-            return {
-                'content': data['result']['response'],
-                'tokens': data['result'].get('tokens_used', 0),
-                'model': model,
-                'provider': 'cloudflare'
+        response = await self._client('cloudflare').post(
+            endpoint,
+            headers={
+                "Authorization": f"Bearer {api_key}",
+                "Content-Type": "application/json"
+            },
+            json={
+                "messages": messages,
+                "max_tokens": max_tokens
             }
+        )
+        
+        if response.status_code != 200:
+            raise Exception(f"HTTP {response.status_code}: {response.text}")
+        
+        data = response.json()
+        
+        return {
+            'content': data['result']['response'],
+            'tokens': data['result'].get('tokens_used', 0),
+            'model': model,
+            'provider': 'cloudflare'
+        }
     
     async def query_with_fallback(
         self,
@@ -290,8 +392,11 @@ class LLMProviderManager:
         max_tokens: int = 4000
     ) -> Dict[str, Any]:
         """
-        Try providers in priority order until one succeeds
-        Priority: cerebras (14.4K RPD) → groq (1K RPD) → cloudflare → openrouter → together → fireworks
+        Try providers until one succeeds
+        Order follows recent health; with no history it is the static priority:
+        cerebras (14.4K RPD) → groq (1K RPD) → cloudflare → openrouter → together → fireworks
+        With hedging on, a call running past its provider's p95 is raced
+        against the next healthy provider and the first answer wins.
         """
         
         # Use pre-built messages if provided, otherwise build from query
@@ -302,47 +407,266 @@ class LLMProviderManager:
         else:
             messages = [{"role": "user", "content": query}]
         
-        # Try providers in order (Cerebras first - highest rate limit)
-        provider_priority = ['cerebras', 'groq', 'cloudflare', 'openrouter', 'together', 'fireworks']
+        attempts = list(self._key_attempts())
+        pending: Dict[asyncio.Task, str] = {}
+        hedged = False
         
-        for provider_name in provider_priority:
-            if provider_name not in self.providers:
-                continue  # Skip if not configured
-            
-            provider = self.providers[provider_name]
-            
-            # Try each key for this provider
-            for _ in range(len(provider.keys)):
-                key = self.get_next_key(provider_name)
-                if not key:
-                    continue
+        def launch(index: int) -> None:
+            provider_name, key = attempts.pop(index)
+            logger.info(f"Trying {provider_name}", key_preview=key[:10], hedge=bool(pending))
+            task = asyncio.ensure_future(self._timed_call(
+                provider_name, key, messages, model, temperature, max_tokens
+            ))
+            pending[task] = provider_name
+        
+        try:
+            while pending or attempts:
+                if not pending:
+                    launch(0)
                 
-                try:
-                    logger.info(f"Trying {provider_name}", key_preview=key[:10])
-                    
-                    result = await self.call_provider(
-                        provider_name=provider_name,
-                        api_key=key,
-                        messages=messages,
-                        model=model,
-                        temperature=temperature,
-                        max_tokens=max_tokens
+                hedge_delay = None
+                hedge_index = None
+                if self.hedge_requests and not hedged and len(pending) == 1:
+                    running = next(iter(pending.values()))
+                    hedge_index = next(
+                        (i for i, (name, _) in enumerate(attempts) if name != running), None
                     )
+                    if hedge_index is not None:
+                        hedge_delay = self._provider_health(running).p95()
+                
+                done, _ = await asyncio.wait(
+                    pending, timeout=hedge_delay, return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    # Primary is slower than its p95: race a second provider
+                    hedged = True
+                    launch(hedge_index)
+                    continue
+                
+                for task in done:
+                    provider_name = pending.pop(task)
+                    try:
+                        result = task.result()
+                    except Exception as e:
+                        logger.warning(
+                            f"{provider_name} failed, trying next",
+                            error=str(e)[:100]
+                        )
+                        continue
                     
                     logger.info(
                         f"Success with {provider_name}",
                         tokens=result['tokens'],
                         model=result['model']
                     )
-                    
                     return result
-                    
-                except Exception as e:
-                    logger.warning(
-                        f"{provider_name} failed, trying next",
-                        error=str(e)[:100]
-                    )
+        finally:
+            for task in pending:
+                task.cancel()
+        
+        # All providers failed
+        raise Exception("All LLM providers are unavailable")
+
+    async def _timed_call(
+        self,
+        provider_name: str,
+        api_key: str,
+        messages: List[Dict[str, str]],
+        model: Optional[str],
+        temperature: float,
+        max_tokens: int
+    ) -> Dict[str, Any]:
+        """call_provider, recording latency and outcome in the health stats"""
+        start = time.monotonic()
+        try:
+            result = await self.call_provider(
+                provider_name=provider_name,
+                api_key=api_key,
+                messages=messages,
+                model=model,
+                temperature=temperature,
+                max_tokens=max_tokens
+            )
+        except asyncio.CancelledError:
+            raise  # Lost a hedge race; says nothing about provider health
+        except Exception:
+            self._record_outcome(provider_name, api_key, None, ok=False)
+            raise
+        self._record_outcome(provider_name, api_key, time.monotonic() - start, ok=True)
+        return result
+
+    async def stream_provider(
+        self,
+        provider_name: str,
+        api_key: str,
+        messages: List[Dict[str, str]],
+        model: Optional[str] = None,
+        temperature: float = 0.7,
+        max_tokens: int = 4000
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Stream a completion from a specific provider
+        Yields {'type': 'token', 'content': ...} deltas, then {'type': 'usage', 'tokens': ...}
+        """
+        provider = self.providers.get(provider_name)
+        if not provider:
+            raise ValueError(f"Unknown provider: {provider_name}")
+        
+        model_to_use = self._resolve_model(provider_name, model)
+        
+        if provider_name in OPENAI_COMPATIBLE_PROVIDERS:
+            async for event in self._stream_openai_compatible(
+                endpoint=provider.endpoint,
+                api_key=api_key,
+                model=model_to_use,
+                messages=messages,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                provider_name=provider_name
+            ):
+                yield event
+        
+        elif provider_name == 'cloudflare':
+            # Workers AI responses arrive whole; surface them as a single delta
+            result = await self._call_cloudflare(
+                api_key=api_key,
+                model=model_to_use,
+                messages=messages,
+                max_tokens=max_tokens
+            )
+            yield {'type': 'token', 'content': result['content']}
+            yield {'type': 'usage', 'tokens': result['tokens']}
+        
+        else:
+            raise ValueError(f"Unsupported provider: {provider_name}")
+    
+    async def _stream_openai_compatible(
+        self,
+        endpoint: str,
+        api_key: str,
+        model: str,
+        messages: List[Dict[str, str]],
+        temperature: float,
+        max_tokens: int,
+        provider_name: str
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Stream an OpenAI-compatible chat completion (server-sent events)"""
+        
+        tokens = 0
+        async with self._client(provider_name).stream(
+            "POST",
+            endpoint,
+            headers={
+                "Authorization": f"Bearer {api_key}",
+                "Content-Type": "application/json"
+            },
+            json={
+                "model": model,
+                "messages": messages,
+                "temperature": temperature,
+                "max_tokens": max_tokens,
+                "stream": True
+            }
+        ) as response:
+            if response.status_code == 429:
+                raise Exception("Rate limit exceeded")
+            elif response.status_code != 200:
+                body = await response.aread()
+                raise Exception(f"HTTP {response.status_code}: {body.decode(errors='replace')}")
+            
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
                     continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    break
+                chunk = json.loads(data)
+                # Usage arrives on the final chunk (Groq nests it under x_groq)
+                usage = chunk.get('usage') or (chunk.get('x_groq') or {}).get('usage')
+                if usage:
+                    tokens = usage.get('total_tokens', tokens)
+                for choice in chunk.get('choices') or []:
+                    content = (choice.get('delta') or {}).get('content')
+                    if content:
+                        yield {'type': 'token', 'content': content}
+    
+        yield {'type': 'usage', 'tokens': tokens}
+    
+    async def stream_with_fallback(
+        self,
+        messages: List[Dict[str, str]],
+        model: Optional[str] = None,
+        temperature: float = 0.2,
+        max_tokens: int = 4000
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Stream from the first provider that starts producing output
+        
+        Failover happens only before the first event: once a provider has
+        streamed anything, switching would repeat or contradict it, so later
+        errors propagate to the caller.
+        
+        Yields {'type': 'start', 'provider', 'model'}, then token events,
+        then {'type': 'done', 'content', 'tokens', 'provider', 'model'}.
+        """
+        for provider_name, key in self._key_attempts():
+            stream = self.stream_provider(
+                provider_name=provider_name,
+                api_key=key,
+                messages=messages,
+                model=model,
+                temperature=temperature,
+                max_tokens=max_tokens
+            )
+            try:
+                logger.info(f"Streaming from {provider_name}", key_preview=key[:10])
+                first_event = await stream.__anext__()
+            except Exception as e:
+                await stream.aclose()
+                self._record_outcome(provider_name, key, None, ok=False)
+                logger.warning(
+                    f"{provider_name} stream failed, trying next",
+                    error=str(e)[:100]
+                )
+                continue
+            
+            # Time-to-first-token is not comparable with full-call latency; record the outcome only
+            self._record_outcome(provider_name, key, None, ok=True)
+            model_used = self._resolve_model(provider_name, model)
+            yield {'type': 'start', 'provider': provider_name, 'model': model_used}
+            
+            parts: List[str] = []
+            tokens = 0
+            try:
+                event = first_event
+                while True:
+                    if event['type'] == 'token':
+                        parts.append(event['content'])
+                        yield event
+                    elif event['type'] == 'usage':
+                        tokens = event['tokens']
+                    try:
+                        event = await stream.__anext__()
+                    except StopAsyncIteration:
+                        break
+            finally:
+                await stream.aclose()
+            
+            content = ''.join(parts)
+            if not tokens:
+                # Provider did not report usage; same 4-chars-per-token heuristic as the route
+                prompt_chars = sum(len(m.get('content') or '') for m in messages)
+                tokens = (prompt_chars + len(content)) // 4
+            
+            logger.info(f"Streamed with {provider_name}", tokens=tokens, model=model_used)
+            yield {
+                'type': 'done',
+                'content': content,
+                'tokens': tokens,
+                'provider': provider_name,
+                'model': model_used
+            }
+            return
         
         # All providers failed
         raise Exception("All LLM providers are unavailable")
@@ -357,3 +681,8 @@ def get_provider_manager() -> LLMProviderManager:
         _provider_manager = LLMProviderManager()
     return _provider_manager
 
+async def close_provider_manager() -> None:
+    """Close the singleton's pooled connections (app shutdown)"""
+    if _provider_manager is not None:
+        await _provider_manager.aclose()
+
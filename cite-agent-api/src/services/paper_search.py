@@ -6,11 +6,13 @@ Production-ready implementation with caching and error handling
 import asyncio
 import aiohttp
 import structlog
-from typing import List, Dict, Any, Optional, Tuple, Callable, Awaitable
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Tuple, Callable, Awaitable, AsyncIterator, Set
 from datetime import datetime, timedelta
 import json
 import os
 import re
+import time
 from pathlib import Path
 
 from src.config.settings import get_settings
@@ -20,6 +22,57 @@ from src.models.request import SearchFilters
 
 logger = structlog.get_logger(__name__)
 
+# Provider answers are reused across searches for this long (seconds)
+PROVIDER_CACHE_TTL = 900
+PROVIDER_CACHE_SIZE = 512
+
+ProviderKey = Tuple[str, str, int]  # (source, query, limit)
+
+# Shared by every PaperSearcher: one pooled session, recent provider answers
+# and provider calls still running (including ones a search stopped waiting for)
+_session: Optional[aiohttp.ClientSession] = None
+_session_loop: Optional[asyncio.AbstractEventLoop] = None
+_provider_results: "OrderedDict[ProviderKey, Tuple[float, List[Dict[str, Any]]]]" = OrderedDict()
+_provider_tasks: Dict[ProviderKey, asyncio.Task] = {}
+
+
+def _cached_provider_results(key: ProviderKey) -> Optional[List[Dict[str, Any]]]:
+    entry = _provider_results.get(key)
+    if entry is None:
+        return None
+    expires_at, results = entry
+    if time.monotonic() > expires_at:
+        del _provider_results[key]
+        return None
+    _provider_results.move_to_end(key)
+    return results
+
+
+def _remember_provider_results(key: ProviderKey, task: asyncio.Task) -> None:
+    """Done callback for provider calls: cache non-empty answers"""
+    if _provider_tasks.get(key) is task:
+        del _provider_tasks[key]
+    if task.cancelled() or task.exception() is not None:
+        return
+    _, results = task.result()
+    if not results:
+        return
+    _provider_results[key] = (time.monotonic() + PROVIDER_CACHE_TTL, results)
+    _provider_results.move_to_end(key)
+    while len(_provider_results) > PROVIDER_CACHE_SIZE:
+        _provider_results.popitem(last=False)
+
+
+async def close_paper_search_session() -> None:
+    """Close the pooled provider session (app shutdown)"""
+    global _session
+    for task in list(_provider_tasks.values()):
+        task.cancel()
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
+
+
 class PaperSearcher:
     """Production-ready paper search with real API integration"""
     
@@ -35,6 +88,8 @@ class PaperSearcher:
             Path(__file__).resolve().parents[1] / "data" / "offline_papers.json"
         )
         self._offline_cache: Optional[List[Dict[str, Any]]] = None
+        # Latency budget for one multi-provider search (seconds)
+        self.search_deadline = getattr(self.settings, "search_deadline_seconds", 3.0)
         self.semantic_scholar_api_key = (
             getattr(self.settings, "semantic_scholar_api_key", None)
             or os.getenv("SEMANTIC_SCHOLAR_API_KEY")
@@ -55,16 +110,22 @@ class PaperSearcher:
         }
         
     async def _get_session(self):
-        """Get aiohttp session with proper headers"""
-        if self.session is None:
-            self.session = aiohttp.ClientSession(
+        """Get the pooled aiohttp session shared by all searches"""
+        global _session, _session_loop
+        loop = asyncio.get_running_loop()
+        # A session is bound to its event loop (pytest-asyncio runs one per test)
+        if _session is None or _session.closed or _session_loop is not loop:
+            _session = aiohttp.ClientSession(
                 headers={
                     "User-Agent": "Nocturnal-Archive/1.0 (contact@nocturnal.dev)",
                     "Accept": "application/json"
                 },
-                timeout=aiohttp.ClientTimeout(total=30)
+                timeout=aiohttp.ClientTimeout(total=30),
+                connector=aiohttp.TCPConnector(limit=30, ttl_dns_cache=300)
             )
-        return self.session
+            _session_loop = loop
+        self.session = _session
+        return _session
     
     def _check_rate_limit(self, source: str) -> bool:
         """Check if we can make a request to the source"""
@@ -324,9 +385,113 @@ class PaperSearcher:
         query: str,
         limit: int = 10,
         sources: Optional[List[str]] = None,
-        filters: Optional[SearchFilters] = None
+        filters: Optional[SearchFilters] = None,
+        deadline: Optional[float] = None
     ) -> Dict[str, Any]:
-        """Main search method with real API integration."""
+        """
+        Main search method with real API integration.
+
+        Returns what the providers answered within ``deadline`` seconds
+        (search_deadline_seconds by default); the rest are listed in
+        ``sources_pending`` and cached for the next search when they finish.
+        """
+        budget = self.search_deadline if deadline is None else deadline
+        all_results: List[Dict[str, Any]] = []
+        attempted_sources: List[str] = []
+        pending_sources: List[str] = []
+
+        async for source, provider_results in self._iter_provider_results(query, limit, sources, budget):
+            attempted_sources.append(source)
+            if provider_results is None:
+                pending_sources.append(source)
+            elif provider_results:
+                all_results.extend(provider_results)
+
+        if pending_sources:
+            logger.info("Paper search deadline reached", query=query, deadline=budget, pending=pending_sources)
+
+        if not all_results:
+            attempted_sources.append("offline")
+            all_results.extend(self._search_offline_corpus(query, limit))
+
+        filtered_results = self._apply_filters(all_results, filters)
+
+        unique_results = self._deduplicate_results(filtered_results)
+        sorted_results = sorted(unique_results, key=lambda x: x.get("citations_count", 0), reverse=True)
+
+        return {
+            "papers": sorted_results[:limit],
+            "count": len(sorted_results),
+            "query": query,
+            "sources_used": list(dict.fromkeys(attempted_sources)) or sources,
+            "sources_pending": pending_sources,
+            "timestamp": datetime.now().isoformat()
+        }
+
+    async def stream_papers(
+        self,
+        query: str,
+        limit: int = 10,
+        sources: Optional[List[str]] = None,
+        filters: Optional[SearchFilters] = None,
+        deadline: Optional[float] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Same search as search_papers, yielding each provider's papers as they arrive
+
+        Events: {"type": "papers", "source", "papers"} per provider (papers not
+        already sent, best cited first), then {"type": "done", "count",
+        "sources_used", "sources_pending"}.
+        """
+        budget = self.search_deadline if deadline is None else deadline
+        seen: Set[str] = set()
+        attempted_sources: List[str] = []
+        pending_sources: List[str] = []
+        answered = False
+
+        async for source, provider_results in self._iter_provider_results(query, limit, sources, budget):
+            attempted_sources.append(source)
+            if provider_results is None:
+                pending_sources.append(source)
+                continue
+            answered = answered or bool(provider_results)
+            papers = self._deduplicate_results(self._apply_filters(provider_results, filters), seen)
+            if papers:
+                papers.sort(key=lambda x: x.get("citations_count", 0), reverse=True)
+                yield {"type": "papers", "source": source, "papers": papers[:limit]}
+
+        # Like search_papers: fall back only when no provider found anything,
+        # not when the filters removed everything they found
+        if not answered:
+            attempted_sources.append("offline")
+            papers = self._deduplicate_results(
+                self._apply_filters(self._search_offline_corpus(query, limit), filters), seen
+            )
+            if papers:
+                yield {"type": "papers", "source": "offline", "papers": papers}
+
+        yield {
+            "type": "done",
+            "count": len(seen),
+            "query": query,
+            "sources_used": list(dict.fromkeys(attempted_sources)),
+            "sources_pending": pending_sources,
+        }
+
+    async def _iter_provider_results(
+        self,
+        query: str,
+        limit: int,
+        sources: Optional[List[str]],
+        deadline: float
+    ) -> AsyncIterator[Tuple[str, Optional[List[Dict[str, Any]]]]]:
+        """
+        Yield (source, papers) for each requested source, fastest first
+
+        Cached answers and the offline corpus come straight away. Providers
+        still running at the deadline are yielded with None and left to
+        finish in the background, where their answer fills the cache.
+        """
         if sources is None:
             sources = ["semantic_scholar", "openalex", "pubmed"]
 
@@ -336,20 +501,15 @@ class PaperSearcher:
             "semantic_scholar": self.search_semantic_scholar,
         }
 
-        all_results: List[Dict[str, Any]] = []
-        attempted_sources: List[str] = []
-
-        async_tasks: List[asyncio.Task] = []
-
+        running: Dict[asyncio.Task, str] = {}
         for source in sources:
             if source == "offline":
-                attempted_sources.append(source)
                 try:
                     offline_results = self._search_offline_corpus(query, max(limit, 10))
-                    if offline_results:
-                        all_results.extend(offline_results)
                 except Exception as exc:
                     logger.error("Offline corpus search failed", error=str(exc))
+                    offline_results = []
+                yield source, offline_results
                 continue
 
             provider = providers.get(source)
@@ -357,46 +517,47 @@ class PaperSearcher:
                 logger.warning("Unknown source requested", source=source)
                 continue
 
-            attempted_sources.append(source)
-            async_tasks.append(asyncio.create_task(self._execute_provider(provider, source, query, limit)))
-
-        if async_tasks:
-            provider_payloads = await asyncio.gather(*async_tasks, return_exceptions=True)
-            for payload in provider_payloads:
-                if isinstance(payload, Exception):
-                    # Exception already logged inside _execute_provider
-                    continue
-                source_name, provider_results = payload
-                if provider_results:
-                    all_results.extend(provider_results)
-
-        if not all_results:
-            attempted_sources.append("offline")
-            all_results.extend(self._search_offline_corpus(query, limit))
-
-        filtered_results = self._apply_filters(all_results, filters)
-
-        unique_results = self._deduplicate_results(filtered_results)
-        sorted_results = sorted(unique_results, key=lambda x: x.get("citations_count", 0), reverse=True)
+            cached = _cached_provider_results((source, query, limit))
+            if cached is not None:
+                yield source, cached
+                continue
+            running[self._provider_task(provider, source, query, limit)] = source
+
+        loop = asyncio.get_running_loop()
+        stop_at = loop.time() + deadline
+        pending = set(running)
+        while pending:
+            remaining = stop_at - loop.time()
+            if remaining <= 0:
+                break
+            done, pending = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                # Exceptions are already logged inside _execute_provider
+                yield running[task], [] if task.cancelled() else task.result()[1]
 
-        result = {
-            "papers": sorted_results[:limit],
-            "count": len(sorted_results),
-            "query": query,
-            "sources_used": list(dict.fromkeys(attempted_sources)) or sources,
-            "timestamp": datetime.now().isoformat()
-        }
+        for task in pending:
+            yield running[task], None
 
-        # Ensure session is closed to avoid warnings in short-lived test runs
-        try:
-            await self.close()
-        except Exception:
-            pass
-        return result
+    def _provider_task(
+        self,
+        provider: Callable[[str, int], Awaitable[List[Dict[str, Any]]]],
+        source: str,
+        query: str,
+        limit: int
+    ) -> asyncio.Task:
+        """Provider call for this query, joining one already running"""
+        key = (source, query, limit)
+        task = _provider_tasks.get(key)
+        if task is not None and not task.done() and task.get_loop() is asyncio.get_running_loop():
+            return task
+        task = asyncio.create_task(self._execute_provider(provider, source, query, limit))
+        _provider_tasks[key] = task
+        task.add_done_callback(lambda done: _remember_provider_results(key, done))
+        return task
     
-    def _deduplicate_results(self, results: List[Dict]) -> List[Dict]:
-        """Remove duplicate papers based on DOI or title"""
-        seen = set()
+    def _deduplicate_results(self, results: List[Dict], seen: Optional[Set[str]] = None) -> List[Dict]:
+        """Remove duplicate papers based on DOI or title (and any keys already in seen)"""
+        seen = set() if seen is None else seen
         unique = []
         
         for paper in results:
@@ -546,9 +707,5 @@ class PaperSearcher:
         return top
 
     async def close(self):
-        """Close the session"""
-        if self.session:
-            try:
-                await self.session.close()
-            finally:
-                self.session = None
\ No newline at end of file
+        """Release this searcher; the pooled session stays open for other searches"""
+        self.session = None
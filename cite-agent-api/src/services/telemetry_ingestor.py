@@ -114,7 +114,7 @@ class TelemetryIngestor:
 
         logger.info(
             "telemetry_ingested",
-            event=payload.get("event"),
+            telemetry_event=payload.get("event"),
             token_hash=token_hash[:12],
             path=str(file_path),
         )
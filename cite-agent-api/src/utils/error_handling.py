@@ -4,6 +4,8 @@ from __future__ import annotations
 
 from typing import Any, Dict, Optional
 
+from fastapi.responses import JSONResponse
+
 
 def create_problem_response(detail: str, status: int = 500, code: Optional[str] = None) -> Dict[str, Any]:
     """Return a simple RFC 7807-style problem response payload."""
@@ -17,6 +19,12 @@ def create_problem_response(detail: str, status: int = 500, code: Optional[str]
     return payload
 
 
+def problem_json_response(detail: str, status: int = 500, code: Optional[str] = None) -> JSONResponse:
+    """Problem response served with its own HTTP status (a bare dict would go out as 200)."""
+    problem = create_problem_response(detail, status, code)
+    return JSONResponse(problem, status_code=problem["status"])
+
+
 def get_error_type(status: int) -> str:
     """Map HTTP status codes to a coarse error type string."""
     if status >= 500:
@@ -0,0 +1,14 @@
+"""
+Helpers for streaming (NDJSON) responses
+"""
+
+import json
+from typing import Any, Dict
+
+# Streaming responses are newline-delimited JSON events
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+def ndjson_event(event: Dict[str, Any]) -> bytes:
+    """Encode one streaming event as a JSON line"""
+    return (json.dumps(event, default=str) + "\n").encode("utf-8")
@@ -0,0 +1,229 @@
+"""
+AuthManager API key storage: per-user index, pipelined reads, cached
+validation and revocation broadcast, against a small in-memory Redis.
+"""
+import asyncio
+import fnmatch
+
+import pytest
+
+from src.auth.security import AuthManager, REVOCATION_CHANNEL
+
+
+class FakeRedis:
+    """Just enough of redis.asyncio.Redis for AuthManager; counts round trips"""
+
+    def __init__(self):
+        self.data = {}
+        self.ttls = {}
+        self.round_trips = 0
+        self.subscribers = []
+
+    # Commands (values are stored as bytes like the real client returns)
+    async def get(self, key):
+        self.round_trips += 1
+        return self._get(key)
+
+    def _get(self, key):
+        value = self.data.get(key)
+        return value.encode() if isinstance(value, str) else value
+
+    async def mget(self, keys):
+        self.round_trips += 1
+        return [self._get(key) for key in keys]
+
+    async def smembers(self, key):
+        self.round_trips += 1
+        return {member.encode() for member in self.data.get(key, set())}
+
+    async def srem(self, key, *members):
+        self.round_trips += 1
+        return self._srem(key, *members)
+
+    def _srem(self, key, *members):
+        before = len(self.data.get(key, set()))
+        self.data.get(key, set()).difference_update(members)
+        return before - len(self.data.get(key, set()))
+
+    async def scan_iter(self, match):
+        self.round_trips += 1
+        for key in list(self.data):
+            if fnmatch.fnmatch(key, match):
+                yield key.encode()
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    def pubsub(self):
+        return FakePubSub(self)
+
+    def _run(self, name, *args):
+        if name == "get":
+            return self._get(args[0])
+        if name == "setex":
+            self.data[args[0]] = args[2]
+            self.ttls[args[0]] = args[1]
+            return True
+        if name == "expire":
+            if args[0] in self.data:
+                self.ttls[args[0]] = args[1]
+            return args[0] in self.data
+        if name == "sadd":
+            self.data.setdefault(args[0], set()).update(args[1:])
+            return len(args) - 1
+        if name == "srem":
+            return self._srem(*args)
+        if name == "hgetall":
+            return {k.encode(): str(v).encode() for k, v in self.data.get(args[0], {}).items()}
+        if name == "hincrby":
+            stats = self.data.setdefault(args[0], {})
+            stats[args[1]] = int(stats.get(args[1], 0)) + args[2]
+            return stats[args[1]]
+        if name == "hset":
+            self.data.setdefault(args[0], {})[args[1]] = args[2]
+            return 1
+        if name == "delete":
+            return int(self.data.pop(args[0], None) is not None)
+        if name == "publish":
+            for queue in self.subscribers:
+                queue.put_nowait({"type": "message", "channel": args[0], "data": args[1].encode()})
+            return len(self.subscribers)
+        raise NotImplementedError(name)
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.commands = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def __getattr__(self, name):
+        def command(*args):
+            self.commands.append((name, args))
+            return self
+        return command
+
+    async def execute(self):
+        self.redis.round_trips += 1
+        return [self.redis._run(name, *args) for name, args in self.commands]
+
+
+class FakePubSub:
+    def __init__(self, redis):
+        self.redis = redis
+        self.queue = asyncio.Queue()
+
+    async def subscribe(self, channel):
+        assert channel == REVOCATION_CHANNEL
+        self.redis.subscribers.append(self.queue)
+
+    async def listen(self):
+        while True:
+            yield await self.queue.get()
+
+    async def aclose(self):
+        self.redis.subscribers.remove(self.queue)
+
+
+@pytest.mark.asyncio
+async def test_listing_reads_only_the_users_keys():
+    redis = FakeRedis()
+    auth = AuthManager(redis)
+    mine = [await auth.create_api_key("alice", f"key {i}") for i in range(3)]
+    for i in range(50):
+        await auth.create_api_key(f"user-{i}", "other")
+
+    redis.round_trips = 0
+    keys = await auth.get_user_api_keys("alice")
+
+    assert sorted(k["api_key"] for k in keys) == sorted(mine)
+    assert {k["name"] for k in keys} == {"key 0", "key 1", "key 2"}
+    assert redis.round_trips == 2  # SMEMBERS + one pipeline
+    assert await auth.get_user_api_keys("nobody") == []
+
+
+@pytest.mark.asyncio
+async def test_validation_is_cached_and_usage_written_on_refresh():
+    redis = FakeRedis()
+    auth = AuthManager(redis, cache_ttl=60)
+    api_key = await auth.create_api_key("alice", "cli")
+
+    redis.round_trips = 0
+    for _ in range(100):
+        data = await auth.validate_api_key(api_key)
+    assert data["user_id"] == "alice"
+    assert data["usage_count"] == 100
+    assert redis.round_trips == 2  # One read pipeline, one expiry pipeline
+
+    # The next refresh writes the 100 uses in one go
+    auth._key_cache[api_key].expires_at = 0
+    await auth.validate_api_key(api_key)
+    listed = (await auth.get_user_api_keys("alice"))[0]
+    assert listed["usage_count"] == 100
+    assert listed["last_used"] is not None
+
+
+@pytest.mark.asyncio
+async def test_revocation_evicts_cached_keys_on_every_instance():
+    redis = FakeRedis()
+    issuer = AuthManager(redis, cache_ttl=60)
+    other_worker = AuthManager(redis, cache_ttl=60)
+    api_key = await issuer.create_api_key("alice", "cli")
+
+    assert await other_worker.validate_api_key(api_key) is not None
+    await asyncio.sleep(0)  # Let the revocation listener subscribe
+
+    assert await issuer.revoke_api_key(api_key) is True
+    await asyncio.sleep(0)
+
+    assert await other_worker.validate_api_key(api_key) is None
+    assert await issuer.get_user_api_keys("alice") == []
+    assert await issuer.revoke_api_key(api_key) is False
+    for auth in (issuer, other_worker):
+        if auth._revocation_listener:
+            auth._revocation_listener.cancel()
+
+
+@pytest.mark.asyncio
+async def test_rebuild_indexes_keys_created_without_the_index():
+    redis = FakeRedis()
+    auth = AuthManager(redis)
+    redis.data["api_key:na_legacy"] = str({"user_id": "bob", "name": "old", "permissions": ["read"],
+                                          "created_at": "2024-01-01T00:00:00+00:00", "last_used": None,
+                                          "usage_count": 7})
+
+    assert await auth.get_user_api_keys("bob") == []
+    assert await auth.rebuild_user_key_index() == 1
+
+    keys = await auth.get_user_api_keys("bob")
+    assert [(k["api_key"], k["usage_count"]) for k in keys] == [("na_legacy", 7)]
+
+
+@pytest.mark.asyncio
+async def test_expired_keys_are_pruned_from_the_index():
+    redis = FakeRedis()
+    auth = AuthManager(redis)
+    api_key = await auth.create_api_key("alice", "cli")
+    del redis.data[f"api_key:{api_key}"]  # Redis expired it
+
+    assert await auth.get_user_api_keys("alice") == []
+    assert redis.data["api_keys:user:alice"] == set()
+
+
+@pytest.mark.asyncio
+async def test_index_outlives_keys_that_stay_in_use():
+    redis = FakeRedis()
+    auth = AuthManager(redis)
+    api_key = await auth.create_api_key("alice", "cli")
+    await auth.validate_api_key(api_key)
+
+    # The key's expiry slides on use; the index must not expire under it
+    assert f"api_key:{api_key}" in redis.ttls
+    assert "api_keys:user:alice" not in redis.ttls
+    if auth._revocation_listener:
+        auth._revocation_listener.cancel()
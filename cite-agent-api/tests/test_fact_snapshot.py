@@ -0,0 +1,113 @@
+"""
+Request-scoped fact snapshot: each fact lookup resolves once per request,
+shared by the store, the SEC adapter and concurrent callers.
+"""
+import asyncio
+
+import pytest
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from src.adapters.sec_facts import SECFactsAdapter
+from src.facts.snapshot import FactSnapshot, current_fact_snapshot, fact_snapshot, snapshot_lookup
+from src.facts.store import FactsStore
+from src.middleware.context import RequestContextMiddleware
+
+
+def _counting_adapter(monkeypatch):
+    adapter = SECFactsAdapter()
+    calls = []
+
+    async def fetch_fact(ticker, concept, *, period=None, freq="Q", as_reported=False, accession=None):
+        calls.append((concept, accession))
+        await asyncio.sleep(0.01)
+        return {"concept": concept, "value": 1.0, "citation": {"accession": "0000320193-24-000123"}}
+
+    monkeypatch.setattr(adapter, "_fetch_fact", fetch_fact)
+    return adapter, calls
+
+
+@pytest.mark.asyncio
+async def test_adapter_lookups_resolve_once_per_snapshot(monkeypatch):
+    adapter, calls = _counting_adapter(monkeypatch)
+
+    with fact_snapshot() as snapshot:
+        await adapter.get_fact("AAPL", "revenue", period="latest")
+        await adapter.get_fact("aapl", "revenue", period="latest")
+        same_filing = await adapter.get_facts_from_same_filing(
+            "AAPL", ["revenue", "netIncome"], period="latest"
+        )
+        await adapter.get_facts_from_same_filing("AAPL", ["revenue", "netIncome"], period="latest")
+
+    assert set(same_filing) == {"revenue", "netIncome"}
+    assert calls == [("revenue", None), ("netIncome", "0000320193-24-000123")]
+    assert snapshot.hits == 4 and snapshot.misses == 2
+    assert current_fact_snapshot() is None
+
+    # Outside a snapshot nothing is memoized
+    await adapter.get_fact("AAPL", "revenue", period="latest")
+    assert len(calls) == 3
+
+
+@pytest.mark.asyncio
+async def test_concurrent_lookups_share_one_load():
+    loads = []
+
+    async def load():
+        loads.append(1)
+        await asyncio.sleep(0.01)
+        return "fact"
+
+    with fact_snapshot() as snapshot:
+        results = await asyncio.gather(*(snapshot_lookup(("AAPL", "revenue"), load) for _ in range(5)))
+    assert results == ["fact"] * 5
+    assert len(loads) == 1
+    assert snapshot.stats() == {"fact_lookups": 5, "fact_snapshot_hits": 4}
+
+
+@pytest.mark.asyncio
+async def test_failed_lookups_are_retried():
+    snapshot = FactSnapshot()
+    attempts = []
+
+    async def flaky():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise ConnectionError("SEC unavailable")
+        return "fact"
+
+    with pytest.raises(ConnectionError):
+        await snapshot.lookup("key", flaky)
+    assert await snapshot.lookup("key", flaky) == "fact"
+    assert await snapshot.lookup("key", flaky) == "fact"
+    assert len(attempts) == 2
+
+
+def test_each_request_gets_its_own_snapshot(monkeypatch):
+    store = FactsStore()
+    selects = []
+    select_fact = store._select_fact
+
+    async def counting_select(*args):
+        selects.append(args[2])
+        return await select_fact(*args)
+
+    async def resolve(_ticker):
+        return "0000320193"
+
+    monkeypatch.setattr(store, "_select_fact", counting_select)
+    monkeypatch.setattr(store, "_resolve_ticker_to_cik", resolve)
+
+    async def endpoint(request):
+        first = await store.get_fact("AAPL", "us-gaap:SalesRevenueNet")
+        again = await store.get_fact("AAPL", "us-gaap:SalesRevenueNet")
+        return JSONResponse({"same": first is again, **request.state.fact_snapshot.stats()})
+
+    app = RequestContextMiddleware(Starlette(routes=[Route("/fact", endpoint)]))
+    client = TestClient(app)
+
+    for _ in range(2):
+        assert client.get("/fact").json() == {"same": True, "fact_lookups": 2, "fact_snapshot_hits": 1}
+    assert selects == ["us-gaap:SalesRevenueNet"] * 2
@@ -1,3 +1,5 @@
+import asyncio
+
 import pytest
 
 from src.facts.store import Fact, FactsStore, PeriodType
@@ -63,4 +65,24 @@ async def test_get_fact_refreshes_stale_data(monkeypatch):
 
     assert result is not None
     assert result.period == "2025-Q2"
-    assert result.value == pytest.approx(7_685_000_000.0)
\ No newline at end of file
+    assert result.value == pytest.approx(7_685_000_000.0)
+
+@pytest.mark.asyncio
+async def test_cancelled_caller_does_not_cancel_the_shared_load(monkeypatch):
+    store = FactsStore()
+    loads = []
+
+    async def slow_load(ticker, cik, *, force_refresh=False):
+        loads.append(cik)
+        await asyncio.sleep(0.05)
+
+    monkeypatch.setattr(store, "_load_company_facts", slow_load)
+
+    first = asyncio.ensure_future(store._lazy_load_company_facts("AMD", "0000002488"))
+    second = asyncio.ensure_future(store._lazy_load_company_facts("AMD", "0000002488"))
+    await asyncio.sleep(0.01)
+    first.cancel()
+
+    await second  # Would raise CancelledError if the shared load had been cancelled
+    assert first.cancelled()
+    assert loads == ["0000002488"]
@@ -0,0 +1,171 @@
+"""
+Financial statement assembly: one company load per request, accession-keyed
+statement cache and cached segment grouping.
+"""
+import copy
+import json
+import statistics
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from src.facts.statement_cache import StatementCache
+from src.facts.store import FactsStore
+from src.facts.test_data import TEST_COMPANY_DATA
+from src.routes import finance_kpis
+
+HEADERS = {"X-API-Key": "demo-key-123", "X-Request-Source": "agent"}
+REQUEST = SimpleNamespace(state=SimpleNamespace(trace_id="test"))
+
+
+async def _statement(statement_type):
+    return await finance_kpis.get_financial_statement(
+        "AAPL", statement_type, period="latest", freq="Q", request=REQUEST
+    )
+
+
+@pytest.fixture
+def isolated_store(monkeypatch):
+    """Fresh store and cache wired like the module globals"""
+    store = FactsStore()
+    cache = StatementCache()
+    store.add_accession_listener(cache.invalidate_company)
+    monkeypatch.setattr(finance_kpis, "facts_store", store)
+    monkeypatch.setattr(finance_kpis, "statement_cache", cache)
+    return store, cache
+
+
+def _apple(extra_revenue=None):
+    data = copy.deepcopy(TEST_COMPANY_DATA["AAPL"])
+    data.setdefault("tickers", ["AAPL"])
+    if extra_revenue:
+        data["facts"]["us-gaap:SalesRevenueNet"].append(extra_revenue)
+    return data
+
+
+def test_all_statements_in_one_request_warm_p95_under_50ms(client):
+    url = "/v1/finance/kpis/AAPL/statements/all"
+    first = client.get(url, headers=HEADERS)
+    assert first.status_code == 200
+    body = first.json()
+    assert set(body["statements"]) == {"income", "balance", "cashflow"}
+    income = body["statements"]["income"]["line_items"]
+    assert any(item["line_item"] == "revenue" for item in income)
+
+    timings = []
+    for _ in range(60):
+        start = time.perf_counter()
+        response = client.get(url, headers=HEADERS)
+        timings.append(time.perf_counter() - start)
+        assert response.json() == body
+    p95 = statistics.quantiles(timings, n=20)[-1]
+    print(f"\nwarm all-statements p95: {p95 * 1000:.1f} ms")
+    assert p95 < 0.05
+
+
+@pytest.mark.asyncio
+async def test_line_items_share_one_company_load(isolated_store, monkeypatch):
+    store, _ = isolated_store
+    loads = []
+
+    async def fake_load(ticker, cik, *, force_refresh=False):
+        loads.append((cik, force_refresh))
+        await store.store_company_facts(_apple())
+
+    async def resolve(_ticker):
+        return "0000320193"
+
+    store.facts_by_company.clear()
+    monkeypatch.setattr(store, "_resolve_ticker_to_cik", resolve)
+    monkeypatch.setattr(store, "_load_company_facts", fake_load)
+
+    # Every concept misses the store and asks for the SEC; one fetch serves all
+    facts = await store.get_facts("AAPL", ["us-gaap:SalesRevenueNet", "us-gaap:NetIncomeLoss", "us-gaap:Missing"])
+    assert facts["us-gaap:SalesRevenueNet"].value == pytest.approx(119_575_000_000)
+    assert facts["us-gaap:Missing"] is None
+    assert loads == [("0000320193", False)]
+
+
+@pytest.mark.asyncio
+async def test_new_accession_invalidates_cached_statements(isolated_store):
+    store, cache = isolated_store
+    await store.store_company_facts(_apple(), replace_existing=True)
+
+    first = await _statement("income")
+    again = await _statement("income")
+    assert again is first
+    assert cache.hits == 1 and len(cache) == 1
+
+    # Re-storing the same filings keeps the cache
+    await store.store_company_facts(_apple(), replace_existing=True)
+    assert len(cache) == 1
+
+    new_quarter = {"value": 124_300_000_000, "unit": "USD", "end_date": "2025-Q1",
+                   "accession": "0000320193-25-000008", "frame": "CY2025Q1", "dimensions": {},
+                   "period_type": "duration", "restated": False}
+    await store.store_company_facts(_apple(new_quarter), replace_existing=True)
+    assert len(cache) == 0
+    assert store.company_accession("0000320193") == "0000320193-25-000008"
+
+    refreshed = await _statement("income")
+    revenue = next(item for item in refreshed["line_items"] if item["line_item"] == "revenue")
+    assert revenue["period"] == "2025-Q1"
+    assert revenue["citation"]["accession"] == "0000320193-25-000008"
+
+
+@pytest.mark.asyncio
+async def test_unknown_statement_type_is_rejected(isolated_store):
+    response = await _statement("equity")
+    assert response.status_code == 422
+    assert "all" in json.loads(response.body)["detail"]
+
+
+def test_unknown_ticker_is_a_404(client, isolated_store, monkeypatch):
+    store, _ = isolated_store
+
+    async def unresolved(ticker):
+        return None
+
+    monkeypatch.setattr(store, "_resolve_ticker_to_cik", unresolved)
+    response = client.get("/v1/finance/kpis/ZZZZQ/statements/income", headers=HEADERS)
+
+    assert response.status_code == 404
+    assert response.json()["code"] == "not-found"
+
+
+@pytest.mark.asyncio
+async def test_clearing_the_store_forgets_ingested_filings(isolated_store):
+    store, cache = isolated_store
+    await store.store_company_facts(_apple())
+    await _statement("income")
+    assert len(cache) == 1
+
+    store.clear_store()
+    assert store.company_accession("0000320193") is None
+    # Storing the same filing again counts as new and drops the cached statements
+    await store.store_company_facts(_apple())
+    assert len(cache) == 0
+
+
+@pytest.mark.asyncio
+async def test_segment_grouping_is_built_once_per_filing_set(isolated_store):
+    store, _ = isolated_store
+    data = _apple()
+    data["facts"]["us-gaap:SalesRevenueNet"] = [
+        {"value": 10 + q, "unit": "USD", "end_date": f"2024-Q{q}", "accession": f"acc-{q}",
+         "dimensions": {"BusinessSegment": segment}, "period_type": "duration"}
+        for q in range(1, 5) for segment in ("iPhone", "Services")
+    ]
+    await store.store_company_facts(data, replace_existing=True)
+
+    segments = await store.get_segment_series("AAPL", "us-gaap:SalesRevenueNet", freq="Q", limit=3)
+    assert set(segments) == {"iPhone", "Services"}
+    assert [f.period for f in segments["iPhone"]] == ["2024-Q4", "2024-Q3", "2024-Q2"]
+    index = store._segment_index[("0000320193", "us-gaap:SalesRevenueNet", "Q")]
+
+    await store.get_segment_series("AAPL", "us-gaap:SalesRevenueNet", freq="Q", limit=12)
+    assert store._segment_index[("0000320193", "us-gaap:SalesRevenueNet", "Q")] is index
+
+    await store.store_company_facts(data, replace_existing=True)
+    assert ("0000320193", "us-gaap:SalesRevenueNet", "Q") not in store._segment_index
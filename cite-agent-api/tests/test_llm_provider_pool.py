@@ -0,0 +1,178 @@
+"""
+Mock-provider load tests for pooled, health-weighted, hedged LLM calls.
+
+The mock provider is a minimal keep-alive HTTP/1.1 server on localhost.
+Each new connection pays HANDSHAKE_DELAY before its first response,
+standing in for the DNS/TCP/TLS setup a real provider costs.
+"""
+import asyncio
+import json
+import statistics
+import time
+from collections import Counter
+
+import httpx
+import pytest
+
+from src.services.llm_providers import LLMProviderManager, ProviderConfig
+
+HANDSHAKE_DELAY = 0.03
+FAST = 0.005
+
+COMPLETION = json.dumps({
+    "choices": [{"message": {"content": "ok"}}],
+    "usage": {"total_tokens": 3},
+}).encode()
+
+
+class MockProvider:
+    """Keep-alive HTTP server whose behaviour per path is set by `behaviour(path, n)`"""
+
+    def __init__(self, behaviour):
+        self.behaviour = behaviour
+        self.connections = 0
+        self.requests = Counter()
+        self.server = None
+
+    async def __aenter__(self):
+        self.server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        return self
+
+    async def __aexit__(self, *exc):
+        self.server.close()
+
+    def url(self, path):
+        port = self.server.sockets[0].getsockname()[1]
+        return f"http://127.0.0.1:{port}/{path}"
+
+    async def _handle(self, reader, writer):
+        self.connections += 1
+        await asyncio.sleep(HANDSHAKE_DELAY)
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                lines = head.decode().split("\r\n")
+                path = lines[0].split()[1].strip("/")
+                length = next(
+                    int(line.split(":", 1)[1]) for line in lines if line.lower().startswith("content-length")
+                )
+                await reader.readexactly(length)
+                self.requests[path] += 1
+                delay, status = self.behaviour(path, self.requests[path])
+                await asyncio.sleep(delay)
+                writer.write(
+                    b"HTTP/1.1 %d X\r\nContent-Type: application/json\r\nContent-Length: %d\r\n\r\n"
+                    % (status, len(COMPLETION)) + COMPLETION
+                )
+                await writer.drain()
+        except (asyncio.IncompleteReadError, asyncio.CancelledError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+
+def _manager(monkeypatch, mock, names, hedge=False):
+    providers = {
+        name: ProviderConfig(name=name, keys=[f"{name}-key"], endpoint=mock.url(name), models=["m"], rate_limit_per_day=1)
+        for name in names
+    }
+    monkeypatch.setattr(LLMProviderManager, "_load_providers", lambda self: providers)
+    return LLMProviderManager(hedge_requests=hedge)
+
+
+async def _per_call_client(url):
+    """What every provider call used to do: a fresh client per request"""
+    async with httpx.AsyncClient() as client:
+        response = await client.post(url, json={"messages": []}, timeout=60.0)
+        response.raise_for_status()
+
+
+async def _load(call, requests=60, concurrency=6):
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            start = time.perf_counter()
+            await call()
+            latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(one() for _ in range(requests)))
+    return latencies
+
+
+@pytest.mark.asyncio
+async def test_pooled_clients_skip_connection_setup(monkeypatch):
+    async with MockProvider(lambda path, n: (FAST, 200)) as mock:
+        manager = _manager(monkeypatch, mock, ["cerebras"])
+        try:
+            unpooled = await _load(lambda: _per_call_client(mock.url("cerebras")))
+            unpooled_connections = mock.connections
+            pooled = await _load(lambda: manager.query_with_fallback("hi"))
+        finally:
+            await manager.aclose()
+
+    pooled_connections = mock.connections - unpooled_connections
+    print(f"\nper-call clients: mean {statistics.mean(unpooled) * 1000:.1f}ms, {unpooled_connections} connections")
+    print(f"pooled clients:   mean {statistics.mean(pooled) * 1000:.1f}ms, {pooled_connections} connections")
+
+    assert unpooled_connections == 60
+    assert pooled_connections <= 6
+    assert statistics.mean(pooled) < statistics.mean(unpooled) - HANDSHAKE_DELAY / 2
+
+
+@pytest.mark.asyncio
+async def test_selection_prefers_healthy_providers(monkeypatch):
+    # cerebras (first by static priority) is failing; groq is fine
+    async with MockProvider(lambda path, n: (FAST, 500 if path == "cerebras" else 200)) as mock:
+        manager = _manager(monkeypatch, mock, ["cerebras", "groq"])
+        try:
+            for _ in range(10):
+                result = await manager.query_with_fallback("hi")
+                assert result["provider"] == "groq"
+        finally:
+            await manager.aclose()
+
+    assert [name for name, _ in manager._key_attempts()] == ["groq", "cerebras"]
+    # Once cerebras ranks last it stops being tried first on every request
+    assert mock.requests["cerebras"] < 5
+
+
+@pytest.mark.asyncio
+async def test_hedging_cuts_tail_latency(monkeypatch):
+    # Every 25th cerebras call stalls (outside its p95); groq is steady but slower than a fast cerebras call
+    def behaviour(path, n):
+        if path == "cerebras":
+            return (0.4 if n % 25 == 0 else FAST), 200
+        return 0.02, 200
+
+    tails = {}
+    for hedge in (False, True):
+        async with MockProvider(behaviour) as mock:
+            manager = _manager(monkeypatch, mock, ["cerebras", "groq"], hedge=hedge)
+            try:
+                # Warm up health stats so cerebras has a p95 (and stays the first choice)
+                for _ in range(25):
+                    await manager.query_with_fallback("hi")
+                latencies = await _load(lambda: manager.query_with_fallback("hi"), requests=40, concurrency=1)
+            finally:
+                await manager.aclose()
+        tails[hedge] = max(latencies)
+
+    print(f"\nworst latency: unhedged {tails[False] * 1000:.0f}ms, hedged {tails[True] * 1000:.0f}ms")
+    assert tails[False] > 0.35
+    assert tails[True] < 0.2
+
+
+def test_key_attempts_rotate_the_first_key(monkeypatch):
+    keys = [f"k{i}" for i in range(4)]
+    providers = {"groq": ProviderConfig(name="groq", keys=keys, endpoint="http://unused", models=["m"],
+                                        rate_limit_per_day=1)}
+    monkeypatch.setattr(LLMProviderManager, "_load_providers", lambda self: providers)
+    manager = LLMProviderManager()
+
+    firsts = [next(manager._key_attempts())[1] for _ in range(6)]
+    assert firsts == ["k0", "k1", "k2", "k3", "k0", "k1"]
+    # Every key is still offered, failing keys last
+    manager._record_outcome("groq", "k3", None, ok=False)
+    assert [key for _, key in manager._key_attempts()] == ["k2", "k0", "k1", "k3"]
@@ -0,0 +1,137 @@
+"""
+PaperSearcher fan-out: answers bounded by the search deadline, stragglers
+filling the provider cache, progressive streaming and the pooled session.
+"""
+import asyncio
+import json
+import time
+import uuid
+
+import pytest
+
+from src.models.request import SearchFilters
+from src.services import paper_search
+from src.services.paper_search import PaperSearcher
+
+
+def _paper(source, title, citations=0, doi=None):
+    return {"id": f"{source}-{title}", "title": title, "authors": [{"name": "A. Author"}], "year": 2023,
+            "doi": doi, "citations_count": citations, "source": source}
+
+
+def _searcher(monkeypatch, delays):
+    """PaperSearcher whose providers answer after the given delays, counting calls"""
+    searcher = PaperSearcher()
+    calls = {source: 0 for source in delays}
+
+    def provider(source, delay):
+        async def search(query, limit=10):
+            calls[source] += 1
+            await asyncio.sleep(delay)
+            return [_paper(source, f"{source} paper", citations=int(delay * 100))]
+        return search
+
+    for source, delay in delays.items():
+        monkeypatch.setattr(searcher, f"search_{source}", provider(source, delay))
+    return searcher, calls
+
+
+def _duplicate_of_semantic_scholar(delay):
+    async def search(query, limit=10):
+        await asyncio.sleep(delay)
+        return [_paper("openalex", "semantic_scholar paper"), _paper("openalex", "openalex only")]
+    return search
+
+
+@pytest.mark.asyncio
+async def test_slow_provider_does_not_hold_the_response(monkeypatch):
+    searcher, calls = _searcher(monkeypatch, {"openalex": 0.01, "semantic_scholar": 0.02, "pubmed": 0.5})
+    query = f"deadline {uuid.uuid4()}"
+
+    start = time.monotonic()
+    result = await searcher.search_papers(query, limit=5, deadline=0.1)
+    assert time.monotonic() - start < 0.3
+    assert {p["source"] for p in result["papers"]} == {"openalex", "semantic_scholar"}
+    assert result["sources_pending"] == ["pubmed"]
+    assert set(result["sources_used"]) == {"openalex", "semantic_scholar", "pubmed"}
+
+    # The straggler finishes in the background and answers the next search
+    await asyncio.sleep(0.5)
+    again = await searcher.search_papers(query, limit=5, deadline=0.1)
+    assert {p["source"] for p in again["papers"]} == {"openalex", "semantic_scholar", "pubmed"}
+    assert again["sources_pending"] == []
+    assert calls == {"openalex": 1, "semantic_scholar": 1, "pubmed": 1}
+
+
+@pytest.mark.asyncio
+async def test_concurrent_searches_share_provider_calls(monkeypatch):
+    searcher, calls = _searcher(monkeypatch, {"openalex": 0.05})
+    query = f"shared {uuid.uuid4()}"
+
+    results = await asyncio.gather(*(
+        searcher.search_papers(query, sources=["openalex"], deadline=1) for _ in range(5)
+    ))
+    assert all(r["papers"][0]["source"] == "openalex" for r in results)
+    assert calls["openalex"] == 1
+
+
+@pytest.mark.asyncio
+async def test_stream_yields_providers_as_they_answer(monkeypatch):
+    searcher, _ = _searcher(monkeypatch, {"openalex": 0.05, "semantic_scholar": 0.01, "pubmed": 0.5})
+    monkeypatch.setattr(searcher, "search_openalex", _duplicate_of_semantic_scholar(0.05))
+
+    events = [event async for event in searcher.stream_papers(f"stream {uuid.uuid4()}", deadline=0.2)]
+
+    assert [(e["type"], e.get("source")) for e in events] == [
+        ("papers", "semantic_scholar"), ("papers", "openalex"), ("done", None)
+    ]
+    # The openalex copy of the semantic scholar paper is not sent twice
+    assert [p["title"] for p in events[1]["papers"]] == ["openalex only"]
+    assert events[-1]["count"] == 2
+    assert events[-1]["sources_pending"] == ["pubmed"]
+    await paper_search.close_paper_search_session()  # Cancels the straggler
+
+
+@pytest.mark.asyncio
+async def test_stream_and_search_agree_on_the_offline_fallback(monkeypatch):
+    searcher, _ = _searcher(monkeypatch, {"openalex": 0.01})
+    monkeypatch.setattr(searcher, "_search_offline_corpus", lambda query, limit: [_paper("offline", "offline paper")])
+    too_recent = SearchFilters(year_min=2030)  # Drops every provider paper (2023)
+
+    query = f"filtered {uuid.uuid4()}"
+    result = await searcher.search_papers(query, sources=["openalex"], filters=too_recent, deadline=1)
+    events = [e async for e in searcher.stream_papers(query, sources=["openalex"], filters=too_recent, deadline=1)]
+
+    # Providers answered, so neither falls back to the offline corpus
+    assert result["papers"] == [] and "offline" not in result["sources_used"]
+    assert [e["type"] for e in events] == ["done"] and "offline" not in events[-1]["sources_used"]
+
+
+@pytest.mark.asyncio
+async def test_session_persists_across_searches():
+    first, second = PaperSearcher(), PaperSearcher()
+    session = await first._get_session()
+    await first.close()
+
+    assert await second._get_session() is session
+    assert not session.closed
+
+    await paper_search.close_paper_search_session()
+    assert session.closed
+
+
+def test_stream_endpoint_sends_ndjson_events(client, monkeypatch):
+    async def stream_papers(self, query, limit=10, sources=None, filters=None, deadline=None):
+        yield {"type": "papers", "source": "openalex", "papers": [_paper("openalex", "Streamed", doi="10.1/x")]}
+        yield {"type": "done", "count": 1, "query": query, "sources_used": ["openalex"], "sources_pending": []}
+
+    monkeypatch.setattr(PaperSearcher, "stream_papers", stream_papers)
+    response = client.post("/api/search/stream", json={"query": "streaming test", "limit": 5},
+                           headers={"X-API-Key": "demo-key-123"})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    events = [json.loads(line) for line in response.text.splitlines()]
+    assert [e["type"] for e in events] == ["papers", "done"]
+    assert events[0]["papers"][0]["title"] == "Streamed"
+    assert events[0]["trace_id"] == events[1]["trace_id"]
@@ -0,0 +1,172 @@
+import json
+from datetime import date
+
+import pytest
+from jose import jwt
+
+from src.routes import query as query_route
+from src.routes.query import QueryRequest
+from src.services.llm_providers import LLMProviderManager, ProviderConfig
+
+
+def _manager(monkeypatch, scripts):
+    """Provider manager whose providers stream the scripted events (or raise)"""
+    providers = {
+        name: ProviderConfig(name=name, keys=["key-" + name], endpoint="", models=["m"], rate_limit_per_day=1)
+        for name in scripts
+    }
+    monkeypatch.setattr(LLMProviderManager, "_load_providers", lambda self: providers)
+    manager = LLMProviderManager(hedge_requests=False)
+    calls = []
+
+    async def fake_stream(provider_name, api_key, messages, model=None, temperature=0.7, max_tokens=4000):
+        calls.append(provider_name)
+        for item in scripts[provider_name]:
+            if isinstance(item, Exception):
+                raise item
+            yield item
+
+    monkeypatch.setattr(manager, "stream_provider", fake_stream)
+    return manager, calls
+
+
+async def _collect(stream):
+    return [event async for event in stream]
+
+
+@pytest.mark.asyncio
+async def test_stream_fails_over_before_first_token(monkeypatch):
+    manager, calls = _manager(monkeypatch, {
+        "cerebras": [RuntimeError("Rate limit exceeded")],
+        "groq": [
+            {"type": "token", "content": "Hel"},
+            {"type": "token", "content": "lo"},
+            {"type": "usage", "tokens": 12},
+        ],
+    })
+
+    events = await _collect(manager.stream_with_fallback([{"role": "user", "content": "hi"}]))
+
+    assert calls == ["cerebras", "groq"]
+    assert events[0] == {"type": "start", "provider": "groq", "model": "m"}
+    assert [e["content"] for e in events if e["type"] == "token"] == ["Hel", "lo"]
+    assert events[-1]["type"] == "done"
+    assert events[-1]["content"] == "Hello" and events[-1]["tokens"] == 12
+
+
+@pytest.mark.asyncio
+async def test_stream_errors_after_first_token_are_not_retried(monkeypatch):
+    manager, calls = _manager(monkeypatch, {
+        "cerebras": [{"type": "token", "content": "partial"}, RuntimeError("connection reset")],
+        "groq": [{"type": "token", "content": "other answer"}],
+    })
+
+    received = []
+    with pytest.raises(RuntimeError):
+        async for event in manager.stream_with_fallback([{"role": "user", "content": "hi"}]):
+            received.append(event)
+
+    assert calls == ["cerebras"]
+    assert received[-1] == {"type": "token", "content": "partial"}
+
+
+@pytest.mark.asyncio
+async def test_stream_estimates_tokens_without_usage(monkeypatch):
+    manager, _ = _manager(monkeypatch, {"groq": [{"type": "token", "content": "x" * 40}]})
+
+    events = await _collect(manager.stream_with_fallback([{"role": "user", "content": "y" * 40}]))
+
+    assert events[-1]["tokens"] == 20
+
+
+class _FakeConnection:
+    def __init__(self):
+        self.closed = False
+        self.executed = []
+        self.arguments = []
+
+    async def fetchrow(self, sql, *args):
+        return {"tokens_used_today": 100, "last_token_reset": date.today()}
+
+    async def execute(self, sql, *args):
+        self.executed.append(sql)
+        self.arguments.append(args)
+
+    def billed_tokens(self):
+        return [args[0] for sql, args in zip(self.executed, self.arguments) if "UPDATE users" in sql]
+
+    async def close(self):
+        self.closed = True
+
+
+def test_query_stream_endpoint_emits_ndjson(client, monkeypatch):
+    connection = _FakeConnection()
+    manager, _ = _manager(monkeypatch, {
+        "groq": [{"type": "token", "content": "Four"}, {"type": "token", "content": "."}],
+    })
+
+    async def fake_get_db():
+        return connection
+
+    monkeypatch.setattr(query_route, "get_db", fake_get_db)
+    monkeypatch.setattr(query_route, "get_provider_manager", lambda: manager)
+    token = jwt.encode({"sub": "user-1"}, "temp-dev-key", algorithm="HS256")
+
+    response = client.post(
+        "/api/query/stream",
+        json={"query": "What is two plus two?"},
+        headers={"Authorization": f"Bearer {token}"},
+    )
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    events = [json.loads(line) for line in response.text.splitlines()]
+    assert [e["type"] for e in events] == ["start", "token", "token", "done"]
+    assert events[-1]["provider"] == "groq" and "response" not in events[-1]
+    assert any("INSERT INTO queries" in sql for sql in connection.executed)
+    assert connection.closed
+
+
+async def _start_stream(monkeypatch, scripts):
+    """Call the streaming endpoint directly; returns its body iterator and the fake connection"""
+    connection = _FakeConnection()
+    manager, _ = _manager(monkeypatch, scripts)
+
+    async def fake_get_db():
+        return connection
+
+    monkeypatch.setattr(query_route, "get_db", fake_get_db)
+    monkeypatch.setattr(query_route, "get_provider_manager", lambda: manager)
+    response = await query_route.process_query_stream(
+        QueryRequest(query="Explain the results"), current_user={"user_id": "user-1"}
+    )
+    return response.body_iterator, connection
+
+
+@pytest.mark.asyncio
+async def test_client_disconnect_bills_the_tokens_already_sent(monkeypatch):
+    body, connection = await _start_stream(monkeypatch, {
+        "groq": [{"type": "token", "content": "x" * 400} for _ in range(10)],
+    })
+
+    received = [json.loads(await body.__anext__()) for _ in range(3)]
+    await body.aclose()  # Client goes away after two tokens
+
+    assert [e["type"] for e in received] == ["start", "token", "token"]
+    inserted = [args for sql, args in zip(connection.executed, connection.arguments) if "INSERT INTO queries" in sql]
+    assert len(inserted) == 1 and inserted[0][3] == "x" * 800  # Two tokens sent, not ten
+    assert len(connection.billed_tokens()) == 1 and connection.billed_tokens()[0] >= 200
+    assert connection.closed
+
+
+@pytest.mark.asyncio
+async def test_provider_error_mid_stream_bills_the_partial_answer(monkeypatch):
+    body, connection = await _start_stream(monkeypatch, {
+        "groq": [{"type": "token", "content": "x" * 400}, RuntimeError("connection reset")],
+    })
+
+    events = [json.loads(line) async for line in body]
+
+    assert [e["type"] for e in events] == ["start", "token", "error"]
+    assert len(connection.billed_tokens()) == 1 and connection.billed_tokens()[0] >= 100
+    assert connection.closed
@@ -0,0 +1,149 @@
+"""
+Shared upstream client: token bucket pacing (in and across processes),
+request coalescing and conditional GETs, against a local aiohttp server.
+"""
+import asyncio
+import time
+
+import pytest
+import pytest_asyncio
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from src.connectors.http_client import TokenBucket, UpstreamClient
+
+ETAG = '"companyfacts-v1"'
+
+
+@pytest_asyncio.fixture
+async def upstream():
+    """Counts hits, answers If-None-Match with 304 and 429s on /throttle"""
+    hits = {"facts": 0, "not_modified": 0}
+
+    async def facts(request):
+        hits["facts"] += 1
+        await asyncio.sleep(0.05)
+        if request.headers.get("If-None-Match") == ETAG:
+            hits["not_modified"] += 1
+            return web.Response(status=304, headers={"ETag": ETAG})
+        return web.json_response({"cik": 320193, "facts": {"us-gaap": {}}}, headers={"ETag": ETAG})
+
+    async def throttle(request):
+        return web.Response(status=429, headers={"Retry-After": "1"})
+
+    app = web.Application()
+    app.router.add_get("/facts", facts)
+    app.router.add_get("/throttle", throttle)
+    server = TestServer(app)
+    await server.start_server()
+    server.hits = hits
+    yield server
+    await server.close()
+
+
+@pytest.mark.asyncio
+async def test_bucket_paces_concurrent_callers():
+    bucket = TokenBucket(rate=20, capacity=2)
+    start = time.monotonic()
+    await asyncio.gather(*(bucket.acquire() for _ in range(8)))
+    # 2 burst tokens, then 6 more at 20/s
+    assert time.monotonic() - start >= 0.28
+
+
+@pytest.mark.asyncio
+async def test_bucket_state_is_shared_through_the_file(tmp_path):
+    path = tmp_path / "sec.bucket"
+    worker_a = TokenBucket(rate=10, capacity=2, shared_path=path)
+    worker_b = TokenBucket(rate=10, capacity=2, shared_path=path)
+
+    assert await worker_a.acquire() == 0
+    assert await worker_a.acquire() == 0
+    # worker_a spent the burst, so worker_b has to wait for a refill
+    assert await worker_b.acquire() > 0.05
+
+
+class _ScriptedRedis:
+    """Stands in for redis.asyncio: records script calls, answers with queued delays"""
+
+    def __init__(self, delays):
+        self.delays = list(delays)
+        self.calls = []
+
+    async def eval(self, script, numkeys, key, rate, capacity, action, seconds):
+        self.calls.append((key, action, seconds))
+        return str(self.delays.pop(0)) if action == "take" else "0"
+
+
+@pytest.mark.asyncio
+async def test_bucket_state_is_shared_through_redis():
+    bucket = TokenBucket(rate=10, capacity=2, redis_url="redis://limits", redis_key="finsight:ratelimit:sec")
+    redis = _ScriptedRedis([0.05, 0])
+    bucket._redis[asyncio.get_running_loop()] = redis
+
+    assert await bucket.acquire() == pytest.approx(0.05)
+    await bucket.pause(2)
+    assert redis.calls == [
+        ("finsight:ratelimit:sec", "take", 0.0),
+        ("finsight:ratelimit:sec", "take", 0.0),
+        ("finsight:ratelimit:sec", "pause", 2),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_unreachable_redis_falls_back_to_the_local_bucket():
+    bucket = TokenBucket(rate=20, capacity=1, redis_url="redis://127.0.0.1:1")
+    start = time.monotonic()
+    await asyncio.gather(*(bucket.acquire() for _ in range(3)))
+    assert time.monotonic() - start >= 0.09
+    await bucket.close()
+
+
+@pytest.mark.asyncio
+async def test_identical_requests_are_coalesced(upstream):
+    client = UpstreamClient("test", rate=100, shared_limit=False)
+    url = str(upstream.make_url("/facts"))
+
+    responses = await asyncio.gather(*(client.get(url) for _ in range(10)))
+    assert upstream.hits["facts"] == 1
+    assert client.stats["coalesced"] == 9
+    assert all(r.status == 200 and r.json()["cik"] == 320193 for r in responses)
+
+    # Still fresh: served without touching the network
+    await client.get(url)
+    assert upstream.hits["facts"] == 1
+    await client.close()
+
+
+@pytest.mark.asyncio
+async def test_stale_entries_are_revalidated_with_etag(upstream):
+    client = UpstreamClient("test", rate=100, shared_limit=False, fresh_for=0)
+    url = str(upstream.make_url("/facts"))
+
+    first = await client.get(url)
+    second = await client.get(url)
+    assert upstream.hits == {"facts": 2, "not_modified": 1}
+    assert second.revalidated and second.status == 200
+    assert second.json() == first.json()
+    await client.close()
+
+
+@pytest.mark.asyncio
+async def test_throttled_response_pauses_the_bucket(upstream):
+    client = UpstreamClient("test", rate=100, shared_limit=False)
+
+    response = await client.get(str(upstream.make_url("/throttle")))
+    assert response.status == 429
+    assert await client.bucket.acquire() >= 0.9
+    await client.close()
+
+
+@pytest.mark.asyncio
+async def test_session_timeout_applies_without_an_override(upstream):
+    client = UpstreamClient("test", rate=100, shared_limit=False, timeout=0.01)
+    url = str(upstream.make_url("/facts"))
+
+    with pytest.raises(asyncio.TimeoutError):
+        await client.get(url)
+    # A per-call timeout still takes precedence
+    assert (await client.get(url, timeout=5)).status == 200
+    await client.close()
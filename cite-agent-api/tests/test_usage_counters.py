@@ -0,0 +1,178 @@
+"""
+Usage counters: O(1) quota checks, batched usage logging and cross-worker
+reconciliation, against an in-memory stand-in for the asyncpg connection.
+"""
+import asyncio
+from datetime import date
+
+import pytest
+from fastapi import HTTPException
+
+from src.core import usage_counters
+from src.core.usage_counters import FINANCE_DAILY, MONTHLY, UsageCounters
+from src.middleware import product_auth
+
+TODAY = date(2026, 3, 14)
+
+
+class FakeDatabase:
+    """api_usage rows and api_usage_counters totals shared by fake connections"""
+
+    def __init__(self):
+        self.counters = {}
+        self.rows = []
+        self.queries = []
+        self.fail = False
+
+    async def connect(self):
+        return FakeConnection(self)
+
+
+class FakeConnection:
+    def __init__(self, db):
+        self.db = db
+
+    def transaction(self):
+        return self
+
+    async def __aenter__(self):
+        if self.db.fail:
+            raise ConnectionError("database unavailable")
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def close(self):
+        pass
+
+    async def fetchval(self, sql, *args):
+        self.db.queries.append(sql)
+        assert "COUNT(*)" not in sql
+        return self.db.counters.get(args)
+
+    async def execute(self, sql, *columns):
+        assert "INSERT INTO api_usage " in sql
+        self.db.rows.extend(zip(*columns))
+
+    async def fetch(self, sql, *columns):
+        assert "ON CONFLICT" in sql
+        result = []
+        for key_id, bucket, start, delta in zip(*columns):
+            key = (key_id, bucket, start)
+            self.db.counters[key] = self.db.counters.get(key, 0) + delta
+            result.append({"api_key_id": key_id, "bucket": bucket, "period_start": start,
+                           "count": self.db.counters[key]})
+        return result
+
+
+@pytest.mark.asyncio
+async def test_quota_reads_are_served_from_memory():
+    db = FakeDatabase()
+    db.counters[("key-1", FINANCE_DAILY, TODAY)] = 41
+    counters = UsageCounters(connect=db.connect)
+    conn = await db.connect()
+
+    for _ in range(1000):
+        assert await counters.count(conn, "key-1", FINANCE_DAILY, TODAY) == 41
+    assert len(db.queries) == 1
+
+
+@pytest.mark.asyncio
+async def test_recorded_calls_count_immediately_and_flush_in_one_batch():
+    db = FakeDatabase()
+    counters = UsageCounters(connect=db.connect, flush_interval=60)
+    conn = await db.connect()
+
+    for _ in range(3):
+        counters.record("key-1", "/v1/finance/kpis/AAPL", day=TODAY)
+    counters.record("key-1", "/api/search", day=TODAY)
+
+    assert await counters.count(conn, "key-1", FINANCE_DAILY, TODAY) == 3
+    assert await counters.count(conn, "key-1", MONTHLY, TODAY) == 4
+    assert db.rows == []
+
+    await counters.flush()
+    assert len(db.rows) == 4
+    assert db.counters[("key-1", FINANCE_DAILY, TODAY)] == 3
+    assert db.counters[("key-1", MONTHLY, date(2026, 3, 1))] == 4
+    # Totals come back from the upsert, so nothing is double counted
+    assert await counters.count(conn, "key-1", MONTHLY, TODAY) == 4
+    await counters.close()
+
+
+@pytest.mark.asyncio
+async def test_full_buffer_flushes_without_waiting():
+    db = FakeDatabase()
+    counters = UsageCounters(connect=db.connect, flush_interval=60, max_buffered=10)
+    for _ in range(10):
+        counters.record("key-1", "/v1/finance/prices", day=TODAY)
+    await asyncio.sleep(0.01)
+    assert len(db.rows) == 10
+
+
+@pytest.mark.asyncio
+async def test_workers_reconcile_through_postgres():
+    db = FakeDatabase()
+    worker_a = UsageCounters(connect=db.connect, flush_interval=60, reconcile_after=0)
+    worker_b = UsageCounters(connect=db.connect, flush_interval=60, reconcile_after=0)
+    conn = await db.connect()
+
+    for _ in range(5):
+        worker_a.record("key-1", "/v1/finance/prices", day=TODAY)
+    worker_b.record("key-1", "/v1/finance/prices", day=TODAY)
+    await worker_a.flush()
+
+    assert await worker_b.count(conn, "key-1", FINANCE_DAILY, TODAY) == 6
+    await worker_b.flush()
+    assert await worker_a.count(conn, "key-1", FINANCE_DAILY, TODAY) == 6
+
+
+@pytest.mark.asyncio
+async def test_failed_flush_keeps_usage_for_retry():
+    db = FakeDatabase()
+    counters = UsageCounters(connect=db.connect, flush_interval=60)
+    conn = await db.connect()
+    counters.record("key-1", "/v1/finance/prices", day=TODAY)
+
+    db.fail = True
+    await counters.flush()
+    assert await counters.count(conn, "key-1", FINANCE_DAILY, TODAY) == 1
+
+    db.fail = False
+    await counters.flush()
+    assert len(db.rows) == 1
+    assert db.counters[("key-1", FINANCE_DAILY, TODAY)] == 1
+
+
+@pytest.mark.asyncio
+async def test_flush_forgets_counters_of_past_periods():
+    db = FakeDatabase()
+    counters = UsageCounters(connect=db.connect, flush_interval=60)
+    today = usage_counters.utc_today()
+    for _ in range(3):
+        counters.record("key-1", "/v1/finance/prices", day=TODAY)
+    counters.record("key-1", "/v1/finance/prices")
+
+    await counters.flush()
+    assert set(counters._counters) == {
+        ("key-1", FINANCE_DAILY, today),
+        ("key-1", MONTHLY, today.replace(day=1)),
+    }
+    # Totals for the evicted day are still in Postgres
+    assert await counters.count(await db.connect(), "key-1", FINANCE_DAILY, TODAY) == 3
+
+
+@pytest.mark.asyncio
+async def test_daily_quota_is_enforced_from_counters(monkeypatch):
+    db = FakeDatabase()
+    monkeypatch.setattr(usage_counters, "_usage_counters", UsageCounters(connect=db.connect, flush_interval=60))
+    conn = await db.connect()
+
+    for _ in range(100):  # demo-key-123 is on the student tier: 100 calls/day
+        await product_auth.check_product_access(conn, "demo-key-123", "/v1/finance/prices", "agent")
+
+    with pytest.raises(HTTPException) as excinfo:
+        await product_auth.check_product_access(conn, "demo-key-123", "/v1/finance/prices", "agent")
+    assert excinfo.value.status_code == 429
+    assert excinfo.value.detail["current_usage"] == 100
+    assert len(db.queries) == 1
@@ -5,8 +5,6 @@ A Groq-powered research and finance co-pilot with deterministic tooling and
 prior stacks preserved only in Git history, kept out of the runtime footprint.
 """
 
-from .enhanced_ai_agent import EnhancedNocturnalAgent, ChatRequest, ChatResponse
-
 """
 Cite-Agent: Terminal AI Assistant for Academic Research
 """
@@ -21,6 +19,15 @@ __all__ = [
     "ChatResponse"
 ]
 
+
+def __getattr__(name):
+    """Import the agent on first use so `import cite_agent` stays cheap"""
+    if name in __all__:
+        from . import enhanced_ai_agent
+        return getattr(enhanced_ai_agent, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
 # Package metadata
 PACKAGE_NAME = "cite-agent"
 PACKAGE_VERSION = __version__
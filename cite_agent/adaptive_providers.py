@@ -1,6 +1,9 @@
 """
 Adaptive Provider Selection System
 Learns which provider is best for different query types and auto-switches
+
+Profiles and health live in the shared persistent state store, so recording
+a result is an in-memory update that is flushed to disk in the background.
 """
 
 from dataclasses import dataclass, field
@@ -11,6 +14,8 @@ import logging
 import json
 from pathlib import Path
 
+from .persistent_state import PersistentState, get_state_store
+
 logger = logging.getLogger(__name__)
 
 
@@ -114,9 +119,15 @@ class AdaptiveProviderSelector:
     - Time of day (some providers have peak hours)
     """
     
-    def __init__(self, storage_dir: Optional[Path] = None):
+    PROFILE_NAMESPACE = "provider_profiles"
+    HEALTH_NAMESPACE = "provider_health"
+
+    def __init__(self, storage_dir: Optional[Path] = None, store: Optional[PersistentState] = None):
         self.storage_dir = storage_dir or Path.home() / ".nocturnal_archive" / "provider_selection"
         self.storage_dir.mkdir(parents=True, exist_ok=True)
+        if store is None:
+            store = PersistentState(self.storage_dir / "state.db") if storage_dir else get_state_store()
+        self.store = store
         
         # Performance profiles: provider -> query_type -> profile
         self.profiles: Dict[str, Dict[QueryType, ProviderPerformanceProfile]] = {}
@@ -220,8 +231,13 @@ class AdaptiveProviderSelector:
             self.provider_last_degraded[provider] = datetime.now()
             logger.warning(f"⚠️ Provider '{provider}' degraded (health: {new_health:.1%})")
         
-        # Save updated profiles
-        self._save_profiles()
+        # Queue the changed profile and health for the next background flush
+        self._save_profile(profile)
+        degraded = self.provider_last_degraded.get(provider)
+        self.store.put(self.HEALTH_NAMESPACE, provider, {
+            "health": new_health,
+            "last_degraded": degraded.isoformat() if degraded else None,
+        })
     
     def get_provider_recommendation(
         self,
@@ -310,57 +326,61 @@ class AdaptiveProviderSelector:
         return self.profiles[provider][query_type]
     
     def _load_profiles(self):
-        """Load historical performance data"""
+        """Load historical performance data (importing the legacy JSON file once)"""
+        stored = self.store.items(self.PROFILE_NAMESPACE)
+        if not stored:
+            stored = self._import_legacy_profiles()
+
+        for profile_data in stored.values():
+            try:
+                query_type = QueryType(profile_data["query_type"])
+                profile = ProviderPerformanceProfile(**{**profile_data, "query_type": query_type})
+            except (KeyError, TypeError, ValueError):
+                continue
+            self.profiles.setdefault(profile.provider_name, {})[query_type] = profile
+
+        for provider, health in self.store.items(self.HEALTH_NAMESPACE).items():
+            self.provider_health[provider] = health.get("health", 1.0)
+            if health.get("last_degraded"):
+                self.provider_last_degraded[provider] = datetime.fromisoformat(health["last_degraded"])
+
+        if self.profiles:
+            logger.info(f"📥 Loaded {len(self.profiles)} provider profiles")
+
+    def _import_legacy_profiles(self) -> Dict[str, Dict]:
+        """Move provider_profiles.json from older versions into the state store"""
         profile_file = self.storage_dir / "provider_profiles.json"
         if not profile_file.exists():
-            return
-        
+            return {}
+
         try:
             with open(profile_file, 'r') as f:
                 data = json.load(f)
-            
-            for provider, query_types in data.items():
-                for query_type_str, profile_data in query_types.items():
-                    try:
-                        query_type = QueryType(query_type_str)
-                        profile = ProviderPerformanceProfile(**profile_data)
-                        
-                        if provider not in self.profiles:
-                            self.profiles[provider] = {}
-                        self.profiles[provider][query_type] = profile
-                    except ValueError:
-                        continue
-            
-            logger.info(f"📥 Loaded {len(self.profiles)} provider profiles")
-        
         except Exception as e:
             logger.error(f"Failed to load profiles: {e}")
-    
-    def _save_profiles(self):
-        """Save performance data to disk"""
-        try:
-            profile_file = self.storage_dir / "provider_profiles.json"
-            
-            data = {}
-            for provider, query_types in self.profiles.items():
-                data[provider] = {}
-                for query_type, profile in query_types.items():
-                    data[provider][query_type.value] = {
-                        'provider_name': profile.provider_name,
-                        'query_type': query_type.value,
-                        'total_requests': profile.total_requests,
-                        'successful_requests': profile.successful_requests,
-                        'avg_latency_ms': profile.avg_latency_ms,
-                        'p95_latency_ms': profile.p95_latency_ms,
-                        'accuracy_score': profile.accuracy_score,
-                        'cost_per_request': profile.cost_per_request,
-                    }
-            
-            with open(profile_file, 'w') as f:
-                json.dump(data, f, indent=2)
-        
-        except Exception as e:
-            logger.error(f"Failed to save profiles: {e}")
+            return {}
+
+        imported = {}
+        for provider, query_types in data.items():
+            for query_type_str, profile_data in query_types.items():
+                key = f"{provider}:{query_type_str}"
+                imported[key] = profile_data
+                self.store.put(self.PROFILE_NAMESPACE, key, profile_data)
+        return imported
+
+    def _save_profile(self, profile: ProviderPerformanceProfile):
+        """Queue one profile for persistence"""
+        query_type = profile.query_type.value
+        self.store.put(self.PROFILE_NAMESPACE, f"{profile.provider_name}:{query_type}", {
+            'provider_name': profile.provider_name,
+            'query_type': query_type,
+            'total_requests': profile.total_requests,
+            'successful_requests': profile.successful_requests,
+            'avg_latency_ms': profile.avg_latency_ms,
+            'p95_latency_ms': profile.p95_latency_ms,
+            'accuracy_score': profile.accuracy_score,
+            'cost_per_request': profile.cost_per_request,
+        })
     
     def get_status_message(self) -> str:
         """Human-readable status"""
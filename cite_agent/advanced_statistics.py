@@ -12,6 +12,9 @@ from scipy import stats
 from sklearn.decomposition import PCA, FactorAnalysis
 from sklearn.preprocessing import StandardScaler
 
+from . import bootstrap
+from .bootstrap import BootstrapEngine, ci_excludes_zero, percentile_ci
+
 
 class AdvancedStatistics:
     """Advanced statistical analyses for research"""
@@ -206,7 +209,8 @@ class AdvancedStatistics:
         X: str,  # Independent variable
         M: str,  # Mediator
         Y: str,  # Dependent variable
-        bootstrap_samples: int = 5000
+        bootstrap_samples: int = 5000,
+        n_jobs: int = 1
     ) -> Dict[str, Any]:
         """
         Mediation analysis - Test if M mediates X → Y relationship
@@ -218,6 +222,7 @@ class AdvancedStatistics:
             M: Mediator variable
             Y: Dependent variable (outcome)
             bootstrap_samples: Number of bootstrap samples for CI
+            n_jobs: Worker processes for bootstrap chunks (helps only for very large n)
 
         Returns:
             Direct, indirect, and total effects with significance
@@ -258,30 +263,15 @@ class AdvancedStatistics:
         indirect_effect = slope_a * b
 
         # Bootstrap confidence intervals for indirect effect
-        indirect_effects = []
-        np.random.seed(42)
-
-        for _ in range(bootstrap_samples):
-            # Resample with replacement
-            boot_sample = data.sample(n=len(data), replace=True)
-
-            # Recalculate paths
-            slope_a_boot, _, _, _, _ = linregress(boot_sample[X], boot_sample[M])
-
-            model_boot = LinearRegression()
-            X_boot = boot_sample[[X, M]].values
-            y_boot = boot_sample[Y].values
-            model_boot.fit(X_boot, y_boot)
-            b_boot = model_boot.coef_[1]
-
-            indirect_effects.append(slope_a_boot * b_boot)
+        # All resamples are solved at once with batched normal equations
+        engine = BootstrapEngine(n_resamples=bootstrap_samples, seed=42, n_jobs=n_jobs)
+        indirect_effects = engine.run(data[[X, M, Y]].to_numpy(), bootstrap.indirect_effect)
 
         # 95% CI
-        ci_lower = np.percentile(indirect_effects, 2.5)
-        ci_upper = np.percentile(indirect_effects, 97.5)
+        ci_lower, ci_upper = percentile_ci(indirect_effects, 0.95)
 
         # Mediation is significant if CI doesn't include 0
-        significant_mediation = not (ci_lower <= 0 <= ci_upper)
+        significant_mediation = ci_excludes_zero(ci_lower, ci_upper)
 
         # Proportion mediated
         if abs(slope_c) > 0.001:
@@ -344,7 +334,8 @@ class AdvancedStatistics:
         X: str,  # Independent variable
         W: str,  # Moderator
         Y: str,  # Dependent variable
-        center_variables: bool = True
+        center_variables: bool = True,
+        bootstrap_samples: int = 0
     ) -> Dict[str, Any]:
         """
         Moderation analysis - Test if W moderates X → Y relationship
@@ -356,6 +347,7 @@ class AdvancedStatistics:
             W: Moderator variable
             Y: Dependent variable (outcome)
             center_variables: Whether to mean-center X and W (reduces multicollinearity)
+            bootstrap_samples: If > 0, add a bootstrapped 95% CI for the interaction
 
         Returns:
             Main effects, interaction effect, simple slopes
@@ -423,6 +415,17 @@ class AdvancedStatistics:
                 "interpretation": f"When {W}={w_value:.2f}, effect of {X} on {Y} is {slope:.3f}"
             }
 
+        interaction_effect_result = {
+            "coefficient": float(coef_interaction),
+            "p_value": float(p_interaction),
+            "significant": p_interaction < 0.05,
+            "description": f"Interaction between {X} and {W}"
+        }
+        if bootstrap_samples > 0:
+            engine = BootstrapEngine(n_resamples=bootstrap_samples, seed=42)
+            boot = engine.run(data[[X_var, W_var, Y]].to_numpy(), bootstrap.interaction_effect)
+            interaction_effect_result["ci_95_bootstrap"] = list(percentile_ci(boot, 0.95))
+
         return {
             "success": True,
             "variables": {"X": X, "W": W, "Y": Y},
@@ -438,16 +441,65 @@ class AdvancedStatistics:
                 "p_value": float(p_W),
                 "significant": p_W < 0.05
             },
-            "interaction_effect": {
-                "coefficient": float(coef_interaction),
-                "p_value": float(p_interaction),
-                "significant": p_interaction < 0.05,
-                "description": f"Interaction between {X} and {W}"
-            },
+            "interaction_effect": interaction_effect_result,
             "simple_slopes": simple_slopes,
             "interpretation": self._interpret_moderation(p_interaction, coef_interaction, simple_slopes)
         }
 
+    def correlation_confidence_interval(
+        self,
+        var1: str,
+        var2: str,
+        method: str = "pearson",
+        bootstrap_samples: int = 5000,
+        confidence: float = 0.95
+    ) -> Dict[str, Any]:
+        """
+        Bootstrapped confidence interval for a correlation coefficient
+
+        Args:
+            var1: First variable
+            var2: Second variable
+            method: "pearson" or "spearman"
+            bootstrap_samples: Number of bootstrap samples
+            confidence: Confidence level for the percentile interval
+
+        Returns:
+            Correlation estimate with percentile CI
+        """
+        if self.df is None:
+            return {"error": "No dataframe loaded"}
+
+        for var in [var1, var2]:
+            if var not in self.df.columns:
+                return {"error": f"Variable '{var}' not found"}
+
+        statistic = {
+            "pearson": bootstrap.pearson_correlation,
+            "spearman": bootstrap.spearman_correlation,
+        }.get(method)
+        if statistic is None:
+            return {"error": f"Unknown correlation method: {method}"}
+
+        data = self.df[[var1, var2]].dropna().to_numpy(dtype=float)
+        if len(data) < 10:
+            return {"error": "Need at least 10 observations for a bootstrapped correlation"}
+
+        estimate = float(statistic(data[None, :, :])[0])
+        boot = BootstrapEngine(n_resamples=bootstrap_samples, seed=42).run(data, statistic)
+        ci_lower, ci_upper = percentile_ci(boot, confidence)
+
+        return {
+            "success": True,
+            "variables": [var1, var2],
+            "method": method,
+            "correlation": estimate,
+            "ci": [ci_lower, ci_upper],
+            "confidence": confidence,
+            "n": int(len(data)),
+            "significant": ci_excludes_zero(ci_lower, ci_upper)
+        }
+
     def _interpret_moderation(self, p_interaction, coef, simple_slopes):
         """Interpret moderation results"""
         if p_interaction >= 0.05:
@@ -1,6 +1,10 @@
 """
 Circuit Breaker Pattern Implementation
 Detects failures, fails fast, auto-recovers gracefully
+
+Breakers given a persistent state store keep their state and counters across
+processes, so a fresh CLI invocation does not hammer a service that the
+previous one just found down.
 """
 
 import time
@@ -10,6 +14,8 @@ from datetime import datetime, timedelta
 from typing import Optional, Callable, Any, Dict
 import logging
 
+from .persistent_state import PersistentState
+
 logger = logging.getLogger(__name__)
 
 
@@ -84,7 +90,8 @@ class CircuitBreaker:
         self,
         name: str,
         config: Optional[CircuitBreakerConfig] = None,
-        on_state_change: Optional[Callable] = None
+        on_state_change: Optional[Callable] = None,
+        store: Optional[PersistentState] = None
     ):
         self.name = name
         self.config = config or CircuitBreakerConfig()
@@ -93,6 +100,42 @@ class CircuitBreaker:
         self.last_state_change = datetime.now()
         self.on_state_change = on_state_change
         self.half_open_calls = 0
+        self.store = store
+        self._restore()
+
+    STORE_NAMESPACE = "circuit_breakers"
+
+    def _restore(self):
+        """Resume state and counters persisted by an earlier process"""
+        if self.store is None:
+            return
+        saved = self.store.get(self.STORE_NAMESPACE, self.name)
+        if not saved:
+            return
+        try:
+            self.state = CircuitState(saved["state"])
+            self.last_state_change = datetime.fromisoformat(saved["last_state_change"])
+        except (KeyError, ValueError):
+            return
+        self.metrics.total_calls = saved.get("total_calls", 0)
+        self.metrics.total_failures = saved.get("total_failures", 0)
+        self.metrics.total_successes = saved.get("total_successes", 0)
+        self.metrics.consecutive_failures = saved.get("consecutive_failures", 0)
+        self.metrics.last_failure_message = saved.get("last_failure")
+
+    def _persist(self):
+        """Queue the current state for the store's next background flush"""
+        if self.store is None:
+            return
+        self.store.put(self.STORE_NAMESPACE, self.name, {
+            "state": self.state.value,
+            "last_state_change": self.last_state_change.isoformat(),
+            "total_calls": self.metrics.total_calls,
+            "total_failures": self.metrics.total_failures,
+            "total_successes": self.metrics.total_successes,
+            "consecutive_failures": self.metrics.consecutive_failures,
+            "last_failure": self.metrics.last_failure_message,
+        })
     
     async def call(
         self,
@@ -192,6 +235,7 @@ class CircuitBreaker:
         if self.state == CircuitState.HALF_OPEN:
             self._change_state(CircuitState.CLOSED)
             self.half_open_calls = 0
+        self._persist()
     
     def _on_failure(self, error_message: str, response_time: float):
         """Record failed call"""
@@ -211,6 +255,7 @@ class CircuitBreaker:
             # Any failure in HALF_OPEN goes back to OPEN
             self._change_state(CircuitState.OPEN)
             logger.warning(f"🔴 {self.name}: Recovery failed, circuit OPEN again")
+        self._persist()
     
     def _should_open_circuit(self) -> bool:
         """Determine if circuit should open"""
@@ -247,6 +292,7 @@ class CircuitBreaker:
                 self.metrics.reset()
             elif new_state == CircuitState.HALF_OPEN:
                 self.half_open_calls = 0
+            self._persist()
     
     def reset(self):
         """Manually reset circuit to CLOSED"""
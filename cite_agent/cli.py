@@ -35,12 +35,14 @@ from rich.theme import Theme
 from .enhanced_ai_agent import EnhancedNocturnalAgent, ChatRequest
 from .setup_config import NocturnalConfig, DEFAULT_QUERY_LIMIT, MANAGED_SECRETS
 from .telemetry import TelemetryManager
-from .updater import NocturnalUpdater
 from .cli_workflow import WorkflowCLI
 from .workflow import WorkflowManager, Paper, parse_paper_from_response
 from .session_manager import SessionManager
 from .streaming_ui import StreamingChatUI, groq_stream_to_generator
 
+# Background update checks start this long after launch so they never compete with startup
+UPDATE_CHECK_DELAY_SECONDS = 5.0
+
 PRESET_SCENARIOS: Dict[str, Dict[str, str]] = {
     "Research sprint": {
         "prompt": "Run a literature review on retrieval-augmented generation, summarise three key papers and cite sources.",
@@ -637,6 +639,9 @@ class NocturnalCLI:
             working_dir=str(Path.cwd())
         )
 
+        # Show each step of a multi-step plan as it finishes, not only the final answer
+        self.agent.workflow_step_callback = streaming_ui.show_workflow_step
+
         streaming_ui.show_header()
         streaming_ui.show_info("Type your questions. Use 'quit' to exit, '/stream off' to disable streaming.")
 
@@ -688,10 +693,9 @@ class NocturnalCLI:
 
                         try:
                             stream = await self.agent.process_request_streaming(request)
-                            indicator.stop()
 
-                            # Stream the response
-                            full_response = await streaming_ui.stream_agent_response(stream)
+                            # Stream the response (indicator stays up until the first token)
+                            full_response = await streaming_ui.stream_agent_response(stream, indicator=indicator)
 
                             # Save to history
                             self.workflow.save_query_result(
@@ -836,21 +840,22 @@ class NocturnalCLI:
 
     def list_library(self, tag: Optional[str] = None):
         """List papers in local library"""
-        papers = self.workflow.list_papers(tag=tag)
+        total = self.workflow.count_papers(tag=tag)
+        papers = self.workflow.list_papers(tag=tag, limit=20)
         
         if not papers:
             self.console.print("[warning]No papers in library yet.[/warning]")
             self.console.print("[dim]Use --save-paper after a search to add papers.[/dim]")
             return
         
-        table = Table(title=f"📚 Library ({len(papers)} papers)", box=box.ROUNDED)
+        table = Table(title=f"📚 Library ({total} papers)", box=box.ROUNDED)
         table.add_column("ID", style="cyan")
         table.add_column("Title", style="bold")
         table.add_column("Authors", style="dim")
         table.add_column("Year", justify="right")
         table.add_column("Tags", style="yellow")
         
-        for paper in papers[:20]:  # Show first 20
+        for paper in papers:  # Show first 20
             authors_str = paper.authors[0] if paper.authors else "Unknown"
             if len(paper.authors) > 1:
                 authors_str += " et al."
@@ -867,8 +872,8 @@ class NocturnalCLI:
         
         self.console.print(table)
         
-        if len(papers) > 20:
-            self.console.print(f"[dim]... and {len(papers) - 20} more papers[/dim]")
+        if total > 20:
+            self.console.print(f"[dim]... and {total - 20} more papers[/dim]")
 
     def export_library_bibtex(self):
         """Export library to BibTeX"""
@@ -891,7 +896,7 @@ class NocturnalCLI:
 
     def show_history(self, limit: int = 10):
         """Show recent query history"""
-        history = self.workflow.get_history()[:limit]
+        history = self.workflow.get_history(limit=limit)
         
         if not history:
             self.console.print("[warning]No query history yet.[/warning]")
@@ -1308,6 +1313,7 @@ Examples:
     
     # Handle updates
     if args.update or args.check_updates:
+        from .updater import NocturnalUpdater
         updater = NocturnalUpdater()
         if args.update:
             success = updater.update_package()
@@ -1413,6 +1419,7 @@ Examples:
                 if time.time() - last_check < 86400:  # 24 hours
                     return  # Skip check
             
+            from .updater import NocturnalUpdater
             updater = NocturnalUpdater()
             update_info = updater.check_for_updates()
             
@@ -1461,9 +1468,11 @@ Examples:
         except:
             pass  # Silently fail, don't block startup
     
-    # Run auto-upgrade in background (doesn't delay startup)
+    # Run auto-upgrade in background once startup and the first request are under way
     import threading
-    threading.Thread(target=auto_upgrade_if_needed, daemon=True).start()
+    update_timer = threading.Timer(UPDATE_CHECK_DELAY_SECONDS, auto_upgrade_if_needed)
+    update_timer.daemon = True
+    update_timer.start()
     
     # Handle query or interactive mode
     async def run_cli():
@@ -0,0 +1,334 @@
+"""
+Token-Budgeted Context Packing
+==============================
+
+Assembles the prompt context to a token budget instead of fixed message
+windows and character cut-offs.
+
+Token counts come from a local estimate (words, with long words split into
+~4-character pieces, plus punctuation), which tracks BPE tokenizers closely
+enough for budgeting without loading one. The budget reserves a fixed share for conversation
+history; whatever the system prompt leaves over is split between memory
+and tool/API results, with memory's unused share going to the results:
+
+    packer = ContextPacker(ContextBudget(total=8000))
+    allocation = packer.budget.allocate(estimate_tokens(system_prompt), estimate_tokens(memory))
+    output = packer.compress(shell_output, allocation["tools"], query=question)
+    history = packer.pack_history(conversation_history)
+
+Large outputs are compressed by relevance: the head and tail are kept and
+the middle lines that share the most terms with the question (or look like
+errors) fill the rest. History keeps the newest turns and summarizes what
+falls out. The cut point is sticky, so the packed prefix (summary plus
+oldest kept turns) stays byte-identical across turns until the budget is
+exceeded, at which point it jumps forward to a low-water mark. That lets
+the summary be reused and keeps provider-side prompt caches warm.
+"""
+
+import hashlib
+import logging
+import re
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+MESSAGE_OVERHEAD_TOKENS = 4  # Role and separators per chat message
+LOW_WATER = 0.6  # Fraction of the history budget kept after a cut
+SUMMARY_SHARE = 0.2  # Fraction of the history budget for the dropped-turn summary
+MAX_LINE_CHARS = 400  # Longer lines are split so they can be ranked separately
+HEAD_LINES = 3
+TAIL_LINES = 3
+
+_PIECE = re.compile(r"\w+|[^\w\s]")
+_TERM = re.compile(r"[a-z0-9][a-z0-9_.\-]{2,}")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s")
+_SIGNAL = re.compile(r"\b(error|exception|traceback|fail(ed|ure)?|warning|denied|not found)\b", re.IGNORECASE)
+
+_STOPWORDS = frozenset({
+    "the", "and", "for", "are", "but", "not", "you", "all", "any", "can", "had", "her", "was",
+    "one", "our", "out", "has", "have", "what", "which", "who", "how", "why", "when", "where",
+    "this", "that", "with", "from", "they", "will", "would", "there", "their", "about", "into",
+    "does", "show", "tell", "give", "find", "list", "please", "could", "should", "me", "my",
+})
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimated token count of text.
+
+    Words up to 7 characters and punctuation marks cost one token each;
+    longer words one more per further 4 characters. That stays within ~20%
+    of cl100k-style tokenizers on prose, code and JSON.
+    """
+    if not text:
+        return 0
+    return sum(_piece_tokens(piece) for piece in _PIECE.findall(text))
+
+
+def _piece_tokens(piece: str) -> int:
+    return 1 + max(len(piece) - 4, 0) // 4
+
+
+def query_terms(query: str) -> frozenset:
+    """Lowercase content words of a question, used to rank output lines"""
+    return frozenset(t.strip(".-") for t in _TERM.findall(query.lower()) if t not in _STOPWORDS)
+
+
+def clip(text: str, max_tokens: int) -> str:
+    """Leading part of text within max_tokens, cut at a word boundary"""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    used = 0
+    end = 0
+    for match in _PIECE.finditer(text):
+        cost = _piece_tokens(match.group())
+        if used + cost > max_tokens:
+            break
+        used += cost
+        end = match.end()
+    return text[:end].rstrip() + "…"
+
+
+@dataclass
+class ContextBudget:
+    """Prompt token budget and how it is shared between context sections"""
+    total: int = 8000
+    history_share: float = 0.3
+    memory_share: float = 0.1
+    minimum: int = 1200  # Floor for memory + results when the system prompt is large
+
+    @property
+    def history_tokens(self) -> int:
+        return int(self.total * self.history_share)
+
+    def allocate(self, system_tokens: int, memory_tokens: Optional[int] = None) -> Dict[str, int]:
+        """
+        Token allowance per section once the system prompt is known.
+
+        Memory gets at most its share (less if it needs less); results get
+        everything else that the system prompt and history leave over.
+        """
+        available = max(self.total - self.history_tokens - system_tokens, self.minimum)
+        memory = int(available * self.memory_share)
+        if memory_tokens is not None:
+            memory = min(memory, memory_tokens)
+        return {
+            "system": system_tokens,
+            "history": self.history_tokens,
+            "memory": memory,
+            "tools": available - memory,
+        }
+
+
+class ContextPacker:
+    """Fits tool output and conversation history into a ContextBudget"""
+
+    def __init__(self, budget: Optional[ContextBudget] = None, cache_size: int = 512):
+        self.budget = budget or ContextBudget()
+        self._cache_size = cache_size
+        self._message_tokens: Dict[Tuple[str, str], int] = {}
+        # Sticky history cut: turns before _cut are summarized, the rest kept verbatim
+        self._anchor: Optional[str] = None
+        self._cut = 0
+        self._summary: Optional[str] = None
+
+    # ------------------------------------------------------------------
+    # Tool output
+    # ------------------------------------------------------------------
+
+    def compress(self, text: str, max_tokens: int, query: str = "") -> str:
+        """
+        Text reduced to about max_tokens, keeping the lines that matter.
+
+        The first and last few lines are always kept (headers, totals and
+        trailing errors live there); the remaining allowance goes to the
+        lines sharing the most terms with the query, then to error-looking
+        lines, then to the earliest. Omitted runs are replaced by a marker.
+        """
+        if not text or estimate_tokens(text) <= max_tokens:
+            return text
+
+        lines = self._segments(text)
+        if len(lines) == 1:
+            return clip(lines[0], max_tokens)
+
+        costs = [estimate_tokens(line) + 1 for line in lines]
+        # Reserve room for a handful of omission markers
+        allowance = max(max_tokens - 8 * 3, 0)
+        keep = set()
+
+        edges = list(range(min(HEAD_LINES, len(lines)))) + list(range(max(len(lines) - TAIL_LINES, 0), len(lines)))
+        for index in edges:
+            if index not in keep and costs[index] <= allowance:
+                keep.add(index)
+                allowance -= costs[index]
+
+        terms = query_terms(query)
+
+        def score(index: int) -> Tuple[int, int, int]:
+            line = lines[index].lower()
+            hits = sum(1 for term in terms if term in line)
+            return (-hits, 0 if _SIGNAL.search(line) else 1, index)
+
+        for index in sorted((i for i in range(len(lines)) if i not in keep), key=score):
+            if costs[index] <= allowance:
+                keep.add(index)
+                allowance -= costs[index]
+            if allowance <= 0:
+                break
+
+        output: List[str] = []
+        skipped = 0
+        for index, line in enumerate(lines):
+            if index in keep:
+                if skipped:
+                    output.append(f"... [{skipped} lines omitted] ...")
+                    skipped = 0
+                output.append(line)
+            else:
+                skipped += 1
+        if skipped:
+            output.append(f"... [{skipped} lines omitted] ...")
+        return "\n".join(output)
+
+    @staticmethod
+    def _segments(text: str) -> List[str]:
+        segments: List[str] = []
+        for line in text.splitlines():
+            while len(line) > MAX_LINE_CHARS:
+                split = line.rfind(" ", 0, MAX_LINE_CHARS)
+                if split <= 0:
+                    split = MAX_LINE_CHARS
+                segments.append(line[:split])
+                line = line[split:].lstrip()
+            segments.append(line)
+        return segments
+
+    # ------------------------------------------------------------------
+    # Conversation history
+    # ------------------------------------------------------------------
+
+    def message_tokens(self, message: Dict[str, str]) -> int:
+        """Estimated tokens of a chat message, memoized by content"""
+        content = str(message.get("content", ""))
+        key = (message.get("role", ""), hashlib.sha1(content.encode("utf-8", "replace")).hexdigest())
+        tokens = self._message_tokens.get(key)
+        if tokens is None:
+            if len(self._message_tokens) >= self._cache_size:
+                self._message_tokens.clear()
+            tokens = estimate_tokens(content) + MESSAGE_OVERHEAD_TOKENS
+            self._message_tokens[key] = tokens
+        return tokens
+
+    def pack_history(self, history: Sequence[Dict[str, str]], max_tokens: Optional[int] = None) -> List[Dict[str, str]]:
+        """
+        Recent history within max_tokens, older turns folded into a summary.
+
+        Returns plain chat messages; when turns were dropped the first one is
+        a system message summarizing them.
+        """
+        if max_tokens is None:
+            max_tokens = self.budget.history_tokens
+        if not history:
+            self.reset()
+            return []
+
+        anchor = self._fingerprint(history[0])
+        if anchor != self._anchor or self._cut > len(history):
+            # New conversation (or history was rewritten): start over
+            self.reset()
+            self._anchor = anchor
+
+        summary_budget = int(max_tokens * SUMMARY_SHARE)
+        costs = [self.message_tokens(message) for message in history]
+        kept = sum(costs[self._cut:])
+        reserved = summary_budget if self._cut else 0
+
+        if kept + reserved > max_tokens:
+            # Jump the cut forward so the next several turns fit without moving it again
+            target = int(max_tokens * LOW_WATER) - summary_budget
+            cut = len(history)
+            used = 0
+            while cut > self._cut and used + costs[cut - 1] <= target:
+                cut -= 1
+                used += costs[cut]
+            cut = min(cut, len(history) - 1)  # Always keep the newest message
+            # Start the kept window on a user turn where possible
+            while cut < len(history) - 1 and history[cut].get("role") != "user":
+                cut += 1
+            self._cut = cut
+            self._summary = None
+
+        if self._cut and self._summary is None:
+            self._summary = summarize_turns(history[:self._cut], summary_budget)
+
+        packed: List[Dict[str, str]] = []
+        if self._cut:
+            packed.append({"role": "system", "content": self._summary})
+        per_message = max(max_tokens - summary_budget, max_tokens // 2)
+        for message, cost in zip(history[self._cut:], costs[self._cut:]):
+            if cost > per_message:
+                message = {**message, "content": self.compress(str(message.get("content", "")), per_message)}
+            packed.append(message)
+        return packed
+
+    @property
+    def summarized_messages(self) -> int:
+        """How many of the oldest messages the last packed history summarized"""
+        return self._cut
+
+    def reset(self) -> None:
+        """Forget the packed history prefix (new conversation or topic)"""
+        self._anchor = None
+        self._cut = 0
+        self._summary = None
+
+    @staticmethod
+    def _fingerprint(message: Dict[str, str]) -> str:
+        raw = f"{message.get('role', '')}\0{message.get('content', '')}"
+        return hashlib.sha1(raw.encode("utf-8", "replace")).hexdigest()
+
+
+def summarize_turns(messages: Sequence[Dict[str, str]], max_tokens: int) -> str:
+    """
+    Extractive summary of dropped turns within max_tokens.
+
+    Each exchange becomes "question → first sentence of the answer", newest
+    exchanges first in priority; anything that does not fit is counted.
+    """
+    exchanges: List[str] = []
+    question: Optional[str] = None
+    for message in messages:
+        role = message.get("role")
+        content = " ".join(str(message.get("content", "")).split())
+        if not content:
+            continue
+        if role == "user":
+            if question is not None:
+                exchanges.append(f"- {clip(question, 40)}")
+            question = content
+        elif role == "assistant":
+            answer = clip(_SENTENCE_END.split(content, 1)[0], 40)
+            exchanges.append(f"- {clip(question, 40)} → {answer}" if question else f"- {answer}")
+            question = None
+    if question is not None:
+        exchanges.append(f"- {clip(question, 40)}")
+
+    header = "Earlier in this conversation:"
+    if not exchanges:
+        return f"{header} {len(messages)} earlier messages."
+
+    allowance = max_tokens - estimate_tokens(header) - 10
+    chosen: List[str] = []
+    for line in reversed(exchanges):
+        cost = estimate_tokens(line) + 1
+        if cost > allowance:
+            break
+        chosen.append(line)
+        allowance -= cost
+    chosen.reverse()
+    omitted = len(exchanges) - len(chosen)
+    if omitted:
+        chosen.insert(0, f"- ({omitted} earlier exchanges omitted)")
+    return "\n".join([header] + chosen)
@@ -3,13 +3,25 @@
 
 from __future__ import annotations
 
+import atexit
+import contextlib
 import json
 import hashlib
+import logging
 import os
+import threading
+import weakref
 from dataclasses import dataclass
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import Iterator, List, Dict, Any, Optional
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows: appends are only serialized within a process
+    fcntl = None
+
+logger = logging.getLogger(__name__)
 
 
 @dataclass
@@ -44,6 +56,213 @@ class ArchiveEntry:
         )
 
 
+class AppendOnlyLog:
+    """
+    Log-structured JSONL store with group-committed appends.
+
+    Each key maps to one ``<key>.jsonl`` segment. ``append`` only buffers the
+    record; a background writer flushes all pending records in one write per
+    segment every ``flush_interval`` seconds (and at interpreter exit), so the
+    request path never touches the disk. ``tail`` reads backwards from the end
+    of the segment, so its cost depends on the records returned, not on the
+    conversation length. Segments are compacted to the newest ``keep`` records
+    once they grow past ``keep * compact_factor`` lines.
+
+    ``_lock`` only guards the in-memory buffer; file I/O is serialized by
+    ``_io_lock`` (always taken first) and, across processes sharing ``root``,
+    by an ``flock`` on ``root/.lock`` held for every append and compaction.
+    """
+
+    _READ_BLOCK = 8192
+    _LOCK_NAME = ".lock"
+
+    def __init__(
+        self,
+        root: Path,
+        keep: int,
+        flush_interval: float = 0.5,
+        compact_factor: int = 4,
+    ) -> None:
+        self.root = Path(root)
+        self.keep = max(1, keep)
+        self.flush_interval = flush_interval
+        self.compact_factor = max(2, compact_factor)
+        self._lock = threading.Lock()
+        self._io_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._pending: Dict[str, List[str]] = {}
+        self._line_counts: Dict[str, int] = {}
+        self._writer: Optional[threading.Thread] = None
+        self._closed = False
+        self.root.mkdir(parents=True, exist_ok=True)
+        _LIVE_LOGS.add(self)
+
+    def segment_path(self, key: str) -> Path:
+        return self.root / f"{key}.jsonl"
+
+    def append(self, key: str, record: Dict[str, Any]) -> None:
+        line = json.dumps(record, ensure_ascii=False)
+        with self._lock:
+            self._pending.setdefault(key, []).append(line)
+            if self._writer is None and not self._closed:
+                self._writer = threading.Thread(
+                    target=self._run_writer, name="cite-agent-log-writer", daemon=True
+                )
+                self._writer.start()
+        if self.flush_interval <= 0:
+            self.flush()
+
+    def tail(self, key: str, limit: int) -> List[Dict[str, Any]]:
+        """Return the newest ``limit`` records (oldest first), including unflushed ones."""
+        limit = max(1, limit)
+        # Holding the I/O lock keeps a flush from moving records from the
+        # buffer to the file between the two reads (duplicates or gaps)
+        with self._io_lock:
+            with self._lock:
+                pending = list(self._pending.get(key, ()))
+            lines = pending[-limit:]
+            if len(lines) < limit:
+                lines = self._read_tail_lines(self.segment_path(key), limit - len(lines)) + lines
+
+        records: List[Dict[str, Any]] = []
+        for line in lines:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                continue  # Torn write from a crashed process
+        return records
+
+    def delete(self, key: str) -> None:
+        with self._io_lock:
+            with self._lock:
+                self._pending.pop(key, None)
+                self._line_counts.pop(key, None)
+            path = self.segment_path(key)
+            with self._file_lock():
+                if path.exists():
+                    path.unlink()
+
+    def keys(self) -> List[str]:
+        with self._lock:
+            pending = set(self._pending)
+        on_disk = {p.stem for p in self.root.glob("*.jsonl")}
+        return sorted(on_disk | pending)
+
+    def flush(self) -> None:
+        """Group-commit every pending record: one append per segment."""
+        with self._io_lock:
+            # Appends keep buffering while this flush writes
+            with self._lock:
+                batches, self._pending = self._pending, {}
+            failed: Dict[str, List[str]] = {}
+            for key, lines in batches.items():
+                path = self.segment_path(key)
+                try:
+                    with self._file_lock():
+                        with open(path, "a", encoding="utf-8") as handle:
+                            handle.write("\n".join(lines) + "\n")
+                        count = self._line_counts.get(key)
+                        if count is None:
+                            count = self._count_lines(path)
+                        else:
+                            count += len(lines)
+                        if count > self.keep * self.compact_factor:
+                            count = self._compact(path)
+                except OSError as exc:
+                    logger.debug("Archive append failed for %s: %s", path, exc)
+                    failed[key] = lines
+                    continue
+                self._line_counts[key] = count
+            if failed:
+                # Retry with the next flush; only the newest records survive compaction anyway
+                cap = self.keep * self.compact_factor
+                with self._lock:
+                    for key, lines in failed.items():
+                        self._pending[key] = (lines + self._pending.get(key, []))[-cap:]
+
+    def close(self) -> None:
+        self._closed = True
+        self._wakeup.set()
+        self.flush()
+
+    def _run_writer(self) -> None:
+        while not self._closed:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.debug("Background archive flush failed", exc_info=True)
+
+    @contextlib.contextmanager
+    def _file_lock(self) -> Iterator[None]:
+        """Exclusive lock shared by every process writing segments under ``root``."""
+        if fcntl is None:
+            yield
+            return
+        with open(self.root / self._LOCK_NAME, "a") as handle:
+            fcntl.flock(handle, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+
+    def _compact(self, path: Path) -> int:
+        """
+        Rewrite a segment with only its newest ``keep`` records (atomic rename).
+
+        Called with the file lock held, so no other process appends to the
+        segment between reading its tail and replacing it.
+        """
+        lines = self._read_tail_lines(path, self.keep)
+        tmp_path = path.with_suffix(".jsonl.tmp")
+        try:
+            tmp_path.write_text("".join(line + "\n" for line in lines), encoding="utf-8")
+            os.replace(tmp_path, path)
+        except OSError as exc:
+            logger.debug("Archive compaction failed for %s: %s", path, exc)
+            return self._count_lines(path)
+        return len(lines)
+
+    @staticmethod
+    def _count_lines(path: Path) -> int:
+        try:
+            with open(path, "rb") as handle:
+                return sum(chunk.count(b"\n") for chunk in iter(lambda: handle.read(1 << 16), b""))
+        except OSError:
+            return 0
+
+    @classmethod
+    def _read_tail_lines(cls, path: Path, limit: int) -> List[str]:
+        """Read the last ``limit`` lines by seeking backwards from EOF."""
+        try:
+            with open(path, "rb") as handle:
+                handle.seek(0, os.SEEK_END)
+                position = handle.tell()
+                buffer = b""
+                while position > 0 and buffer.count(b"\n") <= limit:
+                    step = min(cls._READ_BLOCK, position)
+                    position -= step
+                    handle.seek(position)
+                    buffer = handle.read(step) + buffer
+        except OSError:
+            return []
+        lines = [line for line in buffer.decode("utf-8", errors="replace").splitlines() if line.strip()]
+        return lines[-limit:]
+
+
+_LIVE_LOGS: "weakref.WeakSet[AppendOnlyLog]" = weakref.WeakSet()
+
+
+@atexit.register
+def _flush_live_logs() -> None:
+    for log in list(_LIVE_LOGS):
+        try:
+            log.close()
+        except Exception:
+            pass
+
+
 class ConversationArchive:
     """Stores compact conversation summaries for long-running research threads."""
 
@@ -52,24 +271,51 @@ class ConversationArchive:
         root: Optional[Path] = None,
         enabled: Optional[bool] = None,
         max_entries: int = 30,
+        flush_interval: float = 0.5,
     ) -> None:
         self.enabled = True if enabled is None else bool(enabled)
         self.max_entries = max(1, max_entries)
         env_root = os.getenv("CITE_AGENT_ARCHIVE_DIR")
         final_root = root or Path(env_root) if env_root else root
         self.root = Path(final_root or (Path.home() / ".cite_agent" / "conversation_archive"))
+        self._log: Optional[AppendOnlyLog] = None
+        self._migrated: set = set()
         if self.enabled:
-            self.root.mkdir(parents=True, exist_ok=True)
+            self._log = AppendOnlyLog(self.root, keep=self.max_entries, flush_interval=flush_interval)
 
     @staticmethod
     def _hash_identifier(identifier: str) -> str:
         digest = hashlib.sha256(identifier.encode("utf-8")).hexdigest()
         return digest[:16]
 
-    def _conversation_path(self, user_id: str, conversation_id: str) -> Path:
+    def _conversation_key(self, user_id: str, conversation_id: str) -> str:
         user_hash = self._hash_identifier(user_id or "anonymous")
         convo_hash = self._hash_identifier(conversation_id or "default")
-        return self.root / f"{user_hash}-{convo_hash}.json"
+        key = f"{user_hash}-{convo_hash}"
+        self._migrate_legacy(key)
+        return key
+
+    def _migrate_legacy(self, key: str) -> None:
+        """Convert a pre-JSONL ``<key>.json`` archive into a log segment once."""
+        if key in self._migrated:
+            return
+        self._migrated.add(key)
+        legacy = self.root / f"{key}.json"
+        if not legacy.exists():
+            return
+        try:
+            data = json.loads(legacy.read_text(encoding="utf-8"))
+            entries = [ArchiveEntry.from_dict(item) for item in data] if isinstance(data, list) else []
+        except Exception:
+            entries = []
+        segment = self._log.segment_path(key)
+        try:
+            with open(segment, "a", encoding="utf-8") as handle:
+                for item in entries[-self.max_entries:]:
+                    handle.write(json.dumps(item.to_dict(), ensure_ascii=False) + "\n")
+            legacy.unlink()
+        except OSError as exc:
+            logger.debug("Archive migration failed for %s: %s", legacy, exc)
 
     def record_entry(
         self,
@@ -90,21 +336,7 @@ class ConversationArchive:
             tools_used=list(tools_used or []),
             citations=list(citations or []) or None,
         )
-
-        path = self._conversation_path(user_id, conversation_id)
-        entries: List[ArchiveEntry] = []
-        if path.exists():
-            try:
-                data = json.loads(path.read_text(encoding="utf-8"))
-                entries = [ArchiveEntry.from_dict(item) for item in data]
-            except Exception:
-                entries = []
-
-        entries.append(entry)
-        entries = entries[-self.max_entries:]
-
-        serialized = [item.to_dict() for item in entries]
-        path.write_text(json.dumps(serialized, indent=2), encoding="utf-8")
+        self._log.append(self._conversation_key(user_id, conversation_id), entry.to_dict())
 
     def get_recent_context(
         self,
@@ -115,19 +347,8 @@ class ConversationArchive:
         if not self.enabled:
             return ""
 
-        path = self._conversation_path(user_id, conversation_id)
-        if not path.exists():
-            return ""
-
-        try:
-            data = json.loads(path.read_text(encoding="utf-8"))
-        except Exception:
-            return ""
-
-        if not isinstance(data, list):
-            return ""
-
-        entries = [ArchiveEntry.from_dict(item) for item in data][-max(1, limit):]
+        records = self._log.tail(self._conversation_key(user_id, conversation_id), max(1, limit))
+        entries = [ArchiveEntry.from_dict(item) for item in records if isinstance(item, dict)]
         if not entries:
             return ""
 
@@ -142,11 +363,78 @@ class ConversationArchive:
     def clear_conversation(self, user_id: str, conversation_id: str) -> None:
         if not self.enabled:
             return
-        path = self._conversation_path(user_id, conversation_id)
-        if path.exists():
-            path.unlink()
+        self._log.delete(self._conversation_key(user_id, conversation_id))
 
     def list_conversations(self) -> List[str]:
         if not self.enabled or not self.root.exists():
             return []
-        return [p.name for p in self.root.glob("*.json")]
+        return [f"{key}.jsonl" for key in self._log.keys()]
+
+    def flush(self) -> None:
+        if self._log:
+            self._log.flush()
+
+
+class ConversationMemoryStore:
+    """
+    Short-term interaction memory shared across CLI processes.
+
+    Replaces the per-turn rewrite of ``memory_cache/<conversation>.json`` with
+    an append-only segment per conversation; loading reads only the tail.
+    """
+
+    def __init__(
+        self,
+        root: Optional[Path] = None,
+        max_interactions: int = 10,
+        flush_interval: float = 0.5,
+    ) -> None:
+        self.root = Path(root or (Path.home() / ".cite_agent" / "memory_cache"))
+        self.max_interactions = max(1, max_interactions)
+        self._log = AppendOnlyLog(self.root, keep=self.max_interactions, flush_interval=flush_interval)
+        self._migrated: set = set()
+
+    def _key(self, user_id: str, conversation_id: str) -> str:
+        key = ConversationArchive._hash_identifier(f"{user_id or 'anonymous'}:{conversation_id or 'default'}")
+        self._migrate_legacy(key, user_id, conversation_id)
+        return key
+
+    def _migrate_legacy(self, key: str, user_id: str, conversation_id: str) -> None:
+        if key in self._migrated:
+            return
+        self._migrated.add(key)
+        legacy = self.root / f"{conversation_id}.json"
+        if not conversation_id or not legacy.exists():
+            return
+        try:
+            data = json.loads(legacy.read_text())
+            if data.get("user_id") == user_id:
+                timestamp = data.get("last_updated") or datetime.now(timezone.utc).isoformat()
+                for interaction in data.get("interactions", [])[-self.max_interactions:]:
+                    self._log.append(key, {"timestamp": timestamp, "interaction": interaction})
+            legacy.unlink()
+        except Exception as exc:
+            logger.debug("Memory migration failed for %s: %s", legacy, exc)
+
+    def append(self, user_id: str, conversation_id: str, interaction: str) -> None:
+        self._log.append(
+            self._key(user_id, conversation_id),
+            {"timestamp": datetime.now(timezone.utc).isoformat(), "interaction": interaction},
+        )
+
+    def load(self, user_id: str, conversation_id: str, max_age_hours: float = 24.0) -> Optional[List[str]]:
+        """Return recent interactions, or None if there are none fresher than ``max_age_hours``."""
+        records = self._log.tail(self._key(user_id, conversation_id), self.max_interactions)
+        if not records:
+            return None
+        try:
+            last_updated = datetime.fromisoformat(records[-1]["timestamp"])
+        except (KeyError, TypeError, ValueError):
+            return None
+        age_hours = (datetime.now(timezone.utc) - last_updated).total_seconds() / 3600
+        if age_hours > max_age_hours:
+            return None
+        return [record.get("interaction", "") for record in records]
+
+    def flush(self) -> None:
+        self._log.flush()
@@ -12,10 +12,11 @@ Automatically detect:
 The "magical" part: Smart suggestions for fixing issues.
 """
 
+import warnings
+
 import pandas as pd
 import numpy as np
 from typing import Dict, Any, List, Optional, Tuple
-from scipy import stats
 from dataclasses import dataclass
 
 
@@ -31,13 +32,119 @@ class DataQualityIssue:
     auto_fixable: bool
 
 
+# Object columns are first probed on this many non-null values; only columns
+# that look mostly numeric are then coerced in full
+PARSE_PROBE_SIZE = 1000
+PARSE_PROBE_MIN_RATE = 0.5
+
+
+@dataclass
+class DataScan:
+    """Per-column statistics gathered in one vectorized pass over a DataFrame"""
+    missing_mask: pd.DataFrame  # rows × columns, True where missing
+    missing_counts: pd.Series
+    numeric_columns: List[str]
+    numeric_values: np.ndarray  # rows × numeric columns as float64 (NaN = missing)
+    numeric_stats: pd.DataFrame  # numeric columns × count/mean/std/q05/q25/median/q75/q95/skew
+    numeric_coercions: Dict[str, pd.Series]  # object column -> pd.to_numeric(errors='coerce')
+    fully_numeric_objects: List[str]
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> "DataScan":
+        missing_mask = df.isna()
+        numeric_columns = df.select_dtypes(include=[np.number]).columns.tolist()
+        values = df[numeric_columns].to_numpy(dtype=float, na_value=np.nan)
+
+        with np.errstate(invalid='ignore', divide='ignore'), warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            counts = (~np.isnan(values)).sum(axis=0)
+            mean = np.nanmean(values, axis=0)
+            centered = values - mean
+            m2 = np.nanmean(centered ** 2, axis=0)
+            m3 = np.nanmean(centered ** 3, axis=0)
+            # Population moments match scipy.stats.zscore / scipy.stats.skew defaults
+            skew = np.where(m2 > 0, m3 / m2 ** 1.5, np.nan)
+            # np.quantile handles complete columns in one sort; nanquantile only where needed
+            probs = [0.05, 0.25, 0.5, 0.75, 0.95]
+            quantiles = np.full((len(probs), len(numeric_columns)), np.nan)
+            if len(values):
+                complete = counts == len(values)
+                quantiles[:, complete] = np.quantile(values[:, complete], probs, axis=0)
+                partial = ~complete
+                if partial.any():
+                    quantiles[:, partial] = np.nanquantile(values[:, partial], probs, axis=0)
+
+        numeric_stats = pd.DataFrame({
+            "count": counts,
+            "mean": mean,
+            "std": np.sqrt(m2),
+            "q05": quantiles[0],
+            "q25": quantiles[1],
+            "median": quantiles[2],
+            "q75": quantiles[3],
+            "q95": quantiles[4],
+            "skew": skew,
+        }, index=numeric_columns)
+
+        # Object columns: cheap parse-rate probe on a sample, full coercion only when promising
+        coercions: Dict[str, pd.Series] = {}
+        fully_numeric: List[str] = []
+        text_columns = [
+            col for col, dtype in df.dtypes.items()
+            if pd.api.types.is_object_dtype(dtype) or pd.api.types.is_string_dtype(dtype)
+        ]
+        for col in text_columns:
+            series = df[col]
+            probe = series.dropna().head(PARSE_PROBE_SIZE)
+            if len(probe) and pd.to_numeric(probe, errors='coerce').notna().mean() < PARSE_PROBE_MIN_RATE:
+                continue
+            coerced = pd.to_numeric(series, errors='coerce')
+            coercions[col] = coerced
+            if not (coerced.isna() & series.notna()).any():
+                fully_numeric.append(col)
+
+        return cls(
+            missing_mask=missing_mask,
+            missing_counts=missing_mask.sum(),
+            numeric_columns=numeric_columns,
+            numeric_values=values,
+            numeric_stats=numeric_stats,
+            numeric_coercions=coercions,
+            fully_numeric_objects=fully_numeric,
+        )
+
+    def outlier_mask(self, iqr_multiplier: float = 1.5, z_threshold: Optional[float] = 3.0) -> np.ndarray:
+        """rows × numeric columns mask of IQR (and optionally |z| > threshold) outliers"""
+        stats_ = self.numeric_stats
+        iqr = (stats_["q75"] - stats_["q25"]).to_numpy()
+        lower = stats_["q25"].to_numpy() - iqr_multiplier * iqr
+        upper = stats_["q75"].to_numpy() + iqr_multiplier * iqr
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mask = (self.numeric_values < lower) | (self.numeric_values > upper)
+            if z_threshold is not None:
+                z = np.abs(self.numeric_values - stats_["mean"].to_numpy()) / stats_["std"].to_numpy()
+                mask |= z > z_threshold
+        return mask
+
+
 class DataCleaningWizard:
     """Automatically detect and fix data quality issues"""
 
     def __init__(self, df: pd.DataFrame):
         self.df = df.copy()
-        self.original_df = df.copy()
+        # The wizard only ever modifies its own copy, so the caller's frame is the original
+        self.original_df = df
         self.issues: List[DataQualityIssue] = []
+        self._scan_cache: Optional[Tuple[pd.DataFrame, DataScan]] = None
+
+    def _scan(self) -> DataScan:
+        """Column statistics for the current frame, recomputed only after it changes"""
+        if self._scan_cache is None or self._scan_cache[0] is not self.df:
+            self._scan_cache = (self.df, DataScan.from_frame(self.df))
+        return self._scan_cache[1]
+
+    def _invalidate_scan(self):
+        self._scan_cache = None
 
     def scan_all_issues(self) -> Dict[str, Any]:
         """
@@ -47,13 +154,14 @@ class DataCleaningWizard:
             Report of all issues found
         """
         self.issues = []
+        scan = self._scan()
 
         # Check each type of issue
-        self._detect_missing_values()
+        self._detect_missing_values(scan)
         self._detect_duplicates()
-        self._detect_outliers()
-        self._detect_type_issues()
-        self._detect_distribution_issues()
+        self._detect_outliers(scan)
+        self._detect_type_issues(scan)
+        self._detect_distribution_issues(scan)
 
         # Categorize by severity
         high = [i for i in self.issues if i.severity == "high"]
@@ -81,13 +189,14 @@ class DataCleaningWizard:
             ]
         }
 
-    def _detect_missing_values(self):
+    def _detect_missing_values(self, scan: DataScan):
         """Detect missing values and suggest fixes"""
-        for col in self.df.columns:
-            missing_count = self.df[col].isna().sum()
+        index = self.df.index
+        numeric = set(scan.numeric_columns)
+        for position, (col, missing_count) in enumerate(scan.missing_counts.items()):
             if missing_count > 0:
                 missing_pct = (missing_count / len(self.df)) * 100
-                missing_idx = self.df[self.df[col].isna()].index.tolist()
+                missing_idx = index[scan.missing_mask.iloc[:, position].to_numpy()].tolist()
 
                 # Determine severity
                 if missing_pct > 50:
@@ -95,13 +204,13 @@ class DataCleaningWizard:
                     suggestion = f"Consider dropping column '{col}' (>{missing_pct:.1f}% missing)"
                 elif missing_pct > 20:
                     severity = "medium"
-                    if pd.api.types.is_numeric_dtype(self.df[col]):
+                    if col in numeric:
                         suggestion = f"Impute with median or mean, or use predictive imputation"
                     else:
                         suggestion = f"Impute with mode or create 'Missing' category"
                 else:
                     severity = "low"
-                    if pd.api.types.is_numeric_dtype(self.df[col]):
+                    if col in numeric:
                         suggestion = f"Impute with median (recommended for <20% missing)"
                     else:
                         suggestion = f"Impute with mode or most frequent value"
@@ -118,46 +227,32 @@ class DataCleaningWizard:
 
     def _detect_duplicates(self):
         """Detect duplicate rows"""
-        duplicates = self.df[self.df.duplicated(keep=False)]
-        if len(duplicates) > 0:
-            dup_idx = duplicates.index.tolist()
-            unique_dups = self.df[self.df.duplicated(keep='first')].index.tolist()
+        duplicated_any = self.df.duplicated(keep=False).to_numpy()
+        if duplicated_any.any():
+            dup_idx = self.df.index[duplicated_any].tolist()
+            unique_dups = int(self.df.duplicated(keep='first').sum())
 
             self.issues.append(DataQualityIssue(
                 issue_type="duplicates",
                 severity="medium",
                 column=None,
                 row_indices=dup_idx,
-                description=f"{len(unique_dups)} duplicate rows found ({len(dup_idx)} total including originals)",
+                description=f"{unique_dups} duplicate rows found ({len(dup_idx)} total including originals)",
                 suggestion="Remove duplicates using drop_duplicates(). Keep first occurrence.",
                 auto_fixable=True
             ))
 
-    def _detect_outliers(self):
+    def _detect_outliers(self, scan: DataScan):
         """Detect outliers using IQR and Z-score methods"""
-        numeric_cols = self.df.select_dtypes(include=[np.number]).columns
-
-        for col in numeric_cols:
-            data = self.df[col].dropna()
+        # IQR fences and |z| > 3 for every numeric column at once
+        outlier_mask = scan.outlier_mask(iqr_multiplier=1.5, z_threshold=3.0)
+        counts = scan.numeric_stats["count"].to_numpy()
 
-            if len(data) < 10:
+        for position, col in enumerate(scan.numeric_columns):
+            if counts[position] < 10:
                 continue  # Skip if too few values
 
-            # IQR method
-            Q1 = data.quantile(0.25)
-            Q3 = data.quantile(0.75)
-            IQR = Q3 - Q1
-            lower_bound = Q1 - 1.5 * IQR
-            upper_bound = Q3 + 1.5 * IQR
-
-            outliers_iqr = self.df[(self.df[col] < lower_bound) | (self.df[col] > upper_bound)].index.tolist()
-
-            # Z-score method (>3 std devs from mean)
-            z_scores = np.abs(stats.zscore(data))
-            outliers_zscore = data[z_scores > 3].index.tolist()
-
-            # Combine both methods
-            outliers = list(set(outliers_iqr + outliers_zscore))
+            outliers = self.df.index[outlier_mask[:, position]].tolist()
 
             if outliers:
                 outlier_pct = (len(outliers) / len(self.df)) * 100
@@ -174,69 +269,58 @@ class DataCleaningWizard:
                     auto_fixable=False  # Requires judgment
                 ))
 
-    def _detect_type_issues(self):
+    def _detect_type_issues(self, scan: DataScan):
         """Detect columns with wrong data types"""
-        for col in self.df.columns:
-            # Check if numeric column stored as string
-            if self.df[col].dtype == 'object':
-                # Try converting to numeric
-                try:
-                    pd.to_numeric(self.df[col], errors='raise')
-                    # If successful, it's a type issue
-                    self.issues.append(DataQualityIssue(
-                        issue_type="type_mismatch",
-                        severity="medium",
-                        column=col,
-                        row_indices=None,
-                        description=f"Column '{col}' contains numeric data but stored as text/object",
-                        suggestion=f"Convert to numeric: df['{col}'] = pd.to_numeric(df['{col}'])",
-                        auto_fixable=True
-                    ))
-                except (ValueError, TypeError):
-                    # Mixed types - check if mostly numeric
-                    numeric_count = pd.to_numeric(self.df[col], errors='coerce').notna().sum()
-                    total_count = self.df[col].notna().sum()
-
-                    if numeric_count / total_count > 0.8:
-                        non_numeric_idx = pd.to_numeric(self.df[col], errors='coerce').isna() & self.df[col].notna()
-                        problem_rows = self.df[non_numeric_idx].index.tolist()
-
-                        self.issues.append(DataQualityIssue(
-                            issue_type="mixed_types",
-                            severity="high",
-                            column=col,
-                            row_indices=problem_rows,
-                            description=f"Column '{col}' is mostly numeric but has {len(problem_rows)} non-numeric values",
-                            suggestion=f"Clean non-numeric values, then convert to numeric",
-                            auto_fixable=False
-                        ))
-
-    def _detect_distribution_issues(self):
-        """Detect skewed distributions that might need transformation"""
-        numeric_cols = self.df.select_dtypes(include=[np.number]).columns
-
-        for col in numeric_cols:
-            data = self.df[col].dropna()
-
-            if len(data) < 30:
-                continue  # Need sufficient sample size
+        for col, coerced in scan.numeric_coercions.items():
+            # Numeric column stored as string
+            if col in scan.fully_numeric_objects:
+                self.issues.append(DataQualityIssue(
+                    issue_type="type_mismatch",
+                    severity="medium",
+                    column=col,
+                    row_indices=None,
+                    description=f"Column '{col}' contains numeric data but stored as text/object",
+                    suggestion=f"Convert to numeric: df['{col}'] = pd.to_numeric(df['{col}'])",
+                    auto_fixable=True
+                ))
+                continue
 
-            # Calculate skewness
-            skewness = stats.skew(data)
+            # Mixed types - check if mostly numeric
+            present = self.df[col].notna()
+            numeric_count = coerced.notna().sum()
+            total_count = present.sum()
 
-            if abs(skewness) > 1.0:
-                direction = "right" if skewness > 0 else "left"
+            if total_count and numeric_count / total_count > 0.8:
+                problem_rows = self.df.index[(coerced.isna() & present).to_numpy()].tolist()
 
                 self.issues.append(DataQualityIssue(
-                    issue_type="skewed_distribution",
-                    severity="low",
+                    issue_type="mixed_types",
+                    severity="high",
                     column=col,
-                    row_indices=None,
-                    description=f"Column '{col}' is highly {direction}-skewed (skewness={skewness:.2f})",
-                    suggestion=f"Consider log transformation" if direction == "right" else "Consider reflection + log transform",
-                    auto_fixable=True
+                    row_indices=problem_rows,
+                    description=f"Column '{col}' is mostly numeric but has {len(problem_rows)} non-numeric values",
+                    suggestion=f"Clean non-numeric values, then convert to numeric",
+                    auto_fixable=False
                 ))
 
+    def _detect_distribution_issues(self, scan: DataScan):
+        """Detect skewed distributions that might need transformation"""
+        stats_ = scan.numeric_stats
+        candidates = stats_[(stats_["count"] >= 30) & (stats_["skew"].abs() > 1.0)]
+
+        for col, skewness in candidates["skew"].items():
+            direction = "right" if skewness > 0 else "left"
+
+            self.issues.append(DataQualityIssue(
+                issue_type="skewed_distribution",
+                severity="low",
+                column=col,
+                row_indices=None,
+                description=f"Column '{col}' is highly {direction}-skewed (skewness={skewness:.2f})",
+                suggestion=f"Consider log transformation" if direction == "right" else "Consider reflection + log transform",
+                auto_fixable=True
+            ))
+
     def auto_fix_issues(self, fix_types: Optional[List[str]] = None) -> Dict[str, Any]:
         """
         Automatically fix fixable issues
@@ -251,6 +335,9 @@ class DataCleaningWizard:
             fix_types = ["missing_values", "duplicates", "type_mismatch", "skewed_distribution"]
 
         fixes_applied = []
+        # Medians from the scan that produced self.issues, unless rows change below
+        scan = self._scan()
+        medians = scan.numeric_stats["median"]
 
         # Fix duplicates
         if "duplicates" in fix_types:
@@ -258,6 +345,7 @@ class DataCleaningWizard:
             self.df = self.df.drop_duplicates()
             after = len(self.df)
             if before != after:
+                medians = self.df[scan.numeric_columns].median()
                 fixes_applied.append({
                     "type": "duplicates",
                     "description": f"Removed {before - after} duplicate rows"
@@ -268,8 +356,8 @@ class DataCleaningWizard:
             for issue in self.issues:
                 if issue.issue_type == "missing_values" and issue.auto_fixable:
                     col = issue.column
-                    if pd.api.types.is_numeric_dtype(self.df[col]):
-                        median_val = self.df[col].median()
+                    if col in medians.index:
+                        median_val = medians[col]
                         self.df[col] = self.df[col].fillna(median_val)
                         fixes_applied.append({
                             "type": "missing_values",
@@ -311,6 +399,8 @@ class DataCleaningWizard:
                             "description": f"Created log-transformed column '{col}_log'"
                         })
 
+        self._invalidate_scan()
+
         return {
             "success": True,
             "fixes_applied": len(fixes_applied),
@@ -341,6 +431,7 @@ class DataCleaningWizard:
                 "message": "No missing values found"
             }
         
+        self._invalidate_scan()
         try:
             if method == "median":
                 if pd.api.types.is_numeric_dtype(self.df[column]):
@@ -425,6 +516,8 @@ class DataCleaningWizard:
         if missing_before == 0:
             return {"error": f"No missing values in column '{column}'"}
 
+        self._invalidate_scan()
+
         if method == "knn":
             # Use KNN imputer on numeric columns only
             numeric_cols = self.df.select_dtypes(include=[np.number]).columns.tolist()
@@ -494,34 +587,40 @@ class DataCleaningWizard:
         if column not in self.df.columns:
             return {"error": f"Column '{column}' not found"}
 
-        if not pd.api.types.is_numeric_dtype(self.df[column]):
+        scan = self._scan()
+        if column not in scan.numeric_stats.index:
             return {"error": f"Column '{column}' must be numeric"}
 
-        data = self.df[column].dropna()
+        # Quartiles, moments and percentiles come from the cached scan
+        column_stats = scan.numeric_stats.loc[column]
+        values = self.df[column]
         before_count = len(self.df)
 
         if method == "iqr":
-            Q1 = data.quantile(0.25)
-            Q3 = data.quantile(0.75)
+            Q1 = column_stats["q25"]
+            Q3 = column_stats["q75"]
             IQR = Q3 - Q1
             lower_bound = Q1 - threshold * IQR
             upper_bound = Q3 + threshold * IQR
 
-            self.df = self.df[(self.df[column] >= lower_bound) & (self.df[column] <= upper_bound)]
+            # Missing values are not outliers; keep those rows
+            self.df = self.df[values.isna() | ((values >= lower_bound) & (values <= upper_bound))]
 
         elif method == "zscore":
-            z_scores = np.abs(stats.zscore(data))
-            self.df = self.df[np.abs(stats.zscore(self.df[column])) <= threshold]
+            std = column_stats["std"]
+            if std > 0:
+                z_scores = (values - column_stats["mean"]).abs() / std
+                self.df = self.df[values.isna() | (z_scores <= threshold)]
 
         elif method == "winsorize":
             # Cap at percentiles instead of removing
-            lower = self.df[column].quantile(0.05)
-            upper = self.df[column].quantile(0.95)
-            self.df[column] = self.df[column].clip(lower, upper)
+            self.df[column] = values.clip(column_stats["q05"], column_stats["q95"])
 
         else:
             return {"error": f"Unknown method: {method}"}
 
+        self._invalidate_scan()
+
         after_count = len(self.df)
         removed = before_count - after_count
 
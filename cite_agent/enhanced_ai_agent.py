@@ -19,7 +19,6 @@ import subprocess
 import time
 from importlib import resources
 
-import aiohttp
 from datetime import datetime, timezone
 from typing import Dict, Any, List, Optional, Tuple, Set
 from urllib.parse import urlparse
@@ -30,26 +29,56 @@ import textwrap
 
 from .telemetry import TelemetryManager
 from .setup_config import DEFAULT_QUERY_LIMIT
-from .conversation_archive import ConversationArchive
-from .tool_executor import ToolExecutor
+from .conversation_archive import ConversationArchive, ConversationMemoryStore
+from .tool_executor import DeferredDataAnalyzer, ToolExecutor
 from .timeout_retry_handler import TimeoutRetryHandler, RetryConfig
 from .workflow import WorkflowManager, Paper
+from .query_classifier import (
+    classify_query,
+    has_dataset_evidence,
+    COMPARISON_METRICS,
+    COMPARISON_WORDS,
+    FOUR_DIGITS_PATTERN,
+    MARKET_SHARE_SCOPES,
+    VAGUE_EXEMPT_RESEARCH,
+    YEAR_PATTERN,
+)
 
 # Infrastructure for production sophistication
 from .observability import ObservabilitySystem, EventType
 from .circuit_breaker import CircuitBreaker, CircuitBreakerConfig, CircuitState
+from .persistent_state import get_state_store
 from .request_queue import IntelligentRequestQueue, RequestPriority
+from .entity_linker import CompanyNameMatcher
+from .context_packer import ContextBudget, ContextPacker, estimate_tokens
+from .plan_executor import (
+    DEFAULT_MAX_WORKERS,
+    DEFAULT_STEP_TIMEOUT,
+    PlanExecutor,
+    StepOutcome,
+    critical_path_length,
+    merge_step_outputs,
+    plan_dependencies,
+    referenced_steps,
+)
 
 # Suppress noise
 logging.basicConfig(level=logging.ERROR)
 logger = logging.getLogger(__name__)
 
-# Groq import with graceful fallback (API keys unavailable/banned)
-# Used only in local mode fallback scenarios
-try:
-    from groq import Groq
-except ImportError:
-    Groq = None  # Graceful fallback - will log error if needed
+
+def _load_groq():
+    """
+    Groq client class, or None when the library is unavailable.
+
+    Imported on demand: it is only used in local mode fallback scenarios and
+    costs a few hundred milliseconds of startup otherwise.
+    """
+    try:
+        from groq import Groq
+    except ImportError:
+        return None
+    return Groq
 
 @dataclass
 class ChatRequest:
@@ -142,6 +171,11 @@ class EnhancedNocturnalAgent:
         self.conversation_history = []
         self.shell_session = None
         self.memory = {}
+        try:
+            context_tokens = int(os.getenv("NOCTURNAL_CONTEXT_TOKENS", 8000))
+        except (TypeError, ValueError):
+            context_tokens = 8000
+        self._context_packer = ContextPacker(ContextBudget(total=context_tokens))
         self.daily_token_usage = 0
         self.daily_limit = 100000
         self.daily_query_limit = self._resolve_daily_query_limit()
@@ -169,8 +203,11 @@ class EnhancedNocturnalAgent:
         
         # Workflow integration
         self.workflow = WorkflowManager()
+        # Optional UI hook called with a dict per finished multi-step plan step
+        self.workflow_step_callback = None
         self.last_paper_result = None  # Track last paper mentioned for "save that"
         self.archive = ConversationArchive()
+        self.memory_store = ConversationMemoryStore()
         
         # CRITICAL: Persistent usage database for cross-process tracking
         from .usage_database import get_usage_db
@@ -189,12 +226,8 @@ class EnhancedNocturnalAgent:
         self.tool_executor = None
 
         # DataAnalyzer for dataset persistence across queries (fallback if tool_executor unavailable)
-        self._data_analyzer = None
-        try:
-            from .research_assistant import DataAnalyzer
-            self._data_analyzer = DataAnalyzer()
-        except Exception:
-            pass  # Will use tool_executor._data_analyzer if available
+        # Built (and pandas imported) only once a dataset is actually loaded
+        self._data_analyzer = DeferredDataAnalyzer()
 
         # File context tracking (for pronoun resolution and multi-turn)
         self.file_context = {
@@ -222,6 +255,8 @@ class EnhancedNocturnalAgent:
         self.finsight_client = None
         self.session = None
         self.company_name_to_ticker = {}
+        self._company_matcher: Optional[CompanyNameMatcher] = None
+        self._company_matcher_source: Optional[Dict[str, str]] = None
 
         # Groq key rotation state
         self.api_keys: List[str] = []
@@ -250,6 +285,8 @@ class EnhancedNocturnalAgent:
 
         # Infrastructure for production sophistication
         self.observability = ObservabilitySystem()
+        # Breaker state is shared with other CLI processes via the persistent state store
+        breaker_state = get_state_store()
         self.circuit_breakers = {
             'backend': CircuitBreaker(
                 name="backend_api",
@@ -257,7 +294,8 @@ class EnhancedNocturnalAgent:
                     failure_threshold=0.6,
                     min_requests_for_decision=5,
                     open_timeout=30.0
-                )
+                ),
+                store=breaker_state
             ),
             'archive': CircuitBreaker(
                 name="archive_api",
@@ -265,7 +303,8 @@ class EnhancedNocturnalAgent:
                     failure_threshold=0.5,
                     min_requests_for_decision=3,
                     open_timeout=20.0
-                )
+                ),
+                store=breaker_state
             ),
             'financial': CircuitBreaker(
                 name="financial_api",
@@ -273,7 +312,8 @@ class EnhancedNocturnalAgent:
                     failure_threshold=0.5,
                     min_requests_for_decision=3,
                     open_timeout=20.0
-                )
+                ),
+                store=breaker_state
             )
         }
         self.request_queue = IntelligentRequestQueue(
@@ -724,6 +764,18 @@ class EnhancedNocturnalAgent:
 
         self.company_name_to_ticker = mapping
 
+    def _company_name_matcher(self) -> CompanyNameMatcher:
+        """Compiled matcher for company_name_to_ticker, built on first use"""
+        matcher = self._company_matcher
+        if matcher is None or self._company_matcher_source is not self.company_name_to_ticker:
+            matcher = CompanyNameMatcher.load_or_build(
+                self.company_name_to_ticker,
+                cache_dir=Path.home() / ".nocturnal_archive" / "cache",
+            )
+            self._company_matcher = matcher
+            self._company_matcher_source = self.company_name_to_ticker
+        return matcher
+
     def _ensure_environment_loaded(self):
         if self._env_loaded:
             return
@@ -1332,14 +1384,38 @@ class EnhancedNocturnalAgent:
             return True
         return normalized in {"pwd", "pwd?"}
 
-    def _format_api_results_for_prompt(self, api_results: Dict[str, Any]) -> str:
+    def _serialize_for_prompt(self, data: Any, max_tokens: int, query: str = "") -> str:
+        """JSON for the prompt, compressed to max_tokens keeping lines relevant to query"""
+        try:
+            serialized = json.dumps(data, indent=2)
+        except Exception:
+            serialized = str(data)
+        return self._context_packer.compress(serialized, max_tokens, query)
+
+    def _format_api_results_for_prompt(
+        self,
+        api_results: Dict[str, Any],
+        query: str = "",
+        max_tokens: Optional[int] = None
+    ) -> str:
         if not api_results:
             logger.info("🔍 DEBUG: _format_api_results_for_prompt called with EMPTY api_results")
             return "No API results yet."
 
+        if max_tokens is None:
+            max_tokens = self._context_packer.budget.allocate(0)["tools"]
+        compress = self._context_packer.compress
+
         # Special formatting for shell results to make them VERY clear
         if "shell_info" in api_results:
             shell_info = api_results["shell_info"]
+            other_results = {k: v for k, v in api_results.items() if k != "shell_info"}
+            # Raw outputs (and any other data) share the results budget
+            payload_fields = [
+                name for name in ("output", "error", "directory_contents", "search_results")
+                if name in shell_info
+            ]
+            field_tokens = max_tokens // max(1, len(payload_fields) + (1 if other_results else 0))
             formatted_parts = ["=" * 60]
             formatted_parts.append("🔧 SHELL COMMAND EXECUTION RESULTS (ALREADY EXECUTED)")
             formatted_parts.append("=" * 60)
@@ -1350,19 +1426,19 @@ class EnhancedNocturnalAgent:
 
             if "output" in shell_info:
                 formatted_parts.append(f"\n📤 Command output (THIS IS THE RESULT):")
-                formatted_parts.append(f"{shell_info['output']}")
+                formatted_parts.append(compress(str(shell_info['output']), field_tokens, query))
 
             if "error" in shell_info:
                 formatted_parts.append(f"\n❌ Error occurred:")
-                formatted_parts.append(f"{shell_info['error']}")
+                formatted_parts.append(compress(str(shell_info['error']), field_tokens, query))
 
             if "directory_contents" in shell_info:
                 formatted_parts.append(f"\n📂 Directory listing (THIS IS THE RESULT):")
-                formatted_parts.append(f"{shell_info['directory_contents']}")
+                formatted_parts.append(compress(str(shell_info['directory_contents']), field_tokens, query))
 
             if "search_results" in shell_info:
                 formatted_parts.append(f"\n🔍 Search results (THIS IS THE RESULT):")
-                formatted_parts.append(f"{shell_info['search_results']}")
+                formatted_parts.append(compress(str(shell_info['search_results']), field_tokens, query))
 
             formatted_parts.append("\n" + "=" * 60)
             formatted_parts.append("🚨 CRITICAL INSTRUCTION 🚨")
@@ -1376,12 +1452,8 @@ class EnhancedNocturnalAgent:
             formatted_parts.append("=" * 60)
 
             # Add other api_results
-            other_results = {k: v for k, v in api_results.items() if k != "shell_info"}
             if other_results:
-                try:
-                    serialized = json.dumps(other_results, indent=2)
-                except Exception:
-                    serialized = str(other_results)
+                serialized = self._serialize_for_prompt(other_results, field_tokens, query)
                 formatted_parts.append(f"\nOther data:\n{serialized}")
 
             return "\n".join(formatted_parts)
@@ -1464,12 +1536,11 @@ class EnhancedNocturnalAgent:
                 # Add other api_results
                 other_results = {k: v for k, v in api_results.items() if k != "research"}
                 if other_results:
-                    try:
-                        other_serialized = json.dumps(other_results, indent=2)
-                        paper_lines.append("\nOther data:")
-                        paper_lines.append(other_serialized)
-                    except Exception:
-                        paper_lines.append(f"\nOther data: {str(other_results)}")
+                    paper_tokens = estimate_tokens("\n".join(paper_lines))
+                    paper_lines.append("\nOther data:")
+                    paper_lines.append(self._serialize_for_prompt(
+                        other_results, max(max_tokens - paper_tokens, max_tokens // 4), query
+                    ))
 
                 return "\n".join(paper_lines)
 
@@ -1516,22 +1587,16 @@ class EnhancedNocturnalAgent:
             other_results = {k: v for k, v in api_results.items()
                            if k not in ("dataset_in_memory", "analysis_result", "dataset_loaded")}
             if other_results:
-                try:
-                    other_serialized = json.dumps(other_results, indent=2)
-                    formatted_parts.append(f"\nOther data:\n{other_serialized}")
-                except:
-                    formatted_parts.append(f"\nOther data: {str(other_results)}")
+                analysis_tokens = estimate_tokens("\n".join(formatted_parts))
+                other_serialized = self._serialize_for_prompt(
+                    other_results, max(max_tokens - analysis_tokens, max_tokens // 4), query
+                )
+                formatted_parts.append(f"\nOther data:\n{other_serialized}")
 
             return "\n".join(formatted_parts)
 
-        # Normal formatting for non-research results
-        try:
-            serialized = json.dumps(api_results, indent=2)
-        except Exception:
-            serialized = str(api_results)
-        max_len = 3000  # Aggressive limit to prevent token explosion
-        if len(serialized) > max_len:
-            serialized = serialized[:max_len] + "\n... (truncated for length)"
+        # Normal formatting for non-research results: keep the lines relevant to the question
+        serialized = self._serialize_for_prompt(api_results, max_tokens, query)
 
         # DEBUG: Log formatted results length and preview
         logger.info(f"🔍 DEBUG: _format_api_results_for_prompt returning {len(serialized)} chars")
@@ -1579,7 +1644,8 @@ class EnhancedNocturnalAgent:
         self,
         request_analysis: Dict[str, Any],
         memory_context: str,
-        api_results: Dict[str, Any]
+        api_results: Dict[str, Any],
+        query: str = ""
     ) -> str:
         sections: List[str] = []
         apis = request_analysis.get("apis", [])
@@ -1641,17 +1707,17 @@ class EnhancedNocturnalAgent:
         elif hasattr(self, '_data_analyzer') and self._data_analyzer:
             analyzer = self._data_analyzer
 
-        if analyzer and hasattr(analyzer, 'current_dataset') and analyzer.current_dataset is not None:
-            df = analyzer.current_dataset
+        if analyzer and analyzer.has_dataset:
+            overview = analyzer.dataset_overview()
             filepath = getattr(analyzer.dataset_info, 'filepath', 'unknown') if hasattr(analyzer, 'dataset_info') else 'unknown'
             # Include sample data for context
-            sample_str = df.head(5).to_string() if len(df) > 0 else "No data"
+            sample_str = overview["sample"].to_string() if overview["rows"] > 0 else "No data"
             dataset_context = (
                 f"\n📊 CURRENT DATASET LOADED:\n"
                 f"• File: {filepath}\n"
-                f"• Shape: {len(df)} rows × {len(df.columns)} columns\n"
-                f"• Columns: {list(df.columns)}\n"
-                f"• Data Types: {dict(df.dtypes.astype(str))}\n"
+                f"• Shape: {overview['rows']} rows × {len(overview['columns'])} columns\n"
+                f"• Columns: {overview['columns']}\n"
+                f"• Data Types: {overview['dtypes']}\n"
                 f"• Sample Data:\n{sample_str}\n\n"
                 f"• When user asks about data, groups, values → Use THIS loaded dataset\n"
                 f"• YOU HAVE THE DATA - answer based on the sample above\n\n"
@@ -1854,12 +1920,19 @@ class EnhancedNocturnalAgent:
 
         sections.append("\n".join(guidelines))
 
+        # Split what the instructions leave of the context budget between memory and results
+        allocation = self._context_packer.budget.allocate(
+            estimate_tokens("\n\n".join(sections)),
+            estimate_tokens(memory_context) if memory_context else 0,
+        )
+
         # Add memory context if available
         if memory_context:
-            sections.append("\nRecent context:\n" + memory_context.strip())
+            memory_text = self._context_packer.compress(memory_context.strip(), allocation["memory"], query)
+            sections.append("\nRecent context:\n" + memory_text)
 
         # Add API results if available
-        api_results_text = self._format_api_results_for_prompt(api_results)
+        api_results_text = self._format_api_results_for_prompt(api_results, query, allocation["tools"])
         if api_results_text.strip():
             sections.append("\nData available:\n" + api_results_text)
 
@@ -2463,6 +2536,7 @@ class EnhancedNocturnalAgent:
                         http_client=http_client
                     )
                 elif self.llm_provider == "groq":
+                    Groq = _load_groq()
                     if Groq is None:
                         logger.error("Groq provider requested but groq library not available (API keys unavailable/banned)")
                         return False
@@ -2511,6 +2585,7 @@ class EnhancedNocturnalAgent:
                         http_client=http_client
                     )
                 elif self.llm_provider == "groq":
+                    Groq = _load_groq()
                     if Groq is None:
                         logger.error("Groq provider requested but groq library not available (API keys unavailable/banned)")
                         return False
@@ -2664,35 +2739,18 @@ class EnhancedNocturnalAgent:
 
     def _extract_tickers_from_text(self, text: str) -> List[str]:
         """Find tickers either as explicit symbols or from known company names."""
-        text_lower = text.lower()
         # Explicit ticker-like symbols
-        ticker_candidates: List[str] = []
-        for token in re.findall(r"\b[A-Z]{1,5}(?:\d{0,2})\b", text):
-            ticker_candidates.append(token)
-        # Company name matches
-        for name, sym in self.company_name_to_ticker.items():
-            if name and name in text_lower:
-                ticker_candidates.append(sym)
+        ticker_candidates: List[str] = re.findall(r"\b[A-Z]{1,5}(?:\d{0,2})\b", text)
+        # Company name matches (word-boundary, longest match wins)
+        ticker_candidates.extend(match.ticker for match in self._company_name_matcher().find(text))
         # Deduplicate preserve order
-        seen = set()
-        ordered: List[str] = []
-        for t in ticker_candidates:
-            if t not in seen:
-                seen.add(t)
-                ordered.append(t)
-        return ordered[:4]
+        return list(dict.fromkeys(ticker_candidates))[:4]
 
     def _plan_financial_request(self, question: str, session_key: Optional[str] = None) -> Tuple[List[str], List[str]]:
         """Derive ticker and metric targets for a financial query."""
         tickers = list(self._extract_tickers_from_text(question))
         question_lower = question.lower()
 
-        if not tickers:
-            if "apple" in question_lower:
-                tickers.append("AAPL")
-            if "microsoft" in question_lower:
-                tickers.append("MSFT" if "AAPL" not in tickers else "MSFT")
-
         metrics_to_fetch: List[str] = []
         keyword_map = [
             ("revenue", ["revenue", "sales", "top line"]),
@@ -2805,7 +2863,9 @@ Available tools:
 Your task:
 1. Determine if this query needs MULTIPLE tools in SEQUENCE
 2. Identify which tools are needed and in what order
-3. Explain your reasoning
+3. For each step, list in "depends_on" the earlier step numbers whose results it uses
+   ([] when the step can run on its own - independent steps run in parallel)
+4. Explain your reasoning
 
 CRITICAL RULES FOR MULTI-STEP DETECTION:
 - If query contains "then", "after that", "next", "and then" → MUST BE SEQUENCING!
@@ -2837,12 +2897,20 @@ For MULTI-STEP queries:
     {{
       "tool": "financial",
       "query": "Get Apple's revenue",
+      "depends_on": [],
       "reason": "User wants Apple revenue from SEC filings (accurate financial data)"
     }},
+    {{
+      "tool": "research",
+      "query": "Find papers about supply chain resilience",
+      "depends_on": [],
+      "reason": "Independent literature search, does not need the revenue"
+    }},
     {{
       "tool": "analysis", 
-      "query": "Calculate mean from collegetown.csv",
-      "reason": "Need to calculate dataset mean to compare with revenue"
+      "query": "Compare Apple's revenue with the mean from collegetown.csv",
+      "depends_on": [1],
+      "reason": "Needs the revenue from step 1"
     }}
   ]
 }}
@@ -2901,6 +2969,7 @@ Output ONLY valid JSON, no other text:"""
                         {
                             "tool": task['type'],
                             "query": task['query'],
+                            "depends_on": task['depends_on'],
                             "reason": f"Pattern-based classification as {task['type']}"
                         }
                         for task in sequential_tasks
@@ -3007,100 +3076,84 @@ Output ONLY valid JSON, no other text:"""
     async def _execute_plan_from_llm(self, plan: Dict, original_request: ChatRequest) -> ChatResponse:
         """
         Execute the LLM-generated execution plan.
+
+        Independent steps run concurrently; a step waits only for the steps it
+        depends on (see plan_executor.plan_dependencies).
         """
         
         debug_mode = self.debug_mode
         steps = plan.get("steps", [])
+        dependencies = plan_dependencies(steps)
         
         if debug_mode:
-            print(f"\n🔀 Executing {len(steps)}-step workflow (LLM-planned)")
+            print(f"\n🔀 Executing {len(steps)}-step workflow (LLM-planned, "
+                  f"critical path {critical_path_length(dependencies)} steps)")
+            for i, step in enumerate(steps, 1):
+                after = ", ".join(str(d + 1) for d in sorted(dependencies[i - 1])) or "none"
+                print(f"📍 Step {i}/{len(steps)}: [{step['tool'].upper()}] {step['query']}")
+                print(f"   Reason: {step.get('reason', '')}")
+                print(f"   After steps: {after}")
+        
+        async def run_step(index: int, step: Dict, context: Dict) -> ChatResponse:
+            i = index + 1
+            tool = step['tool']
+            sub_request = ChatRequest(
+                question=step['query'],
+                context=original_request.context,
+                user_id=original_request.user_id,
+                conversation_id=original_request.conversation_id
+            )
+            
+            if tool == 'analysis' and context:
+                # Inject context from the steps this one depends on into code generation
+                enriched_query = step['query'] + "\n\n# Context from previous steps:\n"
+                # Include direct numeric values
+                for key, value in context.items():
+                    if not key.startswith('step_') and isinstance(value, (int, float)):
+                        enriched_query += f"# {key} = {value}\n"
+                # Include previous step results
+                for key, value in context.items():
+                    if key.startswith('step_'):
+                        step_num = key.replace('step_', '')
+                        step_response = value.get('response', '')
+                        enriched_query += f"# Step {step_num} result: {step_response.strip()[:200]}\n"
+                sub_request.question = enriched_query
+            
+            response = await self._dispatch_workflow_task(tool, sub_request, None, context)
+            
+            # Record this step's results for dependent steps
+            context[f'step_{i}'] = {
+                'type': tool,
+                'query': step['query'],
+                'response': response.response,
+                'api_results': response.api_results
+            }
+            
+            # Extract key values for next steps (e.g., AAPL_revenue)
+            if tool == 'financial' and response.api_results:
+                for key, value in response.api_results.items():
+                    context[key] = value
+            return response
+        
+        outcomes = await self._workflow_executor(run_step).run(steps, dependencies)
         
         results = []
-        context_data = {}
         all_tools_used = ["llm_planning"]
         total_tokens = 0
         errors_occurred = False
-        
-        for i, step in enumerate(steps, 1):
-            if debug_mode:
-                print(f"\n{'='*60}")
-                print(f"📍 Step {i}/{len(steps)}: [{step['tool'].upper()}]")
-                print(f"   Query: {step['query']}")
-                print(f"   Reason: {step['reason']}")
-                print(f"{'='*60}")
-            
-            try:
-                # Create sub-request
-                sub_request = ChatRequest(
-                    question=step['query'],
-                    context=original_request.context,
-                    user_id=original_request.user_id,
-                    conversation_id=original_request.conversation_id
-                )
-                
-                # Execute based on tool type
-                tool = step['tool']
-                
-                if tool == 'financial':
-                    response = await self._execute_financial_task(sub_request, None, context_data)
-                    
-                elif tool == 'research':
-                    response = await self._execute_research_task(sub_request, None, context_data)
-                    
-                elif tool == 'analysis':
-                    # Inject context from previous steps into code generation
-                    if context_data:
-                        enriched_query = step['query'] + "\n\n# Context from previous steps:\n"
-                        # Include direct numeric values
-                        for key, value in context_data.items():
-                            if not key.startswith('step_') and isinstance(value, (int, float)):
-                                enriched_query += f"# {key} = {value}\n"
-                        # Include previous step results
-                        for key, value in context_data.items():
-                            if key.startswith('step_'):
-                                step_num = key.replace('step_', '')
-                                step_response = value.get('response', '')
-                                enriched_query += f"# Step {step_num} result: {step_response.strip()[:200]}\n"
-                        sub_request.question = enriched_query
-                    
-                    response = await self._execute_analysis_task(sub_request, None, context_data)
-                    
-                elif tool == 'file':
-                    response = await self._execute_file_task(sub_request, None, context_data)
-                    
-                else:
-                    response = await self._execute_general_task(sub_request, None, context_data)
-                
+        for outcome in outcomes:
+            i = outcome.index + 1
+            tool = outcome.step['tool']
+            if outcome.ok:
                 # Collect results (preserve statistical notation like p<0.01** but remove markdown bold)
-                cleaned_response = self._clean_markdown_preserve_stats(response.response)
-                result_text = f"Step {i} [{tool}]: {cleaned_response}"
-                results.append(result_text)
-                
-                # Update context with this step's results
-                context_data[f'step_{i}'] = {
-                    'type': tool,
-                    'query': step['query'],
-                    'response': response.response,
-                    'api_results': response.api_results
-                }
-                
-                # Extract key values for next steps (e.g., AAPL_revenue)
-                if tool == 'financial' and response.api_results:
-                    for key, value in response.api_results.items():
-                        context_data[key] = value
-                
-                all_tools_used.extend(response.tools_used or [])
-                total_tokens += response.tokens_used or 0
-                
-                if debug_mode:
-                    self._safe_print(f"✅ Step {i} complete")
-                    
-            except Exception as e:
-                error_msg = f"Step {i} [{tool}]: ⚠️ Error: {str(e)}"
-                results.append(error_msg)
+                cleaned_response = self._clean_markdown_preserve_stats(outcome.result.response)
+                results.append(f"Step {i} [{tool}]: {cleaned_response}")
+                all_tools_used.extend(outcome.result.tools_used or [])
+                total_tokens += outcome.result.tokens_used or 0
+            else:
+                results.append(f"Step {i} [{tool}]: ⚠️ Error: {outcome.error}")
                 errors_occurred = True
-                if debug_mode:
-                    self._safe_print(f"❌ Step {i} failed: {e}")
+        context_data = merge_step_outputs(outcomes)
         
         # Combine results
         combined_response = "\n\n".join(results)
@@ -3120,11 +3173,74 @@ Output ONLY valid JSON, no other text:"""
             reasoning_steps=[f"Step {i}: {s['reason']}" for i, s in enumerate(steps, 1)]
         )
     
-    def _decompose_sequential_query(self, query: str) -> List[Dict[str, str]]:
+    async def _dispatch_workflow_task(
+        self,
+        tool: str,
+        request: ChatRequest,
+        session_key: Optional[str],
+        context: Dict
+    ) -> ChatResponse:
+        """Route one workflow step to the executor for its tool type"""
+        if tool == 'financial':
+            return await self._execute_financial_task(request, session_key, context)
+        if tool == 'research':
+            return await self._execute_research_task(request, session_key, context)
+        if tool == 'analysis':
+            return await self._execute_analysis_task(request, session_key, context)
+        if tool == 'file':
+            return await self._execute_file_task(request, session_key, context)
+        # General query - use normal chat
+        return await self._execute_general_task(request, session_key, context)
+    
+    def _workflow_executor(self, run_step) -> PlanExecutor:
+        """Plan executor configured from the environment, reporting each finished step"""
+        try:
+            max_workers = int(os.getenv("NOCTURNAL_PLAN_WORKERS", DEFAULT_MAX_WORKERS))
+        except ValueError:
+            max_workers = DEFAULT_MAX_WORKERS
+        try:
+            step_timeout = float(os.getenv("NOCTURNAL_STEP_TIMEOUT", DEFAULT_STEP_TIMEOUT))
+        except ValueError:
+            step_timeout = DEFAULT_STEP_TIMEOUT
+        return PlanExecutor(
+            run_step,
+            max_workers=max_workers,
+            step_timeout=step_timeout or None,
+            on_step_complete=self._report_workflow_step,
+        )
+    
+    async def _report_workflow_step(self, outcome: StepOutcome) -> None:
+        """Stream a finished step to the UI callback (if any) as soon as it completes"""
+        i = outcome.index + 1
+        if self.debug_mode:
+            if outcome.ok:
+                self._safe_print(f"✅ Step {i} complete ({outcome.elapsed:.1f}s)")
+            else:
+                self._safe_print(f"❌ Step {i} failed: {outcome.error}")
+        
+        callback = self.workflow_step_callback
+        if callback is None:
+            return
+        update = {
+            "step": i,
+            "tool": outcome.step.get('tool') or outcome.step.get('type'),
+            "query": outcome.step.get('query', ''),
+            "status": "completed" if outcome.ok else ("timeout" if outcome.timed_out else "error"),
+            "response": outcome.result.response if outcome.ok else None,
+            "error": outcome.error,
+            "elapsed": round(outcome.elapsed, 3),
+        }
+        result = callback(update)
+        if asyncio.iscoroutine(result):
+            await result
+    
+    def _decompose_sequential_query(self, query: str) -> List[Dict[str, Any]]:
         """
         Decompose multi-step queries into sequential subtasks.
         
-        Returns: List of {'type': str, 'query': str} dicts
+        Returns: List of {'type': str, 'query': str, 'step': int, 'depends_on': list} dicts;
+        a step depends on earlier ones only when it refers back to them
+        ("X, then plot it"), so independent clauses can run concurrently
         
         Tool types: 'financial', 'research', 'analysis', 'file', 'general'
         """
@@ -3165,14 +3281,15 @@ Output ONLY valid JSON, no other text:"""
                     tasks.append({
                         'type': task_type,
                         'query': part_clean,
-                        'step': i
+                        'step': i,
+                        'depends_on': referenced_steps(part_clean, i, task_type)
                     })
                 
                 return tasks
         
         # No sequential pattern detected - single task
         task_type = self._classify_query_type(query)
-        return [{'type': task_type, 'query': query, 'step': 1}]
+        return [{'type': task_type, 'query': query, 'step': 1, 'depends_on': []}]
     
     def _classify_query_type(self, query: str) -> str:
         """
@@ -3181,88 +3298,18 @@ Output ONLY valid JSON, no other text:"""
         CRITICAL: This is fallback only - LLM planning is primary.
         Be CONSERVATIVE - don't default to 'financial' unless explicit company/ticker mentioned.
         """
-        query_lower = query.lower()
-        
-        # Math/counting keywords (NEW - catch simple math queries)
-        math_keywords = ['count to', 'factorial', 'fibonacci', 'prime', 'even', 'odd',
-                        'divisible', 'multiply', 'divide', 'subtract', 'add']
-        
-        # Analysis keywords (CHECK FIRST - most specific)
-        analysis_keywords = ['calculate', 'compute', 'correlation', 'regression',
-                            'mean', 'average', 'median', 'std', 'variance', 
-                            'analyze', 'analyse', 'statistics', 'test', 'sum',
-                            'histogram', 'plot', 'sample size', 'power', 'mde']
-        
-        # Research keywords  
-        research_keywords = ['paper', 'research', 'study', 'publication', 'arxiv',
-                            'journal', 'cite', 'citation', 'author', 'abstract',
-                            'literature', 'scholar', 'doi', 'pubmed']
-        
-        # Financial keywords - MUST have company context
-        financial_keywords = ['revenue', 'profit', 'earnings', 'stock price', 
-                             'margin', 'eps', 'market cap', 'financial', 'nasdaq',
-                             'ticker', 'shares', 'dividend', 'p/e ratio', 'valuation']
-        
-        # Company/ticker indicators (required for financial)
-        company_indicators = ['apple', 'microsoft', 'google', 'tesla', 'amazon', 
-                             'aapl', 'msft', 'googl', 'tsla', 'amzn', 'nio',
-                             'company', 'corporation', 'inc', 'stock']
-        
-        # File operation keywords
-        file_keywords = ['read', 'write', 'file', 'list', 'directory', 'show',
-                        'display', 'open', 'save', '.txt', '.csv', '.json']
-        
-        # Web search keywords
-        web_keywords = ['search web', 'find online', 'google', 'search for', 'look up',
-                       'find information about', 'what is', 'who is', 'when', 'where']
-        
-        # Check in priority order
-        
-        # 1. Simple math queries → analysis (not financial!)
-        if any(kw in query_lower for kw in math_keywords):
-            return 'analysis'
-        
-        # 2. Analysis keywords
-        if any(kw in query_lower for kw in analysis_keywords):
-            # Only route to financial if BOTH financial keyword AND company context
-            has_financial = any(kw in query_lower for kw in financial_keywords)
-            has_company = any(kw in query_lower for kw in company_indicators)
-            if has_financial and has_company and not any(ext in query_lower for ext in ['.csv', '.txt', 'data', 'dataset']):
-                return 'financial'
-            return 'analysis'
-        
-        # 3. Research keywords → research (not financial!)
-        if any(kw in query_lower for kw in research_keywords):
-            return 'research'
-        
-        # 4. Web search keywords
-        if any(kw in query_lower for kw in web_keywords):
-            return 'web'
-        
-        # 5. Financial - ONLY if has both financial keyword AND company
-        if any(kw in query_lower for kw in financial_keywords):
-            has_company = any(kw in query_lower for kw in company_indicators)
-            if has_company:
-                return 'financial'
-            else:
-                # Financial keyword but no company → probably analysis
-                return 'analysis'
-        
-        # 6. File operations
-        if any(kw in query_lower for kw in file_keywords):
-            return 'file'
-        
-        # 7. Default to 'general' (NOT financial!)
-        return 'general'
+        # Priority order: math → analysis → research → web → financial (needs
+        # company context) → file → general
+        return classify_query(query).task_type
     
     async def _execute_sequential_workflow(
         self, 
-        tasks: List[Dict[str, str]], 
+        tasks: List[Dict[str, Any]], 
         original_request: ChatRequest,
         session_key: Optional[str]
     ) -> ChatResponse:
         """
-        Execute multiple tasks in sequence, passing context between them.
+        Execute multiple tasks, passing context from each task to those that depend on it.
         """
         debug_mode = os.getenv("NOCTURNAL_DEBUG", "0") == "1"
         
@@ -3271,69 +3318,48 @@ Output ONLY valid JSON, no other text:"""
             for task in tasks:
                 print(f"   Step {task['step']}: [{task['type']}] {task['query'][:60]}...")
         
+        # Workflow tasks use "type"; the plan executor reads "tool". Tasks
+        # without explicit dependencies are treated as a chain
+        steps = [
+            dict(task, tool=task['type'], depends_on=task.get('depends_on', [i] if i else []))
+            for i, task in enumerate(tasks)
+        ]
+        
+        async def run_step(index: int, step: Dict, context: Dict) -> ChatResponse:
+            sub_request = ChatRequest(
+                question=step['query'],
+                context=original_request.context,
+                user_id=original_request.user_id,
+                conversation_id=original_request.conversation_id
+            )
+            response = await self._dispatch_workflow_task(step['type'], sub_request, session_key, context)
+            
+            # Record this step's results for dependent steps
+            context[f'step_{index + 1}'] = {
+                'type': step['type'],
+                'query': step['query'],
+                'response': response.response,
+                'api_results': response.api_results
+            }
+            return response
+        
+        outcomes = await self._workflow_executor(run_step).run(steps)
+        
         results = []
-        context_data = {}  # Accumulate data for later steps
         all_tools_used = []
         total_tokens = 0
         workflow_errors = False
-        
-        for i, task in enumerate(tasks, 1):
-            if debug_mode:
-                print(f"\n{'='*60}")
-                print(f"📍 Executing Step {i}/{len(tasks)}: [{task['type'].upper()}]")
-                print(f"   Query: {task['query']}")
-                print(f"{'='*60}")
-            
-            try:
-                # Create sub-request
-                sub_request = ChatRequest(
-                    question=task['query'],
-                    context=original_request.context,
-                    user_id=original_request.user_id,
-                    conversation_id=original_request.conversation_id
-                )
-                
-                # Execute based on task type
-                if task['type'] == 'financial':
-                    response = await self._execute_financial_task(sub_request, session_key, context_data)
-                    
-                elif task['type'] == 'research':
-                    response = await self._execute_research_task(sub_request, session_key, context_data)
-                    
-                elif task['type'] == 'analysis':
-                    response = await self._execute_analysis_task(sub_request, session_key, context_data)
-                    
-                elif task['type'] == 'file':
-                    response = await self._execute_file_task(sub_request, session_key, context_data)
-                    
-                else:
-                    # General query - use normal chat
-                    response = await self._execute_general_task(sub_request, session_key, context_data)
-                
-                # Collect results
-                result_text = f"**Step {i}** [{task['type']}]: {response.response}"
-                results.append(result_text)
-                
-                # Update context with this step's results
-                context_data[f'step_{i}'] = {
-                    'type': task['type'],
-                    'query': task['query'],
-                    'response': response.response,
-                    'api_results': response.api_results
-                }
-                
-                all_tools_used.extend(response.tools_used or [])
-                total_tokens += response.tokens_used or 0
-                
-                if debug_mode:
-                    self._safe_print(f"✅ Step {i} complete: {len(response.response)} chars")
-                    
-            except Exception as e:
-                error_msg = f"**Step {i}** [{task['type']}]: ⚠️ Error: {str(e)}"
-                results.append(error_msg)
+        for outcome in outcomes:
+            i = outcome.index + 1
+            task_type = outcome.step['type']
+            if outcome.ok:
+                results.append(f"**Step {i}** [{task_type}]: {outcome.result.response}")
+                all_tools_used.extend(outcome.result.tools_used or [])
+                total_tokens += outcome.result.tokens_used or 0
+            else:
+                results.append(f"**Step {i}** [{task_type}]: ⚠️ Error: {outcome.error}")
                 workflow_errors = True
-                if debug_mode:
-                    self._safe_print(f"❌ Step {i} failed: {e}")
+        context_data = merge_step_outputs(outcomes)
         
         # Combine all results
         combined_response = "\n\n".join(results)
@@ -3465,6 +3491,43 @@ Output ONLY valid JSON, no other text:"""
             confidence_score=0.9
         )
     
+    def _dataframe_preamble(self, analyzer, code: str) -> Optional[str]:
+        """
+        Code that binds ``df`` to the loaded dataset ahead of generated analysis code.
+
+        A lazy (out-of-core) dataset is too large to read whole, so only the
+        columns ``code`` names are loaded; returns None if it names none.
+        """
+        filepath = getattr(analyzer.dataset_info, 'filepath', None) if hasattr(analyzer, 'dataset_info') else None
+        if not filepath:
+            return ""
+        from .lazy_dataset import pandas_read_code, referenced_columns  # Deferred: pulls in pandas
+        columns = None
+        if getattr(analyzer, 'is_lazy', False):
+            columns = referenced_columns(code, list(analyzer.dataset_info.column_names))
+            if not columns:
+                return None
+        return f"""import pandas as pd\ndf = {pandas_read_code(filepath, columns)}\n\n"""
+
+    @staticmethod
+    def _lazy_dataset_note(analyzer, rows: int) -> str:
+        """Prompt caveat for datasets too large to hold in memory (empty otherwise)"""
+        if not getattr(analyzer, 'is_lazy', False):
+            return ""
+        return (
+            f"\nNOTE: This file ({rows:,} rows) is too large to load whole. 'df' holds every row but only\n"
+            "the columns your code names as string literals, e.g. df['price'] - always name columns explicitly.\n"
+        )
+
+    @staticmethod
+    def _lazy_dataset_refusal(rows: int) -> str:
+        """Reply when generated code would need a whole out-of-core dataset"""
+        return (
+            f"This dataset has {rows:,} rows, too many to load into memory at once, and the generated "
+            "code did not name any of its columns. Ask about specific columns (for example, the mean of "
+            "'price') so only those are read."
+        )
+
     async def _execute_analysis_task(
         self,
         request: ChatRequest,
@@ -3497,18 +3560,18 @@ Output ONLY valid JSON, no other text:"""
         elif hasattr(self, '_data_analyzer') and self._data_analyzer:
             analyzer = self._data_analyzer
 
-        if analyzer and hasattr(analyzer, 'current_dataset') and analyzer.current_dataset is not None:
-            df = analyzer.current_dataset
-            sample_str = df.head(5).to_string() if len(df) > 0 else "No data"
+        if analyzer and analyzer.has_dataset:
+            overview = analyzer.dataset_overview()
+            sample_str = overview["sample"].to_string() if overview["rows"] > 0 else "No data"
             dataset_context_str = f"""
 
 IMPORTANT - DATASET ALREADY LOADED:
 The variable 'df' is ALREADY loaded in memory with this data:
-- Shape: {len(df)} rows × {len(df.columns)} columns
-- Columns: {list(df.columns)}
+- Shape: {overview['rows']} rows × {len(overview['columns'])} columns
+- Columns: {overview['columns']}
 - Sample data:
 {sample_str}
-
+{self._lazy_dataset_note(analyzer, overview['rows'])}
 YOU MUST USE THE EXISTING 'df' VARIABLE - DO NOT call pd.read_csv() or create fake sample data.
 Example: average = df['Math'].mean()  # Correct - uses loaded df
 WRONG: df = pd.read_csv('file.csv')  # Dataset already loaded!
@@ -3517,7 +3580,7 @@ WRONG: data = {{'col': [1,2,3]}}  # Fake data - use real df!
 
         # Generate and execute code
         # Build requirements based on whether dataset is loaded
-        if analyzer and hasattr(analyzer, 'current_dataset') and analyzer.current_dataset is not None:
+        if analyzer and analyzer.has_dataset:
             requirements = """Requirements:
 - The 'df' variable is ALREADY LOADED - DO NOT call pd.read_csv() or load data
 - Use the existing 'df' DataFrame variable for all operations
@@ -3563,7 +3626,9 @@ Output ONLY the Python code in ```python ``` blocks."""
         ]
         
         try:
-            code_response = self.client.chat.completions.create(
+            # Off the event loop so concurrent plan steps keep running
+            code_response = await asyncio.to_thread(
+                self.client.chat.completions.create,
                 model="llama-3.3-70b",
                 messages=code_gen_messages,
                 max_tokens=1000,
@@ -3585,11 +3650,11 @@ Output ONLY the Python code in ```python ``` blocks."""
                     print("="*60)
 
                 # If dataset is loaded, prepend dataframe loading code
-                if analyzer and hasattr(analyzer, 'current_dataset') and analyzer.current_dataset is not None:
-                    df = analyzer.current_dataset
-                    filepath = getattr(analyzer.dataset_info, 'filepath', None) if hasattr(analyzer, 'dataset_info') else None
-                    if filepath:
-                        df_loading_code = f"""import pandas as pd\ndf = pd.read_csv('{filepath}')\n\n"""
+                if analyzer and analyzer.has_dataset:
+                    df_loading_code = self._dataframe_preamble(analyzer, code_to_run)
+                    if df_loading_code is None:
+                        return self._quick_reply(request, self._lazy_dataset_refusal(analyzer.dataset_info.rows))
+                    if df_loading_code:
                         code_to_run = df_loading_code + code_to_run
 
                         # DEBUG: Log what we're actually executing
@@ -3863,7 +3928,7 @@ Output ONLY the Python code in ```python ``` blocks."""
                     if self.workflow.add_paper(new_paper):
                         added_titles.append(title)
                 if added_titles:
-                    library_path = str(self.workflow.library_dir)
+                    library_path = str(self.workflow.library_db)
                     context['library_add_count'] = len(added_titles)
                     return ChatResponse(
                         response=f"📚 Added {len(added_titles)} papers to your library at {library_path}:\n- " + "\n- ".join(added_titles),
@@ -3916,7 +3981,9 @@ Output ONLY the Python code in ```python ``` blocks."""
             {"role": "user", "content": request.question}
         ]
         
-        response = self.client.chat.completions.create(
+        # Off the event loop so concurrent plan steps keep running
+        response = await asyncio.to_thread(
+            self.client.chat.completions.create,
             model=self.model_name,
             messages=messages,
             max_tokens=500,
@@ -4238,6 +4305,8 @@ Output ONLY the Python code in ```python ``` blocks."""
                 # In Claude Code containers, HTTPS_PROXY is set to egress proxy at 21.0.0.99:15004
                 proxy_url = os.getenv("HTTPS_PROXY") or os.getenv("https_proxy")
 
+                import aiohttp  # Deferred: only needed once the agent talks to the backend
+
                 # Configure TCPConnector with ThreadedResolver for system DNS
                 connector = aiohttp.TCPConnector(
                     family=socket.AF_INET,       # Force IPv4
@@ -4286,6 +4355,35 @@ Output ONLY the Python code in ```python ``` blocks."""
             # Silently ignore update check failures
             pass
     
+    def _backend_query_request(self, query: str, conversation_history: Optional[List[Dict]] = None,
+                               api_results: Optional[Dict[str, Any]] = None) -> Tuple[Dict[str, Any], Dict[str, str]]:
+        """JSON payload and headers for the backend /query endpoints"""
+        # Detect language preference from stored state
+        language = getattr(self, 'language_preference', 'en')
+
+        # Build system instruction for language enforcement
+        system_instruction = ""
+        if language == 'zh-TW':
+            system_instruction = "CRITICAL: You MUST respond entirely in Traditional Chinese (繁體中文). Use Chinese characters (漢字), NOT pinyin romanization. All explanations, descriptions, and responses must be in Chinese characters."
+
+        # Build request with API context as separate field
+        payload = {
+            "query": query,  # Keep query clean
+            "conversation_history": conversation_history or [],
+            "api_context": api_results,  # Send API results separately
+            "model": "openai/gpt-oss-120b",  # PRODUCTION: 120B - best test results
+            "temperature": 0.2,  # Low temp for accuracy
+            "max_tokens": 4000,
+            "language": language,  # Pass language preference
+            "system_instruction": system_instruction if system_instruction else None  # Only include if set
+        }
+
+        headers = {
+            "Authorization": f"Bearer {self.auth_token}",
+            "Content-Type": "application/json"
+        }
+        return payload, headers
+
     async def call_backend_query(self, query: str, conversation_history: Optional[List[Dict]] = None, 
                                  api_results: Optional[Dict[str, Any]] = None, tools_used: Optional[List[str]] = None) -> ChatResponse:
         """
@@ -4311,32 +4409,9 @@ Output ONLY the Python code in ```python ``` blocks."""
             )
         
         try:
-            # Detect language preference from stored state
-            language = getattr(self, 'language_preference', 'en')
-            
-            # Build system instruction for language enforcement
-            system_instruction = ""
-            if language == 'zh-TW':
-                system_instruction = "CRITICAL: You MUST respond entirely in Traditional Chinese (繁體中文). Use Chinese characters (漢字), NOT pinyin romanization. All explanations, descriptions, and responses must be in Chinese characters."
-            
-            # Build request with API context as separate field
-            payload = {
-                "query": query,  # Keep query clean
-                "conversation_history": conversation_history or [],
-                "api_context": api_results,  # Send API results separately
-                "model": "openai/gpt-oss-120b",  # PRODUCTION: 120B - best test results
-                "temperature": 0.2,  # Low temp for accuracy
-                "max_tokens": 4000,
-                "language": language,  # Pass language preference
-                "system_instruction": system_instruction if system_instruction else None  # Only include if set
-            }
+            payload, headers = self._backend_query_request(query, conversation_history, api_results)
             
             # Call backend
-            headers = {
-                "Authorization": f"Bearer {self.auth_token}",
-                "Content-Type": "application/json"
-            }
-            
             url = f"{self.backend_api_url}/query/"
             
             async with self.session.post(url, json=payload, headers=headers, timeout=60) as response:
@@ -4483,6 +4558,61 @@ Output ONLY the Python code in ```python ``` blocks."""
                 error_message=str(e)
             )
     
+    async def call_backend_query_stream(self, query: str, conversation_history: Optional[List[Dict]] = None,
+                                        api_results: Optional[Dict[str, Any]] = None,
+                                        tools_used: Optional[List[str]] = None):
+        """
+        Stream an answer from the backend /query/stream endpoint
+        Yields text chunks as the provider generates them, so the first words
+        appear long before the full answer is done. Whenever the stream cannot
+        start (old backend, auth, quota, 503) this falls back to
+        call_backend_query, which owns those messages and retries.
+        """
+        if not self.auth_token or not self.session:
+            response = await self.call_backend_query(query, conversation_history, api_results, tools_used)
+            yield response.response
+            return
+
+        import aiohttp
+
+        payload, headers = self._backend_query_request(query, conversation_history, api_results)
+        url = f"{self.backend_api_url}/query/stream"
+        # No total deadline: long answers keep streaming as long as tokens keep arriving
+        timeout = aiohttp.ClientTimeout(total=None, sock_connect=15, sock_read=60)
+
+        streamed = False
+        try:
+            async with self.session.post(url, json=payload, headers=headers, timeout=timeout) as response:
+                if response.status == 200:
+                    async for raw_line in response.content:
+                        line = raw_line.strip()
+                        if not line:
+                            continue
+                        event = json.loads(line)
+                        if event.get("type") == "token" and event.get("content"):
+                            streamed = True
+                            yield event["content"]
+                        elif event.get("type") == "error":
+                            streamed = True
+                            yield f"\n\n⚠️ {event.get('detail', 'The response was interrupted.')}"
+                        elif event.get("type") == "done" and self.debug_mode:
+                            self._safe_print(
+                                f"🔍 stream done: provider={event.get('provider')} tokens={event.get('tokens_used')}"
+                            )
+                    if streamed:
+                        return
+                elif self.debug_mode:
+                    self._safe_print(f"🔍 /query/stream unavailable (HTTP {response.status}), falling back")
+        except Exception as e:
+            if streamed:
+                yield f"\n\n⚠️ Connection lost while streaming: {type(e).__name__}"
+                return
+            if self.debug_mode:
+                self._safe_print(f"🔍 /query/stream failed before first token: {e}")
+
+        response = await self.call_backend_query(query, conversation_history, api_results, tools_used)
+        yield response.response
+
     async def _call_files_api(
         self,
         method: str,
@@ -6102,89 +6232,28 @@ Concise query (max {max_length} chars):"""
     
     def _get_conversation_context_with_summary(self) -> List[Dict[str, str]]:
         """
-        Get conversation context with automatic summarization to prevent bloat.
-        
-        Strategy:
-        - Under 20 messages: Send everything
-        - 20-30 messages: Sliding window (last 20)
-        - Over 30 messages: Summary of old + last 20
-        
+        Get conversation context packed to the history token budget.
+
+        Recent turns are kept verbatim newest-first until the budget is used;
+        older turns are folded into a summary message. The cut point only
+        moves when the budget is exceeded, so the packed prefix (and its
+        summary) is reused across turns.
+
         Returns:
             List of message dicts ready for LLM
         """
-        MAX_RECENT_MESSAGES = 20
-        SUMMARIZE_THRESHOLD = 30
-        
-        # Phase 1: Under threshold, send everything
-        if len(self.conversation_history) <= MAX_RECENT_MESSAGES:
-            return self.conversation_history
-        
-        # Phase 2: Over summarize threshold, create summary
-        if len(self.conversation_history) > SUMMARIZE_THRESHOLD:
-            # Only summarize once when crossing threshold
-            if not hasattr(self, '_conversation_summary') or self._conversation_summary is None:
-                old_messages = self.conversation_history[:-MAX_RECENT_MESSAGES]
-                self._conversation_summary = self._summarize_old_context(old_messages)
-                if self.debug_mode:
-                    self._safe_print(f"🔍 [Context Management] Summarized {len(old_messages)} old messages")
-            
-            # Return: [summary_message] + [recent 20 messages]
-            summary_msg = {
-                "role": "system",
-                "content": f"Previous conversation summary: {self._conversation_summary}"
-            }
-            recent_messages = self.conversation_history[-MAX_RECENT_MESSAGES:]
-            
-            if self.debug_mode:
-                self._safe_print(f"🔍 [Context Management] Using summary + {len(recent_messages)} recent messages")
-            
-            return [summary_msg] + recent_messages
-        
-        # Phase 3: Between thresholds, just use sliding window
-        if self.debug_mode:
-            self._safe_print(f"🔍 [Context Management] Using sliding window: last {MAX_RECENT_MESSAGES} messages")
-        return self.conversation_history[-MAX_RECENT_MESSAGES:]
-    
-    def _summarize_old_context(self, old_messages: List[Dict[str, str]]) -> str:
-        """
-        Generate a brief summary of old conversation without LLM call.
-        
-        Args:
-            old_messages: List of message dicts to summarize
-            
-        Returns:
-            String summary of the old context
-        """
-        if not old_messages:
-            return "No previous context."
-        
-        # Extract user queries for context
-        user_queries = [
-            m['content'][:80].strip() 
-            for m in old_messages 
-            if m.get('role') == 'user'
-        ]
-        
-        if not user_queries:
-            return f"Earlier conversation with {len(old_messages)} messages."
-        
-        # Build concise summary
-        if len(user_queries) <= 3:
-            topics = "; ".join(user_queries)
-            return f"Earlier you asked: {topics}"
-        else:
-            first = user_queries[0]
-            last = user_queries[-1]
-            middle_count = len(user_queries) - 2
-            return (
-                f"Earlier you asked: {first}; "
-                f"... {middle_count} more questions ...; "
-                f"{last}"
+        packed = self._context_packer.pack_history(self.conversation_history)
+        dropped = self._context_packer.summarized_messages
+        if self.debug_mode and dropped:
+            self._safe_print(
+                f"🔍 [Context Management] Summarized {dropped} old messages, "
+                f"kept {len(self.conversation_history) - dropped} recent"
             )
-    
+        return packed
+
     def _reset_conversation_summary(self):
         """Reset summary when starting new conversation or topic shift"""
-        self._conversation_summary = None
+        self._context_packer.reset()
         if self.debug_mode:
             self._safe_print("🔍 [Context Management] Conversation summary reset")
     
@@ -6206,58 +6275,28 @@ Concise query (max {max_length} chars):"""
         self._persist_memory_to_disk(user_id, conversation_id)
     
     def _persist_memory_to_disk(self, user_id: str, conversation_id: str):
-        """Persist current memory to disk for cross-CLI continuity"""
+        """Queue the newest interaction for the append-only memory log (cross-CLI continuity)"""
         try:
-            from pathlib import Path
-            import json
-            
-            memory_dir = Path.home() / ".cite_agent" / "memory_cache"
-            memory_dir.mkdir(parents=True, exist_ok=True)
-            
-            memory_file = memory_dir / f"{conversation_id}.json"
-            
-            # Get current memory for this conversation
-            if user_id in self.memory and conversation_id in self.memory[user_id]:
-                memory_data = {
-                    "user_id": user_id,
-                    "conversation_id": conversation_id,
-                    "last_updated": datetime.now(timezone.utc).isoformat(),
-                    "interactions": self.memory[user_id][conversation_id]
-                }
-                
-                memory_file.write_text(json.dumps(memory_data, indent=2))
+            interactions = self.memory.get(user_id, {}).get(conversation_id)
+            if interactions:
+                self.memory_store.append(user_id, conversation_id, interactions[-1])
         except Exception as e:
             # Don't fail the request if persistence fails
             if self.debug_mode:
                 self._safe_print(f"⚠️  Failed to persist memory: {e}")
     
     def _load_memory_from_disk(self, user_id: str, conversation_id: str):
-        """Load memory from disk if available"""
+        """Load memory from disk if available (only interactions from the last 24 hours)"""
         try:
-            from pathlib import Path
-            import json
-            from datetime import timedelta
-            
-            memory_dir = Path.home() / ".cite_agent" / "memory_cache"
-            memory_file = memory_dir / f"{conversation_id}.json"
-            
-            if not memory_file.exists():
-                return
-            
-            # Check if memory is recent (within 24 hours)
-            memory_data = json.loads(memory_file.read_text())
-            last_updated = datetime.fromisoformat(memory_data["last_updated"])
-            age_hours = (datetime.now(timezone.utc) - last_updated).total_seconds() / 3600
-            
-            if age_hours > 24:
-                # Memory too old, skip
+            interactions = self.memory_store.load(user_id, conversation_id, max_age_hours=24)
+            if interactions is None:
                 return
             
             # Load memory into agent
             if user_id not in self.memory:
                 self.memory[user_id] = {}
             
-            self.memory[user_id][conversation_id] = memory_data.get("interactions", [])
+            self.memory[user_id][conversation_id] = interactions
             
             if self.debug_mode:
                 self._safe_print(f"✅ Loaded {len(self.memory[user_id][conversation_id])} past interactions from disk")
@@ -6337,20 +6376,21 @@ Concise query (max {max_length} chars):"""
         
         # Show library
         if any(phrase in question_lower for phrase in ["show my library", "list my papers", "what's in my library", "my saved papers"]):
-            papers = self.workflow.list_papers()
+            total = self.workflow.count_papers()
+            papers = self.workflow.list_papers(limit=10)
             if not papers:
                 message = "Your library is empty. As you find papers, I can save them for you."
             else:
                 paper_list = []
-                for i, paper in enumerate(papers[:10], 1):
+                for i, paper in enumerate(papers, 1):
                     authors_str = paper.authors[0] if paper.authors else "Unknown"
                     if len(paper.authors) > 1:
                         authors_str += " et al."
                     paper_list.append(f"{i}. {paper.title} ({authors_str}, {paper.year})")
                 
-                message = f"You have {len(papers)} paper(s) in your library:\n\n" + "\n".join(paper_list)
-                if len(papers) > 10:
-                    message += f"\n\n...and {len(papers) - 10} more."
+                message = f"You have {total} paper(s) in your library:\n\n" + "\n".join(paper_list)
+                if total > 10:
+                    message += f"\n\n...and {total - 10} more."
             
             return self._quick_reply(request, message, tools_used=["workflow_library"], confidence=1.0)
         
@@ -6358,7 +6398,7 @@ Concise query (max {max_length} chars):"""
         if any(phrase in question_lower for phrase in ["export to bibtex", "export bibtex", "generate bibtex", "bibtex export"]):
             success = self.workflow.export_to_bibtex()
             if success:
-                message = f"✅ Exported {len(self.workflow.list_papers())} papers to BibTeX.\n\nFile: {self.workflow.bibtex_file}\n\nYou can import this into Zotero, Mendeley, or use it in your LaTeX project."
+                message = f"✅ Exported {self.workflow.count_papers()} papers to BibTeX.\n\nFile: {self.workflow.bibtex_file}\n\nYou can import this into Zotero, Mendeley, or use it in your LaTeX project."
             else:
                 message = "❌ Failed to export BibTeX. Make sure you have papers in your library first."
             
@@ -6376,7 +6416,7 @@ Concise query (max {max_length} chars):"""
         
         # Show history
         if any(phrase in question_lower for phrase in ["show history", "my history", "recent queries", "what did i search"]):
-            history = self.workflow.get_history()[:10]
+            history = self.workflow.get_history(limit=10)
             if not history:
                 message = "No query history yet."
             else:
@@ -6420,8 +6460,6 @@ Concise query (max {max_length} chars):"""
     async def _analyze_request_type(self, question: str, user_id: str = None, conversation_id: str = None) -> Dict[str, Any]:
         """Analyze what type of request this is and what APIs to use"""
 
-        question_lower = question.lower()
-
         # PRIORITY 0: If dataset is loaded, assume queries are about it UNLESS explicitly about something else
         has_loaded_dataset = False
 
@@ -6432,40 +6470,19 @@ Concise query (max {max_length} chars):"""
         elif hasattr(self, '_data_analyzer') and self._data_analyzer:
             analyzer = self._data_analyzer
 
-        if analyzer and hasattr(analyzer, 'current_dataset') and analyzer.current_dataset is not None:
+        if analyzer and analyzer.has_dataset:
             has_loaded_dataset = True
 
         # Check 2: Conversation memory for dataset loading evidence
         if not has_loaded_dataset and user_id and conversation_id:
-            if user_id in self.memory and conversation_id in self.memory[user_id]:
-                history = self.memory[user_id][conversation_id]
-                # Look for evidence of loaded dataset in recent conversation (last 10 turns)
-                # Memory format: "Q: ... A: ..." strings
-                for interaction in history[-10:]:
-                    interaction_lower = str(interaction).lower()
-                    # Dataset loaded if contains "load" + file extension, or mentions dataset/rows/columns
-                    if (('load' in interaction_lower and ('.csv' in interaction_lower or '.xlsx' in interaction_lower or '/tmp/' in interaction_lower)) or
-                        ('loaded' in interaction_lower and 'dataset' in interaction_lower) or
-                        ('data loaded' in interaction_lower) or
-                        ('rows' in interaction_lower and 'columns' in interaction_lower)):
-                        has_loaded_dataset = True
-                        break
+            has_loaded_dataset = self._memory_shows_loaded_dataset(user_id, conversation_id)
 
-        if has_loaded_dataset:
-            # Explicit non-data queries (user wants papers, files, finance, etc)
-            non_data_indicators = [
-                'paper', 'papers', 'research', 'study', 'studies', 'literature', 'article',
-                'find papers', 'search papers', 'publications',
-                'file', 'files', 'directory', 'folder', 'python files', '.py', '.js', '.txt',
-                'how many files', 'count files', 'list files', 'file count',
-                'cite_agent', 'codebase', 'repository', 'repo',
-                'revenue', 'stock', 'market cap', 'earnings', 'financial'
-            ]
-
-            is_non_data_query = any(indicator in question_lower for indicator in non_data_indicators)
+        # One compiled scan yields every intent signal used below
+        features = classify_query(question)
 
+        if has_loaded_dataset:
             # If dataset loaded and NOT asking about papers/files/finance, it's about the data
-            if not is_non_data_query:
+            if not features.non_data:
                 return {
                     "type": "data_analysis",
                     "apis": ["data_analysis"],
@@ -6477,31 +6494,7 @@ Concise query (max {max_length} chars):"""
         # These should NOT trigger Archive API searches
         # IMPORTANT: Don't block action requests like "can you find papers" or "can you analyze"
         # Only block queries ABOUT the agent itself
-        meta_query_indicators = [
-            'what are you', 'who are you', 'are you a', 'are you an',
-            'how do you work', 'who made you', 'who built you',
-            'what can you do', 'what do you do', 'tell me about yourself',
-            'your capabilities', 'your features', 'how were you made',
-            'hardcode', 'programmed', 'your code', 'your response', 'your answer'
-        ]
-
-        # More specific checks for agent-introspection questions
-        # Must contain both an agent-question word AND a self-reference
-        agent_question_words = ['did you', 'do you', 'are you', 'can you', 'will you', 'have you']
-        agent_self_refs = ['hardcode', 'program', 'your code', 'your response', 'your answer',
-                          'your capabilities', 'yourself', 'your features', 'you made', 'you built']
-
-        has_agent_question = any(word in question_lower for word in agent_question_words)
-        has_self_ref = any(ref in question_lower for ref in agent_self_refs)
-
-        # Explicit meta indicators (always block)
-        explicit_meta = any(indicator in question_lower for indicator in meta_query_indicators)
-
-        # Combined meta detection: explicit meta OR (agent_question + self_ref)
-        is_meta_query = explicit_meta or (has_agent_question and has_self_ref)
-
-        # If it's a meta query, return early as general (no APIs)
-        if is_meta_query:
+        if features.is_meta:
             return {
                 "type": "general",
                 "apis": [],
@@ -6510,11 +6503,7 @@ Concise query (max {max_length} chars):"""
             }
 
         # Fast-path: simple math/counting commands should use analysis tools
-        simple_math_triggers = [
-            "count to ", "count from ", "count down", "factorial", "permutation",
-            "combination", "simple math", "basic math", "list numbers"
-        ]
-        if any(trigger in question_lower for trigger in simple_math_triggers):
+        if features.simple_math:
             return {
                 "type": "analysis",
                 "apis": ["data_analysis"],
@@ -6522,247 +6511,28 @@ Concise query (max {max_length} chars):"""
                 "analysis_mode": "quantitative"
             }
 
-        # Financial indicators - COMPREHENSIVE list to ensure FinSight is used
-        financial_keywords = [
-            # Core metrics
-            'financial', 'revenue', 'sales', 'income', 'profit', 'earnings', 'loss',
-            'net income', 'operating income', 'gross profit', 'ebitda', 'ebit',
-            
-            # Margins & Ratios
-            'margin', 'gross margin', 'profit margin', 'operating margin', 'net margin', 'ebitda margin',
-            'ratio', 'current ratio', 'quick ratio', 'debt ratio', 'pe ratio', 'p/e',
-            'roe', 'roa', 'roic', 'roce', 'eps',
-            
-            # Balance Sheet
-            'assets', 'liabilities', 'equity', 'debt', 'cash', 'capital',
-            'balance sheet', 'total assets', 'current assets', 'fixed assets',
-            'shareholders equity', 'stockholders equity', 'retained earnings',
-            
-            # Cash Flow
-            'cash flow', 'fcf', 'free cash flow', 'operating cash flow',
-            'cfo', 'cfi', 'cff', 'capex', 'capital expenditure',
-            
-            # Market Metrics
-            'stock', 'market cap', 'market capitalization', 'enterprise value',
-            'valuation', 'price', 'share price', 'stock price', 'quote',
-            'volume', 'trading volume', 'shares outstanding',
-            
-            # Financial Statements
-            'income statement', '10-k', '10-q', '8-k', 'filing', 'sec filing',
-            'quarterly', 'annual report', 'earnings report', 'financial statement',
-            
-            # Company Info
-            'ticker', 'company', 'corporation', 'ceo', 'earnings call',
-            'dividend', 'dividend yield', 'payout ratio',
-            
-            # Growth & Performance
-            'growth', 'yoy', 'year over year', 'qoq', 'quarter over quarter',
-            'cagr', 'trend', 'performance', 'returns'
-        ]
-        
-        # Research indicators (quantitative)
-        research_keywords = [
-            'research', 'paper', 'study', 'academic', 'literature', 'journal',
-            'synthesis', 'findings', 'methodology', 'abstract', 'citation',
-            'author', 'publication', 'peer review', 'scientific',
-            # Technical/architecture terms that indicate research queries
-            'transformer', 'transformers', 'neural', 'network', 'architecture',
-            'model', 'models', 'algorithm', 'deep learning', 'machine learning',
-            'vision transformer', 'vit', 'bert', 'gpt', 'attention mechanism',
-            'self-supervised', 'supervised', 'unsupervised', 'pre-training',
-            # Domain-specific research terms
-            'medical imaging', 'chest x-ray', 'ct scan', 'mri', 'diagnosis',
-            'clinical', 'pathology', 'radiology', 'biomedical',
-            # Research action words
-            'find papers', 'search papers', 'recent papers', 'survey',
-            'state of the art', 'sota', 'baseline', 'benchmark'
-        ]
-        
-        # Qualitative indicators (research-specific only)
-        qualitative_keywords = [
-            'theme', 'themes', 'thematic', 'qualitative coding', 'qualitative',
-            'interview', 'interviews', 'transcript', 'case study', 'narrative analysis',
-            'discourse analysis', 'content analysis', 'quote', 'quotes', 'excerpt',
-            'participant', 'respondent', 'informant', 'ethnography', 'ethnographic',
-            'grounded theory', 'phenomenology', 'phenomenological',
-            'what do people say', 'how do participants',
-            'lived experience', 'meaning making', 'interpretive',
-            'focus group', 'field notes', 'memoir', 'diary study'
-        ]
-        
-        # Quantitative indicators (explicit stats/math)
-        quantitative_keywords = [
-            'calculate', 'average', 'mean', 'median', 'percentage', 'correlation',
-            'regression', 'statistical', 'significance', 'p-value', 'variance',
-            'standard deviation', 'trend', 'forecast', 'model', 'predict',
-            'rate of', 'ratio', 'growth rate', 'change in', 'compared to'
-        ]
-
-        # Data analysis indicators (CSV, datasets, statistical analysis)
-        data_analysis_keywords = [
-            'dataset', 'data.csv', '.csv', '.xlsx', '.xls', 'excel', 'spreadsheet',
-            'load data', 'analyze data', 'data analysis', 'statistical analysis',
-            'regression', 'correlation', 'linear regression', 'logistic regression',
-            'descriptive statistics', 'summary statistics', 'stats',
-            'plot', 'scatter plot', 'histogram', 'bar chart', 'visualize',
-            'test score', 'study hours', 'anova', 't-test', 'chi-square',
-            'normality', 'assumptions', 'check assumptions',
-            'r squared', 'r²', 'p-value', 'confidence interval',
-            'sample size', 'observations', 'variables', 'predictor',
-            'run regression', 'run analysis', 'analyze csv',
-            'r code', 'r script', 'execute r', 'run r',
-            'missing value', 'missing data', 'outlier', 'data quality', 'clean data',
-            'compare', 'comparison', 'between groups', 'group comparison', 'by group'
-        ]
-
-        # System/technical indicators
-        system_keywords = [
-            'file', 'files', 'directory', 'directories', 'folder', 'folders',
-            'command', 'run', 'execute', 'install',
-            'python', 'code', 'script', 'scripts', 'program', 'system', 'terminal',
-            'find', 'search for', 'locate', 'list', 'show me', 'where is',
-            'what files', 'which files', 'how many files',
-            'grep', 'search', 'look for', 'count',
-            '.py', '.txt', '.js', '.java', '.cpp', '.c', '.h',
-            'function', 'class', 'definition', 'route', 'endpoint',
-            'codebase', 'project structure', 'source code'
-        ]
-        
-        question_lower = question.lower()
-        
         matched_types: List[str] = []
         apis_to_use: List[str] = []
-        analysis_mode = "quantitative"  # default
-        
-        # Context-aware keyword detection
-        # Strong quant contexts that override everything
-        strong_quant_contexts = [
-            'algorithm', 'park', 'system', 'database',
-            'calculate', 'predict', 'forecast', 'ratio', 'percentage'
-        ]
-        
-        # Measurement words (can indicate mixed when combined with qual words)
-        measurement_words = ['score', 'metric', 'rating', 'measure', 'index']
-        
-        has_strong_quant_context = any(ctx in question_lower for ctx in strong_quant_contexts)
-        has_measurement = any(mw in question_lower for mw in measurement_words)
-        
-        # Special cases: Certain qual words + measurement = mixed (subjective + quantified)
-        # BUT: Only if NOT in a strong quant context (algorithm overrides)
-        mixed_indicators = [
-            'experience',  # user experience
-            'sentiment',   # sentiment analysis
-            'perception',  # perception
-        ]
-        
-        is_mixed_method = False
-        if not has_strong_quant_context and has_measurement:
-            if any(indicator in question_lower for indicator in mixed_indicators):
-                is_mixed_method = True
-        
-        # Check for qualitative vs quantitative keywords
-        qual_score = sum(1 for kw in qualitative_keywords if kw in question_lower)
-        quant_score = sum(1 for kw in quantitative_keywords if kw in question_lower)
-        
-        # Financial queries are quantitative by nature (unless explicitly qualitative like "interview")
-        has_financial = any(kw in question_lower for kw in financial_keywords)
-        if has_financial and qual_score == 1:
-            # Single qual keyword + financial = probably mixed
-            # e.g., "Interview CEO about earnings" = interview (qual) + earnings/CEO (financial)
-            quant_score += 1
-        
-        # Adjust for context
-        if has_strong_quant_context:
-            # Reduce qualitative score if in strong quantitative context
-            # e.g., "theme park" or "sentiment analysis algorithm"
-            qual_score = max(0, qual_score - 1)
-        
-        # Improved mixed detection: use ratio instead of simple comparison
-        if is_mixed_method:
-            # Special case: qual word + measurement = always mixed
-            analysis_mode = "mixed"
-        elif qual_score >= 2 and quant_score >= 1:
-            # Clear mixed: multiple qual + some quant
-            analysis_mode = "mixed"
-        elif qual_score > quant_score and qual_score > 0:
-            # Predominantly qualitative
-            analysis_mode = "qualitative"
-        elif qual_score > 0 and quant_score > 0:
-            # Some of both - default to mixed
-            analysis_mode = "mixed"
-
-        # Financial keyword detection with context-aware logic
-        # Avoid false positives where research/academic terms overlap with financial terms
-        # Examples:
-        #   - "stock markets" in research context ≠ company stock ticker
-        #   - "returns" in research/statistics ≠ financial returns data
-        #   - "approaches" should NOT match "roa"
-
-
-        # First check: Is this clearly a research/academic query?
-        # If yes, don't even check financial keywords
-        strong_research_indicators = [
-            'research on', 'papers on', 'literature on', 'studies on',
-            'hypothesis', 'hypotheses', 'methodology', 'research gap',
-            'find papers', 'recent papers', 'academic', 'literature review',
-            'emerging markets', 'developing markets',
-            'momentum effect', 'momentum strategy'
-        ]
-
-        is_clearly_research = (
-            any(ind in question_lower for ind in strong_research_indicators) or
-            ('stock market' in question_lower and 'research' in question_lower)
-        )
-
-        financial_matched = False
-
-        if not is_clearly_research:
-            # Only check financial keywords if NOT clearly a research query
-            for keyword in financial_keywords:
-                # Context exclusions: skip if keyword appears in research context
-                if keyword == 'stock' and ('stock market' in question_lower or 'stock markets' in question_lower):
-                    # "stock markets" is research topic, not financial data request
-                    continue
-                if keyword == 'returns' and any(ctx in question_lower for ctx in ['momentum returns', 'research', 'paper', 'study', 'hypothesis', 'premium']):
-                    # "returns" in research context = research variable, not financial data
-                    continue
-                if keyword == 'performance' and any(ctx in question_lower for ctx in ['research', 'model', 'strategy', 'test']):
-                    # "performance" in research = model/strategy performance, not company performance
-                    continue
+        analysis_mode = features.analysis_mode
 
-                # For single-word financial metrics (roa, roe, eps, etc.), require word boundaries
-                if len(keyword.split()) == 1 and len(keyword) <= 4:
-                    # Short acronyms/metrics: require word boundaries
-                    pattern = r'\b' + re.escape(keyword) + r'\b'
-                    if re.search(pattern, question_lower):
-                        financial_matched = True
-                        break
-                else:
-                    # Multi-word phrases or longer words: use simple substring match
-                    if keyword in question_lower:
-                        financial_matched = True
-                        break
-
-        if financial_matched:
+        # Financial detection skips research-context false positives
+        # ("stock markets", "momentum returns", "approaches" vs "roa")
+        if features.financial:
             matched_types.append("financial")
             apis_to_use.append("finsight")
 
-        if any(keyword in question_lower for keyword in research_keywords):
+        if features.research:
             matched_types.append("research")
             apis_to_use.append("archive")
 
-        if any(keyword in question_lower for keyword in data_analysis_keywords):
+        if features.data_analysis:
             matched_types.append("data_analysis")
             apis_to_use.append("data_analysis")
 
         # REMOVED: Auto-adding Archive for qualitative mode caused false positives
         # Qualitative queries should have explicit research keywords to trigger Archive
-        # Old buggy logic:
-        # if analysis_mode in ("qualitative", "mixed") and "research" not in matched_types:
-        #     matched_types.append("research")
-        #     apis_to_use.append("archive")
 
-        if any(keyword in question_lower for keyword in system_keywords):
+        if features.system:
             matched_types.append("system")
             apis_to_use.append("shell")
 
@@ -6791,6 +6561,14 @@ Concise query (max {max_length} chars):"""
             "confidence": confidence,
             "analysis_mode": analysis_mode  # NEW: qualitative, quantitative, or mixed
         }
+
+    def _memory_shows_loaded_dataset(self, user_id: str, conversation_id: str) -> bool:
+        """Look for evidence of a loaded dataset in the last 10 remembered turns"""
+        history = self.memory.get(user_id, {}).get(conversation_id)
+        if not history:
+            return False
+        # Memory format: "Q: ... A: ..." strings
+        return any(has_dataset_evidence(str(interaction)) for interaction in history[-10:])
     
     def _is_query_too_vague_for_apis(self, question: str) -> bool:
         """
@@ -6800,45 +6578,33 @@ Concise query (max {max_length} chars):"""
         NOTE: Research queries (papers, studies, literature) should NEVER be marked vague
         """
         question_lower = question.lower()
+        features = classify_query(question)
 
         # NEVER mark research queries as vague - they need Archive API
-        research_indicators = ['paper', 'papers', 'study', 'studies', 'literature', 'research',
-                             'publication', 'article', 'self-supervised', 'transformer', 'neural']
-        if any(indicator in question_lower for indicator in research_indicators):
+        if features.has_any(VAGUE_EXEMPT_RESEARCH):
             return False  # Research queries always need Archive API
         
         # Pattern 1: Multiple years without SPECIFIC topic (e.g., "2008, 2015, 2019")
-        # import re removed - using module-level import
-        years_pattern = r'\b(19\d{2}|20\d{2})\b'
-        years = re.findall(years_pattern, question)
+        years = YEAR_PATTERN.findall(question)
         if len(years) >= 2:
             # Multiple years - check if there's a SPECIFIC topic beyond just "papers on"
             # Generic terms that don't add specificity
             generic_terms = ['papers', 'about', 'on', 'regarding', 'concerning', 'related to']
             # Remove generic terms and check what's left
             words = question_lower.split()
-            content_words = [w for w in words if w not in generic_terms and not re.match(r'\d{4}', w)]
+            content_words = [w for w in words if w not in generic_terms and not FOUR_DIGITS_PATTERN.match(w)]
             # If fewer than 2 meaningful content words, it's too vague
             if len(content_words) < 2:
                 return True  # Too vague: "papers on 2008, 2015, 2019" needs topic
         
         # Pattern 2: Market share without market specified
-        if 'market share' in question_lower:
-            market_indicators = ['analytics', 'software', 'government', 'data', 'cloud', 'sector', 'industry']
-            if not any(indicator in question_lower for indicator in market_indicators):
+        if 'market share' in features.hits:
+            if not features.has_any(MARKET_SHARE_SCOPES):
                 return True  # Too vague: needs market specification
         
         # Pattern 3: Comparison without metric (compare X and Y)
-        if any(word in question_lower for word in ['compare', 'versus', 'vs', 'vs.']):
-            metric_indicators = [
-                # Financial metrics
-                'revenue', 'market cap', 'sales', 'growth', 'profit', 'valuation',
-                # Data analysis metrics
-                'accuracy', 'response_time', 'response time', 'performance', 'score',
-                'value', 'mean', 'median', 'average', 'rate', 'percentage',
-                'between groups', 'by group', 'group', 'condition'
-            ]
-            if not any(indicator in question_lower for indicator in metric_indicators):
+        if features.has_any(COMPARISON_WORDS):
+            if not features.has_any(COMPARISON_METRICS):
                 return True  # Too vague: needs metric specification
         
         # Pattern 4: Ultra-short queries without specifics (< 4 words)
@@ -7660,21 +7426,12 @@ JSON:"""
             elif hasattr(self, '_data_analyzer') and self._data_analyzer:
                 analyzer = self._data_analyzer
 
-            if analyzer and hasattr(analyzer, 'current_dataset') and analyzer.current_dataset is not None:
+            if analyzer and analyzer.has_dataset:
                 has_loaded_dataset = True
 
             # Check 2: Conversation memory for dataset loading evidence
-            if not has_loaded_dataset and request.user_id in self.memory and request.conversation_id in self.memory[request.user_id]:
-                history = self.memory[request.user_id][request.conversation_id]
-                # Memory format: "Q: ... A: ..." strings
-                for interaction in history[-10:]:
-                    interaction_lower = str(interaction).lower()
-                    if (('load' in interaction_lower and ('.csv' in interaction_lower or '.xlsx' in interaction_lower or '/tmp/' in interaction_lower)) or
-                        ('loaded' in interaction_lower and 'dataset' in interaction_lower) or
-                        ('data loaded' in interaction_lower) or
-                        ('rows' in interaction_lower and 'columns' in interaction_lower)):
-                        has_loaded_dataset = True
-                        break
+            if not has_loaded_dataset:
+                has_loaded_dataset = self._memory_shows_loaded_dataset(request.user_id, request.conversation_id)
 
             is_vague = self._is_query_too_vague_for_apis(request.question)
 
@@ -7764,18 +7521,18 @@ JSON:"""
                                 self._safe_print(f"❌ Dataset loading failed: {e}")
 
                     # SMART DATASET USAGE: If dataset already loaded, inject it into context
-                    if analyzer and hasattr(analyzer, 'current_dataset') and analyzer.current_dataset is not None:
-                        df = analyzer.current_dataset
+                    if analyzer and analyzer.has_dataset:
+                        overview = analyzer.dataset_overview()
                         if debug_mode:
-                            self._safe_print(f"📊 Dataset in memory: {len(df)} rows, {len(df.columns)} cols")
+                            self._safe_print(f"📊 Dataset in memory: {overview['rows']} rows, {len(overview['columns'])} cols")
 
                         # Always provide loaded dataset info to LLM
                         api_results["dataset_in_memory"] = {
                             "loaded": True,
-                            "rows": len(df),
-                            "columns": list(df.columns),
-                            "dtypes": {col: str(dtype) for col, dtype in df.dtypes.items()},
-                            "sample": df.head(5).to_dict('records') if len(df) > 0 else [],
+                            "rows": overview["rows"],
+                            "columns": overview["columns"],
+                            "dtypes": overview["dtypes"],
+                            "sample": overview["sample"].to_dict('records') if overview["rows"] > 0 else [],
                             "filepath": getattr(analyzer.dataset_info, 'filepath', 'unknown') if hasattr(analyzer, 'dataset_info') else None
                         }
 
@@ -7961,7 +7718,7 @@ JSON:"""
                 # Call backend and UPDATE CONVERSATION HISTORY
                 response = await self.call_backend_query(
                     query=request.question,
-                    conversation_history=self.conversation_history[-10:],
+                    conversation_history=self._get_conversation_context_with_summary(),
                     api_results=api_results,
                     tools_used=tools_used
                 )
@@ -8272,10 +8029,10 @@ JSON:"""
                 has_dataset = False
                 if self.tool_executor and hasattr(self.tool_executor, '_data_analyzer'):
                     analyzer_check = self.tool_executor._data_analyzer
-                    if analyzer_check and hasattr(analyzer_check, 'current_dataset') and analyzer_check.current_dataset is not None:
+                    if analyzer_check and analyzer_check.has_dataset:
                         has_dataset = True
                 elif hasattr(self, '_data_analyzer') and self._data_analyzer:
-                    if hasattr(self._data_analyzer, 'current_dataset') and self._data_analyzer.current_dataset is not None:
+                    if self._data_analyzer.has_dataset:
                         has_dataset = True
 
                 # If dataset loaded and LLM wants data-related tools, keep analysis path
@@ -8302,17 +8059,17 @@ JSON:"""
                 elif hasattr(self, '_data_analyzer') and self._data_analyzer:
                     analyzer = self._data_analyzer
 
-                if analyzer and hasattr(analyzer, 'current_dataset') and analyzer.current_dataset is not None:
-                    df = analyzer.current_dataset
-                    sample_str = df.head(5).to_string() if len(df) > 0 else "No data"
+                if analyzer and analyzer.has_dataset:
+                    overview = analyzer.dataset_overview()
+                    sample_str = overview["sample"].to_string() if overview["rows"] > 0 else "No data"
                     dataset_context_str = f"""
 IMPORTANT - DATASET ALREADY LOADED:
 The variable 'df' is ALREADY loaded in memory with this data:
-- Shape: {len(df)} rows × {len(df.columns)} columns
-- Columns: {list(df.columns)}
+- Shape: {overview['rows']} rows × {len(overview['columns'])} columns
+- Columns: {overview['columns']}
 - Sample data:
 {sample_str}
-
+{self._lazy_dataset_note(analyzer, overview['rows'])}
 YOU MUST USE THE EXISTING 'df' VARIABLE - DO NOT call pd.read_csv() or create fake sample data.
 Example: average = df['Math'].mean()  # Correct - uses loaded df
 WRONG: df = pd.read_csv('file.csv')  # Dataset already loaded!
@@ -8321,7 +8078,7 @@ WRONG: data = {{'col': [1,2,3]}}  # Fake data - use real df!
 
                 # STEP 1: Generate code using dedicated LLM call
                 # Build requirements based on whether dataset is loaded
-                if analyzer and hasattr(analyzer, 'current_dataset') and analyzer.current_dataset is not None:
+                if analyzer and analyzer.has_dataset:
                     requirements = """Requirements:
 - The 'df' variable is ALREADY LOADED - DO NOT call pd.read_csv() or load data
 - Use the existing 'df' DataFrame variable for all operations
@@ -8393,11 +8150,15 @@ Output ONLY the Python code wrapped in ```python ``` blocks."""
                             print("="*60)
 
                         # STEP 1.5: If dataset is loaded, prepend dataframe loading code
-                        if analyzer and hasattr(analyzer, 'current_dataset') and analyzer.current_dataset is not None:
-                            df = analyzer.current_dataset
-                            filepath = getattr(analyzer.dataset_info, 'filepath', None) if hasattr(analyzer, 'dataset_info') else None
-                            if filepath:
-                                df_loading_code = f"""import pandas as pd\ndf = pd.read_csv('{filepath}')\n\n"""
+                        if analyzer and analyzer.has_dataset:
+                            df_loading_code = self._dataframe_preamble(analyzer, code_to_run)
+                            if df_loading_code is None:
+                                return self._quick_reply(
+                                    request,
+                                    self._lazy_dataset_refusal(analyzer.dataset_info.rows),
+                                    tools_used=["code_generation"],
+                                )
+                            if df_loading_code:
                                 code_to_run = df_loading_code + code_to_run
 
                                 # DEBUG: Log what we're actually executing
@@ -8699,18 +8460,18 @@ Output ONLY the Python code wrapped in ```python ``` blocks."""
                             self._safe_print(f"❌ [LOCAL] Dataset loading failed: {e}")
 
                 # SMART DATASET USAGE: If dataset already loaded, inject it into context
-                if analyzer and hasattr(analyzer, 'current_dataset') and analyzer.current_dataset is not None:
-                    df = analyzer.current_dataset
+                if analyzer and analyzer.has_dataset:
+                    overview = analyzer.dataset_overview()
                     if debug_mode:
-                        self._safe_print(f"📊 [LOCAL] Dataset in memory: {len(df)} rows, {len(df.columns)} cols")
+                        self._safe_print(f"📊 [LOCAL] Dataset in memory: {overview['rows']} rows, {len(overview['columns'])} cols")
 
                     # Always provide loaded dataset info to LLM
                     api_results["dataset_in_memory"] = {
                         "loaded": True,
-                        "rows": len(df),
-                        "columns": list(df.columns),
-                        "dtypes": {col: str(dtype) for col, dtype in df.dtypes.items()},
-                        "sample": df.head(5).to_dict('records') if len(df) > 0 else [],
+                        "rows": overview["rows"],
+                        "columns": overview["columns"],
+                        "dtypes": overview["dtypes"],
+                        "sample": overview["sample"].to_dict('records') if overview["rows"] > 0 else [],
                         "filepath": getattr(analyzer.dataset_info, 'filepath', 'unknown') if hasattr(analyzer, 'dataset_info') else None
                     }
 
@@ -8730,7 +8491,7 @@ Output ONLY the Python code wrapped in ```python ``` blocks."""
                             tools_used.append("data_analysis")
 
             # Build enhanced system prompt with trimmed sections based on detected needs
-            system_prompt = self._build_system_prompt(request_analysis, memory_context, api_results)
+            system_prompt = self._build_system_prompt(request_analysis, memory_context, api_results, request.question)
 
             # Build messages
             messages = [
@@ -8747,52 +8508,8 @@ Output ONLY the Python code wrapped in ```python ``` blocks."""
             if forbidden:
                 messages.append({"role": "system", "content": f"User mentioned file(s) outside the allowed workspace or sensitive paths: {forbidden}. Refuse to access and explain the restriction succinctly."})
             
-            # Add conversation history with smart context management
-            if len(self.conversation_history) > 12:
-                # For long conversations, summarize early context and keep recent history
-                early_history = self.conversation_history[:-6]
-                recent_history = self.conversation_history[-6:]
-                
-                # Create a summary of early conversation
-                summary_prompt = "Summarize the key points from this conversation history in 2-3 sentences:"
-                summary_messages = [
-                    {"role": "system", "content": summary_prompt},
-                    {"role": "user", "content": str(early_history)}
-                ]
-                
-                try:
-                    if self._ensure_client_ready():
-                        summary_response = self.client.chat.completions.create(
-                            model="llama-3.1-8b-instant",
-                            messages=summary_messages,
-                            max_tokens=160,
-                            temperature=0.2
-                        )
-                        conversation_summary = summary_response.choices[0].message.content
-                        if summary_response.usage and summary_response.usage.total_tokens:
-                            summary_tokens = summary_response.usage.total_tokens
-                            self._charge_tokens(request.user_id, summary_tokens)
-                            self.total_cost += (summary_tokens / 1000) * self.cost_per_1k_tokens
-                        else:
-                            summary_tokens = 0
-                        messages.append({"role": "system", "content": f"Previous conversation summary: {conversation_summary}"})
-                        self._emit_telemetry(
-                            "history_summarized",
-                            request,
-                            success=True,
-                            extra={
-                                "history_length": len(self.conversation_history),
-                                "summary_tokens": summary_tokens,
-                            },
-                        )
-                except:
-                    # If summary fails, just use recent history
-                    pass
-                
-                messages.extend(recent_history)
-            else:
-                # For shorter conversations, use full history
-                messages.extend(self.conversation_history)
+            # Add conversation history packed to its token budget (old turns summarized locally)
+            messages.extend(self._get_conversation_context_with_summary())
             
             # Add current user message
             # For analysis queries, prepend explicit instruction to generate Python code
@@ -8957,11 +8674,10 @@ Output ONLY the Python code wrapped in ```python ``` blocks."""
                 
                 # Create analysis prompt only if we actually executed and have output
                 if execution_results.get("success") and isinstance(execution_results.get("output"), str):
-                    truncated_output = execution_results["output"]
-                    truncated_flag = False
-                    if len(truncated_output) > 1000:
-                        truncated_output = truncated_output[:1000]
-                        truncated_flag = True
+                    truncated_output = self._context_packer.compress(
+                        execution_results["output"], 250, request.question
+                    )
+                    truncated_flag = truncated_output != execution_results["output"]
 
                     summarised_text, summary_tokens = self._summarize_command_output(
                         request,
@@ -8972,7 +8688,7 @@ Output ONLY the Python code wrapped in ```python ``` blocks."""
 
                     final_response = summarised_text
                     if truncated_flag:
-                        final_response += "\n\n(Output truncated to first 1000 characters.)"
+                        final_response += "\n\n(Long output condensed to the most relevant lines.)"
                     if summary_tokens:
                         self._charge_tokens(request.user_id, summary_tokens)
                         tokens_used += summary_tokens
@@ -9086,15 +8802,13 @@ Output ONLY the Python code wrapped in ```python ``` blocks."""
         """
         Process request with streaming response from Groq API
         Returns a Groq stream object that yields chunks as they arrive
+        (production mode: an async generator over the backend token stream)
 
         This enables real-time character-by-character streaming in the UI
         """
-        # PRODUCTION MODE: Backend doesn't support streaming yet, use regular response
+        # PRODUCTION MODE: Proxy the backend's token stream
         if self.client is None:
-            response = await self.call_backend_query(request.question, self.conversation_history[-10:])
-            async def single_yield():
-                yield response.response
-            return single_yield()
+            return self.call_backend_query_stream(request.question, self._get_conversation_context_with_summary())
 
         # DEV MODE ONLY
         try:
@@ -9254,18 +8968,15 @@ Output ONLY the Python code wrapped in ```python ``` blocks."""
                 tools_used.append("archive_api")
             
             # Build messages
-            system_prompt = self._build_system_prompt(request_analysis, memory_context, api_results)
+            system_prompt = self._build_system_prompt(request_analysis, memory_context, api_results, request.question)
             messages = [{"role": "system", "content": system_prompt}]
             
             fc = api_results.get("files_context")
             if fc:
                 messages.append({"role": "system", "content": f"Grounding from mentioned file(s):\n{fc}"})
             
-            # Add conversation history (abbreviated - just recent)
-            if len(self.conversation_history) > 6:
-                messages.extend(self.conversation_history[-6:])
-            else:
-                messages.extend(self.conversation_history)
+            # Add conversation history packed to its token budget
+            messages.extend(self._get_conversation_context_with_summary())
             
             messages.append({"role": "user", "content": request.question})
 
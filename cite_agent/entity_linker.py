@@ -0,0 +1,206 @@
+"""
+Company Name Entity Linker
+==========================
+
+Finds company names in free text and links them to tickers.
+
+Names are normalized to lowercase word tokens and compiled into an
+Aho-Corasick automaton over those tokens, so a question is scanned once
+regardless of how many names are known, and matches always start and end
+on word boundaries ("target" no longer fires inside "targeted"). When
+matches overlap, the longest wins:
+
+    matcher = CompanyNameMatcher.load_or_build(mapping, cache_dir)
+    matcher.find("Compare Goldman Sachs with Apple")
+    # [CompanyMatch(ticker='GS', name='goldman sachs', start=8, end=21, ...),
+    #  CompanyMatch(ticker='AAPL', name='apple', start=27, end=32, ...)]
+
+Compiling ~10k names takes a noticeable fraction of a second, so the
+automaton is pickled under ``cache_dir`` keyed by a hash of the mapping and
+reused until the mapping changes.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import pickle
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+CACHE_VERSION = 1
+
+_WORD = re.compile(r"[^\W_]+")
+
+
+def normalize_name(name: str) -> Tuple[str, ...]:
+    """Lowercase word tokens of a name ("AT&T Inc." -> ("at", "t", "inc"))"""
+    return tuple(token.lower() for token in _WORD.findall(name))
+
+
+@dataclass(frozen=True)
+class CompanyMatch:
+    """A company name found in text"""
+    ticker: str
+    name: str  # Normalized name that matched
+    start: int  # Character span in the original text
+    end: int
+    confidence: float
+
+
+class CompanyNameMatcher:
+    """Word-level Aho-Corasick automaton over normalized company names"""
+
+    def __init__(self, mapping: Dict[str, str]):
+        """
+        Args:
+            mapping: Company name or alias -> ticker; the first name to
+                normalize to a given token sequence wins
+        """
+        self._names: List[Tuple[str, ...]] = []
+        self._tickers: List[str] = []
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[Tuple[int, ...]] = [()]
+
+        seen = set()
+        for name, ticker in mapping.items():
+            tokens = normalize_name(str(name))
+            if not tokens or not ticker or tokens in seen:
+                continue
+            seen.add(tokens)
+            self._insert(tokens, len(self._names))
+            self._names.append(tokens)
+            self._tickers.append(str(ticker))
+        self._link()
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def _insert(self, tokens: Tuple[str, ...], pattern: int) -> None:
+        state = 0
+        for token in tokens:
+            following = self._goto[state].get(token)
+            if following is None:
+                following = len(self._goto)
+                self._goto[state][token] = following
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append(())
+            state = following
+        self._output[state] = (pattern,)
+
+    def _link(self) -> None:
+        """Breadth-first pass setting failure links and merged outputs"""
+        queue = list(self._goto[0].values())
+        for state in queue:
+            for token, following in self._goto[state].items():
+                fallback = self._fail[state]
+                while fallback and token not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[following] = self._goto[fallback].get(token, 0)
+                self._output[following] += self._output[self._fail[following]]
+                queue.append(following)
+
+    def find(self, text: str) -> List[CompanyMatch]:
+        """
+        Non-overlapping company mentions in text order.
+
+        Overlapping candidates are resolved longest-first (then leftmost), so
+        "Goldman Sachs" beats "Goldman" and "Bank of America" beats "America".
+        """
+        words = [(m.start(), m.end(), m.group()) for m in _WORD.finditer(text)]
+        goto, fail, output = self._goto, self._fail, self._output
+
+        candidates: List[Tuple[int, int, int]] = []  # (pattern, first word, last word)
+        state = 0
+        for position, (_, _, word) in enumerate(words):
+            token = word.lower()
+            while state and token not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(token, 0)
+            for pattern in output[state]:
+                candidates.append((pattern, position - len(self._names[pattern]) + 1, position))
+        if not candidates:
+            return []
+
+        candidates.sort(key=lambda c: (words[c[1]][0] - words[c[2]][1], c[1]))
+        taken = [False] * len(words)
+        matches: List[CompanyMatch] = []
+        for pattern, first, last in candidates:
+            if any(taken[first:last + 1]):
+                continue
+            for position in range(first, last + 1):
+                taken[position] = True
+            start, end = words[first][0], words[last][1]
+            matches.append(CompanyMatch(
+                ticker=self._tickers[pattern],
+                name=" ".join(self._names[pattern]),
+                start=start,
+                end=end,
+                confidence=self._confidence(self._names[pattern], text[start:end]),
+            ))
+        matches.sort(key=lambda m: m.start)
+        return matches
+
+    def tickers(self, text: str) -> List[str]:
+        """Distinct tickers mentioned by name, in text order"""
+        return list(dict.fromkeys(match.ticker for match in self.find(text)))
+
+    @staticmethod
+    def _confidence(name: Tuple[str, ...], surface: str) -> float:
+        """
+        Heuristic link confidence.
+
+        Multi-word names are rarely accidental; single words ("target",
+        "square") often are, especially short ones or when not capitalized.
+        """
+        score = 0.85 if len(name) > 1 else 0.65
+        if len(name) == 1 and len(name[0]) <= 3:
+            score -= 0.15
+        if surface[:1].isupper():
+            score += 0.15
+        return round(min(score, 1.0), 2)
+
+    @classmethod
+    def load_or_build(cls, mapping: Dict[str, str], cache_dir: Optional[Path] = None) -> "CompanyNameMatcher":
+        """
+        Matcher for mapping, reusing a pickled automaton from cache_dir.
+
+        Cache failures are never fatal; the matcher is simply rebuilt.
+        """
+        if cache_dir is None:
+            return cls(mapping)
+
+        digest = hashlib.sha1(
+            json.dumps([CACHE_VERSION, list(mapping.items())], default=str).encode("utf-8")
+        ).hexdigest()[:16]
+        cache_path = Path(cache_dir) / f"company_matcher-{digest}.pickle"
+
+        try:
+            with open(cache_path, "rb") as handle:
+                cached = pickle.load(handle)
+            if isinstance(cached, cls):
+                return cached
+        except FileNotFoundError:
+            pass
+        except Exception as exc:
+            logger.debug("Discarding unreadable matcher cache %s: %s", cache_path, exc)
+
+        matcher = cls(mapping)
+        try:
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            for stale in cache_path.parent.glob("company_matcher-*.pickle"):
+                if stale != cache_path:
+                    stale.unlink()
+            temp_path = cache_path.with_suffix(f".{os.getpid()}.tmp")
+            with open(temp_path, "wb") as handle:
+                pickle.dump(matcher, handle, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_path, cache_path)
+        except Exception as exc:
+            logger.debug("Could not cache company matcher in %s: %s", cache_dir, exc)
+        return matcher
@@ -0,0 +1,363 @@
+"""
+Lazy (Out-of-Core) Datasets
+===========================
+
+Large CSV/TSV/Parquet/Feather files are profiled without loading them into
+memory. Column types are inferred from a sample of leading rows, the file is
+then streamed in chunks (pandas chunked CSV reader, or Arrow record batches
+for Parquet and memory-mapped Feather), and a single pass accumulates:
+
+- row count and per-column missingness
+- count, mean, std, min and max of every numeric column
+- pairwise-complete Pearson correlations (shifted sums of cross-products)
+- top values and cardinality of categorical columns
+- a uniform row sample from which quantiles and IQR outlier rates are estimated
+
+The full DataFrame is only materialized when a caller explicitly asks for it.
+"""
+
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+
+# Files larger than this are opened lazily by DataAnalyzer.load_dataset
+LAZY_THRESHOLD_BYTES = 256 * 1024 * 1024
+
+DEFAULT_CHUNK_ROWS = 250_000
+DEFAULT_SAMPLE_ROWS = 10_000
+# Uniform sample kept for quantiles, outlier estimates and normality checks
+DEFAULT_RESERVOIR_ROWS = 20_000
+# Stop tracking exact value counts for categorical columns beyond this many levels
+MAX_TRACKED_CATEGORIES = 10_000
+# String columns whose sample has at most this share of distinct values load as category
+CATEGORY_RATIO = 0.5
+
+SUPPORTED_SUFFIXES = {'.csv': 'csv', '.tsv': 'csv', '.parquet': 'parquet', '.feather': 'feather', '.arrow': 'feather'}
+
+
+def pandas_read_code(path, columns: Optional[List[str]] = None) -> str:
+    """Source of the pandas call that loads ``path`` (only ``columns`` if given), for generated analysis code"""
+    path = Path(path)
+    suffix = path.suffix.lower()
+    fmt = SUPPORTED_SUFFIXES.get(suffix)
+    projection = f", columns={columns!r}" if columns is not None else ""
+    if fmt == 'parquet':
+        return f"pd.read_parquet({str(path)!r}{projection})"
+    if fmt == 'feather':
+        return f"pd.read_feather({str(path)!r}{projection})"
+    projection = f", usecols={columns!r}" if columns is not None else ""
+    if suffix in ('.xlsx', '.xls'):
+        return f"pd.read_excel({str(path)!r}{projection})"
+    if suffix == '.tsv':
+        return f"pd.read_csv({str(path)!r}, sep='\\t'{projection})"
+    return f"pd.read_csv({str(path)!r}{projection})"
+
+
+def referenced_columns(code: str, column_names: List[str]) -> List[str]:
+    """Columns that ``code`` names as string literals (``df['price']``), in file order"""
+    return [
+        col for col in column_names
+        if f"'{col}'" in code or f'"{col}"' in code
+    ]
+
+
+@dataclass
+class DatasetProfile:
+    """Summary statistics gathered in one streaming pass"""
+    rows: int
+    column_names: List[str]
+    column_types: Dict[str, str]
+    missing_values: Dict[str, int]
+    numeric_columns: List[str]
+    categorical_columns: List[str]
+    numeric_stats: Dict[str, Dict[str, float]]
+    correlation: pd.DataFrame
+    pair_counts: pd.DataFrame
+    top_values: Dict[str, Dict[str, int]]
+    unique_values: Dict[str, int]
+    unique_values_truncated: List[str]
+    outliers: Dict[str, Dict[str, Any]]
+    non_numeric_values: Dict[str, int]
+    sample: pd.DataFrame = field(repr=False)
+
+
+class _StreamingAccumulator:
+    """Mergeable per-chunk statistics for a fixed column layout"""
+
+    def __init__(self, columns: List[str], numeric: List[str], reservoir_rows: int, seed: int):
+        self.columns = columns
+        self.numeric = numeric
+        self.categorical = [c for c in columns if c not in set(numeric)]
+        k = len(numeric)
+
+        self.rows = 0
+        self.missing = np.zeros(len(columns), dtype=np.int64)
+        self.non_numeric = np.zeros(k, dtype=np.int64)
+        self.minimum = np.full(k, np.inf)
+        self.maximum = np.full(k, -np.inf)
+
+        # Sums are taken about a per-column shift (first-chunk mean) for stability.
+        # Entry [i, j] of n/s/ss only counts rows where both i and j are present.
+        self.shift: Optional[np.ndarray] = None
+        self.n = np.zeros((k, k))
+        self.s = np.zeros((k, k))
+        self.ss = np.zeros((k, k))
+        self.sxy = np.zeros((k, k))
+
+        self.reservoir_rows = reservoir_rows
+        self._rng = np.random.default_rng(seed)
+        self._sample_keys = np.empty(0)
+        self._sample = np.empty((0, k))
+
+        self.value_counts: Dict[str, pd.Series] = {c: pd.Series(dtype=np.int64) for c in self.categorical}
+        self.truncated: set = set()
+
+    def update(self, chunk: pd.DataFrame) -> None:
+        self.rows += len(chunk)
+        self.missing += chunk[self.columns].isna().sum().to_numpy()
+        if self.numeric:
+            self._update_numeric(chunk)
+        for col in self.categorical:
+            if col in self.truncated:
+                continue
+            counts = self.value_counts[col].add(chunk[col].value_counts(), fill_value=0)
+            if len(counts) > MAX_TRACKED_CATEGORIES:
+                self.truncated.add(col)
+            self.value_counts[col] = counts
+
+    def _update_numeric(self, chunk: pd.DataFrame) -> None:
+        raw = chunk[self.numeric]
+        X = np.empty(raw.shape)
+        for i, col in enumerate(self.numeric):
+            series = raw[col]
+            if not pd.api.types.is_numeric_dtype(series):
+                coerced = pd.to_numeric(series, errors='coerce')
+                self.non_numeric[i] += int((coerced.isna() & series.notna()).sum())
+                series = coerced
+            X[:, i] = series.to_numpy(dtype=float, na_value=np.nan)
+
+        mask = ~np.isnan(X)
+        if self.shift is None:
+            with np.errstate(invalid='ignore'):
+                counts = mask.sum(axis=0)
+                self.shift = np.where(counts > 0, np.nansum(X, axis=0) / np.maximum(counts, 1), 0.0)
+
+        self.minimum = np.minimum(self.minimum, np.where(mask, X, np.inf).min(axis=0, initial=np.inf))
+        self.maximum = np.maximum(self.maximum, np.where(mask, X, -np.inf).max(axis=0, initial=-np.inf))
+
+        centered = np.where(mask, X - self.shift, 0.0)
+        self.sxy += centered.T @ centered
+        if mask.all():
+            # No missing values: pairwise sums reduce to column sums
+            self.n += len(X)
+            self.s += centered.sum(axis=0)[:, None]
+            self.ss += (centered ** 2).sum(axis=0)[:, None]
+        else:
+            present = mask.astype(float)
+            self.n += present.T @ present
+            self.s += centered.T @ present
+            self.ss += (centered ** 2).T @ present
+
+        # Bottom-k sampling on random keys keeps a uniform row sample across chunks
+        keys = np.concatenate([self._sample_keys, self._rng.random(len(X))])
+        rows = np.concatenate([self._sample, X])
+        if len(keys) > self.reservoir_rows:
+            keep = np.argpartition(keys, self.reservoir_rows)[:self.reservoir_rows]
+            keys, rows = keys[keep], rows[keep]
+        self._sample_keys, self._sample = keys, rows
+
+    @property
+    def numeric_sample(self) -> np.ndarray:
+        return self._sample
+
+    def correlation(self) -> np.ndarray:
+        with np.errstate(invalid='ignore', divide='ignore'):
+            cov = self.n * self.sxy - self.s * self.s.T
+            var_i = self.n * self.ss - self.s ** 2
+            corr = cov / np.sqrt(var_i * var_i.T)
+        corr[self.n < 2] = np.nan
+        return np.clip(corr, -1.0, 1.0)
+
+    def numeric_stats(self) -> Dict[str, Dict[str, float]]:
+        counts = np.diag(self.n)
+        sums = np.diag(self.s)
+        squares = np.diag(self.ss)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = self.shift + sums / counts
+            var = (squares - sums ** 2 / counts) / (counts - 1)
+            quantiles = (
+                np.nanpercentile(self._sample, [25, 50, 75], axis=0)
+                if len(self._sample) else np.full((3, len(self.numeric)), np.nan)
+            )
+
+        missing = dict(zip(self.columns, self.missing))
+        stats = {}
+        for i, col in enumerate(self.numeric):
+            stats[col] = {
+                "count": int(counts[i]),
+                "mean": float(mean[i]) if counts[i] else float('nan'),
+                "std": float(np.sqrt(max(var[i], 0.0))) if counts[i] > 1 else float('nan'),
+                "min": float(self.minimum[i]) if counts[i] else float('nan'),
+                "q25": float(quantiles[0, i]),
+                "median": float(quantiles[1, i]),
+                "q75": float(quantiles[2, i]),
+                "max": float(self.maximum[i]) if counts[i] else float('nan'),
+                "missing": int(missing[col]),
+            }
+        return stats
+
+    def outliers(self, stats: Dict[str, Dict[str, float]]) -> Dict[str, Dict[str, Any]]:
+        """IQR-fence outlier counts, estimated from the uniform sample"""
+        result = {}
+        for i, col in enumerate(self.numeric):
+            column = self._sample[:, i] if len(self._sample) else np.empty(0)
+            column = column[~np.isnan(column)]
+            if not len(column):
+                continue
+            q1, q3 = stats[col]["q25"], stats[col]["q75"]
+            iqr = q3 - q1
+            lower, upper = q1 - 1.5 * iqr, q3 + 1.5 * iqr
+            share = float(((column < lower) | (column > upper)).mean())
+            result[col] = {
+                "lower_bound": float(lower),
+                "upper_bound": float(upper),
+                "estimated_count": int(round(share * stats[col]["count"])),
+                "estimated_pct": share * 100,
+            }
+        return result
+
+
+class LazyDataset:
+    """A large tabular file profiled by streaming and loaded only on demand"""
+
+    def __init__(
+        self,
+        path: Path,
+        chunk_rows: int = DEFAULT_CHUNK_ROWS,
+        sample_rows: int = DEFAULT_SAMPLE_ROWS,
+        reservoir_rows: int = DEFAULT_RESERVOIR_ROWS,
+        seed: int = 42,
+    ):
+        self.path = Path(path)
+        suffix = self.path.suffix.lower()
+        if suffix not in SUPPORTED_SUFFIXES:
+            raise ValueError(f"Unsupported file type for lazy loading: {self.path.suffix}")
+        self.format = SUPPORTED_SUFFIXES[suffix]
+        self.sep = '\t' if suffix == '.tsv' else ','
+        self.chunk_rows = chunk_rows
+        self.reservoir_rows = reservoir_rows
+        self.seed = seed
+
+        self.sample = self._read_sample(sample_rows)
+        self.numeric_columns = self.sample.select_dtypes(include=[np.number]).columns.tolist()
+        self.categorical_columns = [c for c in self.sample.columns if c not in set(self.numeric_columns)]
+        self.read_dtypes = self._infer_read_dtypes()
+        self._profile: Optional[DatasetProfile] = None
+
+    def _read_sample(self, rows: int) -> pd.DataFrame:
+        if self.format == 'csv':
+            return pd.read_csv(self.path, sep=self.sep, nrows=rows)
+        return next(self.iter_chunks(batch_rows=rows), pd.DataFrame())
+
+    def _infer_read_dtypes(self) -> Dict[str, str]:
+        """Load low-cardinality string columns as categoricals to save memory"""
+        dtypes = {}
+        for col in self.categorical_columns:
+            series = self.sample[col]
+            if series.dtype == object and len(series) and series.nunique() <= CATEGORY_RATIO * len(series):
+                dtypes[col] = 'category'
+        return dtypes
+
+    @property
+    def column_names(self) -> List[str]:
+        return self.sample.columns.tolist()
+
+    def iter_chunks(
+        self,
+        columns: Optional[List[str]] = None,
+        batch_rows: Optional[int] = None
+    ) -> Iterator[pd.DataFrame]:
+        """Stream the file as DataFrame chunks"""
+        batch_rows = batch_rows or self.chunk_rows
+        if self.format == 'csv':
+            yield from pd.read_csv(self.path, sep=self.sep, usecols=columns, chunksize=batch_rows)
+        elif self.format == 'parquet':
+            import pyarrow.parquet as pq
+
+            for batch in pq.ParquetFile(self.path).iter_batches(batch_size=batch_rows, columns=columns):
+                yield batch.to_pandas()
+        else:
+            import pyarrow as pa
+
+            with pa.memory_map(str(self.path), 'r') as source:
+                reader = pa.ipc.open_file(source)
+                for i in range(reader.num_record_batches):
+                    batch = reader.get_batch(i)
+                    if columns is not None:
+                        batch = batch.select(columns)
+                    offset = 0
+                    while offset < batch.num_rows:
+                        yield batch.slice(offset, batch_rows).to_pandas()
+                        offset += batch_rows
+
+    def profile(self) -> DatasetProfile:
+        """One streaming pass over the file (cached)"""
+        if self._profile is not None:
+            return self._profile
+
+        acc = _StreamingAccumulator(self.column_names, self.numeric_columns, self.reservoir_rows, self.seed)
+        for chunk in self.iter_chunks():
+            acc.update(chunk)
+
+        numeric_stats = acc.numeric_stats()
+        top_values, unique_values = {}, {}
+        for col, counts in acc.value_counts.items():
+            unique_values[col] = int(len(counts))
+            top = counts.sort_values(ascending=False, kind='stable').head(10)
+            top_values[col] = {str(k): int(v) for k, v in top.items()}
+
+        self._profile = DatasetProfile(
+            rows=acc.rows,
+            column_names=self.column_names,
+            column_types={
+                col: self.read_dtypes.get(col, str(self.sample[col].dtype)) for col in self.column_names
+            },
+            missing_values={col: int(m) for col, m in zip(acc.columns, acc.missing)},
+            numeric_columns=self.numeric_columns,
+            categorical_columns=self.categorical_columns,
+            numeric_stats=numeric_stats,
+            correlation=pd.DataFrame(acc.correlation(), index=self.numeric_columns, columns=self.numeric_columns),
+            pair_counts=pd.DataFrame(acc.n.astype(np.int64), index=self.numeric_columns, columns=self.numeric_columns),
+            top_values=top_values,
+            unique_values=unique_values,
+            unique_values_truncated=sorted(acc.truncated),
+            outliers=acc.outliers(numeric_stats),
+            non_numeric_values={
+                col: int(n) for col, n in zip(self.numeric_columns, acc.non_numeric) if n
+            },
+            sample=pd.DataFrame(acc.numeric_sample, columns=self.numeric_columns),
+        )
+        return self._profile
+
+    def read_columns(self, columns: List[str]) -> pd.DataFrame:
+        """Load only ``columns`` (e.g. the variables of one model) into memory"""
+        if self.format == 'csv':
+            dtypes = {c: t for c, t in self.read_dtypes.items() if c in columns}
+            return pd.read_csv(self.path, sep=self.sep, usecols=columns, dtype=dtypes or None)
+        chunks = list(self.iter_chunks(columns=columns))
+        return pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame(columns=columns)
+
+    def to_pandas(self) -> pd.DataFrame:
+        """Materialize the whole file with the sample-inferred dtypes"""
+        if self.format == 'csv':
+            return pd.read_csv(self.path, sep=self.sep, dtype=self.read_dtypes or None)
+        if self.format == 'parquet':
+            import pyarrow.parquet as pq
+
+            return pq.read_table(self.path).to_pandas()
+        import pyarrow.feather as feather
+
+        return feather.read_table(self.path, memory_map=True).to_pandas()
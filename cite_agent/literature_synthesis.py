@@ -12,10 +12,13 @@ The "magical" part: Automatically synthesize dozens of papers.
 """
 
 import re
-from typing import Dict, Any, List, Optional, Tuple, Set
+from typing import Dict, Any, List, Optional, Tuple, Set, Union
 from collections import Counter, defaultdict
+import numpy as np
 import pandas as pd
 
+from .text_features import NgramIndex, normalize_ngram_sizes
+
 
 class LiteratureSynthesizer:
     """AI-powered literature synthesis for systematic reviews"""
@@ -23,6 +26,9 @@ class LiteratureSynthesizer:
     def __init__(self):
         self.papers: List[Dict[str, Any]] = []
         self.themes: Dict[str, List[str]] = defaultdict(list)  # theme -> paper_ids
+        # Sparse paper × n-gram indexes, one per n-gram configuration, kept
+        # up to date as papers are added (rows are positions in self.papers)
+        self._ngram_indexes: Dict[Tuple[int, ...], NgramIndex] = {}
 
     def add_paper(
         self,
@@ -60,6 +66,8 @@ class LiteratureSynthesizer:
         }
 
         self.papers.append(paper)
+        for index in self._ngram_indexes.values():
+            index.add_document(len(self.papers) - 1, self._paper_text(paper))
 
         return {
             "success": True,
@@ -67,17 +75,46 @@ class LiteratureSynthesizer:
             "total_papers": len(self.papers)
         }
 
+    @staticmethod
+    def _paper_text(paper: Dict[str, Any]) -> str:
+        return f"{paper['abstract']} {paper['findings']}"
+
+    def _ngram_index(self, theme_length: Union[int, Tuple[int, int]]) -> NgramIndex:
+        """Return the paper × n-gram index for ``theme_length``, building it on first use"""
+        sizes = normalize_ngram_sizes(theme_length)
+        index = self._ngram_indexes.get(sizes)
+        if index is None:
+            index = NgramIndex(ngram_sizes=sizes)
+            index.add_documents((row, self._paper_text(paper)) for row, paper in enumerate(self.papers))
+            self._ngram_indexes[sizes] = index
+        return index
+
+    def _common_themes(
+        self,
+        min_papers: int,
+        theme_length: Union[int, Tuple[int, int]]
+    ) -> Tuple[NgramIndex, List[Tuple[str, int]]]:
+        """All meaningful themes as (theme, paper_count) pairs, most widespread first"""
+        index = self._ngram_index(theme_length)
+        themes = index.top_terms(
+            min_value=min_papers,
+            by="df",
+            exclude=self._is_stopword_theme
+        )
+        return index, themes
+
     def extract_common_themes(
         self,
         min_papers: int = 3,
-        theme_length: int = 2
+        theme_length: Union[int, Tuple[int, int]] = 2
     ) -> Dict[str, Any]:
         """
         Extract common themes across papers using n-gram analysis
 
         Args:
             min_papers: Minimum number of papers mentioning a theme
-            theme_length: Length of n-grams (2=bigrams, 3=trigrams)
+            theme_length: Length of n-grams (2=bigrams, 3=trigrams) or an inclusive
+                (min, max) range such as (2, 4)
 
         Returns:
             Themes with frequency and supporting papers
@@ -85,54 +122,24 @@ class LiteratureSynthesizer:
         if len(self.papers) < 2:
             return {"error": "Need at least 2 papers for theme extraction"}
 
-        # Combine all abstracts and findings
-        all_text = []
-        for paper in self.papers:
-            text = f"{paper['abstract']} {paper['findings']}"
-            all_text.append((paper['id'], text.lower()))
-
-        # Extract n-grams
-        theme_papers = defaultdict(set)  # theme -> set of paper_ids
-
-        for paper_id, text in all_text:
-            # Tokenize
-            words = re.findall(r'\b[a-z]{3,}\b', text)
-
-            # Generate n-grams
-            for i in range(len(words) - theme_length + 1):
-                ngram = ' '.join(words[i:i+theme_length])
-
-                # Skip common phrases
-                if self._is_meaningful_theme(ngram):
-                    theme_papers[ngram].add(paper_id)
-
-        # Filter by minimum papers
-        common_themes = {
-            theme: list(papers)
-            for theme, papers in theme_papers.items()
-            if len(papers) >= min_papers
-        }
-
-        # Sort by frequency
-        sorted_themes = sorted(
-            common_themes.items(),
-            key=lambda x: len(x[1]),
-            reverse=True
-        )
+        index, themes = self._common_themes(min_papers, theme_length)
 
         return {
             "success": True,
-            "themes_found": len(sorted_themes),
+            "themes_found": len(themes),
             "themes": {
                 theme: {
-                    "frequency": len(papers),
-                    "papers": papers,
-                    "coverage_pct": (len(papers) / len(self.papers)) * 100
+                    "frequency": frequency,
+                    "papers": [self.papers[row]["id"] for row in index.documents_with(theme)],
+                    "coverage_pct": (frequency / len(self.papers)) * 100
                 }
-                for theme, papers in sorted_themes[:30]  # Top 30 themes
+                for theme, frequency in themes[:30]  # Top 30 themes
             }
         }
 
+    def _is_stopword_theme(self, phrase: str) -> bool:
+        return not self._is_meaningful_theme(phrase)
+
     def _is_meaningful_theme(self, phrase: str) -> bool:
         """Filter out common stopword phrases"""
         stopwords = [
@@ -375,40 +382,32 @@ class LiteratureSynthesizer:
         positive_keywords = ['increase', 'improve', 'positive', 'benefit', 'enhance', 'effective']
         negative_keywords = ['decrease', 'reduce', 'negative', 'harm', 'ineffective', 'no effect']
 
-        # Group papers by theme
-        theme_analysis = self.extract_common_themes(min_papers=2, theme_length=2)
+        # Classify each paper's direction once, then look it up per theme
+        polarity = np.zeros(len(self.papers), dtype=np.int8)
+        for row, paper in enumerate(self.papers):
+            text = f"{paper['findings']} {paper['abstract']}".lower()
+
+            pos_count = sum(1 for kw in positive_keywords if kw in text)
+            neg_count = sum(1 for kw in negative_keywords if kw in text)
+            polarity[row] = np.sign(pos_count - neg_count)
+
+        # Group papers by theme (same top themes as extract_common_themes)
+        index, themes = self._common_themes(min_papers=2, theme_length=2)
 
         contradictions = []
 
-        if "themes" in theme_analysis:
-            for theme, data in theme_analysis["themes"].items():
-                if data["frequency"] < 2:
-                    continue
-
-                # Check if papers on this theme have opposite findings
-                theme_papers = [p for p in self.papers if p["id"] in data["papers"]]
-
-                positive_papers = []
-                negative_papers = []
-
-                for paper in theme_papers:
-                    text = f"{paper['findings']} {paper['abstract']}".lower()
-
-                    pos_count = sum(1 for kw in positive_keywords if kw in text)
-                    neg_count = sum(1 for kw in negative_keywords if kw in text)
-
-                    if pos_count > neg_count:
-                        positive_papers.append(paper["id"])
-                    elif neg_count > pos_count:
-                        negative_papers.append(paper["id"])
-
-                if positive_papers and negative_papers:
-                    contradictions.append({
-                        "theme": theme,
-                        "positive_papers": positive_papers,
-                        "negative_papers": negative_papers,
-                        "description": f"Conflicting findings on '{theme}': {len(positive_papers)} positive vs {len(negative_papers)} negative"
-                    })
+        for theme, _ in themes[:30]:
+            rows = np.asarray(index.documents_with(theme), dtype=np.int64)
+            positive_papers = [self.papers[r]["id"] for r in rows[polarity[rows] > 0]]
+            negative_papers = [self.papers[r]["id"] for r in rows[polarity[rows] < 0]]
+
+            if positive_papers and negative_papers:
+                contradictions.append({
+                    "theme": theme,
+                    "positive_papers": positive_papers,
+                    "negative_papers": negative_papers,
+                    "description": f"Conflicting findings on '{theme}': {len(positive_papers)} positive vs {len(negative_papers)} negative"
+                })
 
         return {
             "success": True,
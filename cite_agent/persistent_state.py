@@ -0,0 +1,311 @@
+"""
+Shared Persistent State
+=======================
+
+Small write-coalescing key/value store for client-side bookkeeping
+(provider profiles, rate-limit counters, circuit breaker stats).
+
+Values are JSON objects addressed by ``(namespace, key)`` and kept in a
+SQLite database in WAL mode. Writes only touch memory: ``put`` replaces a
+value, ``update`` adds to counters and assigns fields. A background thread
+commits whatever is dirty every ``flush_interval`` seconds in one
+transaction, and again at exit, so the request path never waits on disk:
+
+    store = get_state_store()
+    store.update("rate_limits", "alice", increment={"groq_requests": 1})
+    store.get("rate_limits", "alice")  # Includes the pending increment
+
+Each flush runs under ``BEGIN IMMEDIATE``, which holds SQLite's write lock
+while pending counter increments are added to the latest committed value.
+Concurrent CLI processes therefore add up their counts instead of
+overwriting one another, and a crash mid-write never leaves a torn file.
+"""
+
+import atexit
+import json
+import logging
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FLUSH_INTERVAL = 2.0
+
+Key = Tuple[str, str]
+
+
+@dataclass
+class _PendingWrite:
+    """Uncommitted changes to one value"""
+    replace: Optional[Dict[str, Any]] = None
+    increment: Dict[str, float] = field(default_factory=dict)
+    assign: Dict[str, Any] = field(default_factory=dict)
+    unless_same: Optional[str] = None  # Skip the replace if base already has this field's new value
+
+    @property
+    def needs_base(self) -> bool:
+        return self.replace is None or self.unless_same is not None
+
+    def apply(self, base: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        replace = self.replace
+        if replace is not None and self.unless_same is not None and base is not None:
+            if base.get(self.unless_same) == replace.get(self.unless_same):
+                replace = None  # Someone else already replaced it
+        value = dict(replace if replace is not None else (base or {}))
+        for name, amount in self.increment.items():
+            value[name] = (value.get(name) or 0) + amount
+        value.update(self.assign)
+        return value
+
+
+class PersistentState:
+    """
+    Write-behind JSON object store backed by SQLite.
+
+    Reads are served from an in-memory copy of the committed value with any
+    pending changes applied. A namespace is loaded from disk on first use;
+    values this process writes are refreshed with the merged result of each
+    flush, which picks up increments made by other processes.
+    """
+
+    def __init__(self, db_path: Optional[Path] = None, flush_interval: float = DEFAULT_FLUSH_INTERVAL):
+        """
+        Args:
+            db_path: SQLite file. Defaults to ~/.nocturnal_archive/state.db
+            flush_interval: Seconds between background commits (0 = write synchronously)
+        """
+        if db_path is None:
+            db_path = Path.home() / ".nocturnal_archive" / "state.db"
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.flush_interval = flush_interval
+
+        self._lock = threading.RLock()
+        self._flush_lock = threading.Lock()
+        self._committed: Dict[Key, Dict[str, Any]] = {}
+        self._loaded_namespaces: set = set()
+        self._pending: Dict[Key, _PendingWrite] = {}
+        self._flushing: Dict[Key, _PendingWrite] = {}  # Being committed right now
+        self._writer: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._closed = False
+
+        with closing(self._connect()) as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS state (
+                    namespace TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    updated_at REAL NOT NULL,
+                    PRIMARY KEY (namespace, key)
+                )
+            """)
+        # Stores owned by a RateLimiter or selector are never closed explicitly
+        atexit.register(self.close)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(str(self.db_path), timeout=30.0, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+
+    def get(self, namespace: str, key: str, default: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        """Current value including pending writes (a copy), or default"""
+        with self._lock:
+            self._ensure_loaded(namespace)
+            value = self._current((namespace, key))
+        return default if value is None else value
+
+    def items(self, namespace: str) -> Dict[str, Dict[str, Any]]:
+        """Every key in namespace with its current value"""
+        with self._lock:
+            self._ensure_loaded(namespace)
+            keys = {k for ns, k in [*self._committed, *self._flushing, *self._pending] if ns == namespace}
+            result = {}
+            for key in keys:
+                value = self._current((namespace, key))
+                if value is not None:
+                    result[key] = value
+            return result
+
+    def _current(self, key: Key) -> Optional[Dict[str, Any]]:
+        value = self._committed.get(key)
+        for layer in (self._flushing, self._pending):
+            change = layer.get(key)
+            if change is not None:
+                value = change.apply(value)
+        return dict(value) if value is not None else None
+
+    def refresh(self, namespace: str, key: str) -> Optional[Dict[str, Any]]:
+        """Re-read one committed value from disk, then return it like ``get``"""
+        try:
+            with closing(self._connect()) as conn:
+                row = conn.execute(
+                    "SELECT value FROM state WHERE namespace = ? AND key = ?", (namespace, key)
+                ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"Could not refresh state '{namespace}/{key}': {e}")
+            return self.get(namespace, key)
+        with self._lock:
+            self._ensure_loaded(namespace)
+            try:
+                if row is not None:
+                    self._committed[(namespace, key)] = json.loads(row[0])
+            except ValueError:
+                pass
+            return self._current((namespace, key))
+
+    def _ensure_loaded(self, namespace: str) -> None:
+        if namespace in self._loaded_namespaces:
+            return
+        try:
+            with closing(self._connect()) as conn:
+                rows = conn.execute(
+                    "SELECT key, value FROM state WHERE namespace = ?", (namespace,)
+                ).fetchall()
+        except sqlite3.Error as e:
+            logger.warning(f"Could not load state namespace '{namespace}': {e}")
+            rows = []
+        for key, raw in rows:
+            try:
+                self._committed[(namespace, key)] = json.loads(raw)
+            except ValueError:
+                continue
+        self._loaded_namespaces.add(namespace)
+
+    # ------------------------------------------------------------------
+    # Writes
+    # ------------------------------------------------------------------
+
+    def put(self, namespace: str, key: str, value: Dict[str, Any], unless_same: Optional[str] = None) -> None:
+        """
+        Replace a value (last writer wins across processes)
+
+        With ``unless_same``, the replace is skipped if the value committed by
+        the time of the flush already has the same ``value[unless_same]``, e.g.
+        a daily reset another process has already done and counted on top of.
+        """
+        with self._lock:
+            self._pending[(namespace, key)] = _PendingWrite(replace=dict(value), unless_same=unless_same)
+        self._schedule()
+
+    def update(
+        self,
+        namespace: str,
+        key: str,
+        increment: Optional[Dict[str, float]] = None,
+        assign: Optional[Dict[str, Any]] = None
+    ) -> None:
+        """Add to counter fields and set other fields of a value"""
+        with self._lock:
+            pending = self._pending.setdefault((namespace, key), _PendingWrite())
+            for name, amount in (increment or {}).items():
+                pending.increment[name] = pending.increment.get(name, 0) + amount
+            pending.assign.update(assign or {})
+        self._schedule()
+
+    def _schedule(self) -> None:
+        if self.flush_interval <= 0 or self._closed:
+            self.flush()
+            return
+        if self._writer is None:
+            with self._lock:
+                if self._writer is None:
+                    self._writer = threading.Thread(
+                        target=self._run_writer, name="cite-agent-state-writer", daemon=True
+                    )
+                    self._writer.start()
+
+    def _run_writer(self) -> None:
+        """Background loop: commit whatever is dirty every flush_interval seconds"""
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception as e:
+                logger.warning(f"Background state flush failed: {e}")
+
+    def flush(self) -> None:
+        """Commit all pending writes in one transaction"""
+        with self._flush_lock:
+            with self._lock:
+                if not self._pending:
+                    return
+                pending, self._pending = self._pending, {}
+                self._flushing = pending
+
+            written: Dict[Key, Dict[str, Any]] = {}
+            try:
+                conn = self._connect()
+                try:
+                    conn.execute("BEGIN IMMEDIATE")
+                    now = time.time()
+                    for (namespace, key), change in pending.items():
+                        base = None
+                        if change.needs_base:
+                            row = conn.execute(
+                                "SELECT value FROM state WHERE namespace = ? AND key = ?", (namespace, key)
+                            ).fetchone()
+                            base = json.loads(row[0]) if row else None
+                        value = change.apply(base)
+                        conn.execute(
+                            "INSERT OR REPLACE INTO state (namespace, key, value, updated_at) VALUES (?, ?, ?, ?)",
+                            (namespace, key, json.dumps(value, default=str), now),
+                        )
+                        written[(namespace, key)] = value
+                    conn.execute("COMMIT")
+                except Exception:
+                    conn.execute("ROLLBACK")
+                    raise
+                finally:
+                    conn.close()
+            except Exception as e:
+                logger.warning(f"Failed to persist {len(pending)} state entries: {e}")
+                with self._lock:
+                    self._flushing = {}
+                    # Keep the changes; anything written meanwhile applies on top
+                    for key, change in pending.items():
+                        newer = self._pending.get(key)
+                        if newer is None:
+                            self._pending[key] = change
+                        elif newer.replace is None:
+                            for name, amount in newer.increment.items():
+                                change.increment[name] = change.increment.get(name, 0) + amount
+                            change.assign.update(newer.assign)
+                            self._pending[key] = change
+                return
+
+            with self._lock:
+                self._committed.update(written)
+                self._flushing = {}
+
+    def close(self) -> None:
+        """Flush pending writes and stop the background writer"""
+        if self._closed:
+            return
+        self._closed = True
+        atexit.unregister(self.close)
+        self._stop.set()
+        if self._writer is not None and self._writer is not threading.current_thread():
+            self._writer.join(timeout=5)
+        self.flush()
+
+
+# Singleton instance
+_state_instance: Optional[PersistentState] = None
+
+
+def get_state_store() -> PersistentState:
+    """Get the process-wide state store"""
+    global _state_instance
+    if _state_instance is None:
+        _state_instance = PersistentState()
+    return _state_instance
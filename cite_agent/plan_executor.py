@@ -0,0 +1,243 @@
+"""
+Dependency-Aware Plan Execution
+===============================
+
+Runs multi-step workflow plans as a DAG instead of strictly in order.
+
+Each step lists the earlier steps whose results it reads (``depends_on``,
+either 1-based step numbers or ``context_data`` keys such as ``"step_2"``).
+When a plan omits them, dependencies are inferred: steps whose executors
+read the shared context (analysis, file, general) wait for everything
+before them, and any step that mentions "step N" or "the previous result" waits
+for that step. Independent steps run concurrently on a bounded pool, so a
+plan takes about as long as its longest dependency chain:
+
+    executor = PlanExecutor(run_step, max_workers=4, step_timeout=90)
+    outcomes = await executor.run(plan["steps"])
+
+``run_step(index, step, context)`` receives a private context holding the
+outputs of the step's ancestors; whatever it writes there becomes the
+step's outputs for its dependents.
+"""
+
+import asyncio
+import inspect
+import logging
+import re
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Set
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_WORKERS = 4
+DEFAULT_STEP_TIMEOUT = 90.0
+
+# Step executors that read values produced by earlier steps from the context
+# (file steps save or show whatever the steps before them produced)
+CONTEXT_CONSUMING_TOOLS = frozenset({"analysis", "file", "general"})
+
+_STEP_REFERENCE = re.compile(r'\bstep[\s_#]*(\d+)\b', re.IGNORECASE)
+_PREVIOUS_REFERENCE = re.compile(
+    r"\b(?:previous|prior|preceding|above|earlier|last)\s+(?:step|result|output|answer|value|data)s?\b"
+    r"|\b(?:that|this|the)\s+result\b",
+    re.IGNORECASE,
+)
+# Pronouns and phrases in a "X, then Y" clause that point back at X's output
+_BACK_REFERENCE = re.compile(
+    r"\b(?:it|its|them|they|their|those|these|both)\b"
+    r"|\bthe\s+(?:results?|outputs?|findings|numbers|figures|data)\b",
+    re.IGNORECASE,
+)
+
+StepRunner = Callable[[int, Dict[str, Any], Dict[str, Any]], Awaitable[Any]]
+
+
+@dataclass
+class StepOutcome:
+    """Result of one plan step"""
+    index: int  # 0-based position in the plan
+    step: Dict[str, Any]
+    result: Any = None
+    error: Optional[str] = None
+    timed_out: bool = False
+    elapsed: float = 0.0
+    outputs: Dict[str, Any] = field(default_factory=dict)  # Context entries written by the step
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def _parse_reference(reference: Any) -> Optional[int]:
+    """1-based step number from ``2``, ``"2"`` or ``"step_2"``"""
+    if isinstance(reference, bool):
+        return None
+    if isinstance(reference, int):
+        return reference
+    match = re.fullmatch(r'\s*(?:step[\s_#]*)?(\d+)\s*', str(reference), re.IGNORECASE)
+    return int(match.group(1)) if match else None
+
+
+def plan_dependencies(steps: Sequence[Dict[str, Any]]) -> List[Set[int]]:
+    """
+    0-based dependency sets for each step.
+
+    Only earlier steps may be depended on, which keeps every plan acyclic.
+    """
+    dependencies: List[Set[int]] = []
+    for i, step in enumerate(steps):
+        explicit = step.get("depends_on")
+        if explicit is not None:
+            if not isinstance(explicit, (list, tuple, set)):
+                explicit = [explicit]
+            numbers = (_parse_reference(ref) for ref in explicit)
+            dependencies.append({n - 1 for n in numbers if n is not None and 1 <= n <= i})
+            continue
+
+        if step.get("tool") in CONTEXT_CONSUMING_TOOLS:
+            dependencies.append(set(range(i)))
+            continue
+
+        query = str(step.get("query", ""))
+        inferred = {int(n) - 1 for n in _STEP_REFERENCE.findall(query) if 1 <= int(n) <= i}
+        if i and _PREVIOUS_REFERENCE.search(query):
+            inferred.add(i - 1)
+        dependencies.append(inferred)
+    return dependencies
+
+
+def referenced_steps(query: str, step: int, tool: Optional[str] = None) -> List[int]:
+    """
+    1-based earlier steps that clause ``step`` of a decomposed query works on.
+
+    A self-contained clause ("find papers on supply chains") depends on
+    nothing. One that refers back ("plot it", "save the results") depends on
+    the step before it, or on every earlier step when its tool reads the
+    shared context ("compare them"). "step N" references are kept as given.
+    """
+    references = {int(n) for n in _STEP_REFERENCE.findall(query) if 1 <= int(n) < step}
+    if step > 1 and (_BACK_REFERENCE.search(query) or _PREVIOUS_REFERENCE.search(query)):
+        if tool in CONTEXT_CONSUMING_TOOLS:
+            return list(range(1, step))
+        references.add(step - 1)
+    return sorted(references)
+
+
+def critical_path_length(dependencies: Sequence[Set[int]]) -> int:
+    """Number of steps on the longest dependency chain"""
+    depth: List[int] = []
+    for deps in dependencies:
+        depth.append(1 + max((depth[d] for d in deps), default=0))
+    return max(depth, default=0)
+
+
+class PlanExecutor:
+    """Execute plan steps concurrently in dependency order"""
+
+    def __init__(
+        self,
+        run_step: StepRunner,
+        max_workers: int = DEFAULT_MAX_WORKERS,
+        step_timeout: Optional[float] = DEFAULT_STEP_TIMEOUT,
+        on_step_complete: Optional[Callable[[StepOutcome], Any]] = None,
+    ):
+        """
+        Args:
+            run_step: Coroutine function ``(index, step, context) -> result``
+            max_workers: Steps allowed to run at the same time
+            step_timeout: Seconds before a step is cancelled (None = no limit)
+            on_step_complete: Called (or awaited) with each StepOutcome as it finishes
+        """
+        self.run_step = run_step
+        self.max_workers = max(1, int(max_workers))
+        self.step_timeout = step_timeout
+        self.on_step_complete = on_step_complete
+
+    async def run(
+        self,
+        steps: Sequence[Dict[str, Any]],
+        dependencies: Optional[Sequence[Set[int]]] = None,
+    ) -> List[StepOutcome]:
+        """
+        Run every step once its dependencies have finished.
+
+        Failed or timed-out dependencies do not block dependents; they simply
+        contribute no outputs, matching the old sequential behaviour.
+
+        Returns:
+            StepOutcomes in plan order
+        """
+        if dependencies is None:
+            dependencies = plan_dependencies(steps)
+
+        ancestors: List[Set[int]] = []
+        for deps in dependencies:
+            closure = set(deps)
+            for d in deps:
+                closure |= ancestors[d]
+            ancestors.append(closure)
+
+        outcomes: List[Optional[StepOutcome]] = [None] * len(steps)
+        semaphore = asyncio.Semaphore(self.max_workers)
+        tasks: List[asyncio.Task] = []
+
+        async def execute(index: int) -> None:
+            if dependencies[index]:
+                await asyncio.gather(*(tasks[d] for d in dependencies[index]))
+
+            context: Dict[str, Any] = {}
+            for ancestor in sorted(ancestors[index]):
+                context.update(outcomes[ancestor].outputs)
+            inherited = dict(context)
+
+            outcome = StepOutcome(index=index, step=steps[index])
+            async with semaphore:
+                start = time.monotonic()
+                try:
+                    if self.step_timeout:
+                        outcome.result = await asyncio.wait_for(
+                            self.run_step(index, steps[index], context), self.step_timeout
+                        )
+                    else:
+                        outcome.result = await self.run_step(index, steps[index], context)
+                except asyncio.TimeoutError:
+                    outcome.timed_out = True
+                    outcome.error = f"timed out after {self.step_timeout:g}s"
+                except Exception as exc:
+                    outcome.error = str(exc) or exc.__class__.__name__
+                outcome.elapsed = time.monotonic() - start
+
+            outcome.outputs = {
+                key: value for key, value in context.items()
+                if key not in inherited or inherited[key] is not value
+            }
+            outcomes[index] = outcome
+            await self._notify(outcome)
+
+        for index in range(len(steps)):
+            tasks.append(asyncio.ensure_future(execute(index)))
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+        return outcomes  # type: ignore[return-value]
+
+    async def _notify(self, outcome: StepOutcome) -> None:
+        if self.on_step_complete is None:
+            return
+        try:
+            maybe_awaitable = self.on_step_complete(outcome)
+            if inspect.isawaitable(maybe_awaitable):
+                await maybe_awaitable
+        except Exception as exc:
+            logger.debug("Step completion callback failed: %s", exc)
+
+
+def merge_step_outputs(outcomes: Sequence[StepOutcome]) -> Dict[str, Any]:
+    """Combine every step's outputs into one context, later steps winning"""
+    merged: Dict[str, Any] = {}
+    for outcome in outcomes:
+        merged.update(outcome.outputs)
+    return merged
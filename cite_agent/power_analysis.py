@@ -4,11 +4,126 @@ Power Analysis - Sample Size Calculations for Study Design
 
 Calculate required sample sizes, statistical power, effect sizes.
 Essential for grant proposals and study planning.
+
+Power functions below are written against SciPy's noncentral t/F
+distributions and broadcast over NumPy arrays, so a whole power curve
+(effect sizes × sample sizes) is one vectorized call. Sample sizes are
+found by bracketing + integer bisection on these functions, and minimum
+detectable effects by Brent root-finding.
 """
 
 import numpy as np
-from scipy import stats
-from typing import Dict, Any, Optional
+from scipy import optimize, stats
+from typing import Callable, Dict, Any, Optional, Sequence
+
+# Upper bound for sample-size searches; beyond this we report "unreachable"
+MAX_SAMPLE_SIZE = 10_000_000
+
+
+# ---------------------------------------------------------------------------
+# Vectorized power functions (all arguments broadcast)
+# ---------------------------------------------------------------------------
+
+def _is_two_sided(alternative: str) -> bool:
+    return alternative in ("two-sided", "2s")
+
+
+def ttest_power(effect_size, n_per_group, alpha=0.05, alternative="two-sided"):
+    """Power of an independent-samples t-test with equal groups (Cohen's d)."""
+    d = np.asarray(effect_size, dtype=float)
+    n = np.asarray(n_per_group, dtype=float)
+    df = 2 * n - 2
+    nc = d * np.sqrt(n / 2)
+    if _is_two_sided(alternative):
+        crit = stats.t.isf(alpha / 2, df)
+        return stats.nct.sf(crit, df, nc) + stats.nct.cdf(-crit, df, nc)
+    crit = stats.t.isf(alpha, df)
+    return stats.nct.sf(crit, df, nc)
+
+
+def correlation_power(effect_size, n, alpha=0.05, alternative="two-sided"):
+    """Power to detect a Pearson correlation r (Fisher z approximation)."""
+    r = np.asarray(effect_size, dtype=float)
+    n = np.asarray(n, dtype=float)
+    z_effect = np.arctanh(r)
+    z_alpha = stats.norm.isf(alpha / 2) if _is_two_sided(alternative) else stats.norm.isf(alpha)
+    return stats.norm.cdf(np.abs(z_effect) * np.sqrt(n - 3) - z_alpha)
+
+
+def anova_power(effect_size, n_total, n_groups, alpha=0.05):
+    """Power of a one-way ANOVA F-test (Cohen's f, total sample size)."""
+    f = np.asarray(effect_size, dtype=float)
+    n = np.asarray(n_total, dtype=float)
+    df_num = n_groups - 1
+    df_den = n - n_groups
+    crit = stats.f.isf(alpha, df_num, df_den)
+    return stats.ncf.sf(crit, df_num, df_den, f ** 2 * n)
+
+
+def regression_power(effect_size_f2, n_total, n_predictors, alpha=0.05):
+    """Power of the overall F-test in multiple regression (Cohen's f²)."""
+    f2 = np.asarray(effect_size_f2, dtype=float)
+    n = np.asarray(n_total, dtype=float)
+    df_den = n - n_predictors - 1
+    crit = stats.f.isf(alpha, n_predictors, df_den)
+    return stats.ncf.sf(crit, n_predictors, df_den, f2 * n)
+
+
+# ---------------------------------------------------------------------------
+# Solvers
+# ---------------------------------------------------------------------------
+
+def solve_sample_size(
+    power_fn: Callable[[int], float],
+    target_power: float,
+    n_min: int,
+    n_max: int = MAX_SAMPLE_SIZE
+) -> Optional[int]:
+    """
+    Smallest integer n >= n_min with power_fn(n) >= target_power.
+
+    Power is monotone in n, so we double until the target is bracketed and
+    then bisect on integers: O(log n) power evaluations instead of a scan.
+    Returns None if the target is not reachable by n_max.
+    """
+    if power_fn(n_min) >= target_power:
+        return n_min
+
+    low, high = n_min, max(n_min + 1, 2 * n_min)
+    while power_fn(high) < target_power:
+        if high >= n_max:
+            return None
+        low, high = high, min(2 * high, n_max)
+
+    while high - low > 1:
+        mid = (low + high) // 2
+        if power_fn(mid) >= target_power:
+            high = mid
+        else:
+            low = mid
+    return high
+
+
+def solve_effect_size(
+    power_fn: Callable[[float], float],
+    target_power: float,
+    upper: float,
+    lower: float = 1e-6,
+    max_upper: float = 1e3
+) -> Optional[float]:
+    """
+    Smallest effect size reaching target_power.
+
+    The bracket starts at ``upper`` and doubles until the target is reached
+    (kept small because noncentral CDFs lose precision at huge noncentrality),
+    then Brent's method finds the root.
+    """
+    objective = lambda es: float(power_fn(es)) - target_power
+    while not objective(upper) >= 0:
+        if upper >= max_upper:
+            return None
+        lower, upper = upper, min(2 * upper, max_upper)
+    return optimize.brentq(objective, lower, upper, xtol=1e-8)
 
 
 class PowerAnalyzer:
@@ -33,19 +148,13 @@ class PowerAnalyzer:
         Returns:
             Required sample size per group
         """
-        from statsmodels.stats.power import TTestIndPower
-
-        analysis = TTestIndPower()
-        nobs1 = analysis.solve_power(
-            effect_size=effect_size,
-            alpha=alpha,
-            power=power,
-            ratio=1.0,
-            alternative=alternative
+        n_per_group = solve_sample_size(
+            lambda n: ttest_power(effect_size, n, alpha, alternative),
+            power,
+            n_min=2
         )
-
-        # Round up
-        n_per_group = int(np.ceil(nobs1))
+        if n_per_group is None:
+            return self._unreachable("Independent samples t-test", effect_size, power)
         total_n = n_per_group * 2
 
         return {
@@ -78,8 +187,11 @@ class PowerAnalyzer:
         Returns:
             Required sample size
         """
-        # Fisher's Z transformation
-        z_effect = 0.5 * np.log((1 + effect_size) / (1 - effect_size))
+        if not 0 < abs(effect_size) < 1:
+            return {"error": "Correlation effect size must be between -1 and 1 (exclusive) and non-zero"}
+
+        # Fisher's Z transformation (closed form, no search needed)
+        z_effect = abs(np.arctanh(effect_size))
 
         # Critical values
         if alternative == "two-sided":
@@ -123,17 +235,14 @@ class PowerAnalyzer:
         Returns:
             Required sample size per group
         """
-        from statsmodels.stats.power import FTestAnovaPower
-
-        analysis = FTestAnovaPower()
-        n_per_group = analysis.solve_power(
-            effect_size=effect_size,
-            alpha=alpha,
-            power=power,
-            k_groups=n_groups
+        # Power depends on the total N; solve on per-group n so groups stay equal
+        n_per_group = solve_sample_size(
+            lambda n: anova_power(effect_size, n * n_groups, n_groups, alpha),
+            power,
+            n_min=2
         )
-
-        n_per_group = int(np.ceil(n_per_group))
+        if n_per_group is None:
+            return self._unreachable(f"One-way ANOVA ({n_groups} groups)", effect_size, power)
         total_n = n_per_group * n_groups
 
         return {
@@ -166,34 +275,14 @@ class PowerAnalyzer:
         Returns:
             Required total sample size
         """
-        from statsmodels.stats.power import FTestPower
-
-        # Convert f² to f
-        effect_size_f = np.sqrt(effect_size)
-
-        analysis = FTestPower()
-
-        # Degrees of freedom
-        df_num = n_predictors
-
-        # Solve for sample size
-        # For regression: df_den = n - k - 1, so n = df_den + k + 1
-        # We need to iterate to find n
-
-        for n_total in range(n_predictors + 10, 1000):
-            df_den = n_total - n_predictors - 1
-            if df_den <= 0:
-                continue
-
-            achieved_power = analysis.power(
-                effect_size=effect_size_f,
-                df_num=df_num,
-                df_denom=df_den,
-                alpha=alpha
-            )
-
-            if achieved_power >= power:
-                break
+        # df_den = n - k - 1 must be positive
+        n_total = solve_sample_size(
+            lambda n: regression_power(effect_size, n, n_predictors, alpha),
+            power,
+            n_min=n_predictors + 2
+        )
+        if n_total is None:
+            return self._unreachable(f"Multiple regression ({n_predictors} predictors)", effect_size, power)
 
         return {
             "success": True,
@@ -227,50 +316,18 @@ class PowerAnalyzer:
             Achieved statistical power
         """
         if test_type == "ttest":
-            from statsmodels.stats.power import TTestIndPower
-            analysis = TTestIndPower()
-            power = analysis.power(
-                effect_size=effect_size,
-                nobs1=n,
-                alpha=alpha,
-                alternative="two-sided"
-            )
+            power = ttest_power(effect_size, n, alpha)
 
         elif test_type == "correlation":
-            # Fisher's Z
-            z_effect = 0.5 * np.log((1 + effect_size) / (1 - effect_size))
-            z_alpha = stats.norm.ppf(1 - alpha/2)
-
-            # Standard error
-            se = 1 / np.sqrt(n - 3)
-
-            # Power calculation
-            z_beta = z_effect / se - z_alpha
-            power = stats.norm.cdf(z_beta)
+            power = correlation_power(effect_size, n, alpha)
 
         elif test_type == "anova":
-            from statsmodels.stats.power import FTestAnovaPower
             n_groups = kwargs.get("n_groups", 3)
-            analysis = FTestAnovaPower()
-            power = analysis.power(
-                effect_size=effect_size,
-                nobs=n,
-                alpha=alpha,
-                k_groups=n_groups
-            )
+            power = anova_power(effect_size, n * n_groups, n_groups, alpha)
 
         elif test_type == "regression":
-            from statsmodels.stats.power import FTestPower
             n_predictors = kwargs.get("n_predictors", 1)
-            effect_size_f = np.sqrt(effect_size)  # Convert f² to f
-            analysis = FTestPower()
-            df_den = n - n_predictors - 1
-            power = analysis.power(
-                effect_size=effect_size_f,
-                df_num=n_predictors,
-                df_denom=df_den,
-                alpha=alpha
-            )
+            power = regression_power(effect_size, n, n_predictors, alpha)
 
         else:
             return {"error": f"Unknown test type: {test_type}"}
@@ -298,38 +355,40 @@ class PowerAnalyzer:
 
         Args:
             test_type: "ttest", "correlation", "anova", or "regression"
-            n: Sample size
+            n: Sample size (per group for ttest/anova, total for correlation/regression)
             alpha: Significance level
             power: Desired power
-            **kwargs: Additional parameters
+            **kwargs: Additional parameters (n_groups for ANOVA, n_predictors for regression)
 
         Returns:
             Minimum detectable effect size
         """
         if test_type == "ttest":
-            from statsmodels.stats.power import TTestIndPower
-            analysis = TTestIndPower()
-            effect = analysis.solve_power(
-                nobs1=n,
-                alpha=alpha,
-                power=power,
-                alternative="two-sided"
+            effect = solve_effect_size(lambda d: ttest_power(d, n, alpha), power, upper=0.5)
+
+        elif test_type == "correlation":
+            effect = solve_effect_size(
+                lambda r: correlation_power(r, n, alpha), power, upper=0.5, max_upper=0.999999
             )
 
         elif test_type == "anova":
-            from statsmodels.stats.power import FTestAnovaPower
             n_groups = kwargs.get("n_groups", 3)
-            analysis = FTestAnovaPower()
-            effect = analysis.solve_power(
-                nobs=n,
-                alpha=alpha,
-                power=power,
-                k_groups=n_groups
+            effect = solve_effect_size(
+                lambda f: anova_power(f, n * n_groups, n_groups, alpha), power, upper=0.25
+            )
+
+        elif test_type == "regression":
+            n_predictors = kwargs.get("n_predictors", 1)
+            effect = solve_effect_size(
+                lambda f2: regression_power(f2, n, n_predictors, alpha), power, upper=0.15
             )
 
         else:
             return {"error": f"MDE calculation not implemented for {test_type}"}
 
+        if effect is None:
+            return {"error": f"Power {power} is not reachable with n={n} for {test_type}"}
+
         return {
             "success": True,
             "test_type": test_type,
@@ -340,6 +399,61 @@ class PowerAnalyzer:
             "interpretation": f"With n={n} and power={power}, can detect effects ≥ {effect:.3f}"
         }
 
+    def power_curve(
+        self,
+        test_type: str,
+        effect_sizes: Sequence[float],
+        sample_sizes: Sequence[int],
+        alpha: float = 0.05,
+        **kwargs
+    ) -> Dict[str, Any]:
+        """
+        Power over a grid of effect sizes × sample sizes, for plotting
+
+        Args:
+            test_type: "ttest", "correlation", "anova", or "regression"
+            effect_sizes: Effect sizes (rows of the grid)
+            sample_sizes: Sample sizes (columns; per group for ttest/anova)
+            alpha: Significance level
+            **kwargs: n_groups for ANOVA, n_predictors for regression
+
+        Returns:
+            Grid of achieved power, one row per effect size
+        """
+        es = np.asarray(effect_sizes, dtype=float)[:, None]
+        n = np.asarray(sample_sizes, dtype=float)[None, :]
+
+        if test_type == "ttest":
+            grid = ttest_power(es, n, alpha)
+        elif test_type == "correlation":
+            grid = correlation_power(es, n, alpha)
+        elif test_type == "anova":
+            n_groups = kwargs.get("n_groups", 3)
+            grid = anova_power(es, n * n_groups, n_groups, alpha)
+        elif test_type == "regression":
+            n_predictors = kwargs.get("n_predictors", 1)
+            grid = regression_power(es, n, n_predictors, alpha)
+        else:
+            return {"error": f"Unknown test type: {test_type}"}
+
+        return {
+            "success": True,
+            "test_type": test_type,
+            "alpha": alpha,
+            "effect_sizes": es[:, 0].tolist(),
+            "sample_sizes": n[0].astype(int).tolist(),
+            "power": np.nan_to_num(grid, nan=0.0).tolist()
+        }
+
+    def _unreachable(self, test_type, effect_size, power):
+        """Error payload when no feasible sample size reaches the target power"""
+        return {
+            "error": (
+                f"{test_type}: power {power} is not reachable with fewer than "
+                f"{MAX_SAMPLE_SIZE:,} participants for effect size {effect_size}"
+            )
+        }
+
     def _interpret_sample_size(self, test_type, effect_size, n, power):
         """Interpret sample size results"""
         interpretations = []
@@ -9,11 +9,15 @@ The "magical" feature professors need for interview/focus group analysis.
 """
 
 import re
-from typing import Dict, Any, List, Optional, Tuple, Set
+from itertools import combinations
+from typing import Dict, Any, Hashable, Iterable, List, Optional, Sequence, Tuple, Set
 from dataclasses import dataclass, field
-from collections import defaultdict, Counter
+from collections import defaultdict
 import pandas as pd
 import numpy as np
+from scipy import sparse
+
+from .text_features import NgramIndex
 
 
 @dataclass
@@ -38,6 +42,154 @@ class CodedSegment:
     context: Optional[str] = None
 
 
+def segment_key(segment: CodedSegment) -> Tuple[str, int, int]:
+    """Segments from different coders are the same unit if doc + line range match"""
+    return (segment.source, segment.line_start, segment.line_end)
+
+
+class SegmentCodeMatrix:
+    """Boolean segment × code matrix, grown one coded segment at a time"""
+
+    def __init__(self, codes: Optional[Iterable[str]] = None):
+        self.codes: List[str] = []
+        self.code_index: Dict[str, int] = {}
+        self._rows: List[np.ndarray] = []
+        self._matrix: Optional[sparse.csr_matrix] = None
+        for code in codes or []:
+            self.code_column(code)
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def code_column(self, code: str) -> int:
+        column = self.code_index.get(code)
+        if column is None:
+            column = len(self.codes)
+            self.code_index[code] = column
+            self.codes.append(code)
+        return column
+
+    def add(self, codes: Iterable[str]) -> int:
+        """Append a segment row; returns its row index"""
+        columns = np.unique(np.fromiter((self.code_column(c) for c in codes), dtype=np.int64))
+        self._rows.append(columns)
+        self._matrix = None
+        return len(self._rows) - 1
+
+    @property
+    def matrix(self) -> sparse.csr_matrix:
+        """Segments × codes boolean matrix (rebuilt lazily after additions)"""
+        if self._matrix is None or self._matrix.shape != (len(self._rows), len(self.codes)):
+            lengths = np.fromiter((len(r) for r in self._rows), dtype=np.int64, count=len(self._rows))
+            indptr = np.zeros(len(lengths) + 1, dtype=np.int64)
+            np.cumsum(lengths, out=indptr[1:])
+            indices = np.concatenate(self._rows) if self._rows else np.empty(0, dtype=np.int64)
+            self._matrix = sparse.csr_matrix(
+                (np.ones(len(indices), dtype=bool), indices, indptr),
+                shape=(len(self._rows), len(self.codes)),
+            )
+        return self._matrix
+
+    def rows_with(self, code: str) -> np.ndarray:
+        """Row indices of segments carrying ``code``"""
+        column = self.code_index.get(code)
+        if column is None:
+            return np.empty(0, dtype=np.int64)
+        return self.matrix[:, column].nonzero()[0]
+
+    def counts_by(self, groups: Sequence[Hashable], labels: Sequence[Hashable]) -> np.ndarray:
+        """(len(labels), n_codes) code counts, rows grouped by each segment's label"""
+        label_index = {label: i for i, label in enumerate(labels)}
+        group_rows = np.fromiter((label_index[g] for g in groups), dtype=np.int64, count=len(groups))
+        one_hot = sparse.csr_matrix(
+            (np.ones(len(group_rows), dtype=np.int64), (np.arange(len(group_rows)), group_rows)),
+            shape=(len(group_rows), len(labels)),
+        )
+        return (one_hot.T @ self.matrix.astype(np.int64)).toarray()
+
+    def cooccurrence(self) -> np.ndarray:
+        """(n_codes, n_codes) segment co-occurrence counts; the diagonal is code frequency"""
+        counts = self.matrix.astype(np.int64)
+        return (counts.T @ counts).toarray()
+
+
+# ---------------------------------------------------------------------------
+# Reliability statistics over a coders × units × codes boolean array
+# (``rated`` marks which coder coded which unit). Each returns one value per
+# code; codes nobody varied on count as perfect agreement.
+# ---------------------------------------------------------------------------
+
+def _chance_corrected(observed: np.ndarray, expected: np.ndarray) -> np.ndarray:
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(expected < 1.0, (observed - expected) / (1.0 - expected), 1.0)
+
+
+def cohen_kappa_by_code(ratings: np.ndarray, rated: np.ndarray) -> np.ndarray:
+    """Cohen's kappa per code, averaged over coder pairs (Light's kappa for >2 coders)"""
+    pair_kappas = []
+    for a, b in combinations(range(ratings.shape[0]), 2):
+        shared = rated[a] & rated[b]
+        if not shared.any():
+            continue
+        first, second = ratings[a][shared], ratings[b][shared]
+        observed = (first == second).mean(axis=0)
+        p1_yes, p2_yes = first.mean(axis=0), second.mean(axis=0)
+        expected = p1_yes * p2_yes + (1 - p1_yes) * (1 - p2_yes)
+        pair_kappas.append(_chance_corrected(observed, expected))
+    return np.mean(pair_kappas, axis=0) if pair_kappas else np.full(ratings.shape[2], np.nan)
+
+
+def fleiss_kappa_by_code(ratings: np.ndarray, rated: np.ndarray) -> np.ndarray:
+    """Fleiss' kappa per code (applied / not applied) over units every coder rated"""
+    complete = rated.all(axis=0)
+    n_coders, n_units = ratings.shape[0], int(complete.sum())
+    if n_coders < 2 or not n_units:
+        return np.full(ratings.shape[2], np.nan)
+    yes = ratings[:, complete].sum(axis=0).astype(float)  # units × codes
+    no = n_coders - yes
+    observed = ((yes * (yes - 1) + no * (no - 1)) / (n_coders * (n_coders - 1))).mean(axis=0)
+    p_yes = yes.sum(axis=0) / (n_units * n_coders)
+    expected = p_yes ** 2 + (1 - p_yes) ** 2
+    return _chance_corrected(observed, expected)
+
+
+def krippendorff_alpha_by_code(ratings: np.ndarray, rated: np.ndarray) -> np.ndarray:
+    """Krippendorff's alpha (nominal) per code; units may be missing for some coders"""
+    per_unit = rated.sum(axis=0)
+    pairable = per_unit >= 2
+    m = per_unit[pairable].astype(float)[:, None]
+    yes = (ratings[:, pairable] & rated[:, pairable, None]).sum(axis=0).astype(float)
+    total = m.sum()
+    if total < 2:
+        return np.full(ratings.shape[2], np.nan)
+    # Off-diagonal coincidences o_01 and marginals n_1, n_0 of the coincidence matrix
+    disagreement = (yes * (m - yes) / (m - 1)).sum(axis=0)
+    n_yes = yes.sum(axis=0)
+    n_no = total - n_yes
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(n_yes * n_no > 0, 1.0 - (total - 1) * disagreement / (n_yes * n_no), 1.0)
+
+
+def _kappa_interpretation(value: float) -> str:
+    if value < 0.20:
+        return "slight agreement"
+    if value < 0.40:
+        return "fair agreement"
+    if value < 0.60:
+        return "moderate agreement"
+    if value < 0.80:
+        return "substantial agreement"
+    return "almost perfect agreement"
+
+
+def _alpha_interpretation(value: float) -> str:
+    if value >= 0.80:
+        return "reliable"
+    if value >= 0.667:
+        return "acceptable for tentative conclusions"
+    return "unreliable"
+
+
 class QualitativeCodingAssistant:
     """Assistant for qualitative data analysis"""
 
@@ -45,6 +197,16 @@ class QualitativeCodingAssistant:
         self.codebook: Dict[str, Code] = {}
         self.coded_segments: List[CodedSegment] = []
         self.documents: Dict[str, str] = {}  # doc_id -> full text
+        self._ngram_index = NgramIndex(ngram_sizes=(2, 3))  # document × bigram/trigram counts
+        self._segment_codes = SegmentCodeMatrix()  # coded_segments × codes
+
+    def _segment_matrix(self) -> SegmentCodeMatrix:
+        """Segment × code matrix in step with self.coded_segments"""
+        if len(self._segment_codes) > len(self.coded_segments):
+            self._segment_codes = SegmentCodeMatrix()
+        for segment in self.coded_segments[len(self._segment_codes):]:
+            self._segment_codes.add(segment.codes)
+        return self._segment_codes
 
     def create_code(
         self,
@@ -104,6 +266,7 @@ class QualitativeCodingAssistant:
             Document info and speaker extraction
         """
         self.documents[doc_id] = text
+        self._ngram_index.add_document(doc_id, text)
 
         # Extract speakers if interview format
         speakers = []
@@ -140,38 +303,25 @@ class QualitativeCodingAssistant:
         if not doc_ids:
             doc_ids = list(self.documents.keys())
 
-        # Combine all text
-        all_text = "\n".join([self.documents[doc_id] for doc_id in doc_ids])
-
-        # Extract n-grams (2-4 words)
-        words = re.findall(r'\b[a-z]{3,}\b', all_text.lower())
+        # Index any documents added to self.documents directly
+        for doc_id in doc_ids:
+            if doc_id not in self._ngram_index:
+                self._ngram_index.add_document(doc_id, self.documents[doc_id])
 
-        # Count bigrams and trigrams
-        bigrams = [' '.join(words[i:i+2]) for i in range(len(words)-1)]
-        trigrams = [' '.join(words[i:i+3]) for i in range(len(words)-2)]
+        # Bigram and trigram counts over the selected documents
+        rows = self._ngram_index.rows_for(doc_ids)
 
-        bigram_counts = Counter(bigrams)
-        trigram_counts = Counter(trigrams)
-
-        # Filter by frequency
         themes = {}
 
-        for phrase, count in bigram_counts.most_common(50):
-            if count >= min_frequency:
+        for size, phrase_type, top_n in ((2, "bigram", 50), (3, "trigram", 30)):
+            for phrase, count in self._ngram_index.top_terms(
+                min_value=min_frequency, by="count", size=size, rows=rows, limit=top_n
+            ):
                 # Skip common stopword phrases
                 if not any(stop in phrase for stop in ['the ', ' the', ' and ', ' or ', ' to ', ' in ']):
                     themes[phrase] = {
                         "frequency": count,
-                        "type": "bigram",
-                        "suggested_code": phrase.replace(' ', '_')
-                    }
-
-        for phrase, count in trigram_counts.most_common(30):
-            if count >= min_frequency:
-                if not any(stop in phrase for stop in ['the ', ' the', ' and ', ' or ', ' to ', ' in ']):
-                    themes[phrase] = {
-                        "frequency": count,
-                        "type": "trigram",
+                        "type": phrase_type,
                         "suggested_code": phrase.replace(' ', '_')
                     }
 
@@ -229,6 +379,7 @@ class QualitativeCodingAssistant:
         )
 
         self.coded_segments.append(segment)
+        self._segment_matrix()
 
         return {
             "success": True,
@@ -257,17 +408,15 @@ class QualitativeCodingAssistant:
             return {"error": f"Code '{code}' not found in codebook"}
 
         excerpts = []
-        for segment in self.coded_segments:
-            if code in segment.codes:
-                excerpts.append({
-                    "text": segment.text,
-                    "source": segment.source,
-                    "speaker": segment.speaker,
-                    "line_range": f"{segment.line_start}-{segment.line_end}",
-                    "all_codes": segment.codes
-                })
-
-        excerpts = excerpts[:max_excerpts]
+        for row in self._segment_matrix().rows_with(code)[:max_excerpts]:
+            segment = self.coded_segments[row]
+            excerpts.append({
+                "text": segment.text,
+                "source": segment.source,
+                "speaker": segment.speaker,
+                "line_range": f"{segment.line_start}-{segment.line_end}",
+                "all_codes": segment.codes
+            })
 
         return {
             "success": True,
@@ -287,16 +436,15 @@ class QualitativeCodingAssistant:
         if not self.coded_segments:
             return {"error": "No coded segments available"}
 
-        # Build matrix
-        doc_ids = sorted(set(s.source for s in self.coded_segments))
+        # Document × code counts = one-hot(document)ᵀ · segment × code matrix
+        segment_codes = self._segment_matrix()
+        sources = [s.source for s in self.coded_segments]
+        doc_ids = sorted(set(sources))
         code_names = sorted(self.codebook.keys())
 
-        matrix = pd.DataFrame(0, index=doc_ids, columns=code_names)
-
-        for segment in self.coded_segments:
-            for code in segment.codes:
-                if code in code_names:
-                    matrix.loc[segment.source, code] += 1
+        counts = segment_codes.counts_by(sources, doc_ids)
+        matrix = pd.DataFrame(counts, index=doc_ids, columns=segment_codes.codes)
+        matrix = matrix.reindex(columns=code_names, fill_value=0)
 
         return {
             "success": True,
@@ -310,6 +458,38 @@ class QualitativeCodingAssistant:
             }
         }
 
+    def generate_code_cooccurrence_matrix(self) -> Dict[str, Any]:
+        """
+        Count how often pairs of codes are applied to the same segment
+
+        Returns:
+            Code × code matrix (diagonal = segments per code) and top pairs
+        """
+        if not self.coded_segments:
+            return {"error": "No coded segments available"}
+
+        segment_codes = self._segment_matrix()
+        code_names = sorted(self.codebook.keys())
+        matrix = pd.DataFrame(
+            segment_codes.cooccurrence(), index=segment_codes.codes, columns=segment_codes.codes
+        ).reindex(index=code_names, columns=code_names, fill_value=0)
+
+        upper = np.triu(matrix.to_numpy(), k=1)
+        rows, cols = np.nonzero(upper)
+        order = np.argsort(-upper[rows, cols], kind="stable")
+        top_pairs = [
+            {"codes": [code_names[rows[i]], code_names[cols[i]]], "segments": int(upper[rows[i], cols[i]])}
+            for i in order[:20]
+        ]
+
+        return {
+            "success": True,
+            "codes": len(code_names),
+            "total_coded_segments": len(self.coded_segments),
+            "matrix": matrix.to_dict(),
+            "top_pairs": top_pairs
+        }
+
     def calculate_inter_rater_reliability(
         self,
         coder1_segments: List[CodedSegment],
@@ -322,96 +502,132 @@ class QualitativeCodingAssistant:
         Args:
             coder1_segments: Coded segments from coder 1
             coder2_segments: Coded segments from coder 2
-            method: "cohen_kappa", "percent_agreement", or "krippendorff_alpha"
+            method: "cohen_kappa", "fleiss_kappa", "krippendorff_alpha", or "percent_agreement"
 
         Returns:
             Reliability metrics
         """
-        # Match segments (assume same doc + line range = same segment)
-        def segment_key(seg):
-            return (seg.source, seg.line_start, seg.line_end)
-
-        coder1_map = {segment_key(s): set(s.codes) for s in coder1_segments}
-        coder2_map = {segment_key(s): set(s.codes) for s in coder2_segments}
-
-        # Find common segments
-        common_keys = set(coder1_map.keys()) & set(coder2_map.keys())
-
-        if not common_keys:
-            return {"error": "No overlapping segments found between coders"}
-
-        # Calculate percent agreement
-        agreements = sum(
-            1 for key in common_keys
-            if coder1_map[key] == coder2_map[key]
+        return self.calculate_multi_coder_reliability(
+            {"coder1": coder1_segments, "coder2": coder2_segments}, method
         )
-        percent_agreement = (agreements / len(common_keys)) * 100
 
-        # Calculate Cohen's Kappa
-        if method == "cohen_kappa":
-            # Build agreement matrix for each code
-            all_codes = sorted(set(
-                code for codes in list(coder1_map.values()) + list(coder2_map.values())
-                for code in codes
-            ))
-
-            kappa_scores = {}
+    def calculate_multi_coder_reliability(
+        self,
+        coder_segments: Dict[str, List[CodedSegment]],
+        method: str = "cohen_kappa"
+    ) -> Dict[str, Any]:
+        """
+        Calculate inter-rater reliability across any number of coders
 
-            for code in all_codes:
-                # Binary: did each coder use this code?
-                coder1_used = [code in coder1_map.get(key, set()) for key in common_keys]
-                coder2_used = [code in coder2_map.get(key, set()) for key in common_keys]
+        Each coder's segments become a boolean unit × code matrix (units are
+        matched on doc + line range) and every statistic is computed for all
+        codes at once.
 
-                # Calculate observed agreement
-                observed = sum(c1 == c2 for c1, c2 in zip(coder1_used, coder2_used)) / len(common_keys)
+        Args:
+            coder_segments: Coder name -> that coder's coded segments
+            method: "cohen_kappa" (pairwise average for >2 coders), "fleiss_kappa",
+                "krippendorff_alpha", or "percent_agreement"
 
-                # Calculate expected agreement by chance
-                p1_yes = sum(coder1_used) / len(common_keys)
-                p2_yes = sum(coder2_used) / len(common_keys)
-                expected = (p1_yes * p2_yes) + ((1-p1_yes) * (1-p2_yes))
+        Returns:
+            Reliability metrics
+        """
+        if len(coder_segments) < 2:
+            return {"error": "At least two coders are required"}
+
+        # coders × units × codes boolean array; a coder's last coding of a unit wins
+        unit_index: Dict[Tuple[str, int, int], int] = {}
+        code_index: Dict[str, int] = {}
+        latest: List[Dict[int, List[str]]] = []
+        for segments in coder_segments.values():
+            coded = {}
+            for segment in segments:
+                unit = unit_index.setdefault(segment_key(segment), len(unit_index))
+                coded[unit] = segment.codes
+                for code in segment.codes:
+                    code_index.setdefault(code, len(code_index))
+            latest.append(coded)
+
+        all_codes = sorted(code_index)
+        ratings = np.zeros((len(latest), len(unit_index), len(all_codes)), dtype=bool)
+        rated = np.zeros((len(latest), len(unit_index)), dtype=bool)
+        column_of = {code: column for column, code in enumerate(all_codes)}
+        for coder, coded in enumerate(latest):
+            units = np.fromiter(coded.keys(), dtype=np.int64, count=len(coded))
+            rated[coder, units] = True
+            pairs = [(unit, column_of[code]) for unit, codes in coded.items() for code in codes]
+            if pairs:
+                unit_rows, code_columns = np.array(pairs, dtype=np.int64).T
+                ratings[coder, unit_rows, code_columns] = True
+
+        # Units every coder rated; percent agreement counts identical code sets
+        # Kappa and alpha only need some pair of coders to share a unit
+        common = rated.all(axis=0)
+        pairwise_methods = ("cohen_kappa", "fleiss_kappa", "krippendorff_alpha")
+        if not common.any() and (method not in pairwise_methods or not (rated.sum(axis=0) >= 2).any()):
+            return {"error": "No overlapping segments found between coders"}
 
-                # Kappa formula
-                if expected < 1.0:
-                    kappa = (observed - expected) / (1 - expected)
-                else:
-                    kappa = 1.0
+        common_ratings = ratings[:, common]
+        identical = (common_ratings == common_ratings[0]).all(axis=(0, 2))
+        agreements = int(identical.sum())
+        percent_agreement = (agreements / max(1, int(common.sum()))) * 100
 
-                kappa_scores[code] = round(kappa, 3)
+        result: Dict[str, Any] = {
+            "success": True,
+            "method": "Percent Agreement",
+            "coders": len(latest),
+            "segments_compared": int(common.sum()),
+            "percent_agreement": round(percent_agreement, 2),
+        }
 
+        if method in ("cohen_kappa", "fleiss_kappa"):
+            if method == "fleiss_kappa" and common.any():
+                by_code = fleiss_kappa_by_code(ratings, rated)
+                result["method"] = "Fleiss' Kappa"
+                result["fleiss_available"] = True
+            else:
+                by_code = cohen_kappa_by_code(ratings, rated)
+                result["method"] = "Cohen's Kappa" if len(latest) == 2 else "Cohen's Kappa (mean pairwise)"
+            if method == "fleiss_kappa" and "fleiss_available" not in result:
+                # Fleiss' kappa needs units every coder rated; report the pairs instead
+                names = list(coder_segments)
+                pairwise = {}
+                for a, b in combinations(range(len(latest)), 2):
+                    pair_kappa = cohen_kappa_by_code(ratings[[a, b]], rated[[a, b]])
+                    if not np.isnan(pair_kappa).all():
+                        pairwise[f"{names[a]} vs {names[b]}"] = round(float(np.nanmean(pair_kappa)), 3)
+                result.update({
+                    "fleiss_available": False,
+                    "pairwise_kappa": pairwise,
+                    "note": "No segment was coded by every coder, so Fleiss' kappa is unavailable; "
+                            "showing mean pairwise Cohen's kappa instead",
+                })
+            kappa_scores = {code: round(float(k), 3) for code, k in zip(all_codes, by_code)}
             # Overall kappa (average)
             overall_kappa = sum(kappa_scores.values()) / len(kappa_scores) if kappa_scores else 0
-
-            # Interpretation
-            if overall_kappa < 0.20:
-                interpretation = "slight agreement"
-            elif overall_kappa < 0.40:
-                interpretation = "fair agreement"
-            elif overall_kappa < 0.60:
-                interpretation = "moderate agreement"
-            elif overall_kappa < 0.80:
-                interpretation = "substantial agreement"
-            else:
-                interpretation = "almost perfect agreement"
-
-            return {
-                "success": True,
-                "method": "Cohen's Kappa",
-                "segments_compared": len(common_keys),
-                "percent_agreement": round(percent_agreement, 2),
+            result.update({
                 "overall_kappa": round(overall_kappa, 3),
-                "interpretation": interpretation,
+                "interpretation": _kappa_interpretation(overall_kappa),
                 "kappa_by_code": kappa_scores,
                 "codes_analyzed": len(all_codes)
-            }
+            })
+            return result
+
+        if method == "krippendorff_alpha":
+            by_code = krippendorff_alpha_by_code(ratings, rated)
+            alpha_scores = {code: round(float(a), 3) for code, a in zip(all_codes, by_code)}
+            overall_alpha = sum(alpha_scores.values()) / len(alpha_scores) if alpha_scores else 0
+            result.update({
+                "method": "Krippendorff's Alpha",
+                "overall_alpha": round(overall_alpha, 3),
+                "interpretation": _alpha_interpretation(overall_alpha),
+                "alpha_by_code": alpha_scores,
+                "codes_analyzed": len(all_codes)
+            })
+            return result
 
-        else:  # Percent agreement only
-            return {
-                "success": True,
-                "method": "Percent Agreement",
-                "segments_compared": len(common_keys),
-                "percent_agreement": round(percent_agreement, 2),
-                "perfect_matches": agreements
-            }
+        # Percent agreement only
+        result["perfect_matches"] = agreements
+        return result
 
     def export_codebook(self, format_type: str = "markdown") -> Dict[str, Any]:
         """
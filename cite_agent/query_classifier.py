@@ -0,0 +1,463 @@
+#!/usr/bin/env python3
+"""
+Compiled keyword classifier for request routing.
+
+Every indicator phrase used by ``EnhancedNocturnalAgent._analyze_request_type``
+and its helpers is compiled into one trie-shaped regular expression when the
+module is imported. A single scan of the lowercased question returns every
+phrase it contains (plain substring semantics, overlapping phrases included),
+so routing decisions become frozenset lookups instead of dozens of
+``any(x in q for x in ...)`` loops.
+
+Usage:
+    features = classify_query("what was apple's revenue in 2023?")
+    features.financial   # True
+    features.analysis_mode  # "quantitative"
+"""
+
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, FrozenSet, Iterable, Tuple
+
+
+# ---------------------------------------------------------------------------
+# Phrase groups
+# ---------------------------------------------------------------------------
+
+NON_DATA_INDICATORS = frozenset([
+    'paper', 'papers', 'research', 'study', 'studies', 'literature', 'article',
+    'find papers', 'search papers', 'publications',
+    'file', 'files', 'directory', 'folder', 'python files', '.py', '.js', '.txt',
+    'how many files', 'count files', 'list files', 'file count',
+    'cite_agent', 'codebase', 'repository', 'repo',
+    'revenue', 'stock', 'market cap', 'earnings', 'financial',
+])
+
+META_QUERY_INDICATORS = frozenset([
+    'what are you', 'who are you', 'are you a', 'are you an',
+    'how do you work', 'who made you', 'who built you',
+    'what can you do', 'what do you do', 'tell me about yourself',
+    'your capabilities', 'your features', 'how were you made',
+    'hardcode', 'programmed', 'your code', 'your response', 'your answer',
+])
+
+AGENT_QUESTION_WORDS = frozenset(['did you', 'do you', 'are you', 'can you', 'will you', 'have you'])
+
+AGENT_SELF_REFS = frozenset([
+    'hardcode', 'program', 'your code', 'your response', 'your answer',
+    'your capabilities', 'yourself', 'your features', 'you made', 'you built',
+])
+
+SIMPLE_MATH_TRIGGERS = frozenset([
+    "count to ", "count from ", "count down", "factorial", "permutation",
+    "combination", "simple math", "basic math", "list numbers",
+])
+
+FINANCIAL_KEYWORDS = frozenset([
+    # Core metrics
+    'financial', 'revenue', 'sales', 'income', 'profit', 'earnings', 'loss',
+    'net income', 'operating income', 'gross profit', 'ebitda', 'ebit',
+    # Margins & Ratios
+    'margin', 'gross margin', 'profit margin', 'operating margin', 'net margin', 'ebitda margin',
+    'ratio', 'current ratio', 'quick ratio', 'debt ratio', 'pe ratio', 'p/e',
+    'roe', 'roa', 'roic', 'roce', 'eps',
+    # Balance Sheet
+    'assets', 'liabilities', 'equity', 'debt', 'cash', 'capital',
+    'balance sheet', 'total assets', 'current assets', 'fixed assets',
+    'shareholders equity', 'stockholders equity', 'retained earnings',
+    # Cash Flow
+    'cash flow', 'fcf', 'free cash flow', 'operating cash flow',
+    'cfo', 'cfi', 'cff', 'capex', 'capital expenditure',
+    # Market Metrics
+    'stock', 'market cap', 'market capitalization', 'enterprise value',
+    'valuation', 'price', 'share price', 'stock price', 'quote',
+    'volume', 'trading volume', 'shares outstanding',
+    # Financial Statements
+    'income statement', '10-k', '10-q', '8-k', 'filing', 'sec filing',
+    'quarterly', 'annual report', 'earnings report', 'financial statement',
+    # Company Info
+    'ticker', 'company', 'corporation', 'ceo', 'earnings call',
+    'dividend', 'dividend yield', 'payout ratio',
+    # Growth & Performance
+    'growth', 'yoy', 'year over year', 'qoq', 'quarter over quarter',
+    'cagr', 'trend', 'performance', 'returns',
+])
+
+# Short single-word metrics ("roa", "eps", "p/e") only count on word boundaries,
+# otherwise "approaches" would match "roa".
+FINANCIAL_BOUNDED_KEYWORDS = frozenset(
+    kw for kw in FINANCIAL_KEYWORDS if len(kw.split()) == 1 and len(kw) <= 4
+)
+
+RESEARCH_KEYWORDS = frozenset([
+    'research', 'paper', 'study', 'academic', 'literature', 'journal',
+    'synthesis', 'findings', 'methodology', 'abstract', 'citation',
+    'author', 'publication', 'peer review', 'scientific',
+    # Technical/architecture terms that indicate research queries
+    'transformer', 'transformers', 'neural', 'network', 'architecture',
+    'model', 'models', 'algorithm', 'deep learning', 'machine learning',
+    'vision transformer', 'vit', 'bert', 'gpt', 'attention mechanism',
+    'self-supervised', 'supervised', 'unsupervised', 'pre-training',
+    # Domain-specific research terms
+    'medical imaging', 'chest x-ray', 'ct scan', 'mri', 'diagnosis',
+    'clinical', 'pathology', 'radiology', 'biomedical',
+    # Research action words
+    'find papers', 'search papers', 'recent papers', 'survey',
+    'state of the art', 'sota', 'baseline', 'benchmark',
+])
+
+QUALITATIVE_KEYWORDS = frozenset([
+    'theme', 'themes', 'thematic', 'qualitative coding', 'qualitative',
+    'interview', 'interviews', 'transcript', 'case study', 'narrative analysis',
+    'discourse analysis', 'content analysis', 'quote', 'quotes', 'excerpt',
+    'participant', 'respondent', 'informant', 'ethnography', 'ethnographic',
+    'grounded theory', 'phenomenology', 'phenomenological',
+    'what do people say', 'how do participants',
+    'lived experience', 'meaning making', 'interpretive',
+    'focus group', 'field notes', 'memoir', 'diary study',
+])
+
+QUANTITATIVE_KEYWORDS = frozenset([
+    'calculate', 'average', 'mean', 'median', 'percentage', 'correlation',
+    'regression', 'statistical', 'significance', 'p-value', 'variance',
+    'standard deviation', 'trend', 'forecast', 'model', 'predict',
+    'rate of', 'ratio', 'growth rate', 'change in', 'compared to',
+])
+
+DATA_ANALYSIS_KEYWORDS = frozenset([
+    'dataset', 'data.csv', '.csv', '.xlsx', '.xls', 'excel', 'spreadsheet',
+    'load data', 'analyze data', 'data analysis', 'statistical analysis',
+    'regression', 'correlation', 'linear regression', 'logistic regression',
+    'descriptive statistics', 'summary statistics', 'stats',
+    'plot', 'scatter plot', 'histogram', 'bar chart', 'visualize',
+    'test score', 'study hours', 'anova', 't-test', 'chi-square',
+    'normality', 'assumptions', 'check assumptions',
+    'r squared', 'r²', 'p-value', 'confidence interval',
+    'sample size', 'observations', 'variables', 'predictor',
+    'run regression', 'run analysis', 'analyze csv',
+    'r code', 'r script', 'execute r', 'run r',
+    'missing value', 'missing data', 'outlier', 'data quality', 'clean data',
+    'compare', 'comparison', 'between groups', 'group comparison', 'by group',
+])
+
+SYSTEM_KEYWORDS = frozenset([
+    'file', 'files', 'directory', 'directories', 'folder', 'folders',
+    'command', 'run', 'execute', 'install',
+    'python', 'code', 'script', 'scripts', 'program', 'system', 'terminal',
+    'find', 'search for', 'locate', 'list', 'show me', 'where is',
+    'what files', 'which files', 'how many files',
+    'grep', 'search', 'look for', 'count',
+    '.py', '.txt', '.js', '.java', '.cpp', '.c', '.h',
+    'function', 'class', 'definition', 'route', 'endpoint',
+    'codebase', 'project structure', 'source code',
+])
+
+STRONG_QUANT_CONTEXTS = frozenset([
+    'algorithm', 'park', 'system', 'database',
+    'calculate', 'predict', 'forecast', 'ratio', 'percentage',
+])
+
+MEASUREMENT_WORDS = frozenset(['score', 'metric', 'rating', 'measure', 'index'])
+
+MIXED_INDICATORS = frozenset(['experience', 'sentiment', 'perception'])
+
+STRONG_RESEARCH_INDICATORS = frozenset([
+    'research on', 'papers on', 'literature on', 'studies on',
+    'hypothesis', 'hypotheses', 'methodology', 'research gap',
+    'find papers', 'recent papers', 'academic', 'literature review',
+    'emerging markets', 'developing markets',
+    'momentum effect', 'momentum strategy',
+])
+
+# Context words that veto individual financial keywords
+STOCK_MARKET_CONTEXT = frozenset(['stock market', 'stock markets'])
+RETURNS_RESEARCH_CONTEXT = frozenset(['momentum returns', 'research', 'paper', 'study', 'hypothesis', 'premium'])
+PERFORMANCE_RESEARCH_CONTEXT = frozenset(['research', 'model', 'strategy', 'test'])
+
+VAGUE_EXEMPT_RESEARCH = frozenset([
+    'paper', 'papers', 'study', 'studies', 'literature', 'research',
+    'publication', 'article', 'self-supervised', 'transformer', 'neural',
+])
+
+COMPARISON_WORDS = frozenset(['compare', 'versus', 'vs', 'vs.'])
+
+COMPARISON_METRICS = frozenset([
+    # Financial metrics
+    'revenue', 'market cap', 'sales', 'growth', 'profit', 'valuation',
+    # Data analysis metrics
+    'accuracy', 'response_time', 'response time', 'performance', 'score',
+    'value', 'mean', 'median', 'average', 'rate', 'percentage',
+    'between groups', 'by group', 'group', 'condition',
+])
+
+MARKET_SHARE_SCOPES = frozenset(['analytics', 'software', 'government', 'data', 'cloud', 'sector', 'industry'])
+
+# Fallback task routing used by _classify_query_type (sequential workflows)
+TASK_MATH_KEYWORDS = frozenset([
+    'count to', 'factorial', 'fibonacci', 'prime', 'even', 'odd',
+    'divisible', 'multiply', 'divide', 'subtract', 'add',
+])
+TASK_ANALYSIS_KEYWORDS = frozenset([
+    'calculate', 'compute', 'correlation', 'regression',
+    'mean', 'average', 'median', 'std', 'variance',
+    'analyze', 'analyse', 'statistics', 'test', 'sum',
+    'histogram', 'plot', 'sample size', 'power', 'mde',
+])
+TASK_RESEARCH_KEYWORDS = frozenset([
+    'paper', 'research', 'study', 'publication', 'arxiv',
+    'journal', 'cite', 'citation', 'author', 'abstract',
+    'literature', 'scholar', 'doi', 'pubmed',
+])
+TASK_FINANCIAL_KEYWORDS = frozenset([
+    'revenue', 'profit', 'earnings', 'stock price',
+    'margin', 'eps', 'market cap', 'financial', 'nasdaq',
+    'ticker', 'shares', 'dividend', 'p/e ratio', 'valuation',
+])
+TASK_COMPANY_INDICATORS = frozenset([
+    'apple', 'microsoft', 'google', 'tesla', 'amazon',
+    'aapl', 'msft', 'googl', 'tsla', 'amzn', 'nio',
+    'company', 'corporation', 'inc', 'stock',
+])
+TASK_LOCAL_DATA_MARKERS = frozenset(['.csv', '.txt', 'data', 'dataset'])
+TASK_FILE_KEYWORDS = frozenset([
+    'read', 'write', 'file', 'list', 'directory', 'show',
+    'display', 'open', 'save', '.txt', '.csv', '.json',
+])
+TASK_WEB_KEYWORDS = frozenset([
+    'search web', 'find online', 'google', 'search for', 'look up',
+    'find information about', 'what is', 'who is', 'when', 'where',
+])
+
+
+# ---------------------------------------------------------------------------
+# Matcher
+# ---------------------------------------------------------------------------
+
+def _trie_pattern(phrases: Iterable[str]) -> str:
+    """Build a prefix-shared regex so the engine walks a trie, not N alternatives."""
+    trie: Dict[str, dict] = {}
+    for phrase in phrases:
+        node = trie
+        for char in phrase:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def render(node: Dict[str, dict]) -> str:
+        terminal = "" in node
+        branches = [re.escape(char) + render(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        if terminal:
+            # Greedy optional extension: the longest phrase at a position wins
+            return ("(?:" + body + ")?") if len(branches) == 1 else body + "?"
+        return body
+
+    return render(trie)
+
+
+class PhraseMatcher:
+    """
+    Finds every phrase from a fixed vocabulary that occurs in a text.
+
+    The lookahead regex reports the longest phrase starting at each offset;
+    all shorter phrases starting at the same offset are its prefixes, which
+    are precomputed, so one C-level scan reproduces ``phrase in text`` for
+    the whole vocabulary.
+    """
+
+    def __init__(self, phrases: Iterable[str], bounded: Iterable[str] = ()) -> None:
+        vocabulary = sorted({p for p in phrases if p})
+        self._pattern = re.compile("(?=(" + _trie_pattern(vocabulary) + "))")
+        self._prefixes: Dict[str, Tuple[str, ...]] = {
+            phrase: tuple(other for other in vocabulary if phrase.startswith(other))
+            for phrase in vocabulary
+        }
+        self._bounded = frozenset(bounded)
+
+    def scan(self, text: str) -> Tuple[FrozenSet[str], FrozenSet[str]]:
+        """Return (phrases found, bounded phrases found on word boundaries)."""
+        hits = set()
+        bounded_hits = set()
+        for match in self._pattern.finditer(text):
+            start = match.start()
+            for phrase in self._prefixes[match.group(1)]:
+                hits.add(phrase)
+                if phrase in self._bounded and phrase not in bounded_hits:
+                    if _on_word_boundaries(text, start, start + len(phrase)):
+                        bounded_hits.add(phrase)
+        return frozenset(hits), frozenset(bounded_hits)
+
+
+def _is_word_char(char: str) -> bool:
+    return char.isalnum() or char == "_"
+
+
+def _on_word_boundaries(text: str, start: int, end: int) -> bool:
+    """Equivalent of ``re.search(r'\\b' + phrase + r'\\b')`` at a known offset."""
+    before = _is_word_char(text[start - 1]) if start > 0 else False
+    after = _is_word_char(text[end]) if end < len(text) else False
+    return before != _is_word_char(text[start]) and after != _is_word_char(text[end - 1])
+
+
+_ALL_PHRASES = frozenset().union(
+    NON_DATA_INDICATORS, META_QUERY_INDICATORS, AGENT_QUESTION_WORDS, AGENT_SELF_REFS,
+    SIMPLE_MATH_TRIGGERS, FINANCIAL_KEYWORDS, RESEARCH_KEYWORDS, QUALITATIVE_KEYWORDS,
+    QUANTITATIVE_KEYWORDS, DATA_ANALYSIS_KEYWORDS, SYSTEM_KEYWORDS, STRONG_QUANT_CONTEXTS,
+    MEASUREMENT_WORDS, MIXED_INDICATORS, STRONG_RESEARCH_INDICATORS, STOCK_MARKET_CONTEXT,
+    RETURNS_RESEARCH_CONTEXT, PERFORMANCE_RESEARCH_CONTEXT, VAGUE_EXEMPT_RESEARCH,
+    COMPARISON_WORDS, COMPARISON_METRICS, MARKET_SHARE_SCOPES, {'market share'},
+    TASK_MATH_KEYWORDS, TASK_ANALYSIS_KEYWORDS, TASK_RESEARCH_KEYWORDS, TASK_FINANCIAL_KEYWORDS,
+    TASK_COMPANY_INDICATORS, TASK_LOCAL_DATA_MARKERS, TASK_FILE_KEYWORDS, TASK_WEB_KEYWORDS,
+)
+
+_MATCHER = PhraseMatcher(_ALL_PHRASES, bounded=FINANCIAL_BOUNDED_KEYWORDS)
+
+# Evidence in a memory entry ("Q: ... A: ...") that a dataset was loaded earlier
+_DATASET_EVIDENCE = PhraseMatcher([
+    'load', 'loaded', '.csv', '.xlsx', '/tmp/', 'dataset', 'data loaded', 'rows', 'columns',
+])
+
+YEAR_PATTERN = re.compile(r'\b(19\d{2}|20\d{2})\b')
+FOUR_DIGITS_PATTERN = re.compile(r'\d{4}')
+
+
+# ---------------------------------------------------------------------------
+# Features
+# ---------------------------------------------------------------------------
+
+@dataclass(frozen=True)
+class QueryFeatures:
+    """All intent signals for one question, computed from a single scan."""
+
+    hits: FrozenSet[str]
+    bounded_hits: FrozenSet[str]
+
+    def has_any(self, group: FrozenSet[str]) -> bool:
+        return not self.hits.isdisjoint(group)
+
+    def count(self, group: FrozenSet[str]) -> int:
+        return len(self.hits & group)
+
+    @property
+    def non_data(self) -> bool:
+        return self.has_any(NON_DATA_INDICATORS)
+
+    @property
+    def is_meta(self) -> bool:
+        if self.has_any(META_QUERY_INDICATORS):
+            return True
+        return self.has_any(AGENT_QUESTION_WORDS) and self.has_any(AGENT_SELF_REFS)
+
+    @property
+    def simple_math(self) -> bool:
+        return self.has_any(SIMPLE_MATH_TRIGGERS)
+
+    @property
+    def clearly_research(self) -> bool:
+        return self.has_any(STRONG_RESEARCH_INDICATORS) or (
+            'stock market' in self.hits and 'research' in self.hits
+        )
+
+    @property
+    def financial(self) -> bool:
+        """Financial intent, with research-context vetoes for ambiguous words."""
+        if self.clearly_research:
+            return False
+        for keyword in self.hits & FINANCIAL_KEYWORDS:
+            if keyword == 'stock' and self.has_any(STOCK_MARKET_CONTEXT):
+                continue
+            if keyword == 'returns' and self.has_any(RETURNS_RESEARCH_CONTEXT):
+                continue
+            if keyword == 'performance' and self.has_any(PERFORMANCE_RESEARCH_CONTEXT):
+                continue
+            if keyword in FINANCIAL_BOUNDED_KEYWORDS and keyword not in self.bounded_hits:
+                continue
+            return True
+        return False
+
+    @property
+    def research(self) -> bool:
+        return self.has_any(RESEARCH_KEYWORDS)
+
+    @property
+    def data_analysis(self) -> bool:
+        return self.has_any(DATA_ANALYSIS_KEYWORDS)
+
+    @property
+    def system(self) -> bool:
+        return self.has_any(SYSTEM_KEYWORDS)
+
+    @property
+    def analysis_mode(self) -> str:
+        """qualitative, quantitative, or mixed."""
+        has_strong_quant_context = self.has_any(STRONG_QUANT_CONTEXTS)
+        is_mixed_method = (
+            not has_strong_quant_context
+            and self.has_any(MEASUREMENT_WORDS)
+            and self.has_any(MIXED_INDICATORS)
+        )
+
+        qual_score = self.count(QUALITATIVE_KEYWORDS)
+        quant_score = self.count(QUANTITATIVE_KEYWORDS)
+
+        # Single qual keyword + financial = probably mixed ("Interview CEO about earnings")
+        if qual_score == 1 and self.has_any(FINANCIAL_KEYWORDS):
+            quant_score += 1
+
+        # "theme park" or "sentiment analysis algorithm"
+        if has_strong_quant_context:
+            qual_score = max(0, qual_score - 1)
+
+        if is_mixed_method:
+            return "mixed"
+        if qual_score >= 2 and quant_score >= 1:
+            return "mixed"
+        if qual_score > quant_score and qual_score > 0:
+            return "qualitative"
+        if qual_score > 0 and quant_score > 0:
+            return "mixed"
+        return "quantitative"
+
+    @property
+    def task_type(self) -> str:
+        """Conservative tool category for sequential workflow steps."""
+        if self.has_any(TASK_MATH_KEYWORDS):
+            return 'analysis'
+        has_financial = self.has_any(TASK_FINANCIAL_KEYWORDS)
+        has_company = self.has_any(TASK_COMPANY_INDICATORS)
+        if self.has_any(TASK_ANALYSIS_KEYWORDS):
+            if has_financial and has_company and not self.has_any(TASK_LOCAL_DATA_MARKERS):
+                return 'financial'
+            return 'analysis'
+        if self.has_any(TASK_RESEARCH_KEYWORDS):
+            return 'research'
+        if self.has_any(TASK_WEB_KEYWORDS):
+            return 'web'
+        if has_financial:
+            return 'financial' if has_company else 'analysis'
+        if self.has_any(TASK_FILE_KEYWORDS):
+            return 'file'
+        return 'general'
+
+
+@lru_cache(maxsize=512)
+def classify_query(text: str) -> QueryFeatures:
+    """Scan a question once and expose every routing signal it carries."""
+    hits, bounded_hits = _MATCHER.scan(text.lower())
+    return QueryFeatures(hits=hits, bounded_hits=bounded_hits)
+
+
+@lru_cache(maxsize=256)
+def has_dataset_evidence(text: str) -> bool:
+    """True if a remembered interaction shows that a dataset was loaded."""
+    hits, _ = _DATASET_EVIDENCE.scan(text.lower())
+    return (
+        ('load' in hits and not hits.isdisjoint(('.csv', '.xlsx', '/tmp/')))
+        or ('loaded' in hits and 'dataset' in hits)
+        or 'data loaded' in hits
+        or ('rows' in hits and 'columns' in hits)
+    )
@@ -8,87 +8,324 @@ that haven't been saved to disk yet.
 Solves the problem: "I imported data in R but can't access it from the agent"
 """
 
-import subprocess
+import atexit
+import collections
 import json
+import queue
+import subprocess
 import tempfile
+import threading
+import uuid
+import weakref
 from pathlib import Path
 from typing import Dict, Any, List, Optional
 import pandas as pd
 
+try:
+    import pyarrow.feather as feather
+except ImportError:  # pragma: no cover - pyarrow is optional
+    feather = None
+
+
+_RESPONSE_PREFIX = "@@cite-agent@@"
+
+# Long-running R worker: reads one JSON request per line on stdin and answers
+# with one prefixed JSON line on stdout. Loaded .RData workspaces are cached
+# per path (reloaded when the file changes) and never modified by executed
+# code; code run without a workspace shares one persistent session environment.
+_WORKER_SCRIPT = r"""
+suppressPackageStartupMessages(library(jsonlite))
+
+.cite <- new.env()
+.cite$has_arrow <- requireNamespace("arrow", quietly = TRUE)
+.cite$session <- new.env(parent = globalenv())
+.cite$workspaces <- list()
+.cite$out <- stdout()
+
+.cite$env_for <- function(path) {
+    if (is.null(path) || !nzchar(path)) return(.cite$session)
+    if (!file.exists(path)) stop(paste("Workspace file not found:", path))
+    mtime <- as.numeric(file.info(path)$mtime)
+    cached <- .cite$workspaces[[path]]
+    if (!is.null(cached) && identical(cached$mtime, mtime)) return(cached$env)
+    env <- new.env(parent = globalenv())
+    load(path, envir = env)
+    .cite$workspaces[[path]] <- list(env = env, mtime = mtime)
+    env
+}
+
+.cite$write_frame <- function(df, stub, format) {
+    if (identical(format, "feather") && .cite$has_arrow) {
+        path <- paste0(stub, ".arrow")
+        arrow::write_feather(df, path, compression = "uncompressed")
+        return(list(path = path, format = "feather"))
+    }
+    path <- paste0(stub, ".csv")
+    write.csv(df, path, row.names = FALSE)
+    list(path = path, format = "csv")
+}
+
+.cite$list <- function(req) {
+    env <- .cite$env_for(req$workspace)
+    objects <- lapply(ls(env), function(name) {
+        obj <- get(name, envir = env)
+        list(
+            name = name,
+            class = class(obj)[1],
+            type = typeof(obj),
+            size = as.numeric(object.size(obj)),
+            dimensions = if (is.null(dim(obj))) length(obj) else paste(dim(obj), collapse = "x"),
+            is_dataframe = is.data.frame(obj),
+            is_matrix = is.matrix(obj),
+            is_vector = is.vector(obj),
+            preview = if (is.data.frame(obj)) {
+                paste(colnames(obj), collapse = ", ")
+            } else if (is.vector(obj) && length(obj) <= 5) {
+                paste(head(obj, 5), collapse = ", ")
+            } else {
+                ""
+            }
+        )
+    })
+    list(objects = objects)
+}
+
+.cite$get <- function(req) {
+    env <- .cite$env_for(req$workspace)
+    name <- req$name
+    if (!exists(name, envir = env)) stop(paste("Object", name, "not found in workspace"))
+    obj <- get(name, envir = env)
+    if (!is.data.frame(obj)) {
+        if (is.matrix(obj)) {
+            obj <- as.data.frame(obj)
+        } else if (is.vector(obj)) {
+            obj <- data.frame(value = obj)
+        } else {
+            stop(paste("Object", name, "cannot be converted to dataframe"))
+        }
+    }
+    c(
+        list(rows = nrow(obj), columns = ncol(obj), column_names = I(colnames(obj))),
+        .cite$write_frame(obj, req$stub, req$format)
+    )
+}
+
+.cite$exec <- function(req) {
+    env <- .cite$env_for(req$workspace)
+    # A loaded workspace must keep matching its file: evaluate in a child env so
+    # assignments never reach the cached copy (the session env persists by design)
+    if (!identical(env, .cite$session)) env <- new.env(parent = env)
+    output <- capture.output(eval(parse(text = req$code), envir = env))
+    captured <- list()
+    for (obj_name in req$capture) {
+        if (!exists(obj_name, envir = env)) next
+        obj <- get(obj_name, envir = env)
+        if (is.data.frame(obj) || is.matrix(obj)) {
+            df <- as.data.frame(obj)
+            captured[[obj_name]] <- c(
+                list(type = "dataframe", rows = nrow(df), columns = ncol(df)),
+                .cite$write_frame(df, paste0(req$stub, "_", obj_name), req$format)
+            )
+        } else if (is.vector(obj)) {
+            captured[[obj_name]] <- list(type = "vector", value = obj, length = length(obj))
+        } else {
+            captured[[obj_name]] <- list(type = class(obj)[1], value = as.character(obj))
+        }
+    }
+    list(captured = captured, output = paste(output, collapse = "\n"))
+}
+
+.cite$save <- function(req) {
+    env <- .cite$env_for(req$workspace)
+    objects <- if (length(req$objects)) req$objects else ls(env)
+    save(list = objects, envir = env, file = req$path)
+    list(message = paste("Saved", length(objects), "objects to", req$path))
+}
+
+.cite$dispatch <- function(req) {
+    switch(req$op,
+        ping = list(arrow = .cite$has_arrow),
+        list = .cite$list(req),
+        get = .cite$get(req),
+        exec = .cite$exec(req),
+        save = .cite$save(req),
+        stop(paste("Unknown operation:", req$op))
+    )
+}
+
+stdin_con <- file("stdin", open = "r")
+repeat {
+    line <- readLines(stdin_con, n = 1, warn = FALSE)
+    if (length(line) == 0) break
+    req <- tryCatch(fromJSON(line, simplifyVector = TRUE), error = function(e) NULL)
+    if (is.null(req)) next
+    resp <- tryCatch(
+        c(list(id = req$id, success = TRUE), .cite$dispatch(req)),
+        error = function(e) list(id = req$id, success = FALSE, error = conditionMessage(e))
+    )
+    cat("@@cite-agent@@", toJSON(resp, auto_unbox = TRUE, null = "null", na = "null", digits = NA),
+        "\n", sep = "", file = .cite$out)
+    flush(.cite$out)
+}
+"""
+
+
+class RWorkerError(RuntimeError):
+    """Raised when the R worker reports an error or exits unexpectedly"""
+
+
+class _RWorker:
+    """A warm ``Rscript`` process answering JSON requests over stdin/stdout"""
+
+    def __init__(self, r_executable: str, script_path: Path):
+        self.r_executable = r_executable
+        self.script_path = script_path
+        self._process: Optional[subprocess.Popen] = None
+        self._responses: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue()
+        self._stderr: "collections.deque[str]" = collections.deque(maxlen=200)
+        self._lock = threading.Lock()
+
+    @property
+    def alive(self) -> bool:
+        return self._process is not None and self._process.poll() is None
+
+    def _start(self):
+        self._responses = queue.Queue()
+        self._process = subprocess.Popen(
+            [self.r_executable, "--vanilla", str(self.script_path)],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            bufsize=1,
+        )
+        threading.Thread(
+            target=self._read_stdout, args=(self._process, self._responses), daemon=True
+        ).start()
+        threading.Thread(target=self._read_stderr, args=(self._process,), daemon=True).start()
+
+    @staticmethod
+    def _read_stdout(process: subprocess.Popen, responses: "queue.Queue"):
+        for line in process.stdout:
+            if line.startswith(_RESPONSE_PREFIX):
+                try:
+                    responses.put(json.loads(line[len(_RESPONSE_PREFIX):]))
+                except json.JSONDecodeError:
+                    continue
+        responses.put(None)  # EOF: the worker exited
+
+    def _read_stderr(self, process: subprocess.Popen):
+        for line in process.stderr:
+            self._stderr.append(line.rstrip("\n"))
+
+    def request(self, payload: Dict[str, Any], timeout: float) -> Dict[str, Any]:
+        """Send one request and wait for its response, restarting the worker if needed"""
+        with self._lock:
+            if not self.alive:
+                self._start()
+            request_id = uuid.uuid4().hex
+            self._stderr.clear()
+            try:
+                self._process.stdin.write(json.dumps({**payload, "id": request_id}) + "\n")
+                self._process.stdin.flush()
+            except (BrokenPipeError, OSError):
+                self.stop()
+                raise RWorkerError("R worker exited: " + self.stderr_tail())
+
+            while True:
+                try:
+                    response = self._responses.get(timeout=timeout)
+                except queue.Empty:
+                    # A stuck request leaves the session in an unknown state
+                    self.stop()
+                    raise subprocess.TimeoutExpired(self.r_executable, timeout)
+                if response is None:
+                    self.stop()
+                    raise RWorkerError("R worker exited: " + self.stderr_tail())
+                if response.get("id") == request_id:
+                    return response
+
+    def stderr_tail(self) -> str:
+        return "\n".join(self._stderr)
+
+    def stop(self):
+        process, self._process = self._process, None
+        if process is None:
+            return
+        try:
+            process.stdin.close()
+            process.wait(timeout=2)
+        except Exception:
+            process.kill()
+
 
 class RWorkspaceBridge:
-    """Bridge to access R workspace objects without saving to disk"""
+    """
+    Bridge to access R workspace objects without saving to disk
+
+    Requests go to a single persistent R worker process, so R starts once and
+    each ``.RData`` file is loaded once (and again only when it changes).
+    Data frames come back as uncompressed Feather files that are memory-mapped
+    with pyarrow, keeping column types intact; the worker falls back to CSV
+    when the R ``arrow`` package or pyarrow is unavailable. Objects created by
+    ``execute_and_capture`` without a workspace persist in the worker session.
+    """
 
     def __init__(self, r_executable: str = "Rscript"):
         self.r_executable = r_executable
         self.temp_dir = Path(tempfile.gettempdir()) / "r_workspace_bridge"
         self.temp_dir.mkdir(exist_ok=True)
+        self.frames_dir = self.temp_dir / "frames"
+        self.frames_dir.mkdir(exist_ok=True)
+
+        script_path = self.temp_dir / "worker.R"
+        if not script_path.exists() or script_path.read_text() != _WORKER_SCRIPT:
+            script_path.write_text(_WORKER_SCRIPT)
+        self._worker = _RWorker(r_executable, script_path)
+        _LIVE_BRIDGES.add(self)
+
+    def close(self):
+        """Stop the R worker process"""
+        self._worker.stop()
+
+    def _request(self, op: str, timeout: float, **params) -> Dict[str, Any]:
+        return self._worker.request({"op": op, **params}, timeout=timeout)
+
+    def _frame_params(self) -> Dict[str, Any]:
+        return {
+            "stub": str(self.frames_dir / uuid.uuid4().hex),
+            "format": "feather" if feather is not None else "csv",
+        }
+
+    @staticmethod
+    def _read_frame(info: Dict[str, Any]) -> pd.DataFrame:
+        """Load a data frame written by the worker, then remove the transfer file"""
+        path = Path(info["path"])
+        try:
+            if info.get("format") == "feather" and feather is not None:
+                return feather.read_table(path, memory_map=True).to_pandas()
+            return pd.read_csv(path)
+        finally:
+            try:
+                path.unlink()
+            except OSError:
+                pass
 
     def list_objects(self, workspace_path: Optional[str] = None) -> Dict[str, Any]:
         """
         List all objects in R workspace
 
         Args:
-            workspace_path: Path to .RData file (optional, uses current session if None)
+            workspace_path: Path to .RData file (optional, uses the worker session if None)
 
         Returns:
             Dict with object names, types, dimensions
         """
-        r_code = """
-        # Load workspace if specified
-        workspace_file <- commandArgs(trailingOnly = TRUE)[1]
-        if (!is.na(workspace_file) && file.exists(workspace_file)) {
-            load(workspace_file)
-        }
-
-        # Get all objects
-        obj_names <- ls()
-
-        # Build info for each object
-        obj_info <- lapply(obj_names, function(name) {
-            obj <- get(name)
-            list(
-                name = name,
-                class = class(obj)[1],
-                type = typeof(obj),
-                size = as.numeric(object.size(obj)),
-                dimensions = if(is.null(dim(obj))) length(obj) else paste(dim(obj), collapse="x"),
-                is_dataframe = is.data.frame(obj),
-                is_matrix = is.matrix(obj),
-                is_vector = is.vector(obj),
-                preview = if(is.data.frame(obj)) {
-                    paste(colnames(obj), collapse=", ")
-                } else if(is.vector(obj) && length(obj) <= 5) {
-                    paste(head(obj, 5), collapse=", ")
-                } else {
-                    ""
-                }
-            )
-        })
-
-        # Convert to JSON
-        cat(jsonlite::toJSON(obj_info, auto_unbox = TRUE))
-        """
-
         try:
-            # Write R code to temp file
-            r_script = self.temp_dir / "list_objects.R"
-            r_script.write_text(r_code)
-
-            # Run R script
-            cmd = [self.r_executable, str(r_script)]
-            if workspace_path:
-                cmd.append(workspace_path)
-
-            result = subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True,
-                timeout=30
-            )
+            response = self._request("list", timeout=30, workspace=workspace_path)
 
-            if result.returncode == 0:
-                objects = json.loads(result.stdout)
+            if response.get("success"):
+                objects = response.get("objects") or []
                 return {
                     "success": True,
                     "objects": objects,
@@ -96,12 +333,14 @@ class RWorkspaceBridge:
                 }
             else:
                 return {
-                    "error": f"R execution failed: {result.stderr}",
+                    "error": f"R execution failed: {response.get('error')}",
                     "success": False
                 }
 
         except subprocess.TimeoutExpired:
             return {"error": "R script timed out after 30 seconds", "success": False}
+        except RWorkerError as e:
+            return {"error": f"R execution failed: {str(e)}", "success": False}
         except Exception as e:
             return {"error": f"Failed to list R objects: {str(e)}", "success": False}
 
@@ -116,250 +355,146 @@ class RWorkspaceBridge:
         Returns:
             Dict with dataframe as pandas DataFrame
         """
-        r_code = f"""
-        # Load workspace if specified
-        workspace_file <- commandArgs(trailingOnly = TRUE)[1]
-        obj_name <- commandArgs(trailingOnly = TRUE)[2]
-        output_file <- commandArgs(trailingOnly = TRUE)[3]
-
-        if (!is.na(workspace_file) && file.exists(workspace_file)) {{
-            load(workspace_file)
-        }}
-
-        # Check if object exists
-        if (!exists(obj_name)) {{
-            stop(paste("Object", obj_name, "not found in workspace"))
-        }}
-
-        # Get object
-        obj <- get(obj_name)
-
-        # Convert to dataframe if needed
-        if (!is.data.frame(obj)) {{
-            if (is.matrix(obj)) {{
-                obj <- as.data.frame(obj)
-            }} else if (is.vector(obj)) {{
-                obj <- data.frame(value = obj)
-            }} else {{
-                stop(paste("Object", obj_name, "cannot be converted to dataframe"))
-            }}
-        }}
-
-        # Write to CSV
-        write.csv(obj, output_file, row.names = FALSE)
-
-        # Print success
-        cat(jsonlite::toJSON(list(
-            success = TRUE,
-            rows = nrow(obj),
-            columns = ncol(obj),
-            column_names = colnames(obj)
-        ), auto_unbox = TRUE))
-        """
-
         try:
-            # Create temp files
-            r_script = self.temp_dir / "get_dataframe.R"
-            csv_output = self.temp_dir / f"{object_name}.csv"
-
-            r_script.write_text(r_code)
-
-            # Run R script
-            cmd = [self.r_executable, str(r_script)]
-            if workspace_path:
-                cmd.append(workspace_path)
-            else:
-                cmd.append("NA")
-            cmd.extend([object_name, str(csv_output)])
-
-            result = subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True,
-                timeout=30
+            response = self._request(
+                "get", timeout=30, workspace=workspace_path, name=object_name, **self._frame_params()
             )
 
-            if result.returncode == 0:
-                # Parse R output
-                r_info = json.loads(result.stdout)
-
-                # Load CSV as pandas DataFrame
-                df = pd.read_csv(csv_output)
-
-                # Clean up temp file
-                csv_output.unlink()
+            if response.get("success"):
+                df = self._read_frame(response)
 
                 return {
                     "success": True,
                     "object_name": object_name,
                     "dataframe": df,
-                    "rows": r_info["rows"],
-                    "columns": r_info["columns"],
-                    "column_names": r_info["column_names"],
+                    "rows": response["rows"],
+                    "columns": response["columns"],
+                    "column_names": response["column_names"],
+                    "transfer_format": response.get("format"),
                     "preview": df.head(5).to_dict('records')
                 }
             else:
                 return {
-                    "error": f"R execution failed: {result.stderr}",
+                    "error": f"R execution failed: {response.get('error')}",
                     "success": False
                 }
 
         except subprocess.TimeoutExpired:
             return {"error": "R script timed out after 30 seconds", "success": False}
+        except RWorkerError as e:
+            return {"error": f"R execution failed: {str(e)}", "success": False}
         except Exception as e:
             return {"error": f"Failed to retrieve R dataframe: {str(e)}", "success": False}
 
-    def execute_and_capture(self, r_code: str, capture_objects: List[str]) -> Dict[str, Any]:
+    def execute_and_capture(
+        self,
+        r_code: str,
+        capture_objects: List[str],
+        workspace_path: Optional[str] = None
+    ) -> Dict[str, Any]:
         """
         Execute R code and capture specified objects
 
         Args:
             r_code: R code to execute
             capture_objects: List of object names to capture after execution
+            workspace_path: Run inside this .RData workspace instead of the worker session
 
         Returns:
             Dict with captured objects as pandas DataFrames
         """
-        full_r_code = f"""
-        # Execute user code
-        {r_code}
-
-        # Capture specified objects
-        output_dir <- commandArgs(trailingOnly = TRUE)[1]
-        capture_names <- c({', '.join([f'"{name}"' for name in capture_objects])})
-
-        captured <- list()
-
-        for (obj_name in capture_names) {{
-            if (exists(obj_name)) {{
-                obj <- get(obj_name)
-
-                # Save as CSV if dataframe-like
-                if (is.data.frame(obj) || is.matrix(obj)) {{
-                    filepath <- file.path(output_dir, paste0(obj_name, ".csv"))
-                    write.csv(as.data.frame(obj), filepath, row.names = FALSE)
-                    captured[[obj_name]] <- list(
-                        type = "dataframe",
-                        filepath = filepath,
-                        rows = nrow(obj),
-                        columns = ncol(obj)
-                    )
-                }} else if (is.vector(obj)) {{
-                    captured[[obj_name]] <- list(
-                        type = "vector",
-                        value = obj,
-                        length = length(obj)
-                    )
-                }} else {{
-                    captured[[obj_name]] <- list(
-                        type = class(obj)[1],
-                        value = as.character(obj)
-                    )
-                }}
-            }}
-        }}
-
-        # Output results as JSON
-        cat(jsonlite::toJSON(captured, auto_unbox = TRUE))
-        """
-
         try:
-            # Create temp directory for outputs
-            output_dir = self.temp_dir / "captures"
-            output_dir.mkdir(exist_ok=True)
-
-            # Write and execute R script
-            r_script = self.temp_dir / "execute_and_capture.R"
-            r_script.write_text(full_r_code)
-
-            result = subprocess.run(
-                [self.r_executable, str(r_script), str(output_dir)],
-                capture_output=True,
-                text=True,
-                timeout=60
+            response = self._request(
+                "exec",
+                timeout=60,
+                workspace=workspace_path,
+                code=r_code,
+                capture=list(capture_objects),
+                **self._frame_params()
             )
 
-            if result.returncode == 0:
-                captured_info = json.loads(result.stdout)
+            if response.get("success"):
+                # Empty R lists serialize as JSON arrays
+                captured_info = response.get("captured") or {}
 
                 # Load dataframes
                 captured_objects = {}
                 for obj_name, info in captured_info.items():
                     if info["type"] == "dataframe":
-                        df = pd.read_csv(info["filepath"])
                         captured_objects[obj_name] = {
                             "type": "dataframe",
-                            "data": df,
+                            "data": self._read_frame(info),
                             "rows": info["rows"],
                             "columns": info["columns"]
                         }
-                        # Clean up temp file
-                        Path(info["filepath"]).unlink()
                     else:
                         captured_objects[obj_name] = info
 
+                stderr = self._worker.stderr_tail()
                 return {
                     "success": True,
                     "captured": captured_objects,
-                    "stdout": result.stdout,
-                    "stderr": result.stderr if result.stderr else None
+                    "stdout": response.get("output", ""),
+                    "stderr": stderr if stderr else None
                 }
             else:
                 return {
-                    "error": f"R execution failed: {result.stderr}",
+                    "error": f"R execution failed: {response.get('error')}",
                     "success": False
                 }
 
         except subprocess.TimeoutExpired:
             return {"error": "R script timed out after 60 seconds", "success": False}
+        except RWorkerError as e:
+            return {"error": f"R execution failed: {str(e)}", "success": False}
         except Exception as e:
             return {"error": f"Failed to execute R code: {str(e)}", "success": False}
 
-    def save_workspace(self, output_path: str, objects: Optional[List[str]] = None) -> Dict[str, Any]:
+    def save_workspace(
+        self,
+        output_path: str,
+        objects: Optional[List[str]] = None,
+        workspace_path: Optional[str] = None
+    ) -> Dict[str, Any]:
         """
-        Save current R workspace (or specific objects) to .RData file
+        Save the worker session (or specific objects) to .RData file
 
         Args:
             output_path: Where to save .RData file
             objects: List of object names to save (None = save all)
+            workspace_path: Save from this loaded .RData workspace instead of the session
 
         Returns:
             Success status and file info
         """
-        if objects:
-            obj_list = ', '.join([f'"{obj}"' for obj in objects])
-            r_code = f"""
-            save(list = c({obj_list}), file = "{output_path}")
-            cat("Saved", length(c({obj_list})), "objects to {output_path}")
-            """
-        else:
-            r_code = f"""
-            save.image("{output_path}")
-            cat("Saved all workspace objects to {output_path}")
-            """
-
         try:
-            r_script = self.temp_dir / "save_workspace.R"
-            r_script.write_text(r_code)
-
-            result = subprocess.run(
-                [self.r_executable, str(r_script)],
-                capture_output=True,
-                text=True,
-                timeout=30
+            response = self._request(
+                "save", timeout=30, workspace=workspace_path, path=output_path, objects=objects or []
             )
 
-            if result.returncode == 0:
+            if response.get("success"):
                 return {
                     "success": True,
-                    "message": result.stdout,
+                    "message": response.get("message", ""),
                     "filepath": output_path
                 }
             else:
                 return {
-                    "error": f"Failed to save workspace: {result.stderr}",
+                    "error": f"Failed to save workspace: {response.get('error')}",
                     "success": False
                 }
 
         except Exception as e:
             return {"error": f"Failed to save workspace: {str(e)}", "success": False}
+
+
+_LIVE_BRIDGES: "weakref.WeakSet[RWorkspaceBridge]" = weakref.WeakSet()
+
+
+@atexit.register
+def _stop_live_workers() -> None:
+    for bridge in list(_LIVE_BRIDGES):
+        try:
+            bridge.close()
+        except Exception:
+            pass
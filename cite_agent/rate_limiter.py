@@ -1,6 +1,10 @@
 """
 Rate Limiting Configuration based on Groq API limits
 Implements per-user rate limiting with soft degradation
+
+Counters live in the shared persistent state store: recording a request
+only queues an increment, and concurrent CLI processes add up their counts
+when the store flushes instead of overwriting each other's files.
 """
 
 from dataclasses import dataclass
@@ -9,6 +13,8 @@ from datetime import datetime, timedelta
 import json
 from pathlib import Path
 
+from .persistent_state import PersistentState, get_state_store
+
 
 @dataclass
 class RateLimitConfig:
@@ -69,7 +75,15 @@ class RateLimiter:
     Implements soft degradation when limits are hit
     """
     
-    def __init__(self, user_id: str, tier: str = 'basic', storage_dir: Optional[Path] = None):
+    NAMESPACE = "rate_limits"
+
+    def __init__(
+        self,
+        user_id: str,
+        tier: str = 'basic',
+        storage_dir: Optional[Path] = None,
+        store: Optional[PersistentState] = None
+    ):
         self.user_id = user_id
         self.tier = tier
         self.config = RATE_LIMITS.get(tier, RATE_LIMITS['basic'])
@@ -78,23 +92,20 @@ class RateLimiter:
         self.storage_dir = storage_dir or Path.home() / ".nocturnal_archive" / "rate_limits"
         self.storage_dir.mkdir(parents=True, exist_ok=True)
         self.storage_file = self.storage_dir / f"{user_id}_limits.json"
+        if store is None:
+            store = PersistentState(self.storage_dir / "state.db") if storage_dir else get_state_store()
+        self.store = store
         
         # Load existing limits
-        self.limits = self._load_limits()
+        self._load_limits()
     
-    def _load_limits(self) -> Dict:
-        """Load rate limit data from storage"""
-        if self.storage_file.exists():
-            try:
-                with open(self.storage_file, 'r') as f:
-                    data = json.load(f)
-                    # Check if data is from today
-                    if data.get('date') == datetime.now().strftime('%Y-%m-%d'):
-                        return data
-            except Exception:
-                pass
-        
-        # Return fresh limits
+    @property
+    def limits(self) -> Dict:
+        """Today's counters, including increments not yet flushed"""
+        return self.store.get(self.NAMESPACE, self.user_id) or self._fresh_limits()
+    
+    @staticmethod
+    def _fresh_limits() -> Dict:
         return {
             'date': datetime.now().strftime('%Y-%m-%d'),
             'groq_requests': 0,
@@ -105,28 +116,29 @@ class RateLimiter:
             'last_request_time': None
         }
     
-    def _save_limits(self):
-        """Save rate limit data to storage"""
+    def _load_limits(self):
+        """Import the per-user JSON file from older versions into the state store"""
+        if self.store.get(self.NAMESPACE, self.user_id) is not None or not self.storage_file.exists():
+            return
         try:
-            with open(self.storage_file, 'w') as f:
-                json.dump(self.limits, f, indent=2)
-        except Exception as e:
-            print(f"Warning: Could not save rate limits: {e}")
+            with open(self.storage_file, 'r') as f:
+                data = json.load(f)
+            # Only today's counts matter
+            if data.get('date') == datetime.now().strftime('%Y-%m-%d'):
+                self.store.put(self.NAMESPACE, self.user_id, {**self._fresh_limits(), **data})
+        except Exception:
+            pass
     
     def _reset_if_needed(self):
         """Reset limits if it's a new day"""
         current_date = datetime.now().strftime('%Y-%m-%d')
-        if self.limits.get('date') != current_date:
-            self.limits = {
-                'date': current_date,
-                'groq_requests': 0,
-                'groq_tokens': 0,
-                'archive_api': 0,
-                'finsight_api': 0,
-                'web_search': 0,
-                'last_request_time': None
-            }
-            self._save_limits()
+        stored = self.store.get(self.NAMESPACE, self.user_id)
+        if stored is None or stored.get('date') != current_date:
+            # Our copy may be stale: another process may have started today already
+            stored = self.store.refresh(self.NAMESPACE, self.user_id)
+        if stored is None or stored.get('date') != current_date:
+            # Conditional, so a reset racing another process's keeps its counts
+            self.store.put(self.NAMESPACE, self.user_id, self._fresh_limits(), unless_same='date')
     
     def can_make_request(self, api_name: str = 'groq', tokens: int = 0) -> tuple[bool, Optional[str]]:
         """
@@ -176,17 +188,13 @@ class RateLimiter:
         self._reset_if_needed()
         
         if api_name == 'groq':
-            self.limits['groq_requests'] += 1
-            self.limits['groq_tokens'] += tokens
-            self.limits['last_request_time'] = datetime.now().isoformat()
-        elif api_name == 'archive_api':
-            self.limits['archive_api'] += 1
-        elif api_name == 'finsight_api':
-            self.limits['finsight_api'] += 1
-        elif api_name == 'web_search':
-            self.limits['web_search'] += 1
-        
-        self._save_limits()
+            self.store.update(
+                self.NAMESPACE, self.user_id,
+                increment={'groq_requests': 1, 'groq_tokens': tokens},
+                assign={'last_request_time': datetime.now().isoformat()}
+            )
+        elif api_name in ('archive_api', 'finsight_api', 'web_search'):
+            self.store.update(self.NAMESPACE, self.user_id, increment={api_name: 1})
     
     def get_remaining(self, api_name: str = 'groq') -> int:
         """Get remaining requests for an API"""
@@ -16,6 +16,8 @@ import os
 import re
 from enum import Enum
 
+from .lazy_dataset import LAZY_THRESHOLD_BYTES, SUPPORTED_SUFFIXES as LAZY_SUFFIXES, LazyDataset
+
 
 # ============================================================================
 # DATA ANALYSIS
@@ -45,31 +47,117 @@ class StatisticalResult:
 
 
 class DataAnalyzer:
-    """Statistical data analysis and hypothesis testing"""
-
-    def __init__(self):
-        self.current_dataset: Optional[pd.DataFrame] = None
+    """
+    Statistical data analysis and hypothesis testing
+
+    Small files are loaded straight into pandas. Files above
+    ``LAZY_THRESHOLD_BYTES`` (or any load with ``lazy=True``) open as a
+    ``LazyDataset``: descriptive statistics, missingness, correlations and
+    outlier estimates come from one streaming pass, models read only the
+    columns they use, and the full frame is materialized only when
+    ``current_dataset`` is actually accessed.
+    """
+
+    def __init__(self, lazy_threshold_bytes: int = LAZY_THRESHOLD_BYTES):
+        self._frame: Optional[pd.DataFrame] = None
+        self._lazy: Optional[LazyDataset] = None
         self.dataset_info: Optional[DatasetInfo] = None
+        self.lazy_threshold_bytes = lazy_threshold_bytes
+
+    @property
+    def current_dataset(self) -> Optional[pd.DataFrame]:
+        """The loaded DataFrame (materializes a lazy dataset on first access)"""
+        if self._frame is None and self._lazy is not None:
+            self._frame = self._lazy.to_pandas()
+        return self._frame
+
+    @current_dataset.setter
+    def current_dataset(self, df: Optional[pd.DataFrame]):
+        # An assigned frame (e.g. after cleaning) supersedes the file profile
+        self._frame = df
+        self._lazy = None
 
     @property
     def df(self) -> Optional[pd.DataFrame]:
         """Alias for current_dataset for compatibility with tool_executor"""
         return self.current_dataset
 
-    def load_dataset(self, filepath: str) -> Dict[str, Any]:
-        """Load CSV or Excel file and return dataset info"""
+    @property
+    def has_dataset(self) -> bool:
+        """Whether a dataset is loaded, without materializing a lazy one"""
+        return self._frame is not None or self._lazy is not None
+
+    @property
+    def is_lazy(self) -> bool:
+        """True while the loaded dataset is only profiled, not held in memory"""
+        return self._frame is None and self._lazy is not None
+
+    def dataset_overview(self, sample_rows: int = 5) -> Optional[Dict[str, Any]]:
+        """Shape, dtypes and leading rows of the loaded dataset (cheap in lazy mode)"""
+        if self.is_lazy:
+            info = self.dataset_info
+            return {
+                "rows": info.rows,
+                "columns": list(info.column_names),
+                "dtypes": dict(info.column_types),
+                "sample": self._lazy.sample.head(sample_rows),
+            }
+        if self._frame is None:
+            return None
+        df = self._frame
+        return {
+            "rows": len(df),
+            "columns": df.columns.tolist(),
+            "dtypes": {col: str(dtype) for col, dtype in df.dtypes.items()},
+            "sample": df.head(sample_rows),
+        }
+
+    def _columns_frame(self, columns: List[str]) -> pd.DataFrame:
+        """Just ``columns`` of the dataset, read from disk in lazy mode"""
+        if self.is_lazy:
+            return self._lazy.read_columns(columns)
+        return self.current_dataset[columns]
+
+    def _match_column(self, name: str) -> Optional[str]:
+        """Case-insensitive column lookup"""
+        name_lower = name.lower()
+        for col in self.dataset_info.column_names if self.is_lazy else self.current_dataset.columns:
+            if col.lower() == name_lower:
+                return col
+        return None
+
+    def load_dataset(self, filepath: str, lazy: Optional[bool] = None) -> Dict[str, Any]:
+        """
+        Load a CSV, TSV, Excel, Parquet or Feather file and return dataset info
+
+        Args:
+            filepath: Path to the data file
+            lazy: Force lazy (True) or in-memory (False) loading; None picks lazy
+                for files larger than ``lazy_threshold_bytes`` (Excel always loads)
+        """
         try:
             path = Path(filepath).expanduser()
+            suffix = path.suffix.lower()
+
+            if suffix not in ('.csv', '.tsv', '.xlsx', '.xls') and suffix not in LAZY_SUFFIXES:
+                return {"error": f"Unsupported file type: {path.suffix}"}
+
+            if lazy is None:
+                lazy = suffix in LAZY_SUFFIXES and path.stat().st_size > self.lazy_threshold_bytes
+            if lazy and suffix in LAZY_SUFFIXES:
+                return self._load_lazy(path)
 
             # Detect file type and load
-            if path.suffix.lower() == '.csv':
+            if suffix == '.csv':
                 df = pd.read_csv(path)
-            elif path.suffix.lower() in ['.xlsx', '.xls']:
+            elif suffix in ['.xlsx', '.xls']:
                 df = pd.read_excel(path)
-            elif path.suffix.lower() == '.tsv':
+            elif suffix == '.tsv':
                 df = pd.read_csv(path, sep='\t')
+            elif suffix == '.parquet':
+                df = pd.read_parquet(path)
             else:
-                return {"error": f"Unsupported file type: {path.suffix}"}
+                df = pd.read_feather(path)
 
             self.current_dataset = df
 
@@ -77,14 +165,14 @@ class DataAnalyzer:
             numeric_cols = df.select_dtypes(include=[np.number]).columns.tolist()
             categorical_cols = df.select_dtypes(exclude=[np.number]).columns.tolist()
 
-            missing = {col: int(df[col].isna().sum()) for col in df.columns}
+            missing = {col: int(count) for col, count in df.isna().sum().items()}
 
             self.dataset_info = DatasetInfo(
                 filepath=str(path),
                 rows=len(df),
                 columns=len(df.columns),
                 column_names=df.columns.tolist(),
-                column_types={col: str(df[col].dtype) for col in df.columns},
+                column_types={col: str(dtype) for col, dtype in df.dtypes.items()},
                 missing_values=missing,
                 numeric_columns=numeric_cols,
                 categorical_columns=categorical_cols
@@ -99,17 +187,59 @@ class DataAnalyzer:
                 "numeric_columns": numeric_cols,
                 "categorical_columns": categorical_cols,
                 "missing_values": missing,
-                "preview": df.head(5).to_dict('records')
+                "preview": df.head(5).to_dict('records'),
+                "mode": "in_memory"
             }
 
         except Exception as e:
             return {"error": f"Failed to load dataset: {str(e)}"}
 
+    def _load_lazy(self, path: Path) -> Dict[str, Any]:
+        """Profile a large file in one streaming pass without keeping it in memory"""
+        dataset = LazyDataset(path)
+        profile = dataset.profile()
+
+        self._frame = None
+        self._lazy = dataset
+        self.dataset_info = DatasetInfo(
+            filepath=str(path),
+            rows=profile.rows,
+            columns=len(profile.column_names),
+            column_names=profile.column_names,
+            column_types=profile.column_types,
+            missing_values=profile.missing_values,
+            numeric_columns=profile.numeric_columns,
+            categorical_columns=profile.categorical_columns
+        )
+
+        return {
+            "success": True,
+            "filepath": str(path),
+            "rows": profile.rows,
+            "columns": len(profile.column_names),
+            "column_names": profile.column_names,
+            "numeric_columns": profile.numeric_columns,
+            "categorical_columns": profile.categorical_columns,
+            "missing_values": profile.missing_values,
+            "preview": dataset.sample.head(5).to_dict('records'),
+            "mode": "lazy",
+            "column_statistics": {
+                col: {k: stats[k] for k in ("mean", "std", "min", "max", "median")}
+                for col, stats in profile.numeric_stats.items()
+            },
+            "outliers_estimated": profile.outliers,
+            "non_numeric_values": profile.non_numeric_values,
+            "note": "Large file profiled by streaming; quantiles and outlier counts are estimated from a uniform sample"
+        }
+
     def descriptive_stats(self, column: Optional[str] = None) -> Dict[str, Any]:
         """Compute descriptive statistics"""
-        if self.current_dataset is None:
+        if not self.has_dataset:
             return {"error": "No dataset loaded"}
 
+        if self.is_lazy:
+            return self._lazy_descriptive_stats(column)
+
         try:
             if column:
                 # Stats for specific column (case-insensitive matching)
@@ -172,28 +302,60 @@ class DataAnalyzer:
         except Exception as e:
             return {"error": f"Failed to compute stats: {str(e)}"}
 
+    def _lazy_descriptive_stats(self, column: Optional[str] = None) -> Dict[str, Any]:
+        """Descriptive statistics from the streaming profile of a lazy dataset"""
+        profile = self._lazy.profile()
+
+        if column:
+            actual_column = self._match_column(column)
+            if actual_column is None:
+                return {"error": f"Column '{column}' not found. Available: {', '.join(profile.column_names)}"}
+
+            if actual_column in profile.numeric_stats:
+                return {"column": actual_column, **profile.numeric_stats[actual_column]}
+            return {
+                "column": actual_column,
+                "type": "categorical",
+                "unique_values": profile.unique_values.get(actual_column, 0),
+                "top_values": profile.top_values.get(actual_column, {}),
+                "missing": profile.missing_values[actual_column]
+            }
+
+        return {
+            "stats": profile.numeric_stats,
+            "correlation_matrix": profile.correlation.to_dict() if profile.numeric_columns else {},
+            "quantiles_estimated": True
+        }
+
     def run_correlation(self, var1: str, var2: str, method: str = "pearson") -> Dict[str, Any]:
         """Compute correlation between two variables"""
-        if self.current_dataset is None:
+        if not self.has_dataset:
             return {"error": "No dataset loaded"}
 
         try:
             from scipy.stats import pearsonr, spearmanr
 
             # Case-insensitive column matching
-            var1_lower = var1.lower()
-            var2_lower = var2.lower()
-            matching_var1 = [c for c in self.current_dataset.columns if c.lower() == var1_lower]
-            matching_var2 = [c for c in self.current_dataset.columns if c.lower() == var2_lower]
-
-            if not matching_var1 or not matching_var2:
-                return {"error": f"One or both variables not found. Available: {', '.join(self.current_dataset.columns)}"}
-
-            actual_var1 = matching_var1[0]
-            actual_var2 = matching_var2[0]
+            actual_var1 = self._match_column(var1)
+            actual_var2 = self._match_column(var2)
+
+            if actual_var1 is None or actual_var2 is None:
+                available = self.dataset_info.column_names if self.is_lazy else self.current_dataset.columns
+                return {"error": f"One or both variables not found. Available: {', '.join(available)}"}
+
+            if self.is_lazy and method == "pearson" and actual_var1 != actual_var2:
+                # Pairwise-complete Pearson r is already in the streaming profile
+                profile = self._lazy.profile()
+                if actual_var1 in profile.numeric_stats and actual_var2 in profile.numeric_stats:
+                    n_obs = int(profile.pair_counts.loc[actual_var1, actual_var2])
+                    if n_obs < 3:
+                        return {"error": "Not enough data points (need at least 3)"}
+                    r = float(profile.correlation.loc[actual_var1, actual_var2])
+                    p = _pearson_p_value(r, n_obs)
+                    return self._correlation_result(r, p, "Pearson", n_obs)
 
             # Drop missing values
-            data = self.current_dataset[[actual_var1, actual_var2]].dropna()
+            data = self._columns_frame([actual_var1, actual_var2]).dropna()
 
             if len(data) < 3:
                 return {"error": "Not enough data points (need at least 3)"}
@@ -208,41 +370,47 @@ class DataAnalyzer:
                 r, p = spearmanr(x, y)
                 method_name = "Spearman"
 
-            # Interpret strength
-            if abs(r) < 0.3:
-                strength = "weak"
-            elif abs(r) < 0.7:
-                strength = "moderate"
-            else:
-                strength = "strong"
-
-            direction = "positive" if r > 0 else "negative"
-
-            return {
-                "correlation": float(r),
-                "correlation_coefficient": float(r),
-                "p_value": float(p),
-                "method": method_name,
-                "n_observations": len(data),
-                "interpretation": f"{strength} {direction} correlation",
-                "significant": bool(p < 0.05)
-            }
+            return self._correlation_result(r, p, method_name, len(data))
 
         except Exception as e:
             return {"error": f"Correlation analysis failed: {str(e)}"}
 
+    @staticmethod
+    def _correlation_result(r: float, p: float, method_name: str, n_obs: int) -> Dict[str, Any]:
+        """Format a correlation coefficient with its interpretation"""
+        # Interpret strength
+        if abs(r) < 0.3:
+            strength = "weak"
+        elif abs(r) < 0.7:
+            strength = "moderate"
+        else:
+            strength = "strong"
+
+        direction = "positive" if r > 0 else "negative"
+
+        return {
+            "correlation": float(r),
+            "correlation_coefficient": float(r),
+            "p_value": float(p),
+            "method": method_name,
+            "n_observations": n_obs,
+            "interpretation": f"{strength} {direction} correlation",
+            "significant": bool(p < 0.05)
+        }
+
     def run_regression(self, y_var: str, x_vars: List[str], model_type: str = "linear") -> Dict[str, Any]:
         """Run regression analysis"""
-        if self.current_dataset is None:
+        if not self.has_dataset:
             return {"error": "No dataset loaded"}
 
         try:
             from scipy.stats import linregress
             import statsmodels.api as sm
 
-            # Prepare data
-            y = self.current_dataset[y_var].dropna()
-            X = self.current_dataset[x_vars].dropna()
+            # Prepare data (lazy datasets read only the model's columns)
+            data = self._columns_frame(list(dict.fromkeys([y_var] + list(x_vars))))
+            y = data[y_var].dropna()
+            X = data[x_vars].dropna()
 
             # Align indices
             common_idx = y.index.intersection(X.index)
@@ -300,7 +468,7 @@ class DataAnalyzer:
 
     def check_assumptions(self, test_type: str) -> Dict[str, Any]:
         """Check statistical assumptions for a given test"""
-        if self.current_dataset is None:
+        if not self.has_dataset:
             return {"error": "No dataset loaded"}
 
         try:
@@ -310,8 +478,10 @@ class DataAnalyzer:
                 # Check normality for numeric columns
                 normality_results = {}
 
+                # Lazy datasets test the uniform row sample from the streaming pass
+                source = self._lazy.profile().sample if self.is_lazy else self.current_dataset
                 for col in self.dataset_info.numeric_columns[:5]:  # Check first 5
-                    data = self.current_dataset[col].dropna()
+                    data = source[col].dropna()
                     if len(data) >= 3:
                         stat, p = shapiro(data)
                         normality_results[col] = {
@@ -334,6 +504,16 @@ class DataAnalyzer:
             return {"error": f"Assumption check failed: {str(e)}"}
 
 
+def _pearson_p_value(r: float, n: int) -> float:
+    """Two-sided p-value for a Pearson correlation of n observations"""
+    from scipy.stats import t as t_dist
+
+    if abs(r) >= 1.0:
+        return 0.0
+    t_stat = r * np.sqrt((n - 2) / (1 - r ** 2))
+    return float(2 * t_dist.sf(abs(t_stat), n - 2))
+
+
 # ============================================================================
 # ASCII PLOTTING (from ascii_plotting.py)
 # ============================================================================
@@ -10,6 +10,7 @@ import threading
 from typing import Optional, AsyncGenerator
 from rich.console import Console
 from rich.markdown import Markdown
+from rich.markup import escape
 from rich.text import Text
 from rich.live import Live
 from rich.spinner import Spinner
@@ -60,17 +61,23 @@ class StreamingChatUI:
     async def stream_agent_response(
         self, 
         content_generator: AsyncGenerator[str, None],
-        show_markdown: bool = True
+        show_markdown: bool = True,
+        indicator: Optional[Live] = None
     ):
         """
         Stream agent response character-by-character
         
         Args:
             content_generator: Async generator yielding text chunks
+                (a synchronous Groq stream is also accepted)
             show_markdown: Whether to render as markdown (default True)
+            indicator: Action indicator to keep running until the first chunk arrives
         """
         global _interrupt_requested
         _interrupt_requested = False
+
+        if not hasattr(content_generator, "__aiter__"):
+            content_generator = groq_stream_to_generator(content_generator)
         
         # Start ESC key listener in background thread
         stop_listener = threading.Event()
@@ -100,6 +107,9 @@ class StreamingChatUI:
         
         try:
             async for chunk in content_generator:
+                if indicator is not None:
+                    indicator.stop()
+                    indicator = None
                 # Check for ESC interrupt
                 if _interrupt_requested:
                     self.console.print("\n[dim]⏹️  Interrupted by ESC.[/dim]")
@@ -116,6 +126,8 @@ class StreamingChatUI:
             return buffer
         finally:
             stop_listener.set()
+            if indicator is not None:
+                indicator.stop()
         
         self.console.print()  # Newline after response
         self.console.print()  # Extra space for readability
@@ -147,6 +159,24 @@ class StreamingChatUI:
         live.start()
         return live
     
+    def show_workflow_step(self, update: dict):
+        """
+        Display one finished step of a multi-step plan as soon as it completes
+
+        Args:
+            update: Step report from the agent (step, tool, query, status, error, elapsed)
+        """
+        query = update.get("query") or ""
+        if len(query) > 60:
+            query = query[:57] + "..."
+        label = escape(f"Step {update.get('step')} [{update.get('tool')}] {query}")
+        elapsed = update.get("elapsed") or 0.0
+        if update.get("status") == "completed":
+            self.console.print(f"[dim]✓ {label} ({elapsed:.1f}s)[/dim]")
+        else:
+            reason = escape(str(update.get("error") or update.get("status")))
+            self.console.print(f"[yellow]✗ {label}: {reason}[/yellow]")
+
     def show_error(self, error_message: str):
         """Display error message"""
         self.console.print(f"[red]Error:[/red] {error_message}")
@@ -0,0 +1,262 @@
+"""
+Sparse N-gram Feature Engine
+============================
+
+Shared document × n-gram matrix used for theme extraction in literature
+synthesis and qualitative coding.
+
+Documents are tokenized once when added; every distinct n-gram gets a
+column in a growing vocabulary and each document becomes one sparse row of
+counts. Queries such as document frequency, corpus frequency, coverage and
+co-occurrence are then column sums and sparse products over the cached CSR
+matrix instead of re-tokenizing and rescanning every text:
+
+    index = NgramIndex(ngram_sizes=(2, 3))
+    index.add_document("p1", abstract_1)
+    index.add_document("p2", abstract_2)
+    for term, df in index.top_terms(min_value=2, by="df"):
+        print(term, df, index.documents_with(term))
+"""
+
+import re
+from collections import Counter
+from typing import Callable, Dict, Hashable, Iterable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+from scipy import sparse
+
+# Lowercase words of three or more letters, as used by the theme extractors
+DEFAULT_TOKEN_PATTERN = re.compile(r'\b[a-z]{3,}\b')
+
+
+def normalize_ngram_sizes(sizes: Union[int, Sequence[int]]) -> Tuple[int, ...]:
+    """Accept ``2`` or an inclusive ``(min, max)`` range such as ``(2, 4)``."""
+    if isinstance(sizes, int):
+        return (sizes,)
+    sizes = tuple(int(n) for n in sizes)
+    if len(sizes) == 2 and sizes[0] < sizes[1]:
+        return tuple(range(sizes[0], sizes[1] + 1))
+    return tuple(sorted(set(sizes)))
+
+
+class NgramIndex:
+    """Incrementally built sparse document × n-gram count matrix."""
+
+    def __init__(
+        self,
+        ngram_sizes: Union[int, Sequence[int]] = (2, 3),
+        token_pattern: "re.Pattern[str]" = DEFAULT_TOKEN_PATTERN,
+    ):
+        """
+        Args:
+            ngram_sizes: N-gram lengths to index (int or inclusive (min, max) range)
+            token_pattern: Compiled regex applied to lowercased text
+        """
+        self.ngram_sizes = normalize_ngram_sizes(ngram_sizes)
+        self.token_pattern = token_pattern
+
+        self.vocabulary: Dict[str, int] = {}
+        self.terms: List[str] = []
+        self._term_sizes: List[int] = []
+
+        self.doc_ids: List[Hashable] = []
+        self._doc_rows: Dict[Hashable, int] = {}
+        self._row_columns: List[np.ndarray] = []
+        self._row_counts: List[np.ndarray] = []
+
+        self._matrix: Optional[sparse.csr_matrix] = None
+        self._presence: Optional[sparse.csr_matrix] = None
+        self._presence_csc: Optional[sparse.csc_matrix] = None
+        # Per-predicate exclusion flags, extended as the vocabulary grows
+        self._exclusions: Dict[Callable[[str], bool], np.ndarray] = {}
+
+    def __len__(self) -> int:
+        return len(self.doc_ids)
+
+    def __contains__(self, doc_id: Hashable) -> bool:
+        return doc_id in self._doc_rows
+
+    # ------------------------------------------------------------------
+    # Building
+    # ------------------------------------------------------------------
+
+    def tokenize(self, text: str) -> List[str]:
+        return self.token_pattern.findall(text.lower())
+
+    def _count_ngrams(self, words: List[str]) -> Counter:
+        counts: Counter = Counter()
+        for n in self.ngram_sizes:
+            if len(words) >= n:
+                counts.update(map(' '.join, zip(*(words[i:] for i in range(n)))))
+        return counts
+
+    def add_document(self, doc_id: Hashable, text: str) -> int:
+        """
+        Index a document, replacing any earlier text stored under ``doc_id``.
+
+        Returns:
+            Row index of the document in the matrix
+        """
+        counts = self._count_ngrams(self.tokenize(text))
+
+        columns = np.empty(len(counts), dtype=np.int64)
+        values = np.empty(len(counts), dtype=np.int64)
+        for i, (term, count) in enumerate(counts.items()):
+            column = self.vocabulary.get(term)
+            if column is None:
+                column = len(self.terms)
+                self.vocabulary[term] = column
+                self.terms.append(term)
+                self._term_sizes.append(term.count(' ') + 1)
+            columns[i] = column
+            values[i] = count
+        order = np.argsort(columns, kind="stable")
+
+        row = self._doc_rows.get(doc_id)
+        if row is None:
+            row = len(self.doc_ids)
+            self._doc_rows[doc_id] = row
+            self.doc_ids.append(doc_id)
+            self._row_columns.append(columns[order])
+            self._row_counts.append(values[order])
+        else:
+            self._row_columns[row] = columns[order]
+            self._row_counts[row] = values[order]
+
+        self._matrix = None
+        self._presence = None
+        self._presence_csc = None
+        return row
+
+    def add_documents(self, documents: Iterable[Tuple[Hashable, str]]) -> None:
+        for doc_id, text in documents:
+            self.add_document(doc_id, text)
+
+    @property
+    def matrix(self) -> sparse.csr_matrix:
+        """Documents × terms count matrix (rebuilt lazily after additions)."""
+        if self._matrix is None:
+            lengths = np.fromiter((len(c) for c in self._row_columns), dtype=np.int64, count=len(self._row_columns))
+            indptr = np.zeros(len(lengths) + 1, dtype=np.int64)
+            np.cumsum(lengths, out=indptr[1:])
+            if self._row_columns:
+                indices = np.concatenate(self._row_columns)
+                data = np.concatenate(self._row_counts)
+            else:
+                indices = np.empty(0, dtype=np.int64)
+                data = np.empty(0, dtype=np.int64)
+            self._matrix = sparse.csr_matrix(
+                (data, indices, indptr), shape=(len(self.doc_ids), len(self.terms))
+            )
+        return self._matrix
+
+    @property
+    def presence(self) -> sparse.csr_matrix:
+        """Binary documents × terms matrix (1 where the term occurs)."""
+        if self._presence is None:
+            presence = self.matrix.copy()
+            presence.data = np.ones_like(presence.data, dtype=np.int32)
+            self._presence = presence
+        return self._presence
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def excluded(self, exclude: Callable[[str], bool]) -> np.ndarray:
+        """Boolean mask of terms rejected by ``exclude``, evaluated once per term."""
+        flags = self._exclusions.get(exclude, np.zeros(0, dtype=bool))
+        if len(flags) < len(self.terms):
+            new_flags = np.fromiter(
+                (bool(exclude(term)) for term in self.terms[len(flags):]),
+                dtype=bool,
+                count=len(self.terms) - len(flags),
+            )
+            flags = np.concatenate([flags, new_flags])
+            self._exclusions[exclude] = flags
+        return flags
+
+    def rows_for(self, doc_ids: Optional[Iterable[Hashable]] = None) -> Optional[np.ndarray]:
+        """Row indices for ``doc_ids`` (None selects every document)."""
+        if doc_ids is None:
+            return None
+        return np.array([self._doc_rows[d] for d in doc_ids if d in self._doc_rows], dtype=np.int64)
+
+    def _select(self, matrix: sparse.csr_matrix, rows: Optional[np.ndarray]) -> sparse.csr_matrix:
+        return matrix if rows is None else matrix[rows]
+
+    def document_frequency(self, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """Number of (selected) documents containing each term."""
+        return np.asarray(self._select(self.presence, rows).sum(axis=0)).ravel()
+
+    def term_frequency(self, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """Total occurrences of each term across (selected) documents."""
+        return np.asarray(self._select(self.matrix, rows).sum(axis=0)).ravel()
+
+    def coverage(self, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """Fraction of (selected) documents containing each term."""
+        n_docs = len(self.doc_ids) if rows is None else len(rows)
+        return self.document_frequency(rows) / max(1, n_docs)
+
+    def top_terms(
+        self,
+        min_value: int = 1,
+        by: str = "df",
+        size: Optional[int] = None,
+        rows: Optional[np.ndarray] = None,
+        limit: Optional[int] = None,
+        exclude: Optional[Callable[[str], bool]] = None,
+    ) -> List[Tuple[str, int]]:
+        """
+        Highest-scoring terms, ties broken by first appearance in the corpus.
+
+        Args:
+            min_value: Minimum document frequency ("df") or occurrence count ("count")
+            by: "df" or "count"
+            size: Restrict to n-grams of this length
+            rows: Restrict to these document rows
+            limit: Maximum number of terms returned (after ``exclude``)
+            exclude: Predicate removing unwanted terms (e.g. stopword phrases);
+                pass the same callable each time so its results are cached
+        """
+        scores = self.document_frequency(rows) if by == "df" else self.term_frequency(rows)
+        mask = scores >= min_value
+        if size is not None:
+            mask &= np.asarray(self._term_sizes, dtype=np.int64) == size
+        if exclude is not None:
+            mask &= ~self.excluded(exclude)
+        candidates = np.flatnonzero(mask)
+        # Stable sort on -score keeps first-appearance order among ties
+        candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+        if limit is not None:
+            candidates = candidates[:limit]
+        return [(self.terms[column], int(scores[column])) for column in candidates]
+
+    def documents_with(self, term: str) -> List[Hashable]:
+        """Document IDs containing ``term``, in insertion order."""
+        column = self.vocabulary.get(term)
+        if column is None:
+            return []
+        if self._presence_csc is None:
+            self._presence_csc = self.presence.tocsc()
+        csc = self._presence_csc
+        rows = csc.indices[csc.indptr[column]:csc.indptr[column + 1]]
+        return [self.doc_ids[r] for r in np.sort(rows)]
+
+    def cooccurrence(self, terms: Sequence[str]) -> np.ndarray:
+        """
+        Document co-occurrence counts between ``terms``.
+
+        Returns:
+            (len(terms), len(terms)) array; the diagonal is document frequency.
+            Unknown terms get rows of zeros.
+        """
+        known = [(i, self.vocabulary[t]) for i, t in enumerate(terms) if t in self.vocabulary]
+        result = np.zeros((len(terms), len(terms)), dtype=np.int64)
+        if not known:
+            return result
+        positions, columns = zip(*known)
+        block = self.presence[:, list(columns)]
+        counts = (block.T @ block).toarray()
+        result[np.ix_(positions, positions)] = counts
+        return result
@@ -11,7 +11,16 @@ from dataclasses import dataclass, field
 from datetime import datetime, timezone
 from enum import Enum
 from typing import Any, Callable, Dict, List, Optional, TypeVar, Coroutine
-import aiohttp
+
+
+def _client_error_types():
+    """aiohttp's ClientError/ClientResponseError, imported on first use to keep startup light"""
+    import aiohttp
+    return aiohttp.ClientError, aiohttp.ClientResponseError
+
+
+def _default_retryable_exceptions() -> List[type]:
+    return [asyncio.TimeoutError, _client_error_types()[0], ConnectionError]
 
 logger = logging.getLogger(__name__)
 
@@ -46,11 +55,7 @@ class RetryConfig:
     retryable_status_codes: List[int] = field(default_factory=lambda: [429, 500, 502, 503, 504])
 
     # Which exception types should trigger retry
-    retryable_exceptions: List[type] = field(default_factory=lambda: [
-        asyncio.TimeoutError,
-        aiohttp.ClientError,
-        ConnectionError,
-    ])
+    retryable_exceptions: List[type] = field(default_factory=_default_retryable_exceptions)
 
 
 @dataclass
@@ -161,7 +166,7 @@ class TimeoutRetryHandler:
         # Check exception types
         if isinstance(error, asyncio.TimeoutError):
             return RetryReason.TIMEOUT
-        elif isinstance(error, aiohttp.ClientError):
+        elif isinstance(error, _client_error_types()[0]):
             error_str = str(error).lower()
             if 'timeout' in error_str:
                 return RetryReason.TIMEOUT
@@ -263,7 +268,7 @@ class TimeoutRetryHandler:
             except Exception as error:
                 # Classify error
                 http_status = None
-                if isinstance(error, aiohttp.ClientResponseError):
+                if isinstance(error, _client_error_types()[1]):
                     http_status = error.status
 
                 retry_reason = self._classify_error(error, http_status)
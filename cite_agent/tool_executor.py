@@ -5,17 +5,86 @@ Provides data analysis, research, and computational tools.
 Primarily used as a container for DataAnalyzer to enable dataset persistence.
 """
 
+import importlib
 import os
 import json
 from typing import Dict, Any, Optional
 from pathlib import Path
-from .research_assistant import DataAnalyzer, ASCIIPlotter, RExecutor, ProjectDetector
-from .r_workspace_bridge import RWorkspaceBridge
-from .qualitative_coding import QualitativeCodingAssistant
-from .data_cleaning_magic import DataCleaningWizard
-from .advanced_statistics import AdvancedStatistics
-from .power_analysis import PowerAnalyzer
-from .literature_synthesis import LiteratureSynthesizer
+
+
+class LazyBackend:
+    """
+    Stand-in for an analysis class whose module is imported on first use.
+
+    The research backends pull in pandas, NumPy, SciPy, scikit-learn and
+    statsmodels; deferring them keeps CLI startup and non-analysis queries
+    from paying for those imports. Calling the stand-in constructs the real
+    class; attribute access is forwarded to it.
+    """
+
+    def __init__(self, module: str, name: str):
+        self._module = module
+        self._name = name
+        self._target = None
+
+    def resolve(self):
+        if self._target is None:
+            self._target = getattr(importlib.import_module(self._module, __package__), self._name)
+        return self._target
+
+    def __call__(self, *args, **kwargs):
+        return self.resolve()(*args, **kwargs)
+
+    def __getattr__(self, attr: str):
+        return getattr(self.resolve(), attr)
+
+    def __repr__(self) -> str:
+        state = "loaded" if self._target is not None else "not loaded"
+        return f"<LazyBackend {self._module}.{self._name} ({state})>"
+
+
+# Tool registry: analysis backends, imported the first time a tool needs them
+DataAnalyzer = LazyBackend(".research_assistant", "DataAnalyzer")
+ASCIIPlotter = LazyBackend(".research_assistant", "ASCIIPlotter")
+RExecutor = LazyBackend(".research_assistant", "RExecutor")
+ProjectDetector = LazyBackend(".research_assistant", "ProjectDetector")
+RWorkspaceBridge = LazyBackend(".r_workspace_bridge", "RWorkspaceBridge")
+QualitativeCodingAssistant = LazyBackend(".qualitative_coding", "QualitativeCodingAssistant")
+DataCleaningWizard = LazyBackend(".data_cleaning_magic", "DataCleaningWizard")
+AdvancedStatistics = LazyBackend(".advanced_statistics", "AdvancedStatistics")
+PowerAnalyzer = LazyBackend(".power_analysis", "PowerAnalyzer")
+LiteratureSynthesizer = LazyBackend(".literature_synthesis", "LiteratureSynthesizer")
+
+
+class DeferredDataAnalyzer:
+    """
+    DataAnalyzer that is only constructed once something is loaded into it.
+
+    ``has_dataset`` answers False without importing anything while the
+    analyzer is still empty; any other attribute builds the real analyzer.
+    """
+
+    def __init__(self):
+        object.__setattr__(self, "_analyzer", None)
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._analyzer is not None
+
+    @property
+    def has_dataset(self) -> bool:
+        return self._analyzer is not None and self._analyzer.has_dataset
+
+    def _real(self):
+        if self._analyzer is None:
+            object.__setattr__(self, "_analyzer", DataAnalyzer())
+        return self._analyzer
+
+    def __getattr__(self, attr: str):
+        return getattr(self._real(), attr)
+
+    def __setattr__(self, attr: str, value):
+        setattr(self._real(), attr, value)
 
 
 class ToolExecutor:
@@ -880,7 +949,8 @@ class ToolExecutor:
 
             # ENHANCEMENT: Auto-compute descriptive stats for all numeric columns
             # This allows single-call data analysis (no need to chain load + analyze)
-            if "error" not in result and hasattr(self._data_analyzer, 'current_dataset'):
+            # (lazily loaded datasets already return streamed column_statistics)
+            if "error" not in result and "column_statistics" not in result:
                 df = self._data_analyzer.current_dataset
                 if df is not None:
                     # Add basic stats for each numeric column
@@ -1397,9 +1467,10 @@ class ToolExecutor:
         """Calculate inter-rater reliability (Cohen's Kappa)"""
         coder1_codes = args.get("coder1_codes", [])
         coder2_codes = args.get("coder2_codes", [])
+        coders = args.get("coders") or {}  # Optional {coder_name: [code per segment]} for >2 coders
         method = args.get("method", "cohen_kappa")
 
-        if not coder1_codes or not coder2_codes:
+        if not coders and (not coder1_codes or not coder2_codes):
             return {"error": "Missing required parameters: coder1_codes, coder2_codes"}
 
         if self.debug_mode:
@@ -1411,10 +1482,17 @@ class ToolExecutor:
 
             # Convert to CodedSegment objects (simplified for this interface)
             from .qualitative_coding import CodedSegment
-            segments1 = [CodedSegment(doc_id="", line_start=i, line_end=i, codes=[c], text="") for i, c in enumerate(coder1_codes)]
-            segments2 = [CodedSegment(doc_id="", line_start=i, line_end=i, codes=[c], text="") for i, c in enumerate(coder2_codes)]
+            def to_segments(codes):
+                return [CodedSegment(source="", line_start=i, line_end=i, codes=[c], text="") for i, c in enumerate(codes)]
+
+            if coders:
+                return self._qual_coder.calculate_multi_coder_reliability(
+                    {name: to_segments(codes) for name, codes in coders.items()}, method
+                )
 
-            result = self._qual_coder.calculate_inter_rater_reliability(segments1, segments2, method)
+            result = self._qual_coder.calculate_inter_rater_reliability(
+                to_segments(coder1_codes), to_segments(coder2_codes), method
+            )
             return result
 
         except Exception as e:
@@ -1732,6 +1810,7 @@ class ToolExecutor:
         alpha = args.get("alpha", 0.05)
         power = args.get("power", 0.80)
         n_groups = args.get("n_groups")
+        n_predictors = args.get("n_predictors")
 
         if not test_type or n is None:
             return {"error": "Missing required parameters: test_type, n"}
@@ -1745,6 +1824,8 @@ class ToolExecutor:
             kwargs = {}
             if n_groups is not None:
                 kwargs['n_groups'] = n_groups
+            if n_predictors is not None:
+                kwargs['n_predictors'] = n_predictors
 
             result = analyzer.minimum_detectable_effect(test_type, n, alpha, power, **kwargs)
 
@@ -4,11 +4,15 @@ Persistent Usage Database for Cite-Agent
 Tracks tokens, queries, conversations, and user metrics across sessions
 """
 
+import atexit
+import queue
 import sqlite3
 import json
+import threading
+from collections import defaultdict
 from datetime import datetime, timezone, timedelta
 from pathlib import Path
-from typing import Optional, Dict, List, Any
+from typing import Optional, Dict, List, Any, Tuple
 from contextlib import contextmanager
 import logging
 
@@ -26,39 +30,82 @@ class UsageDatabase:
     - Tool usage patterns
     - Performance metrics
     - Cost tracking
+    
+    Connections are long-lived (one per thread) and run in WAL mode, so
+    readers never block the writer. ``record_query`` only enqueues the row;
+    a background writer thread commits queued rows in batched transactions
+    every ``flush_interval`` seconds. Today's not-yet-committed totals are
+    overlaid on ``get_daily_usage`` so budget checks stay exact. If a batch
+    fails, its rows are written one by one; a row that still fails is retried
+    with later flushes, up to ``MAX_WRITE_ATTEMPTS`` writes.
     """
     
-    def __init__(self, db_path: Optional[Path] = None):
+    MAX_WRITE_ATTEMPTS = 3
+    
+    def __init__(
+        self,
+        db_path: Optional[Path] = None,
+        flush_interval: float = 1.0,
+        max_batch_size: int = 500,
+    ):
         """
         Initialize usage database
         
         Args:
             db_path: Path to SQLite database file. Defaults to ~/.cite_agent/usage.db
+            flush_interval: Seconds between background batch commits (0 = write synchronously)
+            max_batch_size: Maximum queued queries committed per transaction
         """
         if db_path is None:
             db_path = Path.home() / ".cite_agent" / "usage.db"
         
         self.db_path = Path(db_path)
         self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.flush_interval = flush_interval
+        self.max_batch_size = max(1, max_batch_size)
+        
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+        
+        # Write-behind queue and the uncommitted daily totals it represents
+        self._queue: "queue.Queue[Dict[str, Any]]" = queue.Queue()
+        self._pending_lock = threading.Lock()
+        self._pending_daily: Dict[Tuple[str, str], List[int]] = defaultdict(lambda: [0, 0])
+        self._writer: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._drain_lock = threading.Lock()
+        self._closed = False
         
         # Initialize database schema
         self._init_schema()
         
         logger.info(f"Initialized usage database: {self.db_path}")
     
+    def _connect(self) -> sqlite3.Connection:
+        """Return this thread's long-lived connection, opening it on first use"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.db_path), timeout=30.0, cached_statements=256)
+            conn.row_factory = sqlite3.Row  # Enable column access by name
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+    
     @contextmanager
     def _get_connection(self):
-        """Context manager for database connections"""
-        conn = sqlite3.connect(str(self.db_path))
-        conn.row_factory = sqlite3.Row  # Enable column access by name
+        """Context manager yielding the thread's connection inside a transaction"""
+        conn = self._connect()
         try:
             yield conn
             conn.commit()
         except Exception as e:
             conn.rollback()
             raise e
-        finally:
-            conn.close()
     
     def _init_schema(self):
         """Create database tables if they don't exist"""
@@ -161,126 +208,249 @@ class UsageDatabase:
         error_message: Optional[str] = None,
         metadata: Optional[Dict[str, Any]] = None
     ):
-        """Record a query with full details"""
-        timestamp = datetime.now(timezone.utc).isoformat()
+        """Record a query with full details (committed asynchronously in batches)"""
+        now = datetime.now(timezone.utc)
+        row = {
+            "timestamp": now.isoformat(),
+            "date": now.strftime("%Y-%m-%d"),
+            "user_id": user_id,
+            "conversation_id": conversation_id,
+            "query": query,
+            "response": response,
+            "tokens_used": tokens_used or 0,
+            "tools_used": list(tools_used or []),
+            "response_time_ms": response_time_ms,
+            "success": 1 if success else 0,
+            "error_message": error_message,
+            "metadata": json.dumps(metadata) if metadata else None,
+        }
         
-        with self._get_connection() as conn:
-            cursor = conn.cursor()
-            
-            # Insert query log
-            cursor.execute("""
-                INSERT INTO query_log 
-                (timestamp, user_id, conversation_id, query, response, tokens_used, 
-                 tools_used, response_time_ms, success, error_message, metadata)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                timestamp,
-                user_id,
-                conversation_id,
-                query,
-                response,
-                tokens_used,
-                json.dumps(tools_used),
-                response_time_ms,
-                1 if success else 0,
-                error_message,
-                json.dumps(metadata) if metadata else None
-            ))
-            
-            # Update daily token usage
-            date = datetime.now(timezone.utc).strftime("%Y-%m-%d")
-            # Note: cost_usd = 0 since Cerebras is free (and Groq is ~$0.0001 per 1k tokens)
-            cursor.execute("""
-                INSERT INTO token_usage (date, user_id, tokens_used, query_count, cost_usd, created_at, updated_at)
-                VALUES (?, ?, ?, 1, 0, ?, ?)
-                ON CONFLICT(date, user_id) DO UPDATE SET
-                    tokens_used = tokens_used + ?,
-                    query_count = query_count + 1,
-                    updated_at = ?
-            """, (
-                date,
-                user_id,
-                tokens_used,
-                timestamp,
-                timestamp,
-                tokens_used,
-                timestamp
-            ))
-            
-            # Update conversation metadata
-            cursor.execute("""
-                INSERT INTO conversations (conversation_id, user_id, started_at, last_activity, total_queries, total_tokens)
-                VALUES (?, ?, ?, ?, 1, ?)
-                ON CONFLICT(conversation_id) DO UPDATE SET
-                    last_activity = ?,
-                    total_queries = total_queries + 1,
-                    total_tokens = total_tokens + ?
-            """, (
-                conversation_id,
-                user_id,
-                timestamp,
-                timestamp,
-                tokens_used,
-                timestamp,
-                tokens_used
-            ))
-            
-            # Periodically cleanup old conversations (keep last 5 per user)
-            # Only run cleanup occasionally to avoid overhead (every 10th query)
-            cursor.execute("SELECT total_queries FROM conversations WHERE conversation_id = ?", (conversation_id,))
-            total_queries = cursor.fetchone()[0]
-            if total_queries % 10 == 0:  # Run every 10 queries
+        with self._pending_lock:
+            totals = self._pending_daily[(row["date"], user_id)]
+            totals[0] += row["tokens_used"]
+            totals[1] += 1
+        
+        if self.flush_interval <= 0 or self._closed:
+            self._write_batch([row])
+            return
+        
+        self._queue.put(row)
+        self._ensure_writer()
+    
+    def _ensure_writer(self):
+        if self._writer is not None:
+            return
+        with self._connections_lock:
+            if self._writer is None:
+                self._writer = threading.Thread(
+                    target=self._run_writer, name="cite-agent-usage-writer", daemon=True
+                )
+                self._writer.start()
+    
+    def _run_writer(self):
+        """Background loop: commit whatever accumulated every flush_interval seconds"""
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception as e:
+                logger.warning(f"Background usage flush failed: {e}")
+    
+    def flush(self):
+        """Commit every queued query now (used by reports, shutdown and tests)"""
+        with self._drain_lock:
+            retry: List[Dict[str, Any]] = []
+            try:
+                self._drain(retry)
+            finally:
+                # Requeued only now, so this flush doesn't spin on a failing write
+                for row in retry:
+                    self._queue.put(row)
+    
+    def _drain(self, retry: List[Dict[str, Any]]):
+        """Write queued rows in batches, collecting rows to retry later in ``retry``"""
+        while True:
+            batch: List[Dict[str, Any]] = []
+            while len(batch) < self.max_batch_size:
                 try:
-                    self.cleanup_old_conversations(max_conversations=5, user_id=user_id)
-                except Exception as e:
-                    logger.warning(f"Failed to cleanup old conversations: {e}")
-            
-            # Update tool usage stats
-            for tool in tools_used:
-                cursor.execute("""
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if not batch:
+                return
+            try:
+                self._write_batch(batch)
+            except Exception as e:
+                logger.warning(f"Failed to write usage batch of {len(batch)} queries, writing them one by one: {e}")
+                self._write_rows_individually(batch, retry)
+    
+    def _write_rows_individually(self, rows: List[Dict[str, Any]], retry: List[Dict[str, Any]]):
+        """Fallback for a failed batch: one bad row no longer loses the whole batch"""
+        for row in rows:
+            try:
+                self._write_batch([row])
+            except Exception as e:
+                row["attempts"] = row.get("attempts", 0) + 1
+                if row["attempts"] < self.MAX_WRITE_ATTEMPTS:
+                    retry.append(row)
+                    continue
+                logger.error(
+                    f"Dropping usage row for {row['user_id']} after {row['attempts']} failed writes: {e}"
+                )
+                with self._pending_lock:
+                    self._settle_pending([row])
+    
+    def close(self):
+        """Flush pending writes, stop the writer and close all connections"""
+        if self._closed:
+            return
+        self._closed = True
+        self._stop.set()
+        if self._writer is not None and self._writer is not threading.current_thread():
+            self._writer.join(timeout=5)
+        for _ in range(self.MAX_WRITE_ATTEMPTS):
+            self.flush()
+            if self._queue.empty():
+                break
+        with self._connections_lock:
+            for conn in self._connections:
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+            self._connections = []
+        self._local = threading.local()
+    
+    def _write_batch(self, rows: List[Dict[str, Any]]):
+        """Commit a batch of queries and their rollups in a single transaction"""
+        tool_rows = [
+            (r["date"], tool, r["success"], r["response_time_ms"], r["success"], r["response_time_ms"])
+            for r in rows
+            for tool in r["tools_used"]
+        ]
+        per_conversation: Dict[str, List[Any]] = {}
+        for r in rows:
+            entry = per_conversation.setdefault(r["conversation_id"], [r["user_id"], 0])
+            entry[1] += 1
+        
+        with self._pending_lock:
+            with self._get_connection() as conn:
+                cursor = conn.cursor()
+                
+                # Insert query log
+                cursor.executemany("""
+                    INSERT INTO query_log 
+                    (timestamp, user_id, conversation_id, query, response, tokens_used, 
+                     tools_used, response_time_ms, success, error_message, metadata)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """, [
+                    (
+                        r["timestamp"], r["user_id"], r["conversation_id"], r["query"], r["response"],
+                        r["tokens_used"], json.dumps(r["tools_used"]), r["response_time_ms"],
+                        r["success"], r["error_message"], r["metadata"]
+                    )
+                    for r in rows
+                ])
+                
+                # Update daily token usage
+                # Note: cost_usd = 0 since Cerebras is free (and Groq is ~$0.0001 per 1k tokens)
+                cursor.executemany("""
+                    INSERT INTO token_usage (date, user_id, tokens_used, query_count, cost_usd, created_at, updated_at)
+                    VALUES (?, ?, ?, 1, 0, ?, ?)
+                    ON CONFLICT(date, user_id) DO UPDATE SET
+                        tokens_used = tokens_used + ?,
+                        query_count = query_count + 1,
+                        updated_at = ?
+                """, [
+                    (r["date"], r["user_id"], r["tokens_used"], r["timestamp"], r["timestamp"],
+                     r["tokens_used"], r["timestamp"])
+                    for r in rows
+                ])
+                
+                # Update conversation metadata
+                cursor.executemany("""
+                    INSERT INTO conversations (conversation_id, user_id, started_at, last_activity, total_queries, total_tokens)
+                    VALUES (?, ?, ?, ?, 1, ?)
+                    ON CONFLICT(conversation_id) DO UPDATE SET
+                        last_activity = ?,
+                        total_queries = total_queries + 1,
+                        total_tokens = total_tokens + ?
+                """, [
+                    (r["conversation_id"], r["user_id"], r["timestamp"], r["timestamp"], r["tokens_used"],
+                     r["timestamp"], r["tokens_used"])
+                    for r in rows
+                ])
+                
+                # Update tool usage stats
+                cursor.executemany("""
                     INSERT INTO tool_usage (date, tool_name, usage_count, success_count, avg_response_time_ms)
                     VALUES (?, ?, 1, ?, ?)
                     ON CONFLICT(date, tool_name) DO UPDATE SET
                         usage_count = usage_count + 1,
                         success_count = success_count + ?,
                         avg_response_time_ms = (avg_response_time_ms * usage_count + ?) / (usage_count + 1)
-                """, (
-                    date,
-                    tool,
-                    1 if success else 0,
-                    response_time_ms,
-                    1 if success else 0,
-                    response_time_ms
-                ))
+                """, tool_rows)
+                
+                # Periodically cleanup old conversations (keep last 5 per user)
+                # Only when a conversation crosses a multiple of 10 queries in this batch
+                cleanup_users = set()
+                for conversation_id, (user_id, added) in per_conversation.items():
+                    cursor.execute("SELECT total_queries FROM conversations WHERE conversation_id = ?", (conversation_id,))
+                    total_queries = cursor.fetchone()[0]
+                    if total_queries // 10 > (total_queries - added) // 10:
+                        cleanup_users.add(user_id)
+            
+            # Committed: these rows are no longer "pending" for get_daily_usage
+            self._settle_pending(rows)
+        
+        for user_id in cleanup_users:
+            try:
+                self.cleanup_old_conversations(max_conversations=5, user_id=user_id)
+            except Exception as e:
+                logger.warning(f"Failed to cleanup old conversations: {e}")
+    
+    def _settle_pending(self, rows: List[Dict[str, Any]]):
+        """Remove committed (or dropped) rows from the uncommitted daily totals; hold _pending_lock"""
+        for r in rows:
+            key = (r["date"], r["user_id"])
+            totals = self._pending_daily.get(key)
+            if totals is not None:
+                totals[0] -= r["tokens_used"]
+                totals[1] -= 1
+                if totals[1] <= 0:
+                    del self._pending_daily[key]
     
     def get_daily_usage(self, user_id: str, date: Optional[str] = None) -> Dict[str, Any]:
         """Get token/query usage for a specific day"""
         if date is None:
             date = datetime.now(timezone.utc).strftime("%Y-%m-%d")
         
-        with self._get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                SELECT tokens_used, query_count, cost_usd
-                FROM token_usage
-                WHERE date = ? AND user_id = ?
-            """, (date, user_id))
-            
-            row = cursor.fetchone()
-            if row:
-                return {
-                    "date": date,
-                    "tokens_used": row["tokens_used"],
-                    "query_count": row["query_count"],
-                    "cost_usd": row["cost_usd"]
-                }
-            else:
-                return {
-                    "date": date,
-                    "tokens_used": 0,
-                    "query_count": 0,
-                    "cost_usd": 0.0
-                }
+        # Hold the pending lock so a concurrent batch commit can't be counted twice
+        with self._pending_lock:
+            pending_tokens, pending_queries = self._pending_daily.get((date, user_id), (0, 0))
+            with self._get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("""
+                    SELECT tokens_used, query_count, cost_usd
+                    FROM token_usage
+                    WHERE date = ? AND user_id = ?
+                """, (date, user_id))
+                
+                row = cursor.fetchone()
+        
+        if row:
+            return {
+                "date": date,
+                "tokens_used": row["tokens_used"] + pending_tokens,
+                "query_count": row["query_count"] + pending_queries,
+                "cost_usd": row["cost_usd"]
+            }
+        else:
+            return {
+                "date": date,
+                "tokens_used": pending_tokens,
+                "query_count": pending_queries,
+                "cost_usd": 0.0
+            }
     
     def get_conversation_history(
         self,
@@ -288,6 +458,7 @@ class UsageDatabase:
         limit: int = 10
     ) -> List[Dict[str, Any]]:
         """Get recent queries from a conversation"""
+        self.flush()
         with self._get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute("""
@@ -313,6 +484,7 @@ class UsageDatabase:
     
     def get_usage_summary(self, user_id: str, days: int = 7) -> Dict[str, Any]:
         """Get usage summary for last N days"""
+        self.flush()
         start_date = (datetime.now(timezone.utc) - timedelta(days=days)).strftime("%Y-%m-%d")
         
         with self._get_connection() as conn:
@@ -358,6 +530,7 @@ class UsageDatabase:
     
     def get_tool_stats(self, days: int = 7) -> List[Dict[str, Any]]:
         """Get tool usage statistics"""
+        self.flush()
         start_date = (datetime.now(timezone.utc) - timedelta(days=days)).strftime("%Y-%m-%d")
         
         with self._get_connection() as conn:
@@ -367,7 +540,7 @@ class UsageDatabase:
                     tool_name,
                     SUM(usage_count) as total_uses,
                     SUM(success_count) as total_successes,
-                    AVG(avg_response_time_ms) as avg_response_time
+                    SUM(avg_response_time_ms * usage_count) * 1.0 / SUM(usage_count) as avg_response_time
                 FROM tool_usage
                 WHERE date >= ?
                 GROUP BY tool_name
@@ -448,6 +621,7 @@ class UsageDatabase:
     
     def cleanup_old_data(self, days_to_keep: int = 90):
         """Remove data older than N days"""
+        self.flush()
         cutoff_date = (datetime.now(timezone.utc) - timedelta(days=days_to_keep)).strftime("%Y-%m-%d")
         
         with self._get_connection() as conn:
@@ -472,6 +646,7 @@ class UsageDatabase:
     
     def get_database_size(self) -> Dict[str, Any]:
         """Get database size and row counts"""
+        self.flush()
         with self._get_connection() as conn:
             cursor = conn.cursor()
             
@@ -504,4 +679,5 @@ def get_usage_db() -> UsageDatabase:
     global _db_instance
     if _db_instance is None:
         _db_instance = UsageDatabase()
+        atexit.register(_db_instance.close)
     return _db_instance
@@ -13,11 +13,15 @@ import hashlib
 import json
 import os
 import re
+import sqlite3
 import subprocess
-from datetime import datetime
+import threading
+from datetime import datetime, timedelta
 from pathlib import Path
 from typing import Dict, List, Optional, Any
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass
+
+_SEARCH_TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
 
 
 @dataclass
@@ -133,32 +137,175 @@ class Paper:
 
 
 class WorkflowManager:
-    """Manages scholar workflow integrations"""
+    """
+    Manages scholar workflow integrations
+
+    The paper library lives in an embedded SQLite database (``library.db``)
+    with an FTS5 index over title, authors, abstract and notes, and indexed
+    tag and added-date columns, so listing, filtering and searching stay fast
+    for libraries with tens of thousands of papers. Papers saved by older
+    versions as one JSON file each under ``library/`` are imported once.
+    """
     
-    def __init__(self):
-        self.config_dir = Path.home() / ".cite_agent"
+    def __init__(self, config_dir: Optional[Path] = None):
+        self.config_dir = Path(config_dir) if config_dir else Path.home() / ".cite_agent"
         self.library_dir = self.config_dir / "library"
+        self.library_db = self.config_dir / "library.db"
         self.exports_dir = self.config_dir / "exports"
         self.history_dir = self.config_dir / "history"
         self.bibtex_file = self.exports_dir / "references.bib"
         
         # Create directories
-        self.config_dir.mkdir(exist_ok=True)
+        self.config_dir.mkdir(parents=True, exist_ok=True)
         self.library_dir.mkdir(exist_ok=True)
         self.exports_dir.mkdir(exist_ok=True)
         self.history_dir.mkdir(exist_ok=True)
+        
+        self._db_lock = threading.RLock()
+        self._conn = sqlite3.connect(str(self.library_db), timeout=30.0, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._fts_enabled = False
+        self._init_library_schema()
+        self._migrate_json_library()
+    
+    # ------------------------------------------------------------------
+    # Library storage
+    # ------------------------------------------------------------------
+    
+    def _init_library_schema(self):
+        """Create library tables and indexes if they don't exist"""
+        with self._db_lock, self._conn:
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS papers (
+                    paper_id TEXT PRIMARY KEY,
+                    title TEXT NOT NULL,
+                    authors TEXT NOT NULL DEFAULT '[]',
+                    year INTEGER,
+                    doi TEXT,
+                    url TEXT,
+                    abstract TEXT,
+                    venue TEXT,
+                    citation_count INTEGER NOT NULL DEFAULT 0,
+                    added_date TEXT,
+                    notes TEXT,
+                    tags TEXT NOT NULL DEFAULT '[]'
+                );
+                CREATE INDEX IF NOT EXISTS idx_papers_added_date ON papers(added_date);
+                CREATE INDEX IF NOT EXISTS idx_papers_year ON papers(year);
+                
+                CREATE TABLE IF NOT EXISTS paper_tags (
+                    paper_id TEXT NOT NULL REFERENCES papers(paper_id) ON DELETE CASCADE,
+                    tag TEXT NOT NULL,
+                    PRIMARY KEY (tag, paper_id)
+                );
+                CREATE INDEX IF NOT EXISTS idx_paper_tags_paper ON paper_tags(paper_id);
+                
+                CREATE TABLE IF NOT EXISTS library_meta (
+                    key TEXT PRIMARY KEY,
+                    value TEXT
+                );
+            """)
+            try:
+                self._conn.execute("""
+                    CREATE VIRTUAL TABLE IF NOT EXISTS papers_fts USING fts5(
+                        paper_id UNINDEXED, title, authors, abstract, notes,
+                        tokenize = 'unicode61 remove_diacritics 2'
+                    )
+                """)
+                self._fts_enabled = True
+            except sqlite3.OperationalError:
+                # SQLite built without FTS5: search falls back to LIKE scans
+                self._fts_enabled = False
+    
+    def _migrate_json_library(self):
+        """Import papers saved as individual JSON files by older versions (runs once)"""
+        with self._db_lock:
+            done = self._conn.execute(
+                "SELECT value FROM library_meta WHERE key = 'json_migrated'"
+            ).fetchone()
+            if done:
+                return
+            
+            papers = []
+            for paper_file in self.library_dir.glob("*.json"):
+                try:
+                    with open(paper_file, 'r') as f:
+                        papers.append(Paper(**json.load(f)))
+                except Exception as e:
+                    print(f"Error reading {paper_file}: {e}")
+            
+            with self._conn:
+                for paper in papers:
+                    if not paper.paper_id:
+                        paper.paper_id = self._generate_paper_id(paper)
+                    self._upsert_paper(paper)
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO library_meta (key, value) VALUES ('json_migrated', ?)",
+                    (datetime.now().isoformat(),)
+                )
+    
+    def _upsert_paper(self, paper: Paper):
+        """Write a paper, its tags and its search index row (caller holds the transaction)"""
+        authors = list(paper.authors or [])
+        tags = sorted(set(paper.tags or []))
+        self._conn.execute(
+            """
+            INSERT OR REPLACE INTO papers
+                (paper_id, title, authors, year, doi, url, abstract, venue,
+                 citation_count, added_date, notes, tags)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            (
+                paper.paper_id, paper.title, json.dumps(authors), paper.year,
+                paper.doi, paper.url, paper.abstract, paper.venue,
+                paper.citation_count or 0, paper.added_date, paper.notes, json.dumps(tags),
+            )
+        )
+        self._conn.execute("DELETE FROM paper_tags WHERE paper_id = ?", (paper.paper_id,))
+        self._conn.executemany(
+            "INSERT INTO paper_tags (paper_id, tag) VALUES (?, ?)",
+            [(paper.paper_id, tag) for tag in tags]
+        )
+        if self._fts_enabled:
+            self._conn.execute("DELETE FROM papers_fts WHERE paper_id = ?", (paper.paper_id,))
+            self._conn.execute(
+                "INSERT INTO papers_fts (paper_id, title, authors, abstract, notes) VALUES (?, ?, ?, ?, ?)",
+                (paper.paper_id, paper.title, " ; ".join(authors), paper.abstract or "", paper.notes or "")
+            )
+    
+    @staticmethod
+    def _row_to_paper(row: sqlite3.Row) -> Paper:
+        return Paper(
+            title=row["title"],
+            authors=json.loads(row["authors"] or "[]"),
+            year=row["year"],
+            doi=row["doi"],
+            url=row["url"],
+            abstract=row["abstract"],
+            venue=row["venue"],
+            citation_count=row["citation_count"] or 0,
+            paper_id=row["paper_id"],
+            added_date=row["added_date"],
+            notes=row["notes"],
+            tags=json.loads(row["tags"] or "[]"),
+        )
+    
+    def close(self):
+        """Close the library database connection"""
+        with self._db_lock:
+            self._conn.close()
     
     def add_paper(self, paper: Paper) -> bool:
-        """Add paper to local library"""
+        """Add paper to local library (replaces any paper with the same ID)"""
         try:
             # Generate paper ID if not provided
             if not paper.paper_id:
                 paper.paper_id = self._generate_paper_id(paper)
             
-            # Save paper as JSON
-            paper_file = self.library_dir / f"{paper.paper_id}.json"
-            with open(paper_file, 'w') as f:
-                json.dump(asdict(paper), f, indent=2)
+            with self._db_lock, self._conn:
+                self._upsert_paper(paper)
             
             return True
         except Exception as e:
@@ -168,34 +315,46 @@ class WorkflowManager:
     def get_paper(self, paper_id: str) -> Optional[Paper]:
         """Retrieve paper from library"""
         try:
-            paper_file = self.library_dir / f"{paper_id}.json"
-            if not paper_file.exists():
-                return None
-            
-            with open(paper_file, 'r') as f:
-                data = json.load(f)
-                return Paper(**data)
+            with self._db_lock:
+                row = self._conn.execute(
+                    "SELECT * FROM papers WHERE paper_id = ?", (paper_id,)
+                ).fetchone()
+            return self._row_to_paper(row) if row else None
         except Exception as e:
             print(f"Error retrieving paper: {e}")
             return None
     
-    def list_papers(self, tag: Optional[str] = None) -> List[Paper]:
-        """List all papers in library, optionally filtered by tag"""
-        papers = []
-        for paper_file in self.library_dir.glob("*.json"):
-            try:
-                with open(paper_file, 'r') as f:
-                    data = json.load(f)
-                    paper = Paper(**data)
-                    
-                    if tag is None or tag in paper.tags:
-                        papers.append(paper)
-            except Exception as e:
-                print(f"Error reading {paper_file}: {e}")
+    def list_papers(self, tag: Optional[str] = None, limit: Optional[int] = None) -> List[Paper]:
+        """List papers in library (newest first), optionally filtered by tag"""
+        if tag is None:
+            sql = "SELECT * FROM papers ORDER BY added_date DESC"
+            params: tuple = ()
+        else:
+            sql = (
+                "SELECT p.* FROM paper_tags t JOIN papers p ON p.paper_id = t.paper_id "
+                "WHERE t.tag = ? ORDER BY p.added_date DESC"
+            )
+            params = (tag,)
+        if limit is not None:
+            sql += " LIMIT ?"
+            params += (int(limit),)
         
-        # Sort by added date (newest first)
-        papers.sort(key=lambda p: p.added_date or "", reverse=True)
-        return papers
+        try:
+            with self._db_lock:
+                rows = self._conn.execute(sql, params).fetchall()
+        except Exception as e:
+            print(f"Error reading library: {e}")
+            return []
+        return [self._row_to_paper(row) for row in rows]
+    
+    def count_papers(self, tag: Optional[str] = None) -> int:
+        """Number of papers in library, optionally filtered by tag"""
+        with self._db_lock:
+            if tag is None:
+                row = self._conn.execute("SELECT COUNT(*) FROM papers").fetchone()
+            else:
+                row = self._conn.execute("SELECT COUNT(*) FROM paper_tags WHERE tag = ?", (tag,)).fetchone()
+        return row[0]
     
     def export_to_bibtex(self, papers: Optional[List[Paper]] = None, append: bool = True) -> bool:
         """Export papers to BibTeX file"""
@@ -301,44 +460,69 @@ class WorkflowManager:
             print(f"Error saving query result: {e}")
             return False
     
-    def get_history(self, days: int = 7) -> List[Dict[str, Any]]:
-        """Retrieve query history from last N days"""
-        history = []
-        cutoff = datetime.now()
+    def get_history(self, days: int = 7, limit: int = 100) -> List[Dict[str, Any]]:
+        """Retrieve the most recent queries (newest first) from the last N days"""
+        history: List[Dict[str, Any]] = []
+        cutoff = (datetime.now() - timedelta(days=days)).strftime('%Y%m%d')
         
+        # One file per day named YYYYMMDD.jsonl: walk newest days first and stop
+        # as soon as the limit is reached instead of parsing every file
         for history_file in sorted(self.history_dir.glob("*.jsonl"), reverse=True):
+            if history_file.stem < cutoff:
+                break
             try:
                 with open(history_file, 'r') as f:
-                    for line in f:
-                        entry = json.loads(line)
-                        history.append(entry)
+                    lines = f.readlines()
             except Exception as e:
                 print(f"Error reading history: {e}")
-        
-        return history[:100]  # Limit to last 100 queries
-    
-    def search_library(self, query: str) -> List[Paper]:
-        """Search papers in library by title, author, or abstract"""
-        query_lower = query.lower()
-        results = []
-        
-        for paper in self.list_papers():
-            # Search in title
-            if query_lower in paper.title.lower():
-                results.append(paper)
                 continue
             
-            # Search in authors
-            if any(query_lower in author.lower() for author in paper.authors):
-                results.append(paper)
-                continue
-            
-            # Search in abstract
-            if paper.abstract and query_lower in paper.abstract.lower():
-                results.append(paper)
-                continue
+            for line in reversed(lines):
+                if not line.strip():
+                    continue
+                try:
+                    history.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+                if len(history) >= limit:
+                    return history
         
-        return results
+        return history
+    
+    def search_library(self, query: str, limit: Optional[int] = None) -> List[Paper]:
+        """Search papers in library by title, author, abstract, or notes"""
+        terms = _SEARCH_TOKEN_PATTERN.findall(query.lower())
+        if not terms:
+            return []
+        
+        if self._fts_enabled:
+            # Every term must match, as a prefix so "learn" finds "learning".
+            # bm25 weights follow the column order, starting with paper_id (unindexed)
+            match = " ".join(f'"{term}"*' for term in terms)
+            sql = (
+                "SELECT p.* FROM papers_fts f JOIN papers p ON p.paper_id = f.paper_id "
+                "WHERE papers_fts MATCH ? ORDER BY bm25(papers_fts, 0.0, 10.0, 5.0, 1.0, 1.0)"
+            )
+            params: tuple = (match,)
+        else:
+            pattern = f"%{query.lower()}%"
+            sql = (
+                "SELECT * FROM papers WHERE lower(title) LIKE ? OR lower(authors) LIKE ? "
+                "OR lower(coalesce(abstract, '')) LIKE ? OR lower(coalesce(notes, '')) LIKE ? "
+                "ORDER BY added_date DESC"
+            )
+            params = (pattern,) * 4
+        if limit is not None:
+            sql += " LIMIT ?"
+            params += (int(limit),)
+        
+        try:
+            with self._db_lock:
+                rows = self._conn.execute(sql, params).fetchall()
+        except sqlite3.Error as e:
+            print(f"Error searching library: {e}")
+            return []
+        return [self._row_to_paper(row) for row in rows]
     
     def add_note_to_paper(self, paper_id: str, note: str) -> bool:
         """Add note to a paper in the library"""
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""Tests for consuming the backend /query/stream NDJSON endpoint."""
+
+import asyncio
+import json
+import sys
+from pathlib import Path
+
+import aiohttp
+from aiohttp import web
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from cite_agent.enhanced_ai_agent import ChatResponse, EnhancedNocturnalAgent
+
+
+async def _stream_handler(request):
+    response = web.StreamResponse(headers={"Content-Type": "application/x-ndjson"})
+    await response.prepare(request)
+    body = await request.json()
+    events = [
+        {"type": "start", "provider": "groq", "model": "m"},
+        {"type": "token", "content": "Echo: "},
+        {"type": "token", "content": body["query"]},
+        {"type": "done", "tokens_used": 7, "provider": "groq"},
+    ]
+    for event in events:
+        await response.write((json.dumps(event) + "\n").encode())
+        await asyncio.sleep(0.01)
+    return response
+
+
+async def _collect(routes):
+    app = web.Application()
+    app.add_routes(routes)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+
+    agent = EnhancedNocturnalAgent.__new__(EnhancedNocturnalAgent)
+    agent.auth_token = "token"
+    agent.debug_mode = False
+    agent.backend_api_url = f"http://127.0.0.1:{port}"
+    fallback_calls = []
+
+    async def fake_call_backend_query(query, *args, **kwargs):
+        fallback_calls.append(query)
+        return ChatResponse(response="full answer")
+
+    agent.call_backend_query = fake_call_backend_query
+    try:
+        async with aiohttp.ClientSession() as session:
+            agent.session = session
+            chunks = [chunk async for chunk in agent.call_backend_query_stream("hello", [])]
+    finally:
+        await runner.cleanup()
+    return chunks, fallback_calls
+
+
+def test_stream_yields_tokens_incrementally():
+    chunks, fallback_calls = asyncio.run(_collect([web.post("/query/stream", _stream_handler)]))
+    assert chunks == ["Echo: ", "hello"]
+    assert fallback_calls == []
+
+
+def test_falls_back_when_backend_cannot_stream():
+    # Older backends have no /query/stream route
+    chunks, fallback_calls = asyncio.run(_collect([]))
+    assert chunks == ["full answer"]
+    assert fallback_calls == ["hello"]
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""Tests for the vectorized bootstrap engine."""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from cite_agent.advanced_statistics import AdvancedStatistics
+from cite_agent.bootstrap import BootstrapEngine, batched_ols, ci_excludes_zero, indirect_effect, with_intercept
+
+
+def _mediation_frame(n=200, seed=0):
+    rng = np.random.default_rng(seed)
+    x = rng.normal(size=n)
+    m = 0.5 * x + rng.normal(size=n)
+    y = 0.4 * m + 0.2 * x + rng.normal(size=n)
+    return pd.DataFrame({"x": x, "m": m, "y": y})
+
+
+def test_batched_ols_matches_lstsq():
+    rng = np.random.default_rng(1)
+    design = with_intercept(rng.normal(size=(4, 50, 2)))
+    target = rng.normal(size=(4, 50))
+    coefs = batched_ols(design, target)
+    for i in range(4):
+        expected = np.linalg.lstsq(design[i], target[i], rcond=None)[0]
+        assert np.allclose(coefs[i], expected)
+
+
+def test_process_pool_reproduces_in_process_estimates():
+    data = _mediation_frame().to_numpy()
+    serial = BootstrapEngine(n_resamples=500, seed=7, chunk_size=100).run(data, indirect_effect)
+    parallel = BootstrapEngine(n_resamples=500, seed=7, chunk_size=100, n_jobs=2).run(data, indirect_effect)
+    assert serial.shape == (500,)
+    assert np.allclose(serial, parallel)
+
+
+def test_mediation_ci_brackets_indirect_effect():
+    result = AdvancedStatistics(_mediation_frame()).mediation_analysis("x", "m", "y", bootstrap_samples=2000)
+    low, high = result["indirect_effect"]["ci_95"]
+    assert low < result["indirect_effect"]["coefficient"] < high
+    assert result["indirect_effect"]["significant"]
+
+
+def test_small_scale_data_keeps_bootstrap_cis():
+    for scale in (1e-3, 1e-5):
+        frame = _mediation_frame() * scale
+        stats = AdvancedStatistics(frame)
+        mediation = stats.mediation_analysis("x", "m", "y", bootstrap_samples=500)
+        assert np.all(np.isfinite(mediation["indirect_effect"]["ci_95"]))
+        moderation = stats.moderation_analysis("x", "m", "y", bootstrap_samples=500)
+        assert np.all(np.isfinite(moderation["interaction_effect"]["ci_95_bootstrap"]))
+
+
+def test_nan_ci_is_not_significant():
+    design = with_intercept(np.zeros((3, 40, 2)))  # Every resample singular
+    assert np.isnan(batched_ols(design, np.zeros((3, 40)))).all()
+    assert not ci_excludes_zero(np.nan, np.nan)
+    assert ci_excludes_zero(0.1, 0.3) and not ci_excludes_zero(-0.1, 0.3)
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""Tests for token-budgeted context packing."""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from cite_agent.context_packer import ContextBudget, ContextPacker, estimate_tokens, summarize_turns
+
+
+def _conversation(turns, answer_words=60):
+    history = []
+    for i in range(turns):
+        history.append({"role": "user", "content": f"Question {i} about revenue growth at company {i}?"})
+        history.append({"role": "assistant", "content": f"Answer {i} first sentence. " + "detail " * answer_words})
+    return history
+
+
+def test_estimate_tokens_tracks_length_and_punctuation():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("hello world") == 2
+    assert estimate_tokens("internationalization") == 5
+    assert estimate_tokens('{"a": 1}') == 7
+    prose = "The quick brown fox jumps over the lazy dog. " * 50
+    assert 0.8 < estimate_tokens(prose) / (len(prose) / 4) < 1.6
+
+
+def test_budget_gives_unused_memory_to_results():
+    budget = ContextBudget(total=8000, history_share=0.25, memory_share=0.1, minimum=1000)
+    allocation = budget.allocate(system_tokens=3000, memory_tokens=50)
+    assert allocation["history"] == 2000
+    assert allocation["memory"] == 50
+    assert allocation["tools"] == 8000 - 2000 - 3000 - 50
+    # A huge system prompt still leaves the floor for memory and results
+    squeezed = budget.allocate(system_tokens=9000)
+    assert squeezed["memory"] + squeezed["tools"] == 1000
+
+
+def test_compress_keeps_relevant_lines_head_and_tail():
+    lines = [f"-rw-r--r-- 1 user staff {i * 10} file_{i}.txt" for i in range(2000)]
+    lines[1234] = "-rw-r--r-- 1 user staff 999 quarterly_report.xlsx"
+    lines.append("ls: cannot open directory 'private': Permission denied")
+    output = "\n".join(lines)
+
+    compressed = ContextPacker().compress(output, 300, query="where is the quarterly report?")
+
+    assert estimate_tokens(compressed) <= 300
+    assert "quarterly_report.xlsx" in compressed
+    assert compressed.startswith(lines[0])
+    assert compressed.endswith("Permission denied")
+    assert "lines omitted]" in compressed
+
+
+def test_compress_leaves_small_output_untouched():
+    assert ContextPacker().compress("one\ntwo", 100, query="x") == "one\ntwo"
+
+
+def test_pack_history_fits_budget_and_summarizes_dropped_turns():
+    history = _conversation(30)
+    packed = ContextPacker().pack_history(history, max_tokens=1500)
+
+    packer = ContextPacker()
+    assert sum(packer.message_tokens(m) for m in packed) <= 1500
+    assert packed[0]["role"] == "system"
+    assert packed[0]["content"].startswith("Earlier in this conversation:")
+    assert packed[1]["role"] == "user"
+    assert packed[-1] is history[-1]
+
+
+def test_pack_history_returns_short_history_verbatim():
+    history = _conversation(2)
+    assert ContextPacker().pack_history(history, max_tokens=1500) == history
+
+
+def test_packed_prefix_is_stable_between_turns():
+    packer = ContextPacker()
+    history = _conversation(20)
+    first = packer.pack_history(history, max_tokens=1500)
+    cut = packer.summarized_messages
+
+    # Following turns append to the history without moving the cut point
+    history.extend(_conversation(1))
+    second = packer.pack_history(history, max_tokens=1500)
+    assert packer.summarized_messages == cut
+    assert second[:len(first)] == first
+    assert second[0]["content"] is first[0]["content"]  # Summary reused, not rebuilt
+
+    # Once the budget is exceeded the cut jumps forward to the low-water mark
+    for _ in range(10):
+        history.extend(_conversation(1))
+        packer.pack_history(history, max_tokens=1500)
+    assert packer.summarized_messages > cut
+
+    # A different conversation starts from scratch
+    assert packer.pack_history(_conversation(2), max_tokens=1500) == _conversation(2)
+    assert packer.summarized_messages == 0
+
+
+def test_summary_pairs_questions_with_answers():
+    summary = summarize_turns(_conversation(3), max_tokens=200)
+    assert "- Question 2 about revenue growth at company 2? → Answer 2 first sentence." in summary
+
+    tight = summarize_turns(_conversation(40), max_tokens=100)
+    assert estimate_tokens(tight) <= 100
+    assert "earlier exchanges omitted" in tight
+    assert "Question 39" in tight
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""Tests for the append-only conversation archive and memory store."""
+
+import json
+import subprocess
+import sys
+import threading
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from cite_agent.conversation_archive import AppendOnlyLog, ConversationArchive, ConversationMemoryStore
+
+
+def test_archive_tail_reads_include_unflushed_entries(tmp_path):
+    archive = ConversationArchive(root=tmp_path, max_entries=5, flush_interval=60)
+    for i in range(3):
+        archive.record_entry("user", "convo", f"question {i}", f"summary {i}", ["archive"])
+
+    context = archive.get_recent_context("user", "convo", limit=2)
+    assert "summary 1" in context and "summary 2" in context
+    assert "summary 0" not in context
+    assert not list(tmp_path.glob("*.jsonl"))  # Nothing written on the request path
+
+
+def test_archive_compacts_to_max_entries(tmp_path):
+    archive = ConversationArchive(root=tmp_path, max_entries=5, flush_interval=60)
+    for i in range(40):
+        archive.record_entry("user", "convo", f"q{i}", f"s{i}")
+    archive.flush()
+
+    segment = next(tmp_path.glob("*.jsonl"))
+    lines = segment.read_text().splitlines()
+    assert len(lines) == 5
+    assert json.loads(lines[-1])["summary"] == "s39"
+
+
+def test_archive_migrates_legacy_json(tmp_path):
+    archive = ConversationArchive(root=tmp_path, max_entries=5)
+    key = f"{archive._hash_identifier('user')}-{archive._hash_identifier('convo')}"
+    (tmp_path / f"{key}.json").write_text(json.dumps([
+        {"timestamp": "2024-01-01T00:00:00", "question": "q", "summary": "legacy", "tools_used": []}
+    ]))
+
+    assert "legacy" in archive.get_recent_context("user", "convo")
+    assert not (tmp_path / f"{key}.json").exists()
+
+
+def test_memory_store_keeps_last_interactions(tmp_path):
+    store = ConversationMemoryStore(root=tmp_path, max_interactions=10, flush_interval=60)
+    for i in range(15):
+        store.append("user", "convo", f"Q: {i}")
+    store.flush()
+
+    reloaded = ConversationMemoryStore(root=tmp_path, max_interactions=10)
+    assert reloaded.load("user", "convo") == [f"Q: {i}" for i in range(5, 15)]
+    assert reloaded.load("someone-else", "convo") is None
+
+
+def test_failed_flush_keeps_records_for_the_next_one(tmp_path):
+    log = AppendOnlyLog(tmp_path, keep=5, flush_interval=60)
+    segment = log.segment_path("convo")
+    segment.mkdir()  # Appending to a directory fails with OSError
+    log.append("convo", {"n": 0})
+    log.flush()
+    assert log.tail("convo", 5) == [{"n": 0}]
+
+    segment.rmdir()
+    log.append("convo", {"n": 1})
+    log.flush()
+    assert [json.loads(line) for line in segment.read_text().splitlines()] == [{"n": 0}, {"n": 1}]
+
+
+def test_tail_never_sees_a_record_twice_during_flushes(tmp_path):
+    log = AppendOnlyLog(tmp_path, keep=1000, flush_interval=60)
+    done = threading.Event()
+
+    def writer():
+        for n in range(300):
+            log.append("convo", {"n": n})
+            if n % 3 == 0:
+                log.flush()
+        done.set()
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    while not done.is_set():
+        seen = [record["n"] for record in log.tail("convo", 1000)]
+        assert seen == sorted(set(seen))
+    thread.join()
+    log.flush()
+    assert [record["n"] for record in log.tail("convo", 1000)] == list(range(300))
+
+
+def test_compaction_keeps_appends_from_other_processes(tmp_path):
+    script = (
+        "import sys; sys.path.insert(0, {root!r})\n"
+        "from cite_agent.conversation_archive import AppendOnlyLog\n"
+        "log = AppendOnlyLog({path!r}, keep=10, flush_interval=60, compact_factor=2)\n"
+        "for n in range(200):\n"
+        "    log.append('convo', {{'writer': sys.argv[1], 'n': n}})\n"
+        "    log.flush()\n"
+    ).format(root=str(Path(__file__).parent.parent), path=str(tmp_path))
+    writers = [subprocess.Popen([sys.executable, "-c", script, name]) for name in "ab"]
+    assert all(process.wait(timeout=60) == 0 for process in writers)
+
+    segment = AppendOnlyLog(tmp_path, keep=10, flush_interval=60).segment_path("convo")
+    records = [json.loads(line) for line in segment.read_text().splitlines()]
+    for name in "ab":
+        # Compaction keeps a suffix of each writer's records; a lost append leaves a gap
+        numbers = [r["n"] for r in records if r["writer"] == name]
+        assert numbers == list(range(200 - len(numbers), 200)), name
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""Tests for the single-pass DataCleaningWizard scan."""
+
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from cite_agent.data_cleaning_magic import DataCleaningWizard
+
+
+def _survey_frame(n_rows=2000, n_columns=200, seed=0):
+    rng = np.random.default_rng(seed)
+    columns = {}
+    for i in range(n_columns - 4):
+        values = rng.lognormal(size=n_rows) if i % 3 == 0 else rng.normal(size=n_rows)
+        values[rng.random(n_rows) < 0.03 * (i % 4)] = np.nan
+        columns[f"q{i}"] = values
+    columns["group"] = rng.choice(["a", "b", None], n_rows)
+    columns["numeric_text"] = [str(v) for v in rng.integers(0, 100, n_rows)]
+    mixed = [str(v) for v in rng.integers(0, 100, n_rows)]
+    mixed[::40] = ["n/a"] * len(mixed[::40])
+    columns["mixed"] = mixed
+    columns["labels"] = rng.choice(["red", "green"], n_rows)
+    return pd.DataFrame(columns)
+
+
+def test_scan_matches_per_column_statistics():
+    df = _survey_frame()
+    report = DataCleaningWizard(df).scan_all_issues()
+    issues = {(i["type"], i["column"]): i for i in report["issues"]}
+
+    for col in df.select_dtypes(include=[np.number]).columns:
+        data = df[col].dropna()
+        q1, q3 = data.quantile(0.25), data.quantile(0.75)
+        iqr = q3 - q1
+        iqr_outliers = (data < q1 - 1.5 * iqr) | (data > q3 + 1.5 * iqr)
+        z_outliers = pd.Series(np.abs(stats.zscore(data)) > 3, index=data.index)
+        expected = int((iqr_outliers | z_outliers).sum())
+        found = issues.get(("outliers", col))
+        assert (found["affected_rows"] if found else 0) == expected
+
+        skewed = abs(stats.skew(data)) > 1.0
+        assert (("skewed_distribution", col) in issues) == skewed
+
+        missing = int(df[col].isna().sum())
+        found = issues.get(("missing_values", col))
+        assert (found["affected_rows"] if found else 0) == missing
+
+    assert ("type_mismatch", "numeric_text") in issues
+    assert issues[("mixed_types", "mixed")]["affected_rows"] == 50
+    assert ("type_mismatch", "labels") not in issues
+    assert ("mixed_types", "labels") not in issues
+
+
+def test_scan_is_cached_until_frame_changes():
+    wizard = DataCleaningWizard(_survey_frame(n_rows=200, n_columns=20))
+    wizard.scan_all_issues()
+    scan = wizard._scan()
+    assert wizard._scan() is scan
+
+    wizard.handle_missing_values("q1", method="median")
+    assert wizard._scan() is not scan
+    assert wizard._scan().missing_counts["q1"] == 0
+
+
+def test_auto_fix_reuses_scan_medians():
+    df = _survey_frame(n_rows=500, n_columns=20)
+    wizard = DataCleaningWizard(df)
+    wizard.scan_all_issues()
+    wizard.auto_fix_issues(["missing_values"])
+
+    assert wizard.df["q1"].isna().sum() == 0
+    filled = wizard.df.loc[df["q1"].isna(), "q1"]
+    assert np.allclose(filled, df["q1"].median())
+    assert df["q1"].isna().any()  # Caller's frame is untouched
+
+
+def test_outlier_removal_keeps_missing_rows():
+    df = pd.DataFrame({"x": [1.0, 2.0, 3.0, 2.5, 1.5, 2.0, 100.0, np.nan] * 5})
+    for method in ("iqr", "zscore"):
+        wizard = DataCleaningWizard(df)
+        result = wizard.detect_and_remove_outliers("x", method=method, threshold=1.5)
+        assert result["rows_removed"] == 5
+        assert wizard.df["x"].isna().sum() == 5
+
+
+def test_wide_scan_is_fast():
+    df = _survey_frame(n_rows=5000, n_columns=200)
+    start = time.perf_counter()
+    DataCleaningWizard(df).scan_all_issues()
+    assert time.perf_counter() - start < 1.0
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""Tests for the company-name entity linker."""
+
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from cite_agent.entity_linker import CompanyNameMatcher, normalize_name
+
+MAPPING = {
+    "apple": "AAPL",
+    "goldman sachs": "GS",
+    "goldman": "GS",
+    "target": "TGT",
+    "bank of america": "BAC",
+    "america": "AMX",
+    "at&t inc.": "T",
+    "amd": "AMD",
+}
+
+
+def test_normalize_name():
+    assert normalize_name("AT&T Inc.") == ("at", "t", "inc")
+    assert normalize_name("  Bank of   America ") == ("bank", "of", "america")
+
+
+def test_matches_respect_word_boundaries():
+    matcher = CompanyNameMatcher(MAPPING)
+    assert matcher.find("We targeted pineapple growers") == []
+    assert matcher.tickers("Is Target cheaper than Apple?") == ["TGT", "AAPL"]
+
+
+def test_overlaps_resolve_longest_first_with_spans():
+    matcher = CompanyNameMatcher(MAPPING)
+    text = "Compare Goldman Sachs with Bank of America and AT&T, Inc."
+    matches = matcher.find(text)
+
+    assert [m.ticker for m in matches] == ["GS", "BAC", "T"]
+    assert [text[m.start:m.end] for m in matches] == ["Goldman Sachs", "Bank of America", "AT&T, Inc"]
+    assert matches[0].name == "goldman sachs"
+
+
+def test_confidence_favours_capitalized_multiword_names():
+    matcher = CompanyNameMatcher(MAPPING)
+    by_text = {m.name: m.confidence for m in matcher.find("goldman sachs, Target, target, amd")}
+    assert by_text["goldman sachs"] > by_text["target"]
+    assert matcher.find("Target")[0].confidence > matcher.find("target")[0].confidence
+    assert matcher.find("amd")[0].confidence < matcher.find("target")[0].confidence
+
+
+def test_disk_cache_round_trip(tmp_path):
+    built = CompanyNameMatcher.load_or_build(MAPPING, cache_dir=tmp_path)
+    assert len(list(tmp_path.glob("company_matcher-*.pickle"))) == 1
+
+    cached = CompanyNameMatcher.load_or_build(MAPPING, cache_dir=tmp_path)
+    assert cached is not built and cached.tickers("apple") == ["AAPL"]
+
+    CompanyNameMatcher.load_or_build({**MAPPING, "tesla": "TSLA"}, cache_dir=tmp_path)
+    assert len(list(tmp_path.glob("company_matcher-*.pickle"))) == 1  # Stale cache replaced
+
+
+def test_lookup_cost_independent_of_name_count():
+    mapping = {f"company {i} holdings": f"C{i}" for i in range(10000)}
+    mapping["apple"] = "AAPL"
+    matcher = CompanyNameMatcher(mapping)
+    question = "How did Apple revenue compare with company 42 holdings over the last five years?"
+
+    assert matcher.tickers(question) == ["AAPL", "C42"]
+    start = time.perf_counter()
+    for _ in range(1000):
+        matcher.find(question)
+    assert (time.perf_counter() - start) / 1000 < 0.0005
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""Tests for streaming (out-of-core) dataset profiling in DataAnalyzer."""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from cite_agent.enhanced_ai_agent import EnhancedNocturnalAgent
+from cite_agent.lazy_dataset import LazyDataset, pandas_read_code
+from cite_agent.research_assistant import DataAnalyzer
+
+
+@pytest.fixture
+def panel_csv(tmp_path):
+    rng = np.random.default_rng(0)
+    n = 5000
+    x = rng.normal(50, 10, n)
+    df = pd.DataFrame({
+        "firm": rng.choice(["a", "b", "c"], n),
+        "x": x,
+        "y": 2 * x + rng.normal(0, 5, n),
+        "z": rng.integers(0, 100, n).astype(float),
+    })
+    df.loc[rng.choice(n, 300, replace=False), "y"] = np.nan
+    df.loc[rng.choice(n, 200, replace=False), "z"] = np.nan
+    path = tmp_path / "panel.csv"
+    df.to_csv(path, index=False)
+    return path, pd.read_csv(path)
+
+
+def test_streaming_profile_matches_pandas(panel_csv):
+    path, df = panel_csv
+    profile = LazyDataset(path, chunk_rows=700, sample_rows=100).profile()
+
+    assert profile.rows == len(df)
+    assert profile.missing_values == {c: int(v) for c, v in df.isna().sum().items()}
+    for col in ["x", "y", "z"]:
+        stats = profile.numeric_stats[col]
+        assert stats["count"] == df[col].count()
+        assert stats["mean"] == pytest.approx(df[col].mean())
+        assert stats["std"] == pytest.approx(df[col].std())
+        assert stats["min"] == df[col].min() and stats["max"] == df[col].max()
+        assert stats["median"] == pytest.approx(df[col].median(), rel=0.05)
+    np.testing.assert_allclose(profile.correlation.to_numpy(), df[["x", "y", "z"]].corr().to_numpy(), atol=1e-9)
+    assert profile.top_values["firm"] == {str(k): int(v) for k, v in df["firm"].value_counts().items()}
+
+
+def test_analyzer_lazy_mode_defers_materialization(panel_csv):
+    path, df = panel_csv
+    analyzer = DataAnalyzer()
+    result = analyzer.load_dataset(str(path), lazy=True)
+
+    assert result["mode"] == "lazy" and result["rows"] == len(df)
+    assert analyzer.is_lazy and analyzer.has_dataset
+    assert analyzer.dataset_overview()["columns"] == ["firm", "x", "y", "z"]
+
+    corr = analyzer.run_correlation("X", "y")
+    assert corr["correlation"] == pytest.approx(df[["x", "y"]].dropna().corr().iloc[0, 1])
+    assert corr["n_observations"] == len(df[["x", "y"]].dropna())
+    assert analyzer.run_regression("y", ["x"])["coefficients"]["x"] == pytest.approx(2, abs=0.1)
+    assert analyzer.descriptive_stats("firm")["unique_values"] == 3
+    assert analyzer.is_lazy  # Nothing above needed the full frame
+
+    assert len(analyzer.current_dataset) == len(df)
+    assert not analyzer.is_lazy
+
+
+def test_small_files_stay_in_memory(panel_csv):
+    path, _ = panel_csv
+    analyzer = DataAnalyzer()
+    assert analyzer.load_dataset(str(path))["mode"] == "in_memory"
+    assert not analyzer.is_lazy
+
+
+@pytest.mark.parametrize("name, write", [
+    ("panel.csv", lambda df, path: df.to_csv(path, index=False)),
+    ("panel.tsv", lambda df, path: df.to_csv(path, sep="\t", index=False)),
+    ("panel.parquet", lambda df, path: df.to_parquet(path)),
+    ("panel.feather", lambda df, path: df.to_feather(path)),
+])
+def test_generated_read_code_matches_the_format(panel_csv, tmp_path, name, write):
+    _, df = panel_csv
+    path = tmp_path / name
+    write(df, path)
+
+    namespace = {"pd": pd}
+    exec(f"df = {pandas_read_code(path)}", namespace)
+    pd.testing.assert_frame_equal(namespace["df"], df)
+    exec(f"df = {pandas_read_code(path, ['x', 'z'])}", namespace)
+    pd.testing.assert_frame_equal(namespace["df"], df[["x", "z"]])
+
+
+def test_lazy_dataset_preamble_reads_only_the_named_columns(panel_csv):
+    path, df = panel_csv
+    agent = EnhancedNocturnalAgent.__new__(EnhancedNocturnalAgent)
+    analyzer = DataAnalyzer()
+    analyzer.load_dataset(str(path), lazy=True)
+
+    code = "print(df['y'].mean())"
+    namespace = {}
+    exec(agent._dataframe_preamble(analyzer, code), namespace)
+    pd.testing.assert_frame_equal(namespace["df"], df[["y"]])
+    assert agent._dataframe_preamble(analyzer, "print(df.describe())") is None
+    assert analyzer.is_lazy
+
+    analyzer.current_dataset  # Materialized: the whole file is fair game again
+    assert "usecols" not in agent._dataframe_preamble(analyzer, "print(df.describe())")
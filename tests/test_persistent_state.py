@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""Tests for the shared write-coalescing state store and its users."""
+
+import asyncio
+import json
+import subprocess
+import sys
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from cite_agent.adaptive_providers import AdaptiveProviderSelector, QueryType
+from cite_agent.circuit_breaker import CircuitBreaker, CircuitBreakerConfig, CircuitBreakerOpen, CircuitState
+from cite_agent.persistent_state import PersistentState
+from cite_agent.rate_limiter import RateLimiter
+
+REPO_ROOT = Path(__file__).parent.parent
+
+
+def test_writes_are_visible_before_they_are_flushed(tmp_path):
+    store = PersistentState(tmp_path / "state.db", flush_interval=60)
+    for _ in range(500):
+        store.update("counters", "alice", increment={"requests": 1}, assign={"last": "x"})
+    store.put("profiles", "groq", {"score": 1})
+
+    assert store.get("counters", "alice") == {"requests": 500, "last": "x"}
+    # Nothing reached disk yet
+    assert PersistentState(tmp_path / "state.db").get("counters", "alice") is None
+
+    store.flush()
+    reader = PersistentState(tmp_path / "state.db")
+    assert reader.get("counters", "alice") == {"requests": 500, "last": "x"}
+    assert reader.items("profiles") == {"groq": {"score": 1}}
+    store.close()
+
+
+def test_increments_from_concurrent_processes_add_up(tmp_path):
+    script = (
+        "import sys; from cite_agent.persistent_state import PersistentState\n"
+        "store = PersistentState(sys.argv[1], flush_interval=0.01)\n"
+        "for _ in range(200):\n"
+        "    store.update('counters', 'shared', increment={'n': 1})\n"
+        "store.close()\n"
+    )
+    db = str(tmp_path / "state.db")
+    PersistentState(db)  # Create the schema before the writers race
+    workers = [
+        subprocess.Popen([sys.executable, "-c", script, db], cwd=REPO_ROOT)
+        for _ in range(4)
+    ]
+    assert all(worker.wait(timeout=60) == 0 for worker in workers)
+
+    assert PersistentState(db).get("counters", "shared") == {"n": 800}
+
+
+def test_stores_left_open_are_flushed_at_exit(tmp_path):
+    script = (
+        "import sys; from pathlib import Path; from cite_agent.rate_limiter import RateLimiter\n"
+        "limiter = RateLimiter('alice', 'basic', storage_dir=Path(sys.argv[1]))\n"
+        "limiter.store.flush_interval = 60\n"
+        "for _ in range(3):\n"
+        "    limiter.record_request('groq', tokens=100)\n"
+    )
+    subprocess.run([sys.executable, "-c", script, str(tmp_path)], cwd=REPO_ROOT, check=True, timeout=60)
+
+    assert RateLimiter("alice", "basic", storage_dir=tmp_path).limits["groq_requests"] == 3
+
+
+def test_rate_limiter_counts_without_rewriting_files(tmp_path):
+    limiter = RateLimiter("alice", "basic", storage_dir=tmp_path)
+    limiter.store.flush_interval = 60
+    for _ in range(3):
+        limiter.record_request("groq", tokens=100)
+    limiter.record_request("archive_api")
+
+    assert limiter.limits["groq_requests"] == 3
+    assert limiter.limits["groq_tokens"] == 300
+    assert limiter.get_remaining("archive_api") == 24
+    assert not (tmp_path / "alice_limits.json").exists()
+
+    limiter.store.flush()
+    assert RateLimiter("alice", "basic", storage_dir=tmp_path).limits["groq_requests"] == 3
+
+
+def test_daily_reset_keeps_counts_another_process_already_made(tmp_path):
+    yesterday = {"date": "2000-01-01", "groq_requests": 900}
+    seed = PersistentState(tmp_path / "state.db")
+    seed.put(RateLimiter.NAMESPACE, "carol", yesterday)
+    seed.close()
+
+    stale = RateLimiter("carol", "basic", store=PersistentState(tmp_path / "state.db", flush_interval=60),
+                        storage_dir=tmp_path)
+    assert stale.limits["date"] == "2000-01-01"  # Snapshot taken before the other process's reset
+
+    other = RateLimiter("carol", "basic", store=PersistentState(tmp_path / "state.db", flush_interval=60),
+                        storage_dir=tmp_path)
+    for _ in range(5):
+        other.record_request("groq")
+    other.store.flush()
+
+    stale.record_request("groq")
+    assert stale.limits["groq_requests"] == 6
+    stale.store.flush()
+    assert PersistentState(tmp_path / "state.db").get(RateLimiter.NAMESPACE, "carol")["groq_requests"] == 6
+
+
+def test_conditional_put_loses_to_a_concurrent_replace(tmp_path):
+    first = PersistentState(tmp_path / "state.db", flush_interval=60)
+    second = PersistentState(tmp_path / "state.db", flush_interval=60)
+    first.put("days", "k", {"date": "d2", "n": 0}, unless_same="date")
+    first.update("days", "k", increment={"n": 1})
+    second.put("days", "k", {"date": "d2", "n": 0}, unless_same="date")
+    second.update("days", "k", increment={"n": 4})
+    first.flush()
+    second.flush()
+
+    assert PersistentState(tmp_path / "state.db").get("days", "k") == {"date": "d2", "n": 5}
+
+
+def test_rate_limiter_imports_legacy_json(tmp_path):
+    legacy = {"date": datetime.now().strftime("%Y-%m-%d"), "groq_requests": 7, "groq_tokens": 70,
+              "archive_api": 2, "finsight_api": 0, "web_search": 0, "last_request_time": None}
+    (tmp_path / "bob_limits.json").write_text(json.dumps(legacy))
+
+    limiter = RateLimiter("bob", "basic", storage_dir=tmp_path)
+    assert limiter.get_remaining("groq") == 1000 - 7
+    assert limiter.get_remaining("archive_api") == 23
+
+
+def test_provider_profiles_persist_per_profile(tmp_path):
+    store = PersistentState(tmp_path / "state.db", flush_interval=60)
+    selector = AdaptiveProviderSelector(storage_dir=tmp_path, store=store)
+    for i in range(5):
+        selector.record_result("groq", QueryType.CONVERSATION, success=i != 0, latency_ms=100)
+    store.flush()
+
+    restored = AdaptiveProviderSelector(storage_dir=tmp_path, store=PersistentState(tmp_path / "state.db"))
+    profile = restored.profiles["groq"][QueryType.CONVERSATION]
+    assert profile.total_requests == 5 and profile.successful_requests == 4
+    assert restored.provider_health["groq"] == pytest.approx(selector.provider_health["groq"])
+    assert not (tmp_path / "provider_profiles.json").exists()
+
+
+def test_open_circuit_survives_a_restart(tmp_path):
+    store = PersistentState(tmp_path / "state.db", flush_interval=60)
+    config = CircuitBreakerConfig(failure_threshold=0.5, min_requests_for_decision=2, open_timeout=60)
+    breaker = CircuitBreaker("backend_api", config, store=store)
+
+    async def failing():
+        raise RuntimeError("backend down")
+
+    for _ in range(2):
+        with pytest.raises(RuntimeError):
+            asyncio.run(breaker.call(failing))
+    assert breaker.state == CircuitState.OPEN
+    store.flush()
+
+    restarted = CircuitBreaker("backend_api", config, store=PersistentState(tmp_path / "state.db"))
+    assert restarted.state == CircuitState.OPEN
+    assert restarted.get_status()["last_failure"] == "backend down"
+    with pytest.raises(CircuitBreakerOpen):
+        asyncio.run(restarted.call(failing))
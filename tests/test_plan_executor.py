@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""Tests for dependency-aware parallel plan execution."""
+
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from rich.console import Console
+
+from cite_agent.enhanced_ai_agent import ChatResponse, EnhancedNocturnalAgent
+from cite_agent.plan_executor import (
+    PlanExecutor,
+    StepOutcome,
+    critical_path_length,
+    merge_step_outputs,
+    plan_dependencies,
+)
+
+
+def test_dependencies_explicit_and_inferred():
+    steps = [
+        {"tool": "financial", "query": "Get AAPL revenue"},
+        {"tool": "research", "query": "Find papers on supply chains"},
+        {"tool": "analysis", "query": "Compare them"},
+        {"tool": "research", "query": "Search papers citing the authors from step 2"},
+        {"tool": "file", "query": "Save the previous result"},
+        {"tool": "analysis", "query": "Summarize", "depends_on": ["step_1", 2, "step_9", "junk"]},
+    ]
+    assert plan_dependencies(steps) == [set(), set(), {0, 1}, {1}, {0, 1, 2, 3}, {0, 1}]
+
+
+def test_decomposed_steps_depend_only_on_what_they_refer_to():
+    agent = EnhancedNocturnalAgent.__new__(EnhancedNocturnalAgent)
+    for query, expected in (
+        ("Create a test dataset with 20 rows, then show it", [set(), {0}]),
+        ("Run a regression of sales on price, then save it to out.txt", [set(), {0}]),
+        ("Find papers on transformers, then save them to papers.txt", [set(), {0}]),
+        ("Get AAPL revenue, then find papers on supply chains, then compare them", [set(), set(), {0, 1}]),
+        ("Find papers on CRISPR, then get TSLA revenue, then summarize step 1", [set(), set(), {0}]),
+    ):
+        tasks = agent._decompose_sequential_query(query)
+        steps = [dict(task, tool=task["type"]) for task in tasks]
+        assert plan_dependencies(steps) == expected, query
+
+
+def test_independent_decomposed_clauses_run_concurrently():
+    agent = EnhancedNocturnalAgent.__new__(EnhancedNocturnalAgent)
+    tasks = agent._decompose_sequential_query("Get AAPL revenue, then find papers on supply chains")
+    steps = [dict(task, tool=task["type"]) for task in tasks]
+
+    async def run_step(index, step, context):
+        await asyncio.sleep(0.3)
+
+    start = time.perf_counter()
+    asyncio.run(PlanExecutor(run_step, max_workers=4).run(steps))
+    assert len(steps) == 2 and time.perf_counter() - start < 0.5
+
+
+def test_critical_path_length():
+    assert critical_path_length([set(), set(), {0}, {2}, set()]) == 3
+    assert critical_path_length([]) == 0
+
+
+def test_independent_steps_run_concurrently_and_pass_context():
+    seen_contexts = {}
+
+    async def run_step(index, step, context):
+        seen_contexts[index] = dict(context)
+        await asyncio.sleep(0.2)
+        context[f"step_{index + 1}"] = {"response": step["query"]}
+        context[f"value_{index}"] = index
+        return step["query"]
+
+    steps = [
+        {"tool": "financial", "query": "a"},
+        {"tool": "research", "query": "b"},
+        {"tool": "web", "query": "c"},
+        {"tool": "analysis", "query": "d"},
+    ]
+    start = time.perf_counter()
+    outcomes = asyncio.run(PlanExecutor(run_step, max_workers=4).run(steps))
+    elapsed = time.perf_counter() - start
+
+    # Three independent steps, then one dependent step: two rounds, not four
+    assert elapsed < 0.6
+    assert [o.result for o in outcomes] == ["a", "b", "c", "d"]
+    assert seen_contexts[0] == {}
+    assert seen_contexts[3]["value_2"] == 2 and "step_1" in seen_contexts[3]
+    merged = merge_step_outputs(outcomes)
+    assert list(merged)[:2] == ["step_1", "value_0"] and merged["value_3"] == 3
+
+
+def test_worker_pool_bounds_concurrency():
+    running = {"now": 0, "peak": 0}
+
+    async def run_step(index, step, context):
+        running["now"] += 1
+        running["peak"] = max(running["peak"], running["now"])
+        await asyncio.sleep(0.05)
+        running["now"] -= 1
+
+    steps = [{"tool": "research", "query": str(i)} for i in range(6)]
+    asyncio.run(PlanExecutor(run_step, max_workers=2).run(steps))
+    assert running["peak"] == 2
+
+
+def test_timeouts_and_failures_do_not_block_dependents():
+    completed = []
+
+    async def run_step(index, step, context):
+        if index == 0:
+            await asyncio.sleep(5)
+        if index == 1:
+            raise RuntimeError("boom")
+        return "ok"
+
+    steps = [
+        {"tool": "financial", "query": "slow"},
+        {"tool": "research", "query": "broken"},
+        {"tool": "analysis", "query": "uses both"},
+    ]
+    executor = PlanExecutor(run_step, step_timeout=0.1, on_step_complete=lambda o: completed.append(o.index))
+    outcomes = asyncio.run(executor.run(steps))
+
+    assert outcomes[0].timed_out and not outcomes[0].ok
+    assert outcomes[1].error == "boom"
+    assert outcomes[2].result == "ok"
+    assert completed == [1, 0, 2]  # Reported as each step finishes
+
+
+def test_finished_steps_reach_the_streaming_ui():
+    from cite_agent.streaming_ui import StreamingChatUI
+
+    ui = StreamingChatUI()
+    ui.console = Console(record=True, width=120)
+    agent = EnhancedNocturnalAgent.__new__(EnhancedNocturnalAgent)
+    agent.debug_mode = False
+    agent.workflow_step_callback = ui.show_workflow_step
+
+    async def report():
+        await agent._report_workflow_step(StepOutcome(
+            index=0, step={"tool": "financial", "query": "Get AAPL revenue"},
+            result=ChatResponse(response="$391B"), elapsed=1.25,
+        ))
+        await agent._report_workflow_step(StepOutcome(
+            index=1, step={"tool": "research", "query": "Find papers"}, error="boom",
+        ))
+
+    asyncio.run(report())
+    output = ui.console.export_text()
+    assert "✓ Step 1 [financial] Get AAPL revenue (1.2s)" in output
+    assert "✗ Step 2 [research] Find papers: boom" in output
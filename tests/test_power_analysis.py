@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+"""Tests for the PowerAnalyzer solvers (reference values from G*Power 3.1)."""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from cite_agent.power_analysis import PowerAnalyzer
+
+
+def test_sample_sizes_match_reference_values():
+    analyzer = PowerAnalyzer()
+    assert analyzer.sample_size_ttest(0.5)["n_per_group"] == 64
+    assert analyzer.sample_size_anova(0.25, 3)["total_n"] == 159
+    assert analyzer.sample_size_regression(0.15, 3)["n_required"] == 77
+
+
+def test_unreachable_target_is_reported():
+    result = PowerAnalyzer().sample_size_regression(1e-7, 5)
+    assert "error" in result
+
+
+def test_mde_inverts_power():
+    analyzer = PowerAnalyzer()
+    for test_type in ("ttest", "anova", "correlation", "regression"):
+        mde = analyzer.minimum_detectable_effect(test_type, 80, n_groups=3, n_predictors=3)
+        effect = mde["minimum_detectable_effect"]
+        achieved = analyzer.calculate_achieved_power(test_type, effect, 80, n_groups=3, n_predictors=3)
+        assert abs(achieved["achieved_power"] - 0.80) < 1e-4
+
+
+def test_power_curve_grid_shape_and_monotonicity():
+    curve = PowerAnalyzer().power_curve("ttest", [0.2, 0.5, 0.8], range(10, 200, 10))
+    assert len(curve["power"]) == 3 and len(curve["power"][0]) == 19
+    for row in curve["power"]:
+        assert all(a <= b for a, b in zip(row, row[1:]))
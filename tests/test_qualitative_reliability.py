@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""Tests for matrix-based inter-rater reliability and code matrices."""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from cite_agent.qualitative_coding import (
+    CodedSegment,
+    QualitativeCodingAssistant,
+    fleiss_kappa_by_code,
+    krippendorff_alpha_by_code,
+)
+
+
+def _segments(codes_per_line):
+    return [
+        CodedSegment(text="", codes=codes, source="doc", line_start=i, line_end=i)
+        for i, codes in enumerate(codes_per_line)
+        if codes is not None
+    ]
+
+
+def test_two_coder_cohen_kappa():
+    coder1 = _segments([["hope"], ["hope"], ["barrier"], ["barrier"], ["hope", "barrier"]])
+    coder2 = _segments([["hope"], ["barrier"], ["barrier"], ["barrier"], ["hope", "barrier"]])
+
+    result = QualitativeCodingAssistant().calculate_inter_rater_reliability(coder1, coder2)
+
+    assert result["segments_compared"] == 5
+    assert result["percent_agreement"] == 80.0
+    # hope: observed 4/5, expected .6*.4 + .4*.6 = .48 -> (0.8-0.48)/0.52
+    assert result["kappa_by_code"]["hope"] == round((0.8 - 0.48) / 0.52, 3)
+    # barrier: observed 4/5, expected .6*.8 + .4*.2 = .56
+    assert result["kappa_by_code"]["barrier"] == round((0.8 - 0.56) / 0.44, 3)
+
+
+def test_fleiss_kappa_textbook_binary_case():
+    # 3 coders, 4 units, one code: counts of "applied" per unit = 3, 0, 2, 1
+    ratings = np.array([
+        [1, 0, 1, 1],
+        [1, 0, 1, 0],
+        [1, 0, 0, 0],
+    ], dtype=bool)[:, :, None]
+    rated = np.ones((3, 4), dtype=bool)
+
+    # P_i = 1, 1, 1/3, 1/3 -> P_bar = 2/3; p = 0.5 -> P_e = 0.5
+    assert np.isclose(fleiss_kappa_by_code(ratings, rated)[0], (2 / 3 - 0.5) / 0.5)
+
+
+def test_krippendorff_alpha_handles_missing_ratings():
+    ratings = np.array([
+        [1, 0, 1, 0],
+        [1, 0, 0, 0],
+        [0, 0, 1, 0],
+    ], dtype=bool)[:, :, None]
+    rated = np.array([
+        [True, True, True, True],
+        [True, True, False, True],
+        [False, True, True, False],
+    ])
+    # Every unit's pairable ratings agree, so there are no disagreeing coincidences
+    assert krippendorff_alpha_by_code(ratings, rated)[0] == 1.0
+
+    rated[2, 0] = True  # third coder disagrees on unit 0
+    # unit 0 now has 2 applied + 1 not: o_01 = 2*1/2 = 1; n = 10, n1 = 4, n0 = 6
+    expected = 1 - (10 - 1) * 1 / (4 * 6)
+    assert np.isclose(krippendorff_alpha_by_code(ratings, rated)[0], expected)
+
+
+def test_multi_coder_methods_agree_on_perfect_coding():
+    codes = [["a"], ["b"], ["a", "b"], []]
+    coders = {name: _segments(codes) for name in ("x", "y", "z")}
+    assistant = QualitativeCodingAssistant()
+
+    for method in ("cohen_kappa", "fleiss_kappa"):
+        result = assistant.calculate_multi_coder_reliability(coders, method)
+        assert result["coders"] == 3
+        assert result["overall_kappa"] == 1.0
+    alpha = assistant.calculate_multi_coder_reliability(coders, "krippendorff_alpha")
+    assert alpha["overall_alpha"] == 1.0
+    assert alpha["percent_agreement"] == 100.0
+
+
+def test_frequency_and_cooccurrence_matrices():
+    assistant = QualitativeCodingAssistant()
+    for name in ("hope", "barrier", "family"):
+        assistant.create_code(name, name)
+    assistant.load_transcript("a", "line one\nline two\nline three")
+    assistant.load_transcript("b", "line one\nline two")
+    assistant.code_segment("a", 0, 0, ["hope", "family"])
+    assistant.code_segment("a", 1, 2, ["hope"])
+    assistant.code_segment("b", 0, 1, ["barrier", "family"])
+
+    frequency = assistant.generate_code_frequency_matrix()
+    assert frequency["matrix"]["hope"] == {"a": 2, "b": 0}
+    assert frequency["summary"] == {"barrier": 1, "family": 2, "hope": 2}
+
+    cooccurrence = assistant.generate_code_cooccurrence_matrix()
+    assert cooccurrence["matrix"]["family"]["hope"] == 1
+    assert cooccurrence["matrix"]["family"]["family"] == 2
+    assert {"codes": ["barrier", "family"], "segments": 1} in cooccurrence["top_pairs"]
+
+    excerpts = assistant.get_coded_excerpts("family")
+    assert [e["source"] for e in excerpts["excerpts"]] == ["a", "b"]
+
+
+def test_fleiss_without_a_unit_every_coder_rated_falls_back_to_pairwise_kappa():
+    coders = {
+        "x": _segments([["a"], ["b"], ["a"], None]),
+        "y": _segments([["a"], ["b"], None, ["b"]]),
+        "z": _segments([None, None, ["a"], ["a"]]),
+    }
+
+    result = QualitativeCodingAssistant().calculate_multi_coder_reliability(coders, "fleiss_kappa")
+
+    assert result["success"] and result["fleiss_available"] is False
+    assert result["method"] == "Cohen's Kappa (mean pairwise)"
+    assert result["pairwise_kappa"] == {"x vs y": 1.0, "x vs z": 1.0, "y vs z": 0.0}
+    assert "kappa_by_code" in result and "note" in result
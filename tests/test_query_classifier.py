@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Tests and micro-benchmark for the compiled request classifier.
+
+Run the benchmark standalone with:
+    python tests/test_query_classifier.py
+"""
+
+import re
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from cite_agent.query_classifier import (
+    FINANCIAL_BOUNDED_KEYWORDS,
+    PhraseMatcher,
+    _ALL_PHRASES,
+    classify_query,
+    has_dataset_evidence,
+)
+
+# Queries taken from the README, docs and support transcripts
+QUERY_CORPUS = [
+    "Find papers on transformer architecture",
+    "What are the latest BERT improvements?",
+    "Compare GPT-3 vs GPT-4 architectures",
+    "What's Tesla's revenue for 2024?",
+    "Compare Apple and Microsoft P/E ratios",
+    "Show me NVIDIA's earnings trends",
+    "Load data.csv and run a regression of test score on study hours",
+    "Check assumptions for the linear regression model",
+    "How many python files are in this repo?",
+    "What themes come up in these interview transcripts?",
+    "Research on momentum returns in emerging markets",
+    "What is the stock market reaction to earnings surprises? find recent papers",
+    "Calculate the gross margin and operating margin for AAPL over the last 4 quarters",
+    "who are you and what can you do",
+    "count to 20",
+    "grep for TODO in the codebase",
+    "What sample size do I need for a t-test with effect size 0.5?",
+    "Summarize the methodology of self-supervised learning for chest x-ray diagnosis",
+    "Compare user experience rating between groups",
+    "Papers on 2008, 2015, 2019",
+]
+
+
+def test_matcher_equals_substring_semantics():
+    matcher = PhraseMatcher(_ALL_PHRASES, bounded=FINANCIAL_BOUNDED_KEYWORDS)
+    for query in QUERY_CORPUS + ["approaches to roa", "themes of qualitative coding", "p/e, eps."]:
+        text = query.lower()
+        hits, bounded = matcher.scan(text)
+        assert hits == {p for p in _ALL_PHRASES if p in text}
+        assert bounded == {
+            p for p in FINANCIAL_BOUNDED_KEYWORDS
+            if re.search(r'\b' + re.escape(p) + r'\b', text)
+        }
+
+
+def test_routing_signals():
+    assert classify_query("What's Tesla's revenue for 2024?").financial
+    assert not classify_query("what approaches exist for this").financial  # "roa" inside a word
+    assert not classify_query("Research on momentum returns in emerging markets").financial
+    assert classify_query("Find papers on transformer architecture").research
+    assert classify_query("who are you").is_meta
+    assert classify_query("What themes come up in these interview transcripts?").analysis_mode == "qualitative"
+    assert classify_query("theme park algorithm").analysis_mode == "quantitative"
+    assert classify_query("Compare user experience rating between groups").analysis_mode == "mixed"
+    assert classify_query("count to 20").task_type == "analysis"
+
+
+def test_dataset_evidence():
+    assert has_dataset_evidence("Q: load survey.csv A: Loaded 120 rows")
+    assert has_dataset_evidence("Q: ok A: Dataset has 10 rows and 4 columns")
+    assert not has_dataset_evidence("Q: hello A: hi there")
+
+
+def benchmark(repeat: int = 200) -> float:
+    """Mean microseconds per uncached classification over the corpus."""
+    scan = classify_query.__wrapped__
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for query in QUERY_CORPUS:
+            features = scan(query)
+            features.financial, features.research, features.analysis_mode
+    elapsed = time.perf_counter() - start
+    return elapsed / (repeat * len(QUERY_CORPUS)) * 1e6
+
+
+def test_classification_is_microseconds():
+    # Generous bound for slow CI machines; typical laptops measure ~20µs
+    assert benchmark(repeat=20) < 500
+
+
+if __name__ == "__main__":
+    print(f"classify_query: {benchmark():.1f} µs/query over {len(QUERY_CORPUS)} queries")
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""Tests for the persistent R worker behind RWorkspaceBridge (skipped without R)."""
+
+import shutil
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from cite_agent.r_workspace_bridge import RWorkspaceBridge
+
+
+def _r_has_jsonlite() -> bool:
+    if shutil.which("Rscript") is None:
+        return False
+    probe = subprocess.run(
+        ["Rscript", "-e", "quit(status = !requireNamespace('jsonlite', quietly = TRUE))"],
+        capture_output=True,
+    )
+    return probe.returncode == 0
+
+
+pytestmark = pytest.mark.skipif(not _r_has_jsonlite(), reason="Rscript with jsonlite not installed")
+
+
+@pytest.fixture
+def bridge():
+    bridge = RWorkspaceBridge()
+    yield bridge
+    bridge.close()
+
+
+def test_session_objects_persist_between_calls(bridge):
+    result = bridge.execute_and_capture(
+        "df <- data.frame(x = 1:3, y = c('a', 'b', 'c')); print(nrow(df))", ["df"]
+    )
+    assert result["success"], result
+    assert "3" in result["stdout"]
+    assert result["captured"]["df"]["data"]["x"].tolist() == [1, 2, 3]
+
+    # Same warm worker: the object created above is still there
+    frame = bridge.get_dataframe("df")
+    assert frame["success"], frame
+    assert frame["column_names"] == ["x", "y"]
+    assert frame["dataframe"]["y"].tolist() == ["a", "b", "c"]
+
+
+def test_workspace_file_is_loaded_and_cached(bridge, tmp_path):
+    workspace = tmp_path / "analysis.RData"
+    saved = bridge.execute_and_capture(f"scores <- c(90, 85); save(scores, file = '{workspace}')", [])
+    assert saved["success"], saved
+
+    listing = bridge.list_objects(str(workspace))
+    assert [obj["name"] for obj in listing["objects"]] == ["scores"]
+    assert bridge.get_dataframe("scores", str(workspace))["dataframe"]["value"].tolist() == [90, 85]
+
+
+def test_exec_leaves_the_cached_workspace_untouched(bridge, tmp_path):
+    workspace = tmp_path / "scores.RData"
+    assert bridge.execute_and_capture(f"x <- 5; save(x, file = '{workspace}')", [])["success"]
+
+    changed = bridge.execute_and_capture("x <- 0", ["x"], str(workspace))
+    assert changed["success"], changed
+    assert changed["captured"]["x"]["value"] == 0
+
+    # Reads still see the workspace as saved, not the earlier exec's assignment
+    assert bridge.get_dataframe("x", str(workspace))["dataframe"]["value"].tolist() == [5]
+
+
+def test_errors_are_reported_and_worker_recovers(bridge):
+    missing = bridge.get_dataframe("does_not_exist")
+    assert not missing["success"] and "not found" in missing["error"]
+
+    crashed = bridge.execute_and_capture("quit(save = 'no')", [])
+    assert not crashed["success"]
+    assert bridge.execute_and_capture("z <- 1", [])["success"]
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""Startup benchmark: the CLI must import without the analysis stack."""
+
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT))
+
+# Imported by analysis backends only; none of them may load at startup
+HEAVY_MODULES = ("pandas", "numpy", "scipy", "sklearn", "statsmodels", "groq", "aiohttp")
+
+# Generous ceiling for `import cite_agent.cli` (typically ~0.3-0.4s; was ~2.5s)
+STARTUP_BUDGET_SECONDS = 1.5
+
+
+def _importtime(statement: str) -> dict:
+    """Cumulative import time (seconds) per module from `python -X importtime`"""
+    env = dict(os.environ, PYTHONPATH=str(ROOT))
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        capture_output=True, text=True, cwd=ROOT, env=env, timeout=120,
+    )
+    assert result.returncode == 0, result.stderr[-2000:]
+    timings = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        timings[name.strip()] = int(cumulative) / 1e6
+    return timings
+
+
+def test_cli_import_skips_analysis_stack():
+    timings = _importtime("import cite_agent.cli")
+    loaded = {name.split(".")[0] for name in timings}
+    assert not loaded & set(HEAVY_MODULES), sorted(loaded & set(HEAVY_MODULES))
+    assert "cite_agent.research_assistant" not in timings
+    assert timings["cite_agent.cli"] < STARTUP_BUDGET_SECONDS
+
+
+def test_package_import_defers_agent():
+    timings = _importtime("import cite_agent")
+    assert "cite_agent.enhanced_ai_agent" not in timings
+
+
+def test_lazy_backends_resolve_on_first_use():
+    statement = (
+        "import sys\n"
+        "from cite_agent.tool_executor import DeferredDataAnalyzer, PowerAnalyzer\n"
+        "analyzer = DeferredDataAnalyzer()\n"
+        "assert not analyzer.has_dataset and 'pandas' not in sys.modules\n"
+        "assert PowerAnalyzer().__class__.__name__ == 'PowerAnalyzer'\n"
+        "assert analyzer.current_dataset is None and analyzer.is_loaded\n"
+    )
+    _importtime(statement)
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""Tests for the sparse n-gram engine and the theme extractors built on it."""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from cite_agent.literature_synthesis import LiteratureSynthesizer
+from cite_agent.qualitative_coding import QualitativeCodingAssistant
+from cite_agent.text_features import NgramIndex, normalize_ngram_sizes
+
+
+def test_index_counts_frequencies_and_cooccurrence():
+    index = NgramIndex(ngram_sizes=2)
+    index.add_document("a", "Social media use predicts poor sleep quality")
+    index.add_document("b", "Heavy social media use and sleep quality in students")
+    index.add_document("c", "Sleep quality improves with exercise; social media again: social media")
+
+    assert index.matrix.shape == (3, len(index.terms))
+    assert dict(index.top_terms(min_value=3, by="df")) == {"social media": 3, "sleep quality": 3}
+    assert dict(index.top_terms(min_value=3, by="count")) == {"social media": 4, "sleep quality": 3}
+    assert index.documents_with("media use") == ["a", "b"]
+    assert index.cooccurrence(["media use", "with exercise", "unknown"]).tolist() == [
+        [2, 0, 0], [0, 1, 0], [0, 0, 0]
+    ]
+
+    # Re-adding a document replaces its row
+    index.add_document("c", "nothing relevant here")
+    assert index.documents_with("sleep quality") == ["a", "b"]
+    assert np.isclose(index.coverage()[index.vocabulary["sleep quality"]], 2 / 3)
+
+
+def test_ngram_size_ranges():
+    assert normalize_ngram_sizes(2) == (2,)
+    assert normalize_ngram_sizes((2, 4)) == (2, 3, 4)
+    index = NgramIndex(ngram_sizes=(2, 3))
+    index.add_document(0, "one two three")
+    assert index.terms == ["one two", "two three", "one two three"]
+    assert [t for t, _ in index.top_terms(size=3)] == ["one two three"]
+
+
+def test_literature_themes_update_as_papers_are_added():
+    synth = LiteratureSynthesizer()
+    for i in range(3):
+        synth.add_paper(f"p{i}", "t", "Screen time reduces sleep quality in teens", 2020)
+    themes = synth.extract_common_themes(min_papers=3)["themes"]
+    assert themes["sleep quality"]["papers"] == ["p0", "p1", "p2"]
+    assert "time reduces" in themes
+
+    synth.add_paper("p3", "t", "Sleep quality improved after screen time limits", 2021)
+    themes = synth.extract_common_themes(min_papers=3)["themes"]
+    assert themes["sleep quality"]["frequency"] == 4
+    assert themes["sleep quality"]["coverage_pct"] == 100
+    assert "time reduces" in themes and themes["time reduces"]["frequency"] == 3
+
+
+def test_qualitative_themes_count_selected_documents():
+    assistant = QualitativeCodingAssistant()
+    assistant.load_transcript("i1", "I felt really anxious. Really anxious about money.")
+    assistant.load_transcript("i2", "Felt really anxious again")
+    result = assistant.auto_extract_themes(min_frequency=2)
+    assert result["themes"]["really anxious"]["frequency"] == 3
+    assert result["themes"]["felt really anxious"]["type"] == "trigram"
+    only_first = assistant.auto_extract_themes(doc_ids=["i1"], min_frequency=2)
+    assert only_first["themes"]["really anxious"]["frequency"] == 2
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""Tests for the buffered, WAL-mode usage database."""
+
+import sqlite3
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from cite_agent.usage_database import UsageDatabase
+
+
+def test_daily_usage_includes_queued_queries(tmp_path):
+    db = UsageDatabase(tmp_path / "usage.db", flush_interval=60)
+    for _ in range(3):
+        db.record_query("cli_user", "convo", "q", "r", 100, ["archive"], 50)
+
+    usage = db.get_daily_usage("cli_user")
+    assert usage["tokens_used"] == 300
+    assert usage["query_count"] == 3
+
+    db.flush()
+    assert db.get_daily_usage("cli_user")["query_count"] == 3  # No double counting
+    db.close()
+
+
+def test_batched_rollups_and_reports(tmp_path):
+    db = UsageDatabase(tmp_path / "usage.db", flush_interval=60)
+    for i in range(25):
+        db.record_query("cli_user", f"convo-{i % 2}", "q", "r", 10, ["archive", "shell"], 100 + i)
+
+    summary = db.get_usage_summary("cli_user", days=1)
+    assert summary["total_queries"] == 25
+    assert summary["total_tokens"] == 250
+
+    tools = {row["tool"]: row for row in db.get_tool_stats(days=1)}
+    assert tools["archive"]["uses"] == 25
+    assert db.get_database_size()["row_counts"]["query_log"] == 25
+    db.close()
+
+
+def test_connection_is_reused_in_wal_mode(tmp_path):
+    db = UsageDatabase(tmp_path / "usage.db", flush_interval=0)
+    conn = db._connect()
+    assert conn is db._connect()
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    db.close()
+
+
+def test_failed_batch_falls_back_to_single_rows_and_retries(tmp_path):
+    db = UsageDatabase(tmp_path / "usage.db", flush_interval=60)
+    db.record_query("cli_user", "convo", "q", "r", 10, [], 50)
+    db.record_query("cli_user", "convo", object(), "r", 20, [], 50)  # Cannot be bound: always fails
+    db.record_query("cli_user", "convo", "q", "r", 30, [], 50)
+
+    db.flush()
+    assert db.get_database_size()["row_counts"]["query_log"] == 2  # The good rows still land
+    assert db.get_daily_usage("cli_user")["tokens_used"] == 60  # Bad row is queued for retry
+
+    db.flush()
+    db.flush()
+    usage = db.get_daily_usage("cli_user")
+    assert (usage["tokens_used"], usage["query_count"]) == (40, 2)  # Dropped after three attempts
+    assert db._queue.empty()
+    db.close()
+
+
+def test_transient_write_failure_is_retried(tmp_path, monkeypatch):
+    db = UsageDatabase(tmp_path / "usage.db", flush_interval=60)
+    for _ in range(3):
+        db.record_query("cli_user", "convo", "q", "r", 10, [], 50)
+
+    write_batch = db._write_batch
+
+    def locked(rows):
+        raise sqlite3.OperationalError("database is locked")
+
+    monkeypatch.setattr(db, "_write_batch", locked)
+    db.flush()
+    monkeypatch.setattr(db, "_write_batch", write_batch)
+    db.flush()
+
+    assert db.get_database_size()["row_counts"]["query_log"] == 3
+    assert db.get_daily_usage("cli_user")["query_count"] == 3
+    db.close()
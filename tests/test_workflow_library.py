@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""Tests for the SQLite-backed paper library and query history."""
+
+import json
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from cite_agent.workflow import Paper, WorkflowManager
+
+
+def _paper(i, **kwargs):
+    return Paper(
+        title=kwargs.pop("title", f"Paper {i}"),
+        authors=kwargs.pop("authors", [f"Author {i}"]),
+        year=2000 + i,
+        added_date=f"2024-01-{i + 1:02d}T00:00:00",
+        **kwargs,
+    )
+
+
+def test_library_list_tag_and_search(tmp_path):
+    workflow = WorkflowManager(config_dir=tmp_path)
+    workflow.add_paper(_paper(1, title="Deep learning for protein folding", tags=["bio"]))
+    workflow.add_paper(_paper(2, title="Momentum returns", authors=["Jegadeesh", "Titman"]))
+    workflow.add_paper(_paper(3, abstract="We study transformer language models.", tags=["nlp", "bio"]))
+
+    assert [p.year for p in workflow.list_papers()] == [2003, 2002, 2001]
+    assert [p.year for p in workflow.list_papers(tag="bio")] == [2003, 2001]
+    assert workflow.count_papers() == 3 and workflow.count_papers(tag="nlp") == 1
+
+    assert [p.year for p in workflow.search_library("learn")] == [2001]
+    assert [p.year for p in workflow.search_library("titman")] == [2002]
+    assert [p.year for p in workflow.search_library("Transformer models")] == [2003]
+    assert workflow.search_library("nonexistent") == []
+
+    paper_id = workflow.list_papers(tag="nlp")[0].paper_id
+    workflow.add_note_to_paper(paper_id, "Revisit the ablation on attention heads")
+    workflow.tag_paper(paper_id, ["to-read"])
+    assert [p.year for p in workflow.search_library("ablation")] == [2003]
+    assert workflow.get_paper(paper_id).tags == ["bio", "nlp", "to-read"]
+    assert workflow.count_papers() == 3
+
+
+def test_json_library_migrates_once(tmp_path):
+    library_dir = tmp_path / "library"
+    library_dir.mkdir()
+    legacy = _paper(5, title="Legacy entry", tags=["old"])
+    legacy.paper_id = "legacy"
+    (library_dir / "legacy.json").write_text(json.dumps(legacy.__dict__))
+
+    workflow = WorkflowManager(config_dir=tmp_path)
+    assert workflow.get_paper("legacy").title == "Legacy entry"
+    assert [p.paper_id for p in workflow.list_papers(tag="old")] == ["legacy"]
+    workflow.close()
+
+    # A stale JSON file is not re-imported over newer library state
+    (library_dir / "legacy.json").write_text(json.dumps({**legacy.__dict__, "title": "Stale"}))
+    assert WorkflowManager(config_dir=tmp_path).get_paper("legacy").title == "Legacy entry"
+
+
+def test_history_is_newest_first_and_bounded(tmp_path):
+    workflow = WorkflowManager(config_dir=tmp_path)
+    old_day = (datetime.now() - timedelta(days=30)).strftime("%Y%m%d")
+    (workflow.history_dir / f"{old_day}.jsonl").write_text(
+        json.dumps({"timestamp": "2020-01-01T00:00:00", "query": "ancient", "response": ""}) + "\n"
+    )
+    for i in range(5):
+        workflow.save_query_result(f"query {i}", "answer")
+
+    history = workflow.get_history(limit=3)
+    assert [entry["query"] for entry in history] == ["query 4", "query 3", "query 2"]
+    assert "ancient" not in [entry["query"] for entry in workflow.get_history()]
+
+
+def test_search_ranks_title_and_author_matches_above_body_matches(tmp_path):
+    workflow = WorkflowManager(config_dir=tmp_path)
+    workflow.add_paper(_paper(1, title="Momentum crashes", authors=["Kent Daniel", "Tobias Moskowitz"]))
+    workflow.add_paper(_paper(2, title="Returns to buying winners and selling losers",
+                              authors=["Narasimhan Jegadeesh", "Sheridan Titman"]))
+    workflow.add_paper(_paper(3, title="Time series momentum",
+                              abstract="Titman and Titman (1993) style momentum strategies reverse."))
+    for i in range(4, 8):
+        workflow.add_paper(_paper(i, title=f"Bond yields {i}", abstract="Term structure of bond yields."))
+
+    assert [p.year for p in workflow.search_library("momentum")][:2] == [2001, 2003]
+    assert [p.year for p in workflow.search_library("titman")] == [2002, 2003]